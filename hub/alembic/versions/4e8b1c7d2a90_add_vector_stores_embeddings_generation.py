@@ -0,0 +1,30 @@
+"""Add vector_stores.embeddings_generation.
+
+Revision ID: 4e8b1c7d2a90
+Revises: 9c2d4e7f1a35
+Create Date: 2026-10-17 21:14:52.603119
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4e8b1c7d2a90"
+down_revision: Union[str, None] = "9c2d4e7f1a35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Bumped whenever the embeddings of the vector store change, tells whether its vector index is current.
+    op.add_column(
+        "vector_stores",
+        sa.Column("embeddings_generation", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("vector_stores", "embeddings_generation")
@@ -0,0 +1,33 @@
+"""Create registry_blobs.
+
+Revision ID: 6a0f3e2b9c47
+Revises: d394a6b195ca
+Create Date: 2026-10-17 16:41:09.284517
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6a0f3e2b9c47"
+down_revision: Union[str, None] = "d394a6b195ca"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "registry_blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("namespace", sa.String(255), primary_key=True),
+        sa.Column("entry_id", sa.Integer, nullable=False),
+        sa.Column("size", sa.BigInteger, nullable=False),
+        sa.Column("key", sa.String(1024), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("registry_blobs")
@@ -0,0 +1,104 @@
+"""Add messages.seq for keyset pagination of thread messages.
+
+`hub/start.sh` runs the migrations when a container starts, while other replicas may still be writing messages.
+Messages written during the copy are copied again right before the tables are swapped; stop writes (scale the hub
+down to this replica) to also cover the few statements between that catch-up and the swap.
+
+`seq` comes from AUTO_INCREMENT, which only increases with commit order when every message is inserted through the
+same aggregator, as the hub does through `DATABASE_HOST`. With several aggregators each hands out its own range, and
+the `after` cursor of message listings could skip a message committed later with a lower `seq`.
+
+Revision ID: 9c2d4e7f1a35
+Revises: 6a0f3e2b9c47
+Create Date: 2026-10-17 19:02:37.512948
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c2d4e7f1a35"
+down_revision: Union[str, None] = "6a0f3e2b9c47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "id, object, created_at, thread_id, status, incomplete_details, completed_at, incomplete_at, role, content, "
+    "assistant_id, run_id, attachments, metadata"
+)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # SingleStore cannot add an AUTO_INCREMENT column to an existing table: create the table anew.
+    # `seq` is not unique on its own, as SingleStore only allows unique keys that include the shard key (`id`).
+    print("Creating messages table with seq...")
+    conn.execute(
+        sa.text("""
+        CREATE TABLE new_messages (
+            id VARCHAR(50) NOT NULL,
+            object VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP(6) NULL DEFAULT CURRENT_TIMESTAMP(6),
+            thread_id VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            incomplete_details JSON NULL,
+            completed_at DATETIME NULL,
+            incomplete_at DATETIME NULL,
+            role VARCHAR(20) NOT NULL,
+            content JSON NOT NULL,
+            assistant_id VARCHAR(255) NULL,
+            run_id VARCHAR(255) NULL,
+            attachments JSON NULL,
+            metadata JSON NULL,
+            seq BIGINT NOT NULL AUTO_INCREMENT,
+            PRIMARY KEY (id),
+            KEY ix_messages_seq (seq),
+            KEY ix_messages_thread_id_seq (thread_id, seq),
+            KEY ix_messages_thread_id_run_id_seq (thread_id, run_id, seq)
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+    """)
+    )
+
+    # Number existing messages in creation order.
+    print("Copying messages...")
+    conn.execute(
+        sa.text(f"""
+        INSERT INTO new_messages ({COLUMNS}, seq)
+        SELECT {COLUMNS}, ROW_NUMBER() OVER (ORDER BY created_at, id)
+        FROM messages
+    """)
+    )
+
+    # CRITICAL! New messages must be numbered after the copied ones.
+    conn.execute(sa.text("AGGREGATOR SYNC AUTO_INCREMENT"))
+
+    # Messages written by other replicas while copying, numbered after the ones copied above.
+    print("Copying messages written meanwhile...")
+    conn.execute(
+        sa.text(f"""
+        INSERT INTO new_messages ({COLUMNS})
+        SELECT {COLUMNS}
+        FROM messages
+        WHERE id NOT IN (SELECT id FROM new_messages)
+        ORDER BY created_at, id
+    """)
+    )
+
+    print("Replacing messages table...")
+    op.drop_table("messages")
+    op.rename_table("new_messages", "messages")
+
+    op.create_index("ix_threads_parent_id", "threads", ["parent_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_threads_parent_id", table_name="threads")
+    op.create_index("ix_messages_thread_id", "messages", ["thread_id"])
+    op.drop_index("ix_messages_thread_id_run_id_seq", table_name="messages")
+    op.drop_index("ix_messages_thread_id_seq", table_name="messages")
+    op.drop_index("ix_messages_seq", table_name="messages")
+    op.drop_column("messages", "seq")
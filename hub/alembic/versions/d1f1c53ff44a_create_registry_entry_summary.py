@@ -0,0 +1,81 @@
+"""Create registry_entry_summary and the indexes used to maintain it.
+
+Revision ID: d1f1c53ff44a
+Revises: 3dc05346cbff
+Create Date: 2026-10-17 10:12:31.518204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d1f1c53ff44a"
+down_revision: Union[str, None] = "3dc05346cbff"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "registry_entry_summary",
+        sa.Column("namespace", sa.String(255), primary_key=True),
+        sa.Column("name", sa.String(255), primary_key=True),
+        sa.Column("latest_id", sa.Integer, nullable=False),
+        sa.Column("latest_category", sa.String(255), nullable=False),
+        sa.Column("latest_show_entry", sa.Boolean, nullable=False),
+        sa.Column("num_stars", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("num_forks", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("fork_from_namespace", sa.String(255), nullable=True),
+        sa.Column("fork_from_name", sa.String(255), nullable=True),
+    )
+    op.create_index("ix_registry_entry_summary_latest_id", "registry_entry_summary", ["latest_id"])
+    op.create_index("ix_registry_entry_summary_category", "registry_entry_summary", ["latest_category", "latest_id"])
+
+    op.create_index("ix_registry_entry_namespace_name", "registry_entry", ["namespace", "name"])
+    op.create_index("ix_stars_namespace_name", "stars", ["namespace", "name"])
+    op.create_index("ix_forks_from", "forks", ["category", "from_namespace", "from_name"])
+    op.create_index("ix_entry_tags_tag", "entry_tags", ["tag", "registry_id"])
+
+    # Same query as `hub.api.v1.registry_summary.REBUILD_QUERY` at the time of this revision.
+    op.execute(
+        """
+        INSERT INTO registry_entry_summary
+            (namespace, name, latest_id, latest_category, latest_show_entry, num_stars, num_forks,
+             fork_from_namespace, fork_from_name)
+        SELECT
+            registry.namespace, registry.name, registry.id, registry.category, registry.show_entry,
+            COALESCE(counted_stars.num_stars, 0), COALESCE(counted_forks.num_forks, 0),
+            fork.from_namespace, fork.from_name
+        FROM registry_entry registry
+        JOIN (SELECT MAX(id) AS id FROM registry_entry GROUP BY namespace, name) last_entry
+            ON last_entry.id = registry.id
+        LEFT JOIN (SELECT namespace, name, COUNT(*) AS num_stars FROM stars GROUP BY namespace, name) counted_stars
+            ON counted_stars.namespace = registry.namespace AND counted_stars.name = registry.name
+        LEFT JOIN (
+            SELECT category, from_namespace, from_name, COUNT(*) AS num_forks
+            FROM forks
+            GROUP BY category, from_namespace, from_name
+        ) counted_forks
+            ON counted_forks.category = registry.category
+                AND counted_forks.from_namespace = registry.namespace
+                AND counted_forks.from_name = registry.name
+        LEFT JOIN forks fork
+            ON fork.category = registry.category
+                AND fork.to_namespace = registry.namespace
+                AND fork.to_name = registry.name
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_entry_tags_tag", table_name="entry_tags")
+    op.drop_index("ix_forks_from", table_name="forks")
+    op.drop_index("ix_stars_namespace_name", table_name="stars")
+    op.drop_index("ix_registry_entry_namespace_name", table_name="registry_entry")
+
+    op.drop_index("ix_registry_entry_summary_category", table_name="registry_entry_summary")
+    op.drop_index("ix_registry_entry_summary_latest_id", table_name="registry_entry_summary")
+    op.drop_table("registry_entry_summary")
@@ -0,0 +1,73 @@
+"""Create registry_triggers and index_versions.
+
+Revision ID: d394a6b195ca
+Revises: d1f1c53ff44a
+Create Date: 2026-10-17 14:02:47.113958
+
+"""
+
+import json
+from typing import Any, Dict, List, Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d394a6b195ca"
+down_revision: Union[str, None] = "d1f1c53ff44a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    registry_triggers = op.create_table(
+        "registry_triggers",
+        sa.Column("event_type", sa.String(255), primary_key=True),
+        sa.Column("namespace", sa.String(255), primary_key=True),
+        sa.Column("name", sa.String(255), primary_key=True),
+        sa.Column("registry_id", sa.Integer, nullable=False),
+    )
+    op.create_index("ix_registry_triggers_entry", "registry_triggers", ["namespace", "name"])
+    index_versions = op.create_table(
+        "index_versions",
+        sa.Column("name", sa.String(255), primary_key=True),
+        sa.Column("version", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+    # Event types of the latest visible version of every agent, as `hub.api.v1.registry_summary.trigger_event_types`.
+    agents = op.get_bind().execute(
+        sa.text(
+            """
+            SELECT registry.id, registry.namespace, registry.name, registry.details
+            FROM registry_entry_summary summary
+            JOIN registry_entry registry ON registry.id = summary.latest_id
+            WHERE summary.latest_category = 'agent' AND summary.latest_show_entry
+            """
+        )
+    )
+    rows: List[Dict[str, Any]] = []
+    for registry_id, namespace, name, details in agents:
+        triggers = json.loads(str(details or "{}")).get("triggers")
+        if not isinstance(triggers, dict):
+            continue
+        events = triggers.get("events")
+        event_types = (
+            {event_type for event_type, value in events.items() if value is not None}
+            if isinstance(events, dict)
+            else set()
+        )
+        if triggers.get("webhook") is not None:
+            event_types.add("webhook")
+        rows.extend(
+            {"event_type": event_type, "namespace": namespace, "name": name, "registry_id": registry_id}
+            for event_type in event_types
+        )
+    if rows:
+        op.bulk_insert(registry_triggers, rows)
+    op.bulk_insert(index_versions, [{"name": "triggers", "version": 1}])
+
+
+def downgrade() -> None:
+    op.drop_table("index_versions")
+    op.drop_index("ix_registry_triggers_entry", table_name="registry_triggers")
+    op.drop_table("registry_triggers")
@@ -1,21 +1,52 @@
+import hashlib
 import logging
+import time
 from datetime import datetime
-from typing import Optional
+from os import getenv
+from typing import NamedTuple, Optional, Tuple
 
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from nearai.shared.cache import mem_cache_with_timeout
-from nearai.shared.near.sign import validate_nonce, verify_signed_message
+from nearai.shared.cache import LruTtlCache, cached
+from nearai.shared.near.sign import SignatureVerificationResult, validate_nonce, verify_signed_message
 from pydantic import BaseModel, field_validator
 from sqlmodel import select
 
 from hub.api.v1.exceptions import TokenValidationError
 from hub.api.v1.models import Delegation, get_session
+from hub.api.v1.registry_summary import get_index_version
 from hub.api.v1.sql import SqlClient
 
 bearer = HTTPBearer(auto_error=False)
 logger = logging.getLogger(__name__)
 
+VERIFIED_TOKEN_TTL = float(getenv("VERIFIED_TOKEN_TTL", 300))
+"""Seconds a verified signature is trusted without verifying it again (same as the access key owner cache)."""
+REJECTED_TOKEN_TTL = float(getenv("REJECTED_TOKEN_TTL", 60))
+DELEGATION_CACHE_TTL = float(getenv("DELEGATION_CACHE_TTL", 60))
+
+
+class VerifiedToken(NamedTuple):
+    """Outcome of the signature verification of an auth token."""
+
+    account_id: str
+    nonce: bytes
+    expires_at: float
+    """Unix time after which the token is verified again."""
+    valid: bool
+
+
+# Digest of the signed fields of a token -> VerifiedToken. Bad signatures are cached too, for REJECTED_TOKEN_TTL.
+verified_tokens = LruTtlCache(
+    max_entries=int(getenv("VERIFIED_TOKEN_CACHE_SIZE", 65536)), ttl=VERIFIED_TOKEN_TTL, name="verified_tokens"
+)
+# (original_account_id, delegation_account_id, version of the delegations of original_account_id) -> whether there is
+# a delegation, and its expiry. Keyed on the version in `index_versions`, so that a change made through any hub replica
+# takes effect on the next request.
+delegations = LruTtlCache(
+    max_entries=int(getenv("DELEGATION_CACHE_SIZE", 16384)), ttl=DELEGATION_CACHE_TTL, name="delegations"
+)
+
 
 # TODO: This code is duplicated from shared/auth_data.py (remove duplication)
 class AuthToken(BaseModel):
@@ -82,12 +113,25 @@ def parse_auth(token: Optional[HTTPAuthorizationCredentials] = Depends(bearer)):
         raise TokenValidationError(detail=str(e)) from None
 
 
-def validate_signature(auth: Optional[RawAuthToken] = Depends(parse_auth)):
-    if auth is None:
-        return None
+def auth_digest(auth: AuthToken) -> bytes:
+    """Digest of the fields covered by the signature of an auth token."""
+    h = hashlib.sha256()
+    for field in (auth.account_id, auth.public_key, auth.signature, auth.message, auth.recipient, auth.callback_url):
+        encoded = b"\xff" if field is None else field.encode()
+        h.update(len(encoded).to_bytes(4, "little"))
+        h.update(encoded)
+    h.update(auth.nonce)
+    return h.digest()
 
-    logging.debug(f"account_id {auth.account_id}: verifying signature")
-    is_valid = verify_signed_message(
+
+def verify_auth_token(auth: AuthToken) -> bool:
+    """Verify the signature of an auth token, using `verified_tokens` to skip repeated verifications."""
+    key = auth_digest(auth)
+    cached: Optional[VerifiedToken] = verified_tokens.get(key)
+    if cached is not None:
+        return cached.valid
+
+    result = verify_signed_message(
         auth.account_id,
         auth.public_key,
         auth.signature,
@@ -96,32 +140,68 @@ def validate_signature(auth: Optional[RawAuthToken] = Depends(parse_auth)):
         auth.recipient,
         auth.callback_url,
     )
-    if not is_valid:
-        logging.error(f"account_id {auth.account_id}: signature verification failed")
-        raise HTTPException(status_code=401, detail="Invalid signature")
+    if result == SignatureVerificationResult.TRUE:
+        verified_tokens.set(key, VerifiedToken(auth.account_id, auth.nonce, time.time() + VERIFIED_TOKEN_TTL, True))
+    elif result == SignatureVerificationResult.FALSE:
+        verified_tokens.set(
+            key,
+            VerifiedToken(auth.account_id, auth.nonce, time.time() + REJECTED_TOKEN_TTL, False),
+            ttl=REJECTED_TOKEN_TTL,
+        )
+    # Not cached when the key owner service is unavailable (neither by `verify_access_key_owner`), the next request may
+    # succeed.
+    return bool(result)
 
-    logging.debug(f"account_id {auth.account_id}: signature verified")
 
-    if auth.on_behalf_of is not None:
-        # Query is trying to perform an action on behalf of another account. Check if it has permission to do so.
+def delegations_index(original_account_id: str) -> str:
+    """Name in `index_versions` of the version of the delegations of an account, bumped whenever they change."""
+    return f"delegations:{original_account_id}"
+
+
+def get_delegation_expiry(original_account_id: str, delegation_account_id: str) -> Tuple[bool, Optional[datetime]]:
+    """Whether `delegation_account_id` may act on behalf of `original_account_id`, and until when."""
+    with get_session() as session:
+        version = get_index_version(session, delegations_index(original_account_id))
+        key = (original_account_id, delegation_account_id, version)
+        cached = delegations.get(key)
+        if cached is not None:
+            return cached
 
         query = (
             select(Delegation)
-            .where(Delegation.original_account_id == auth.on_behalf_of)
-            .where(Delegation.delegation_account_id == auth.account_id)
+            .where(Delegation.original_account_id == original_account_id)
+            .where(Delegation.delegation_account_id == delegation_account_id)
             .limit(1)
         )
+        result = session.exec(query).first()
+        delegation = (False, None) if result is None else (True, result.expires_at)
+    delegations.set(key, delegation)
+    return delegation
+
+
+def validate_signature(auth: Optional[RawAuthToken] = Depends(parse_auth)):
+    if auth is None:
+        return None
 
-        with get_session() as session:
-            result = session.exec(query).first()
+    logging.debug(f"account_id {auth.account_id}: verifying signature")
+    is_valid = verify_auth_token(auth)
+    if not is_valid:
+        logging.error(f"account_id {auth.account_id}: signature verification failed")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    logging.debug(f"account_id {auth.account_id}: signature verified")
+
+    if auth.on_behalf_of is not None:
+        # Query is trying to perform an action on behalf of another account. Check if it has permission to do so.
+        found, expires_at = get_delegation_expiry(auth.on_behalf_of, auth.account_id)
 
-            if result is None:
-                err_msg = f"{auth.account_id} don't have permission to execute action on behalf of {auth.on_behalf_of}."
-                raise HTTPException(status_code=401, detail=err_msg)
+        if not found:
+            err_msg = f"{auth.account_id} don't have permission to execute action on behalf of {auth.on_behalf_of}."
+            raise HTTPException(status_code=401, detail=err_msg)
 
-            if result.expires_at is not None and result.expires_at < datetime.now():
-                err_msg = f"{auth.account_id} permission to operate on behalf of {auth.on_behalf_of} expired."
-                raise HTTPException(status_code=401, detail=err_msg)
+        if expires_at is not None and expires_at < datetime.now():
+            err_msg = f"{auth.account_id} permission to operate on behalf of {auth.on_behalf_of} expired."
+            raise HTTPException(status_code=401, detail=err_msg)
 
         # TODO(517): Instead of altering the account_id we should keep the object as is.
         auth.account_id = auth.on_behalf_of
@@ -129,7 +209,7 @@ def validate_signature(auth: Optional[RawAuthToken] = Depends(parse_auth)):
     return auth.unwrap()
 
 
-@mem_cache_with_timeout(timeout=60)
+@cached(ttl=60, max_entries=int(getenv("REVOKABLE_AUTH_CACHE_SIZE", 65536)), name="revokable_auth")
 def revokable_auth(auth: Optional[AuthToken] = Depends(validate_signature)):
     if auth is None:
         return None
@@ -1,19 +1,24 @@
 import asyncio
 import json
+import logging
 from datetime import datetime, timezone
 from enum import Enum
-from os import getenv
-from typing import Callable, List, Union
+from typing import Callable, List, Optional, Union
 
+import anyio
 from dotenv import load_dotenv
-from nearai.shared.client_config import DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT
-from openai import OpenAI
+from openai import AsyncOpenAI, AsyncStream, OpenAI
 from pydantic import BaseModel, field_validator
+from starlette.concurrency import run_in_threadpool
 
 from hub.api.v1.models import Delta, get_session
+from hub.api.v1.provider_clients import StreamSlot, provider_clients
+from hub.api.v1.run_events import commit_and_publish
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 class Provider(Enum):
     HYPERBOLIC = "hyperbolic"
@@ -22,97 +27,97 @@ class Provider(Enum):
     LOCAL = "local"
 
 
-async def handle_stream(thread_id, run_id, message_id, resp_stream, add_usage_callback: Callable):
+async def close_stream(resp_stream: AsyncStream, slot: Optional[StreamSlot] = None) -> None:
+    """Close the upstream stream and release its slot. Idempotent, safe to call from a cancelled task."""
+    with anyio.CancelScope(shield=True):
+        try:
+            await resp_stream.close()
+        finally:
+            if slot is not None:
+                slot.release()
+
+
+async def handle_stream(
+    thread_id,
+    run_id,
+    message_id,
+    resp_stream: AsyncStream,
+    add_usage_callback: Callable,
+    slot: Optional[StreamSlot] = None,
+):
+    """Proxy an upstream completion stream as server-sent events.
+
+    Chunks are forwarded as soon as they arrive, and deltas of a run are persisted off the event loop. If the client
+    disconnects, the generator is cancelled and the upstream stream is closed, which also stops the generation.
+    """
     response_chunks = []
     deltas_to_commit = []
     commit_every = 5  # Commit every N chunks to reduce DB overhead
     is_first_chunk = True
 
-    if run_id is not None:
-        with get_session() as session:
-            for _idx, chunk in enumerate(resp_stream):
+    try:
+        if run_id is not None:
+            with get_session() as session:
+                async for chunk in resp_stream:
+                    c = json.dumps(chunk.model_dump())
+                    response_chunks.append(c)
+
+                    txt = chunk.choices[0].delta.content if chunk.choices else None
+                    if txt is not None:
+                        content = {"content": [{"index": 0, "type": "text", "text": {"value": txt}}]}
+                        delta = Delta(
+                            event="thread.message.delta",
+                            content=content,
+                            created_at=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                            run_id=run_id,
+                            thread_id=thread_id,
+                            message_id=message_id,
+                        )
+                        deltas_to_commit.append(delta)
+
+                        # Commit in batches to reduce DB overhead but commit the first chunk for responsiveness
+                        if is_first_chunk or len(deltas_to_commit) >= commit_every:
+                            is_first_chunk = False
+                            await run_in_threadpool(commit_and_publish, session, run_id, deltas_to_commit)
+                            deltas_to_commit = []
+
+                    yield f"data: {c}\n\n"
+
+                completion_delta = Delta(
+                    object="thread.message.completed",
+                    content="",
+                    created_at=datetime.now(timezone.utc),
+                    run_id=run_id,
+                    thread_id=thread_id,
+                    message_id=message_id,
+                )
+                deltas_to_commit.append(completion_delta)
+                await run_in_threadpool(commit_and_publish, session, run_id, deltas_to_commit)
+
+        else:
+            async for chunk in resp_stream:
                 c = json.dumps(chunk.model_dump())
                 response_chunks.append(c)
-
-                txt = chunk.choices[0].delta.content
-                if txt is not None:
-                    content = {"content": [{"index": 0, "type": "text", "text": {"value": txt}}]}
-                    delta = Delta(
-                        event="thread.message.delta",
-                        content=content,
-                        created_at=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
-                        run_id=run_id,
-                        thread_id=thread_id,
-                        message_id=message_id,
-                    )
-                    deltas_to_commit.append(delta)
-
-                    # Commit in batches to reduce DB overhead but commit the first chunk for responsiveness
-                    if is_first_chunk or len(deltas_to_commit) >= commit_every:
-                        is_first_chunk = False
-                        session.add_all(deltas_to_commit)
-                        session.commit()
-                        deltas_to_commit = []
-
-                # Yield immediately and let the event loop process
                 yield f"data: {c}\n\n"
-                await asyncio.sleep(0)
-
-            completion_delta = Delta(
-                object="thread.message.completed",
-                content="",
-                created_at=datetime.now(timezone.utc),
-                run_id=run_id,
-                thread_id=thread_id,
-                message_id=message_id,
-            )
-            deltas_to_commit.append(completion_delta)
-            session.add_all(deltas_to_commit)
-            session.commit()
-
-    else:
-        for chunk in resp_stream:
-            c = json.dumps(chunk.model_dump())
-            response_chunks.append(c)
-            yield f"data: {c}\n\n"
-            await asyncio.sleep(0)  # lets the event loop yield, otherwise it batches yields
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info(f"Client disconnected, closing upstream stream after {len(response_chunks)} chunks")
+        raise
+    finally:
+        await close_stream(resp_stream, slot)
 
     yield "data: [DONE]\n\n"
     full_response_text = "".join(response_chunks)
-    add_usage_callback(full_response_text)
+    await run_in_threadpool(add_usage_callback, full_response_text)
 
 
 def get_llm_ai(provider: str) -> OpenAI:
-    if provider == "hyperbolic":
-        return OpenAI(
-            base_url="https://api.hyperbolic.xyz/v1",
-            api_key=getenv("HYPERBOLIC_API_KEY"),
-            timeout=DEFAULT_TIMEOUT,
-            max_retries=DEFAULT_MAX_RETRIES,
-        )
-    elif provider == "fireworks":
-        return OpenAI(
-            base_url="https://api.fireworks.ai/inference/v1",
-            api_key=getenv("FIREWORKS_API_KEY"),
-            timeout=DEFAULT_TIMEOUT,
-            max_retries=DEFAULT_MAX_RETRIES,
-        )
-    elif provider == "crynux":
-        return OpenAI(
-            base_url="https://bridge.crynux.ai/v1/llm",
-            api_key=getenv("CRYNUX_API_KEY"),
-            timeout=DEFAULT_TIMEOUT,
-            max_retries=DEFAULT_MAX_RETRIES,
-        )
-    elif provider == "local":
-        return OpenAI(
-            base_url=getenv("PROVIDER_LOCAL_BASE_URL"),
-            api_key=getenv("PROVIDER_LOCAL_API_KEY"),
-            timeout=DEFAULT_TIMEOUT,
-            max_retries=DEFAULT_MAX_RETRIES,
-        )
-    else:
-        raise NotImplementedError
+    """Shared, connection-pooled client of `provider`. Raises NotImplementedError if it is not supported."""
+    return provider_clients.get(provider)
+
+
+def get_async_llm_ai(provider: str) -> AsyncOpenAI:
+    """Async version of `get_llm_ai`, for the running event loop."""
+    return provider_clients.get_async(provider)
 
 
 class Message(BaseModel):
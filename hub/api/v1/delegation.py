@@ -4,8 +4,9 @@ from typing import List
 from fastapi import APIRouter, Depends
 from sqlmodel import delete, select
 
-from hub.api.v1.auth import AuthToken, get_auth
+from hub.api.v1.auth import AuthToken, delegations_index, get_auth
 from hub.api.v1.models import Delegation, get_session
+from hub.api.v1.registry_summary import bump_index_version
 
 v1_router = APIRouter(
     prefix="/delegation",
@@ -26,6 +27,7 @@ def delegate(delegate_account_id: str, expires_at: datetime, auth: AuthToken = D
             expires_at=expires_at,
         )
         session.add(delegation)
+        bump_index_version(session, delegations_index(auth.account_id))
         session.commit()
 
 
@@ -50,4 +52,5 @@ def revoke_delegation(
             query = query.where(Delegation.delegation_account_id == delegate_account_id)  # type: ignore
 
         session.exec(query)  # type: ignore
+        bump_index_version(session, delegations_index(auth.account_id))
         session.commit()
@@ -1,7 +1,7 @@
 import re
 from typing import Annotated
 
-from fastapi import Form, HTTPException
+from fastapi import Form, HTTPException, Query
 from nearai.shared.client_config import IDENTIFIER_PATTERN
 from pydantic import AfterValidator, BaseModel
 
@@ -43,3 +43,8 @@ class EntryLocation(BaseModel):
     def as_form(cls, namespace: str = Form(...), name: str = Form(...), version: str = Form(...)):
         """Creates a location from form data."""
         return cls(namespace=namespace, name=name, version=version)
+
+    @classmethod
+    def as_query(cls, namespace: str = Query(...), name: str = Query(...), version: str = Query(...)):
+        """Creates a location from query parameters."""
+        return cls(namespace=namespace, name=name, version=version)
@@ -1,10 +1,12 @@
+import asyncio
+import base64
 import io
 import logging
 import mimetypes
 import os
 import uuid
 from os import getenv
-from typing import Literal, Tuple
+from typing import List, Literal, Optional, Tuple
 
 import boto3
 import chardet
@@ -35,6 +37,10 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 S3_ENDPOINT = getenv("S3_ENDPOINT")
+MAX_RETRIEVE_FILES = int(getenv("MAX_RETRIEVE_FILES", 100))
+"""Maximum number of files retrieved by a single `/files/retrieve` request."""
+MAX_RETRIEVE_BYTES = int(getenv("MAX_RETRIEVE_BYTES", 32 * 1024 * 1024))
+"""Maximum size of the file contents returned by a single `/files/retrieve` request, before encoding."""
 s3_client = boto3.client(
     "s3",
     endpoint_url=S3_ENDPOINT,
@@ -53,6 +59,28 @@ class FileUploadRequest(BaseModel):
         arbitrary_types_allowed = True
 
 
+class RetrieveFilesRequest(BaseModel):
+    """Request model for retrieving several files."""
+
+    file_ids: List[str]
+    """The IDs of the files to retrieve."""
+    include_content: bool = False
+    """Whether to include the content of the files."""
+
+
+class RetrievedFile(BaseModel):
+    file: FileObject
+    content: Optional[str] = None
+    """The content of the file, base64 encoded, if requested.
+
+    Contents are left out once `MAX_RETRIEVE_BYTES` is reached, and are retrieved by a further request.
+    """
+
+
+class RetrieveFilesResponse(BaseModel):
+    data: List[RetrievedFile]
+
+
 def generate_unique_filename(filename: str) -> str:
     """Generate a unique filename by adding a short UUID.
 
@@ -390,6 +418,79 @@ async def retrieve_file_content(
     )
 
 
+@files_router.post("/files/retrieve")
+async def retrieve_files(
+    request: RetrieveFilesRequest,
+    auth: AuthToken = Depends(get_auth),
+) -> RetrieveFilesResponse:
+    """Retrieve information about several files, and optionally their contents, in a single request.
+
+    Args:
+    ----
+        request (RetrieveFilesRequest): The IDs of the files, and whether to include their contents.
+        auth (AuthToken): The authentication token for the current user.
+
+    Returns:
+    -------
+        RetrieveFilesResponse: The files found, in the order of `file_ids`. Files that are not found or that the
+        user doesn't have permission to access are left out. Contents are included up to `MAX_RETRIEVE_BYTES`, and
+        always for the first file found.
+
+    Raises:
+    ------
+        HTTPException:
+            - 400 if more than `MAX_RETRIEVE_FILES` files are requested.
+            - 500 if there's an error retrieving the files.
+
+    """
+    if len(request.file_ids) > MAX_RETRIEVE_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RETRIEVE_FILES} files can be retrieved at once")
+
+    sql_client = SqlClient()
+    try:
+        files_details = sql_client.get_files_details_by_account(
+            file_ids=list(dict.fromkeys(request.file_ids)), account_id=auth.account_id
+        )
+    except Exception as e:
+        logger.error(f"Database operation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve file information") from e
+    details_by_id = {file_details.id: file_details for file_details in files_details}
+    found = [details_by_id[file_id] for file_id in request.file_ids if file_id in details_by_id]
+
+    contents: List[Optional[str]] = [None] * len(found)
+    if request.include_content:
+        with_content = 0
+        total_bytes = 0
+        for file_details in found:
+            total_bytes += file_details.file_size
+            if with_content and total_bytes > MAX_RETRIEVE_BYTES:
+                break
+            with_content += 1
+        try:
+            raw_contents = await asyncio.gather(
+                *(get_file_content(file_details.file_uri) for file_details in found[:with_content])
+            )
+        except Exception as e:
+            logger.error(f"Failed to retrieve file content: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to retrieve file content") from e
+        contents[:with_content] = [base64.b64encode(content).decode() for content in raw_contents]
+
+    data = []
+    for file_details, content in zip(found, contents):
+        file = FileObject(
+            id=str(file_details.id),
+            bytes=file_details.file_size,
+            created_at=int(file_details.created_at.timestamp()),
+            filename=file_details.filename,
+            object="file",
+            purpose=file_details.purpose,  # type: ignore
+            status="uploaded",
+            status_details="File information retrieved successfully",
+        )
+        data.append(RetrievedFile(file=file, content=content))
+    return RetrieveFilesResponse(data=data)
+
+
 async def get_file_content(file_uri: str) -> bytes:
     """Retrieve the content of a file from the storage system.
 
@@ -411,8 +512,8 @@ async def get_file_content(file_uri: str) -> bytes:
         s3_path = file_uri[len(S3_URI_PREFIX) :]
         bucket, key = s3_path.split("/", 1)
         try:
-            response = s3_client.get_object(Bucket=bucket, Key=key)
-            return response["Body"].read()
+            # Read in a thread, so that contents retrieved together are read concurrently.
+            return await asyncio.to_thread(lambda: s3_client.get_object(Bucket=bucket, Key=key)["Body"].read())
         except Exception as e:
             logger.error(f"Failed to retrieve file from S3: {str(e)}")
             raise
@@ -420,10 +521,14 @@ async def get_file_content(file_uri: str) -> bytes:
         # Extract local file path
         file_path = file_uri[len(FILE_URI_PREFIX) :]
         try:
-            with open(file_path, "rb") as file:
-                return file.read()
+            return await asyncio.to_thread(_read_local_file, file_path)
         except Exception as e:
             logger.error(f"Failed to read local file: {str(e)}")
             raise
     else:
         raise ValueError(f"Unsupported file URI: {file_uri}")
+
+
+def _read_local_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as file:
+        return file.read()
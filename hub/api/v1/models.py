@@ -19,7 +19,7 @@ from openai.types.beta.threads.message_delta_event import MessageDeltaEvent as O
 from openai.types.beta.threads.run import Run as OpenAIRun
 from openai.types.beta.threads.text import Text
 from openai.types.beta.threads.text_content_block import TextContentBlock
-from sqlalchemy import BigInteger
+from sqlalchemy import BigInteger, FetchedValue, Index
 from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.types import TypeDecorator
 from sqlmodel import Column, Field, Session, SQLModel, create_engine
@@ -37,6 +37,9 @@ DB_PASSWORD = getenv("DATABASE_PASSWORD")
 DB_NAME = getenv("DATABASE_NAME")
 STORAGE_TYPE = getenv("STORAGE_TYPE", "file")
 DB_POOL_SIZE = int(getenv("DATABASE_POOL_SIZE", 10))
+DB_POOL_MAX_OVERFLOW = int(getenv("DATABASE_POOL_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(getenv("DATABASE_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(getenv("DATABASE_POOL_RECYCLE", 3600))
 
 
 class Framework(Enum):
@@ -109,9 +112,12 @@ class RegistryEntry(SQLModel, table=True):
     """Entry stored in the registry."""
 
     __tablename__ = "registry_entry"
-    __table_args__ = {
-        "mysql_collate": "utf8mb4_unicode_ci",  # Use case-insensitive Unicode collation for full text search
-    }
+    __table_args__ = (
+        Index("ix_registry_entry_namespace_name", "namespace", "name"),
+        {
+            "mysql_collate": "utf8mb4_unicode_ci",  # Use case-insensitive Unicode collation for full text search
+        },
+    )
 
     id: int = Field(default=None, primary_key=True)
     namespace: str = Field(nullable=False)
@@ -205,12 +211,15 @@ class Tags(SQLModel, table=True):
     """Many-to-many table between registry entries and tags."""
 
     __tablename__ = "entry_tags"
+    __table_args__ = (Index("ix_entry_tags_tag", "tag", "registry_id"),)
 
     registry_id: int = Field(primary_key=True)
     tag: str = Field(primary_key=True)
 
 
 class Stars(SQLModel, table=True):
+    __table_args__ = (Index("ix_stars_namespace_name", "namespace", "name"),)
+
     account_id: str = Field(primary_key=True)
     namespace: str = Field(primary_key=True)
     name: str = Field(primary_key=True)
@@ -218,6 +227,7 @@ class Stars(SQLModel, table=True):
 
 class Fork(SQLModel, table=True):
     __tablename__ = "forks"
+    __table_args__ = (Index("ix_forks_from", "category", "from_namespace", "from_name"),)
 
     category: str = Field(primary_key=True)
     from_namespace: str = Field(nullable=False)
@@ -226,6 +236,66 @@ class Fork(SQLModel, table=True):
     to_name: str = Field(primary_key=True)
 
 
+class RegistryEntrySummary(SQLModel, table=True):
+    """Listing data of the latest version of a registry entry, maintained by `hub.api.v1.registry_summary`."""
+
+    __tablename__ = "registry_entry_summary"
+    __table_args__ = (Index("ix_registry_entry_summary_category", "latest_category", "latest_id"),)
+
+    namespace: str = Field(primary_key=True)
+    name: str = Field(primary_key=True)
+    latest_id: int = Field(nullable=False, index=True)
+    """Id of the latest version, i.e. the `RegistryEntry` with the highest id for this namespace and name."""
+    latest_category: str = Field(default="", nullable=False)
+    latest_show_entry: bool = Field(default=True, nullable=False)
+    num_stars: int = Field(default=0, nullable=False)
+    num_forks: int = Field(default=0, nullable=False)
+    """Number of forks of this entry (in its latest category)."""
+    fork_from_namespace: Optional[str] = Field(default=None)
+    fork_from_name: Optional[str] = Field(default=None)
+
+
+class RegistryTrigger(SQLModel, table=True):
+    """Event type an agent subscribes to through `details.triggers`, for the latest visible version of the agent."""
+
+    __tablename__ = "registry_triggers"
+    __table_args__ = (Index("ix_registry_triggers_entry", "namespace", "name"),)
+
+    event_type: str = Field(primary_key=True)
+    """Key of `details.triggers.events` (e.g. 'x_mentions'), or 'webhook'."""
+    namespace: str = Field(primary_key=True)
+    name: str = Field(primary_key=True)
+    registry_id: int = Field(nullable=False)
+
+
+class IndexVersion(SQLModel, table=True):
+    """Counter incremented on every change of a materialized index, so that readers know when to reload it."""
+
+    __tablename__ = "index_versions"
+
+    name: str = Field(primary_key=True)
+    version: int = Field(default=0, nullable=False)
+
+
+class RegistryBlob(SQLModel, table=True):
+    """Stored object holding a file with the given SHA-256, to reuse its content when the same file is uploaded.
+
+    Blobs are recorded per namespace: content is only reused within the namespace that uploaded it, or from entries
+    anyone can read.
+    """
+
+    __tablename__ = "registry_blobs"
+
+    sha256: str = Field(primary_key=True)
+    namespace: str = Field(primary_key=True)
+    """Namespace of the entry the content was uploaded to."""
+    entry_id: int = Field(nullable=False)
+    """Registry entry the content was uploaded to, to check whether it is public."""
+    size: int = Field(nullable=False)
+    key: str = Field(nullable=False)
+    """S3 key of the object in `S3_BUCKET`."""
+
+
 class Job(SQLModel, table=True):
     __tablename__ = "jobs"
 
@@ -296,8 +366,19 @@ class Delta(SQLModel, table=True):
 
 class Message(SQLModel, table=True):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_seq", "seq"),
+        Index("ix_messages_thread_id_seq", "thread_id", "seq"),
+        Index("ix_messages_thread_id_run_id_seq", "thread_id", "run_id", "seq"),
+    )
 
     id: str = Field(default_factory=lambda: "msg_" + uuid.uuid4().hex[:24], primary_key=True)
+    # Insertion order, assigned by the database (AUTO_INCREMENT): the key of message listings and their cursors.
+    # Not a unique key, which SingleStore only allows when it includes the shard key `id`. Only increasing with commit
+    # order while messages are inserted through a single aggregator (`DATABASE_HOST`), see migration 9c2d4e7f1a35.
+    seq: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger, server_default=FetchedValue(), nullable=False)
+    )
     object: str = Field(default="message", nullable=False)
     created_at: datetime = Field(default_factory=datetime.now, nullable=False)
     thread_id: str = Field(nullable=False, foreign_key="threads.id")
@@ -370,6 +451,7 @@ class Message(SQLModel, table=True):
 
 class Thread(SQLModel, table=True):
     __tablename__ = "threads"
+    __table_args__ = (Index("ix_threads_parent_id", "parent_id"),)
 
     id: str = Field(default_factory=lambda: "thread_" + uuid.uuid4().hex[:24], primary_key=True)
     object: str = Field(default="thread", nullable=False)
@@ -514,7 +596,14 @@ class Completion(SQLModel, table=True):
 
 
 db_url = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}?charset=utf8mb4&use_unicode=1&binary_prefix=true"
-engine = create_engine(db_url, pool_size=DB_POOL_SIZE)
+engine = create_engine(
+    db_url,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 
 
 @contextmanager
@@ -523,6 +612,18 @@ def get_session() -> Iterator[Session]:
         yield session
 
 
+def get_pool_stats() -> Dict[str, int]:
+    """Snapshot of the shared connection pool, used by SQLAlchemy sessions and `SqlClient` alike."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),  # type: ignore
+        "checked_in": pool.checkedin(),  # type: ignore
+        "checked_out": pool.checkedout(),  # type: ignore
+        "overflow": pool.overflow(),  # type: ignore
+        "max_overflow": DB_POOL_MAX_OVERFLOW,
+    }
+
+
 # Constants for file URI prefixes
 FILE_URI_PREFIX = "file::"
 S3_URI_PREFIX = "s3::"
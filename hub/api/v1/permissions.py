@@ -16,6 +16,7 @@ class PermissionVariant(str, Enum):
     UPDATE_PERMISSION = "update_permission"
     SUBMIT_JOB = "submit_job"
     WORKER = "worker"
+    VIEW_STATS = "view_stats"
 
 
 def requires_permission(permission: PermissionVariant):
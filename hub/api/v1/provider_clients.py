@@ -0,0 +1,289 @@
+"""Long-lived, connection-pooled OpenAI-compatible clients for inference providers.
+
+One client is kept per (provider, base_url), so keep-alive connections and TLS sessions to the providers are reused
+across `/completions`, `/chat/completions`, `/embeddings` and `/models` requests. Async clients are additionally kept
+per event loop. Every request sent by these clients is timed and counted per provider, see `provider_stats()`.
+
+The number of concurrent upstream streams of a hub worker is capped by `stream_limiter`.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from os import getenv
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from nearai.shared.client_config import DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+load_dotenv()
+
+PROVIDER_MAX_CONNECTIONS = int(getenv("PROVIDER_MAX_CONNECTIONS", 100))
+"""Maximum number of concurrent connections to each provider."""
+PROVIDER_MAX_KEEPALIVE_CONNECTIONS = int(getenv("PROVIDER_MAX_KEEPALIVE_CONNECTIONS", 20))
+"""Maximum number of idle connections kept open to each provider."""
+PROVIDER_KEEPALIVE_EXPIRY = float(getenv("PROVIDER_KEEPALIVE_EXPIRY", 60))
+"""Seconds after which an idle connection is closed."""
+PROVIDER_MAX_CONCURRENT_STREAMS = int(getenv("PROVIDER_MAX_CONCURRENT_STREAMS", 256))
+"""Maximum number of streaming completions proxied at the same time by a hub worker."""
+PROVIDER_STREAM_WAIT_TIMEOUT = float(getenv("PROVIDER_STREAM_WAIT_TIMEOUT", 10))
+"""Seconds a streaming request waits for a free slot before being rejected."""
+
+
+def get_provider_config(provider: str) -> Tuple[Optional[str], Optional[str]]:
+    """Base URL and API key of a provider.
+
+    Raises
+    ------
+        NotImplementedError: If the provider is not supported.
+
+    """
+    if provider == "hyperbolic":
+        return "https://api.hyperbolic.xyz/v1", getenv("HYPERBOLIC_API_KEY")
+    elif provider == "fireworks":
+        return "https://api.fireworks.ai/inference/v1", getenv("FIREWORKS_API_KEY")
+    elif provider == "crynux":
+        return "https://bridge.crynux.ai/v1/llm", getenv("CRYNUX_API_KEY")
+    elif provider == "local":
+        return getenv("PROVIDER_LOCAL_BASE_URL"), getenv("PROVIDER_LOCAL_API_KEY")
+    else:
+        raise NotImplementedError
+
+
+ClientKey = Tuple[str, Optional[str]]
+"""(provider, base_url)"""
+
+
+class ProviderMetrics:
+    """Request, error and latency counters of one provider. Latency is measured up to the response headers."""
+
+    def __init__(self):  # noqa: D107
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, error: bool) -> None:  # noqa: D102
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stats(self) -> Dict[str, Any]:  # noqa: D102
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "error_rate": self.errors / self.requests if self.requests else 0.0,
+                "avg_latency_ms": 1000 * self.total_latency / self.requests if self.requests else 0.0,
+                "max_latency_ms": 1000 * self.max_latency,
+            }
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """Transport recording the latency and outcome (transport error or 5xx/429 status) of every request."""
+
+    def __init__(self, transport: httpx.BaseTransport, metrics: ProviderMetrics):  # noqa: D107
+        self._transport = transport
+        self._metrics = metrics
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:  # noqa: D102
+        start = time.perf_counter()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            self._metrics.record(time.perf_counter() - start, error=True)
+            raise
+        error = response.status_code >= 500 or response.status_code == 429
+        self._metrics.record(time.perf_counter() - start, error=error)
+        return response
+
+    def close(self) -> None:  # noqa: D102
+        self._transport.close()
+
+
+class MeteredAsyncTransport(httpx.AsyncBaseTransport):
+    """Async version of `MeteredTransport`."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, metrics: ProviderMetrics):  # noqa: D107
+        self._transport = transport
+        self._metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:  # noqa: D102
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            self._metrics.record(time.perf_counter() - start, error=True)
+            raise
+        error = response.status_code >= 500 or response.status_code == 429
+        self._metrics.record(time.perf_counter() - start, error=error)
+        return response
+
+    async def aclose(self) -> None:  # noqa: D102
+        await self._transport.aclose()
+
+
+class ProviderClientRegistry:
+    """Pooled OpenAI clients and their metrics, keyed by (provider, base_url)."""
+
+    def __init__(self):  # noqa: D107
+        self._lock = threading.Lock()
+        self._clients: Dict[ClientKey, OpenAI] = {}
+        # Async clients are bound to the event loop they were first used in.
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, AsyncOpenAI]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._metrics: Dict[str, ProviderMetrics] = {}
+
+    def limits(self) -> httpx.Limits:  # noqa: D102
+        return httpx.Limits(
+            max_connections=PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=PROVIDER_KEEPALIVE_EXPIRY,
+        )
+
+    def metrics(self, provider: str) -> ProviderMetrics:  # noqa: D102
+        with self._lock:
+            return self._metrics.setdefault(provider, ProviderMetrics())
+
+    def get(self, provider: str) -> OpenAI:
+        """Client of `provider`, created on first use.
+
+        Raises
+        ------
+            NotImplementedError: If the provider is not supported.
+
+        """
+        base_url, api_key = get_provider_config(provider)
+        key = (provider, base_url)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        metrics = self.metrics(provider)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                transport = MeteredTransport(httpx.HTTPTransport(limits=self.limits()), metrics)
+                client = OpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    timeout=DEFAULT_TIMEOUT,
+                    max_retries=DEFAULT_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(transport=transport),
+                )
+                self._clients[key] = client
+        return client
+
+    def get_async(self, provider: str) -> AsyncOpenAI:
+        """Async client of `provider` for the running event loop, created on first use.
+
+        Raises
+        ------
+            NotImplementedError: If the provider is not supported.
+
+        """
+        base_url, api_key = get_provider_config(provider)
+        key = (provider, base_url)
+        loop = asyncio.get_running_loop()
+        clients = self._async_clients.get(loop)
+        if clients is not None and key in clients:
+            return clients[key]
+
+        metrics = self.metrics(provider)
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                transport = MeteredAsyncTransport(httpx.AsyncHTTPTransport(limits=self.limits()), metrics)
+                client = AsyncOpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    timeout=DEFAULT_TIMEOUT,
+                    max_retries=DEFAULT_MAX_RETRIES,
+                    http_client=DefaultAsyncHttpxClient(transport=transport),
+                )
+                clients[key] = client
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Metrics of every provider that has been used."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {provider: m.stats() for provider, m in metrics.items()}
+
+    def close(self) -> None:
+        """Close all clients and their connections."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+class StreamSlot:
+    """A slot of `StreamLimiter`, released once (further calls to `release` are no-ops)."""
+
+    def __init__(self, limiter: "StreamLimiter", semaphore: asyncio.Semaphore):  # noqa: D107
+        self._limiter = limiter
+        self._semaphore: Optional[asyncio.Semaphore] = semaphore
+
+    def release(self) -> None:  # noqa: D102
+        if self._semaphore is not None:
+            semaphore, self._semaphore = self._semaphore, None
+            semaphore.release()
+            self._limiter.active -= 1
+
+
+class StreamLimiter:
+    """Caps the number of concurrent upstream streams per event loop."""
+
+    def __init__(self, max_streams: int, wait_timeout: float):  # noqa: D107
+        self.max_streams = max_streams
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def acquire(self) -> Optional[StreamSlot]:
+        """Wait up to `wait_timeout` for a slot, returns None if none became available."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(loop, asyncio.Semaphore(self.max_streams))
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return StreamSlot(self, semaphore)
+
+    def stats(self) -> Dict[str, int]:  # noqa: D102
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_streams": self.max_streams,
+        }
+
+
+provider_clients = ProviderClientRegistry()
+stream_limiter = StreamLimiter(PROVIDER_MAX_CONCURRENT_STREAMS, PROVIDER_STREAM_WAIT_TIMEOUT)
+
+
+def provider_stats() -> Dict[str, Any]:
+    """Latency and error metrics of every provider used by this process, and upstream stream counters."""
+    return {"clients": provider_clients.stats(), "streams": stream_limiter.stats()}
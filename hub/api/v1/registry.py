@@ -2,23 +2,35 @@ import datetime
 import json
 import logging
 import re
+import tempfile
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from os import getenv
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import boto3
 import botocore
 import botocore.exceptions
 from dotenv import load_dotenv
-from fastapi import APIRouter, Body, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Body, Depends, File, Form, Header, HTTPException, Query, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
 from nearai.shared.client_config import DEFAULT_NAMESPACE
+from nearai.shared.registry_bundle import bundle_hash, bundle_manifest, write_bundle
 from pydantic import BaseModel, field_validator, model_validator
+from sqlalchemy import TextClause, bindparam
 from sqlmodel import col, delete, select, text
 
 from hub.api.v1.auth import AuthToken, get_auth, get_optional_auth
 from hub.api.v1.entry_location import EntryLocation, valid_identifier
 from hub.api.v1.models import Fork, RegistryEntry, Tags, get_session, sanitize
+from hub.api.v1.registry_summary import refresh_entry_summary
+from hub.api.v1.registry_uploads import (
+    ManifestFile,
+    UploadManifestResult,
+    find_blobs,
+    record_blob,
+    stream_to_s3,
+)
 
 DEFAULT_NAMESPACE_WRITE_ACCESS_LIST = [
     "spensa2.near",
@@ -41,6 +53,15 @@ s3 = boto3.client(
     endpoint_url=S3_ENDPOINT,
 )
 
+MANIFEST_COPY_WORKERS = int(getenv("REGISTRY_MANIFEST_COPY_WORKERS", 16))
+"""Number of concurrent S3 copies of the files of a manifest whose content is already stored."""
+
+BUNDLE_PREFIX = getenv("REGISTRY_BUNDLE_PREFIX", "registry-bundles")
+"""S3 prefix of the bundles of registry entries, outside of the prefix of the entries."""
+
+BUNDLE_SPOOL_SIZE = int(getenv("REGISTRY_BUNDLE_SPOOL_SIZE", 64 * 1024 * 1024))
+"""Bundles larger than this are built in a temporary file instead of memory."""
+
 v1_router = APIRouter(
     prefix="/registry",
     tags=["registry"],
@@ -60,8 +81,13 @@ def valid_tag(tag: str) -> str:
     return result[0]
 
 
-def with_write_access(use_forms=False):
-    default = Depends(EntryLocation.as_form) if use_forms else Body()
+def with_write_access(use_forms=False, use_query=False):
+    if use_forms:
+        default = Depends(EntryLocation.as_form)
+    elif use_query:
+        default = Depends(EntryLocation.as_query)
+    else:
+        default = Body()
 
     def fn_with_write_access(
         entry_location: EntryLocation = default,
@@ -119,6 +145,7 @@ def get_or_create(entry_location: EntryLocation = Depends(with_write_access()))
             )
             session.add(entry)
             session.commit()
+            refresh_entry_summary(session, entry.namespace, entry.name)
 
         return entry.id
 
@@ -245,18 +272,108 @@ async def upload_file(
     return {"status": "File uploaded", "path": key}
 
 
+@v1_router.post("/upload_manifest")
+def upload_manifest(
+    entry_location: EntryLocation = Depends(with_write_access()),
+    files: List[ManifestFile] = Body(),
+) -> UploadManifestResult:
+    """Places the files of the manifest whose content the hub already stores, and returns their hashes.
+
+    Only content uploaded to the namespace of the entry, or to public entries, is reused. The files with other hashes
+    must be uploaded with `/upload_blob`.
+    """
+    entry = get(entry_location)
+    existing = {file.filename for file in list_files_inner(entry)}
+    with get_session() as session:
+        blobs = find_blobs(session, [file.sha256 for file in files], entry.namespace)
+
+    paths_by_hash: Dict[str, List[ManifestFile]] = defaultdict(list)
+    for file in files:
+        paths_by_hash[file.sha256].append(file)
+
+    known_hashes = []
+    copies: List[Tuple[str, str]] = []
+    for sha256, hash_files in paths_by_hash.items():
+        blob = blobs.get(sha256)
+        missing = [file for file in hash_files if file.path not in existing]
+        if not missing:
+            known_hashes.append(sha256)
+        elif blob is not None and all(file.size == blob.size for file in missing):
+            known_hashes.append(sha256)
+            copies.extend((blob.key, entry.get_key(file.path)) for file in missing)
+
+    assert isinstance(S3_BUCKET, str)
+    bucket = S3_BUCKET
+
+    def copy(source_key: str, key: str) -> None:
+        # Managed copy, in parts for large objects.
+        s3.copy({"Bucket": bucket, "Key": source_key}, bucket, key)
+
+    with ThreadPoolExecutor(max_workers=MANIFEST_COPY_WORKERS) as executor:
+        list(executor.map(lambda args: copy(*args), copies))
+
+    logger.info(f"Manifest of {entry_location}: {len(files)} files, {len(copies)} copied from stored content")
+    return UploadManifestResult(known_hashes=known_hashes)
+
+
+@v1_router.put("/upload_blob")
+async def upload_blob(
+    request: Request,
+    entry_location: EntryLocation = Depends(with_write_access(use_query=True)),
+    path: str = Query(),
+    sha256: str = Query(pattern="^[0-9a-f]{64}$"),
+    size: int = Query(ge=0),
+):
+    """Streams the content of a file of the manifest, sent as the request body, to the entry."""
+    entry = get(entry_location)
+    key = entry.get_key(path)
+
+    if check_file_exists(key):
+        raise HTTPException(status_code=400, detail=f"File {key} already exists.")
+
+    assert isinstance(S3_BUCKET, str)
+    await stream_to_s3(s3, S3_BUCKET, key, request.stream(), sha256, size)
+    with get_session() as session:
+        record_blob(session, sha256, size, key, entry)
+
+    return {"status": "File uploaded", "path": key}
+
+
 @v1_router.post("/download_file")
 def download_file(
     entry: RegistryEntry = Depends(get_read_access),
     path: str = Body(),
+    range_header: Optional[str] = Header(default=None, alias="Range"),
 ):
-    return StreamingResponse(download_file_inner(entry, path).iter_chunks())
+    """Streams a file of an entry.
+
+    A `Range: bytes=<start>-` header streams the file from byte `start` on, to resume an interrupted download.
+    """
+    match = re.fullmatch(r"bytes=(\d+)-", range_header or "")
+    if match is None:
+        return StreamingResponse(download_file_inner(entry, path).iter_chunks())
+
+    try:
+        object = get_file_object(entry, path, byte_range=match.group(0))
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "InvalidRange":
+            raise HTTPException(status_code=416, detail="Range not satisfiable") from e
+        raise
+    headers = {"Accept-Ranges": "bytes"}
+    if "ContentRange" in object:
+        headers["Content-Range"] = object["ContentRange"]
+    return StreamingResponse(object["Body"].iter_chunks(), status_code=206, headers=headers)
 
 
 def download_file_inner(
     entry: RegistryEntry,
     path: str = Body(),
 ):
+    return get_file_object(entry, path)["Body"]
+
+
+def get_file_object(entry: RegistryEntry, path: str, byte_range: Optional[str] = None) -> Mapping[str, Any]:
+    """S3 `get_object` response for a file of an entry, optionally restricted to a byte range."""
     source = entry.details.get("_source")
 
     if source is None:
@@ -272,8 +389,38 @@ def download_file_inner(
         raise HTTPException(status_code=400, detail=f"Unsupported source: {source}")
 
     # https://stackoverflow.com/a/71126498/4950797
-    object = s3.get_object(Bucket=bucket, Key=key)
-    return object["Body"]
+    if byte_range is None:
+        return s3.get_object(Bucket=bucket, Key=key)
+    return s3.get_object(Bucket=bucket, Key=key, Range=byte_range)
+
+
+@v1_router.post("/download_bundle")
+def download_bundle(
+    entry: RegistryEntry = Depends(get_read_access),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+):
+    """Streams all files of an entry as one gzip-compressed tar archive, see `nearai.shared.registry_bundle`.
+
+    The bundle is built once for each content of the entry and stored. Its hash is returned as the `ETag` header, and
+    a request with `If-None-Match` set to the hash of the current bundle gets an empty 304 response.
+    """
+    manifest = bundle_manifest(list_files_inner(entry))
+    digest = bundle_hash(manifest)
+    headers = {"ETag": f'"{digest}"'}
+    if if_none_match is not None and if_none_match.strip('"') == digest:
+        return Response(status_code=304, headers=headers)
+
+    assert isinstance(S3_BUCKET, str)
+    key = f"{BUNDLE_PREFIX}/{entry.namespace}/{entry.name}/{entry.version}/{digest}.tar.gz"
+    if not check_file_exists(key):
+        logger.info(f"Building bundle {key}")
+        with tempfile.SpooledTemporaryFile(max_size=BUNDLE_SPOOL_SIZE) as f:
+            write_bundle(manifest, lambda path: download_file_inner(entry, path), f)
+            f.seek(0)
+            s3.upload_fileobj(f, S3_BUCKET, key)
+
+    object = s3.get_object(Bucket=S3_BUCKET, Key=key)
+    return StreamingResponse(object["Body"].iter_chunks(), media_type="application/gzip", headers=headers)
 
 
 @v1_router.post("/upload_metadata")
@@ -318,6 +465,7 @@ async def upload_metadata(
             session.add_all(tags)
 
         session.commit()
+        refresh_entry_summary(session, entry.namespace, entry.name)
 
         return {"status": "Updated metadata", "namespace": entry.namespace, "metadata": full_metadata.model_dump()}
 
@@ -345,6 +493,10 @@ def download_metadata_inner(entry: RegistryEntry) -> EntryMetadata:
 
 class Filename(BaseModel):
     filename: str
+    size: Optional[int] = None
+    """Size of the file in bytes."""
+    etag: Optional[str] = None
+    """Entity tag of the stored object. It only changes when the content changes, so clients can cache by it."""
 
 
 @v1_router.post("/list_files")
@@ -372,7 +524,10 @@ def list_files_inner(entry: RegistryEntry) -> List[Filename]:
     key = key.strip("/") + "/"
     logger.info(f"Listing files for bucket: {bucket}, key: {key}")
     objects = s3.list_objects(Bucket=bucket, Prefix=key)
-    files = [Filename(filename=obj["Key"][len(key) :]) for obj in objects.get("Contents", [])]
+    files = [
+        Filename(filename=obj["Key"][len(key) :], size=obj.get("Size"), etag=obj.get("ETag", "").strip('"') or None)
+        for obj in objects.get("Contents", [])
+    ]
     return files
 
 
@@ -440,193 +595,24 @@ def list_entries_inner(
     fork_of_name: str = "",
     fork_of_namespace: str = "",
 ) -> List[EntryInformation]:
-    tags_list = list({tag for tag in tags.split(",") if tag})
-
-    bind_params: Dict[str, Any] = {
-        "show_entry": 1 - int(show_hidden),
-    }
-
-    if category:
-        category = valid_tag(category)
-        category_condition = "AND category = :category"
-        bind_params["category"] = category
-    else:
-        category_condition = ""
-
-    if namespace:
-        namespace = valid_identifier(namespace)
-        namespace_condition = "AND registry.namespace = :namespace"
-        bind_params["namespace"] = namespace
-    else:
-        namespace_condition = ""
-
-    if fork_of_name and fork_of_namespace:
-        fork_of_namespace = valid_identifier(fork_of_namespace)
-        fork_of_condition = "AND fork_from_namespace = :fork_of_namespace AND fork_from_name = :fork_of_name"
-        bind_params["fork_of_name"] = fork_of_name
-        bind_params["fork_of_namespace"] = fork_of_namespace
-    else:
-        fork_of_condition = ""
-
-    latest_version_condition = (
-        """JOIN (SELECT MAX(id) as id FROM registry_entry GROUP BY namespace, name) last_entry
-             ON last_entry.id = registry.id"""
-        if show_latest_version
-        else ""
+    query = list_entries_query(
+        namespace=namespace,
+        category=category,
+        tags=tags,
+        custom_where=custom_where,
+        total=total,
+        offset=offset,
+        show_hidden=show_hidden,
+        show_latest_version=show_latest_version,
+        starred_by=starred_by,
+        star_point_of_view=star_point_of_view,
+        fork_of_name=fork_of_name,
+        fork_of_namespace=fork_of_namespace,
     )
 
-    # TODO add extra protection to avoid SQL INJECTION?
-    custom_where_condition = f" AND ({custom_where})" if custom_where else ""
-
-    bind_params["star_point_of_view"] = star_point_of_view
-    bind_params["starred_by"] = starred_by
-
-    if starred_by:
-        starred_by_condition = "AND CountedStars.starred_by_target = 1"
-    else:
-        starred_by_condition = ""
-
     with get_session() as session:
         entries_info: List[EntryInformation] = []
 
-        if len(tags_list) == 0:
-            query_text = f"""WITH
-            CountedStars AS (
-                SELECT namespace, name, COUNT(account_id) as num_stars,
-                CASE WHEN MAX(account_id = :star_point_of_view) THEN 1 ELSE 0 END as starred_by_pov,
-                CASE WHEN MAX(account_id = :starred_by) THEN 1 ELSE 0 END as starred_by_target
-                FROM stars
-                GROUP BY namespace, name
-            ),
-            CountedForks AS (
-                SELECT
-                    category as counted_forks_category,
-                    from_namespace as counted_forks_from_namespace,
-                    from_name as counted_forks_from_name,
-                    COUNT(to_namespace) as num_forks
-                FROM forks
-                GROUP BY counted_forks_category, counted_forks_from_namespace, counted_forks_from_name
-            ),
-            Fork AS (
-                SELECT
-                    category as fork_category,
-                    from_namespace as fork_from_namespace,
-                    from_name as fork_from_name,
-                    to_namespace as fork_to_namespace,
-                    to_name as fork_to_name
-                FROM forks
-            )
-            SELECT
-                registry.id, registry.namespace, registry.name, registry.version,
-                registry.category, registry.description, registry.details, registry.time,
-                CountedStars.num_stars, CountedStars.starred_by_pov, CountedForks.num_forks,
-                Fork.fork_from_namespace, Fork.fork_from_name
-            FROM registry_entry registry
-            LEFT JOIN CountedStars
-                ON registry.namespace = CountedStars.namespace AND registry.name = CountedStars.name
-            LEFT JOIN CountedForks
-                ON registry.category = CountedForks.counted_forks_category
-                    AND registry.namespace = CountedForks.counted_forks_from_namespace
-                    AND registry.name = CountedForks.counted_forks_from_name
-            LEFT JOIN Fork
-                ON registry.category = Fork.fork_category
-                    AND registry.namespace = Fork.fork_to_namespace
-                    AND registry.name = Fork.fork_to_name
-            {latest_version_condition}
-            WHERE show_entry >= :show_entry
-                {category_condition}
-                {namespace_condition}
-                {starred_by_condition}
-                {fork_of_condition}
-                {custom_where_condition}
-            ORDER BY registry.id DESC
-            LIMIT :total
-            OFFSET :offset
-            """
-
-            bind_params["total"] = total
-            bind_params["offset"] = offset
-
-        else:
-            tags_list = [valid_tag(tag) for tag in tags_list]
-
-            query_text = f"""WITH
-                    CountedStars AS (
-                        SELECT namespace, name, COUNT(account_id) as num_stars,
-                        CASE WHEN MAX(account_id = :star_point_of_view) THEN 1 ELSE 0 END as starred_by_pov,
-                        CASE WHEN MAX(account_id = :starred_by) THEN 1 ELSE 0 END as starred_by_target
-                        FROM stars
-                        GROUP BY namespace, name
-                    ),
-                    CountedForks AS (
-                        SELECT
-                            category as counted_forks_category,
-                            from_namespace as counted_forks_from_namespace,
-                            from_name as counted_forks_from_name,
-                            COUNT(to_namespace) as num_forks
-                        FROM forks
-                        GROUP BY counted_forks_category, counted_forks_from_namespace, counted_forks_from_name
-                    ),
-                    Fork AS (
-                        SELECT
-                            category as fork_category,
-                            from_namespace as fork_from_namespace,
-                            from_name as fork_from_name,
-                            to_namespace as fork_to_namespace,
-                            to_name as fork_to_name
-                        FROM forks
-                    ),
-                    FilteredRegistry AS (
-                        SELECT
-                            registry.id, CountedStars.num_stars, CountedStars.starred_by_pov,
-                            CountedForks.num_forks, Fork.fork_from_namespace, Fork.fork_from_name
-                        FROM registry_entry registry
-                        {latest_version_condition}
-                        JOIN entry_tags ON registry.id = entry_tags.registry_id
-                        LEFT JOIN CountedStars
-                            ON registry.namespace = CountedStars.namespace
-                            AND registry.name = CountedStars.name
-                        LEFT JOIN CountedForks
-                            ON registry.category = CountedForks.counted_forks_category
-                                AND registry.namespace = CountedForks.counted_forks_from_namespace
-                                AND registry.name = CountedForks.counted_forks_from_name
-                        LEFT JOIN Fork
-                            ON registry.category = Fork.fork_category
-                                AND registry.namespace = Fork.fork_to_namespace
-                                AND registry.name = Fork.fork_to_name
-                        WHERE show_entry >= :show_entry
-                            AND entry_tags.tag IN :tags
-                            {category_condition}
-                            {namespace_condition}
-                            {starred_by_condition}
-                            {fork_of_condition}
-                            {custom_where_condition}
-                        GROUP BY registry.id
-                        HAVING COUNT(DISTINCT entry_tags.tag) = :ntags
-                    ),
-                    RankedRegistry AS (
-                        SELECT
-                            id, num_stars, starred_by_pov, num_forks, fork_from_namespace, fork_from_name,
-                            ROW_NUMBER() OVER (ORDER BY id DESC) AS col_rank
-                        FROM FilteredRegistry
-                    )
-
-                    SELECT registry.id, registry.namespace, registry.name, registry.version,
-                           registry.category, registry.description, registry.details, registry.time,
-                           ranked.num_stars, ranked.starred_by_pov, num_forks, fork_from_namespace,
-                           fork_from_name
-                    FROM RankedRegistry ranked
-                    JOIN registry_entry registry ON ranked.id = registry.id
-                    WHERE   ranked.col_rank >= :lower_bound AND
-                            ranked.col_rank < :upper_bound
-                    ORDER BY registry.id DESC
-                """
-
-            bind_params["lower_bound"] = offset + 1
-            bind_params["upper_bound"] = offset + total + 1
-            bind_params["tags"] = tags_list
-            bind_params["ntags"] = len(tags_list)
-
         for (
             id,
             namespace_,
@@ -641,7 +627,7 @@ def list_entries_inner(
             num_forks,
             fork_from_namespace,
             fork_from_name,
-        ) in session.exec(text(query_text).bindparams(**bind_params)).all():  # type: ignore
+        ) in session.exec(query).all():  # type: ignore
             fork_of = None
 
             if fork_from_namespace and fork_from_name:
@@ -683,6 +669,283 @@ def list_entries_inner(
         return entries_info
 
 
+def list_entries_query(
+    namespace: str = "",
+    category: str = "",
+    tags: str = "",
+    custom_where: str = "",
+    total: int = 32,
+    offset: int = 0,
+    show_hidden: bool = False,
+    show_latest_version: bool = True,
+    starred_by: str = "",
+    star_point_of_view: str = "",
+    fork_of_name: str = "",
+    fork_of_namespace: str = "",
+    use_summary: bool = True,
+) -> TextClause:
+    """Query of `list_entries_inner`, one row per entry.
+
+    Latest versions are listed from `registry_entry_summary` (see `hub.api.v1.registry_summary`). When
+    `show_latest_version` is False, or `use_summary` is False, stars and forks are aggregated from their tables.
+    """
+    tags_list = list({tag for tag in tags.split(",") if tag})
+
+    bind_params: Dict[str, Any] = {
+        "show_entry": 1 - int(show_hidden),
+    }
+
+    if category:
+        category = valid_tag(category)
+        category_condition = "AND category = :category"
+        bind_params["category"] = category
+    else:
+        category_condition = ""
+
+    if namespace:
+        namespace = valid_identifier(namespace)
+        namespace_condition = "AND registry.namespace = :namespace"
+        bind_params["namespace"] = namespace
+    else:
+        namespace_condition = ""
+
+    if fork_of_name and fork_of_namespace:
+        fork_of_namespace = valid_identifier(fork_of_namespace)
+        fork_of_condition = "AND fork_from_namespace = :fork_of_namespace AND fork_from_name = :fork_of_name"
+        bind_params["fork_of_name"] = fork_of_name
+        bind_params["fork_of_namespace"] = fork_of_namespace
+    else:
+        fork_of_condition = ""
+
+    latest_version_condition = (
+        """JOIN (SELECT MAX(id) as id FROM registry_entry GROUP BY namespace, name) last_entry
+             ON last_entry.id = registry.id"""
+        if show_latest_version
+        else ""
+    )
+
+    # TODO add extra protection to avoid SQL INJECTION?
+    custom_where_condition = f" AND ({custom_where})" if custom_where else ""
+
+    bind_params["star_point_of_view"] = star_point_of_view
+    bind_params["starred_by"] = starred_by
+
+    if starred_by:
+        starred_by_condition = "AND CountedStars.starred_by_target = 1"
+    else:
+        starred_by_condition = ""
+
+    tags_list = [valid_tag(tag) for tag in tags_list]
+
+    if show_latest_version and use_summary:
+        query_text = _summary_query_text(
+            namespace=bool(namespace),
+            category=bool(category),
+            tags=bool(tags_list),
+            starred_by=bool(starred_by),
+            fork_of=bool(fork_of_condition),
+            custom_where_condition=custom_where_condition,
+        )
+        if not starred_by:
+            del bind_params["starred_by"]
+        bind_params["total"] = total
+        bind_params["offset"] = offset
+
+    elif len(tags_list) == 0:
+        query_text = f"""WITH
+        CountedStars AS (
+            SELECT namespace, name, COUNT(account_id) as num_stars,
+            CASE WHEN MAX(account_id = :star_point_of_view) THEN 1 ELSE 0 END as starred_by_pov,
+            CASE WHEN MAX(account_id = :starred_by) THEN 1 ELSE 0 END as starred_by_target
+            FROM stars
+            GROUP BY namespace, name
+        ),
+        CountedForks AS (
+            SELECT
+                category as counted_forks_category,
+                from_namespace as counted_forks_from_namespace,
+                from_name as counted_forks_from_name,
+                COUNT(to_namespace) as num_forks
+            FROM forks
+            GROUP BY counted_forks_category, counted_forks_from_namespace, counted_forks_from_name
+        ),
+        Fork AS (
+            SELECT
+                category as fork_category,
+                from_namespace as fork_from_namespace,
+                from_name as fork_from_name,
+                to_namespace as fork_to_namespace,
+                to_name as fork_to_name
+            FROM forks
+        )
+        SELECT
+            registry.id, registry.namespace, registry.name, registry.version,
+            registry.category, registry.description, registry.details, registry.time,
+            CountedStars.num_stars, CountedStars.starred_by_pov, CountedForks.num_forks,
+            Fork.fork_from_namespace, Fork.fork_from_name
+        FROM registry_entry registry
+        LEFT JOIN CountedStars
+            ON registry.namespace = CountedStars.namespace AND registry.name = CountedStars.name
+        LEFT JOIN CountedForks
+            ON registry.category = CountedForks.counted_forks_category
+                AND registry.namespace = CountedForks.counted_forks_from_namespace
+                AND registry.name = CountedForks.counted_forks_from_name
+        LEFT JOIN Fork
+            ON registry.category = Fork.fork_category
+                AND registry.namespace = Fork.fork_to_namespace
+                AND registry.name = Fork.fork_to_name
+        {latest_version_condition}
+        WHERE show_entry >= :show_entry
+            {category_condition}
+            {namespace_condition}
+            {starred_by_condition}
+            {fork_of_condition}
+            {custom_where_condition}
+        ORDER BY registry.id DESC
+        LIMIT :total
+        OFFSET :offset
+        """
+
+        bind_params["total"] = total
+        bind_params["offset"] = offset
+
+    else:
+        query_text = f"""WITH
+                CountedStars AS (
+                    SELECT namespace, name, COUNT(account_id) as num_stars,
+                    CASE WHEN MAX(account_id = :star_point_of_view) THEN 1 ELSE 0 END as starred_by_pov,
+                    CASE WHEN MAX(account_id = :starred_by) THEN 1 ELSE 0 END as starred_by_target
+                    FROM stars
+                    GROUP BY namespace, name
+                ),
+                CountedForks AS (
+                    SELECT
+                        category as counted_forks_category,
+                        from_namespace as counted_forks_from_namespace,
+                        from_name as counted_forks_from_name,
+                        COUNT(to_namespace) as num_forks
+                    FROM forks
+                    GROUP BY counted_forks_category, counted_forks_from_namespace, counted_forks_from_name
+                ),
+                Fork AS (
+                    SELECT
+                        category as fork_category,
+                        from_namespace as fork_from_namespace,
+                        from_name as fork_from_name,
+                        to_namespace as fork_to_namespace,
+                        to_name as fork_to_name
+                    FROM forks
+                ),
+                FilteredRegistry AS (
+                    SELECT
+                        registry.id, CountedStars.num_stars, CountedStars.starred_by_pov,
+                        CountedForks.num_forks, Fork.fork_from_namespace, Fork.fork_from_name
+                    FROM registry_entry registry
+                    {latest_version_condition}
+                    JOIN entry_tags ON registry.id = entry_tags.registry_id
+                    LEFT JOIN CountedStars
+                        ON registry.namespace = CountedStars.namespace
+                        AND registry.name = CountedStars.name
+                    LEFT JOIN CountedForks
+                        ON registry.category = CountedForks.counted_forks_category
+                            AND registry.namespace = CountedForks.counted_forks_from_namespace
+                            AND registry.name = CountedForks.counted_forks_from_name
+                    LEFT JOIN Fork
+                        ON registry.category = Fork.fork_category
+                            AND registry.namespace = Fork.fork_to_namespace
+                            AND registry.name = Fork.fork_to_name
+                    WHERE show_entry >= :show_entry
+                        AND entry_tags.tag IN :tags
+                        {category_condition}
+                        {namespace_condition}
+                        {starred_by_condition}
+                        {fork_of_condition}
+                        {custom_where_condition}
+                    GROUP BY registry.id
+                    HAVING COUNT(DISTINCT entry_tags.tag) = :ntags
+                ),
+                RankedRegistry AS (
+                    SELECT
+                        id, num_stars, starred_by_pov, num_forks, fork_from_namespace, fork_from_name,
+                        ROW_NUMBER() OVER (ORDER BY id DESC) AS col_rank
+                    FROM FilteredRegistry
+                )
+
+                SELECT registry.id, registry.namespace, registry.name, registry.version,
+                       registry.category, registry.description, registry.details, registry.time,
+                       ranked.num_stars, ranked.starred_by_pov, num_forks, fork_from_namespace,
+                       fork_from_name
+                FROM RankedRegistry ranked
+                JOIN registry_entry registry ON ranked.id = registry.id
+                WHERE   ranked.col_rank >= :lower_bound AND
+                        ranked.col_rank < :upper_bound
+                ORDER BY registry.id DESC
+            """
+
+        bind_params["lower_bound"] = offset + 1
+        bind_params["upper_bound"] = offset + total + 1
+
+    query = text(query_text).bindparams(**bind_params)
+    if tags_list:
+        query = query.bindparams(bindparam("tags", value=tags_list, expanding=True), ntags=len(tags_list))
+    return query
+
+
+def _summary_query_text(
+    namespace: bool, category: bool, tags: bool, starred_by: bool, fork_of: bool, custom_where_condition: str
+) -> str:
+    """Query listing latest versions from `registry_entry_summary`, most recent first."""
+    conditions = []
+    if namespace:
+        conditions.append("AND summary.namespace = :namespace")
+    if category:
+        conditions.append("AND summary.latest_category = :category")
+    if fork_of:
+        conditions.append(
+            "AND summary.fork_from_namespace = :fork_of_namespace AND summary.fork_from_name = :fork_of_name"
+        )
+    if tags:
+        conditions.append(
+            """AND summary.latest_id IN (
+                SELECT registry_id FROM entry_tags
+                WHERE tag IN :tags
+                GROUP BY registry_id
+                HAVING COUNT(DISTINCT tag) = :ntags
+            )"""
+        )
+    if custom_where_condition:
+        conditions.append(custom_where_condition)
+    starred_by_join = (
+        """JOIN stars starred
+            ON starred.account_id = :starred_by
+                AND starred.namespace = summary.namespace
+                AND starred.name = summary.name"""
+        if starred_by
+        else ""
+    )
+    condition_lines = "\n            ".join(conditions)
+
+    return f"""
+        SELECT
+            registry.id, registry.namespace, registry.name, registry.version,
+            registry.category, registry.description, registry.details, registry.time,
+            summary.num_stars, pov.account_id IS NOT NULL AS starred_by_pov, summary.num_forks,
+            summary.fork_from_namespace, summary.fork_from_name
+        FROM registry_entry_summary summary
+        JOIN registry_entry registry ON registry.id = summary.latest_id
+        {starred_by_join}
+        LEFT JOIN stars pov
+            ON pov.account_id = :star_point_of_view
+                AND pov.namespace = summary.namespace
+                AND pov.name = summary.name
+        WHERE summary.latest_show_entry >= :show_entry
+            {condition_lines}
+        ORDER BY summary.latest_id DESC
+        LIMIT :total
+        OFFSET :offset
+    """
+
+
 class ForkEntryModifications(BaseModel):
     name: str
     description: str
@@ -753,6 +1016,8 @@ def fork_entry(
         )
 
         session.commit()
+        refresh_entry_summary(session, entry.namespace, entry.name)
+        refresh_entry_summary(session, new_entry.namespace, new_entry.name)
 
         files = list_files_inner(entry)
         assert isinstance(S3_BUCKET, str)
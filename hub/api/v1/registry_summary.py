@@ -0,0 +1,204 @@
+"""Materialized listing data of the registry, see `RegistryEntrySummary`.
+
+Listing the latest versions of registry entries needs, for each (namespace, name), the id of its latest version and
+its star and fork counts. Instead of aggregating the `registry_entry`, `stars` and `forks` tables on every listing,
+these are stored in `registry_entry_summary` and refreshed by the handlers that change them (uploads, metadata
+updates, stars and forks). Listing is then a scan of the `latest_id` index joined to `registry_entry` by primary key.
+
+The same refresh maintains `registry_triggers`, the event types that the latest visible version of each agent
+subscribes to, and increments the `triggers` version in `index_versions` when they change so that event pollers
+reload their snapshot (see `hub.tasks.triggers`).
+
+A refresh recomputes the whole row of one entry from the source tables, so a missed or concurrent refresh is fixed by
+the next one, and `rebuild_entry_summaries` recomputes every row.
+"""
+
+import logging
+from typing import List, Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, delete, func, select, text
+
+from hub.api.v1.models import Fork, IndexVersion, RegistryEntry, RegistryEntrySummary, RegistryTrigger, Stars
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_INDEX = "triggers"
+"""Name of the trigger index in `index_versions`."""
+
+REBUILD_QUERY = """
+INSERT INTO registry_entry_summary
+    (namespace, name, latest_id, latest_category, latest_show_entry, num_stars, num_forks,
+     fork_from_namespace, fork_from_name)
+SELECT
+    registry.namespace, registry.name, registry.id, registry.category, registry.show_entry,
+    COALESCE(counted_stars.num_stars, 0), COALESCE(counted_forks.num_forks, 0),
+    fork.from_namespace, fork.from_name
+FROM registry_entry registry
+JOIN (SELECT MAX(id) AS id FROM registry_entry GROUP BY namespace, name) last_entry
+    ON last_entry.id = registry.id
+LEFT JOIN (SELECT namespace, name, COUNT(*) AS num_stars FROM stars GROUP BY namespace, name) counted_stars
+    ON counted_stars.namespace = registry.namespace AND counted_stars.name = registry.name
+LEFT JOIN (
+    SELECT category, from_namespace, from_name, COUNT(*) AS num_forks
+    FROM forks
+    GROUP BY category, from_namespace, from_name
+) counted_forks
+    ON counted_forks.category = registry.category
+        AND counted_forks.from_namespace = registry.namespace
+        AND counted_forks.from_name = registry.name
+LEFT JOIN forks fork
+    ON fork.category = registry.category AND fork.to_namespace = registry.namespace AND fork.to_name = registry.name
+"""
+
+
+def refresh_entry_summary(session: Session, namespace: str, name: str) -> None:
+    """Recompute and commit the summary row of the entry `namespace/name`.
+
+    Call it after committing the change to the entry, its stars or its forks: on a conflict the session is rolled
+    back before retrying.
+
+    Args:
+    ----
+        session (Session): Session used for the queries and the commit.
+        namespace (str): Namespace of the entry.
+        name (str): Name of the entry.
+
+    """
+    for attempt in range(2):
+        try:
+            _refresh(session, namespace, name)
+            session.commit()
+            return
+        except IntegrityError:
+            # Another request inserted the row first, the second attempt updates it.
+            session.rollback()
+            if attempt:
+                raise
+
+
+def _refresh(session: Session, namespace: str, name: str) -> None:
+    latest = session.exec(
+        select(RegistryEntry)
+        .where(RegistryEntry.namespace == namespace, RegistryEntry.name == name)
+        .order_by(col(RegistryEntry.id).desc())
+        .limit(1)
+    ).first()
+    summary = session.get(RegistryEntrySummary, (namespace, name))
+
+    if latest is None:
+        if summary is not None:
+            session.delete(summary)
+        _refresh_triggers(session, namespace, name, None)
+        return
+    if summary is not None and summary.latest_id > latest.id:
+        # Computed by a request that saw a newer version, this one is stale.
+        return
+
+    num_stars = session.exec(
+        select(func.count()).select_from(Stars).where(Stars.namespace == namespace, Stars.name == name)
+    ).one()
+    num_forks = session.exec(
+        select(func.count())
+        .select_from(Fork)
+        .where(Fork.category == latest.category, Fork.from_namespace == namespace, Fork.from_name == name)
+    ).one()
+    fork = session.exec(
+        select(Fork).where(Fork.category == latest.category, Fork.to_namespace == namespace, Fork.to_name == name)
+    ).first()
+
+    if summary is None:
+        summary = RegistryEntrySummary(namespace=namespace, name=name, latest_id=latest.id)
+    summary.latest_id = latest.id
+    summary.latest_category = latest.category
+    summary.latest_show_entry = latest.show_entry
+    summary.num_stars = num_stars
+    summary.num_forks = num_forks
+    summary.fork_from_namespace = fork.from_namespace if fork else None
+    summary.fork_from_name = fork.from_name if fork else None
+    session.add(summary)
+    _refresh_triggers(session, namespace, name, latest)
+    session.flush()
+
+
+def trigger_event_types(entry: RegistryEntry) -> List[str]:
+    """Event types an entry subscribes to, from `details.triggers` of visible agents.
+
+    Every key of `details.triggers.events` (e.g. 'x_mentions') is an event type, and 'webhook' if
+    `details.triggers.webhook` is set.
+    """
+    if entry.category != "agent" or not entry.show_entry:
+        return []
+    triggers = (entry.details or {}).get("triggers")
+    if not isinstance(triggers, dict):
+        return []
+    event_types: Set[str] = set()
+    events = triggers.get("events")
+    if isinstance(events, dict):
+        event_types.update(event_type for event_type, value in events.items() if value is not None)
+    if triggers.get("webhook") is not None:
+        event_types.add("webhook")
+    return sorted(event_types)
+
+
+def _refresh_triggers(session: Session, namespace: str, name: str, latest: Optional[RegistryEntry]) -> None:
+    expected = {(event_type, latest.id) for event_type in trigger_event_types(latest)} if latest else set()
+    rows = session.exec(
+        select(RegistryTrigger).where(RegistryTrigger.namespace == namespace, RegistryTrigger.name == name)
+    ).all()
+    if {(row.event_type, row.registry_id) for row in rows} == expected:
+        return
+
+    for row in rows:
+        session.delete(row)
+    session.flush()
+    session.add_all(
+        RegistryTrigger(event_type=event_type, namespace=namespace, name=name, registry_id=registry_id)
+        for event_type, registry_id in expected
+    )
+    bump_index_version(session, TRIGGER_INDEX)
+
+
+def bump_index_version(session: Session, name: str) -> None:
+    """Increment the version of the index `name`, in the transaction of `session`."""
+    result = session.execute(
+        update(IndexVersion).where(col(IndexVersion.name) == name).values(version=IndexVersion.version + 1)
+    )
+    if result.rowcount == 0:  # type: ignore
+        session.add(IndexVersion(name=name, version=1))
+
+
+def get_index_version(session: Session, name: str) -> int:
+    """Current version of the index `name`, 0 if it has never changed."""
+    version = session.exec(select(IndexVersion.version).where(IndexVersion.name == name)).first()
+    return version or 0
+
+
+def rebuild_entry_summaries(session: Session) -> int:
+    """Recompute every summary and trigger row from the source tables, in one transaction.
+
+    Returns
+    -------
+        int: Number of summary rows.
+
+    """
+    session.exec(delete(RegistryEntrySummary))  # type: ignore
+    session.exec(text(REBUILD_QUERY))  # type: ignore
+
+    session.exec(delete(RegistryTrigger))  # type: ignore
+    agents = session.exec(
+        select(RegistryEntry)
+        .join(RegistryEntrySummary, col(RegistryEntrySummary.latest_id) == RegistryEntry.id)
+        .where(RegistryEntrySummary.latest_category == "agent", col(RegistryEntrySummary.latest_show_entry))
+    ).all()
+    session.add_all(
+        RegistryTrigger(event_type=event_type, namespace=agent.namespace, name=agent.name, registry_id=agent.id)
+        for agent in agents
+        for event_type in trigger_event_types(agent)
+    )
+    bump_index_version(session, TRIGGER_INDEX)
+    session.commit()
+    count = session.exec(select(func.count()).select_from(RegistryEntrySummary)).one()
+    logger.info(f"Rebuilt {count} registry entry summaries")
+    return count
@@ -0,0 +1,151 @@
+"""Content-addressed uploads of registry files.
+
+Clients first send a manifest of the files of an entry with their SHA-256. Files whose content the hub already stores,
+in the same namespace or in a public entry, are copied to the entry on S3 without being transferred again, and the
+client streams only the remaining files. Their content is sent to S3 as a multipart upload while it is received, so
+memory use does not depend on the file size, and the upload is only completed once the content matches the SHA-256 of
+the manifest.
+"""
+
+import hashlib
+import logging
+import re
+from os import getenv
+from typing import AsyncIterator, Dict, Iterable, List
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import BaseModel, field_validator
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, select
+from starlette.concurrency import run_in_threadpool
+
+from hub.api.v1.models import RegistryBlob, RegistryEntry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PART_SIZE = int(getenv("REGISTRY_UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+"""Size of the parts of multipart uploads to S3, at least 5 MiB."""
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class ManifestFile(BaseModel):
+    path: str
+    size: int
+    sha256: str
+
+    @field_validator("sha256")
+    @classmethod
+    def validate_sha256(cls, value: str) -> str:  # noqa: D102
+        if _SHA256.fullmatch(value) is None:
+            raise ValueError(f"Invalid SHA-256: {value}")
+        return value
+
+
+class UploadManifestResult(BaseModel):
+    known_hashes: List[str]
+    """Hashes of the files that are already in the entry, or that the hub copied to the entry from stored content.
+    Files with other hashes must be uploaded."""
+
+
+def find_blobs(session: Session, hashes: Iterable[str], namespace: str) -> Dict[str, RegistryBlob]:
+    """Stored content for each of `hashes` that `namespace` may reuse.
+
+    That is content uploaded to `namespace`, or to an entry that is not private: reusing other content would let a
+    writer copy, and then read, files of private entries whose hash they know.
+    """
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    blobs = session.exec(select(RegistryBlob).where(col(RegistryBlob.sha256).in_(hashes))).all()
+    found = {blob.sha256: blob for blob in blobs if blob.namespace == namespace}
+
+    others = [blob for blob in blobs if blob.sha256 not in found]
+    entry_ids = list({blob.entry_id for blob in others})
+    if entry_ids:
+        entries = session.exec(select(RegistryEntry).where(col(RegistryEntry.id).in_(entry_ids))).all()
+        public_ids = {entry.id for entry in entries if not entry.is_private()}
+        for blob in others:
+            if blob.entry_id in public_ids:
+                found.setdefault(blob.sha256, blob)
+    return found
+
+
+def record_blob(session: Session, sha256: str, size: int, key: str, entry: RegistryEntry) -> None:
+    """Remember that the object `key` of `entry` holds content with the given hash.
+
+    Unless another object of the namespace of `entry` already does.
+    """
+    if session.get(RegistryBlob, (sha256, entry.namespace)) is not None:
+        return
+    session.add(RegistryBlob(sha256=sha256, namespace=entry.namespace, entry_id=entry.id, size=size, key=key))
+    try:
+        session.commit()
+    except IntegrityError:
+        # Recorded concurrently.
+        session.rollback()
+
+
+async def stream_to_s3(s3, bucket: str, key: str, chunks: AsyncIterator[bytes], sha256: str, size: int) -> None:
+    """Uploads the streamed content to `key`, which is only created if the content has the given hash and size.
+
+    Raises
+    ------
+        HTTPException: If the content does not match `sha256` or `size`.
+
+    """
+    digest = hashlib.sha256()
+    received = 0
+    buffer = bytearray()
+    upload_id = None
+    parts: List[Dict] = []
+
+    async def upload_part():
+        part_number = len(parts) + 1
+        part = await run_in_threadpool(
+            s3.upload_part,
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=bytes(buffer),
+        )
+        parts.append({"ETag": part["ETag"], "PartNumber": part_number})
+        buffer.clear()
+
+    try:
+        async for chunk in chunks:
+            digest.update(chunk)
+            received += len(chunk)
+            if received > size:
+                raise HTTPException(status_code=400, detail=f"File {key} is larger than {size} bytes.")
+            buffer.extend(chunk)
+            if len(buffer) >= UPLOAD_PART_SIZE:
+                if upload_id is None:
+                    upload = await run_in_threadpool(s3.create_multipart_upload, Bucket=bucket, Key=key)
+                    upload_id = upload["UploadId"]
+                await upload_part()
+
+        if received != size or digest.hexdigest() != sha256:
+            raise HTTPException(status_code=400, detail=f"Content of {key} does not match size {size} and {sha256}.")
+
+        if upload_id is None:
+            await run_in_threadpool(s3.put_object, Bucket=bucket, Key=key, Body=bytes(buffer))
+            return
+        if buffer:
+            await upload_part()
+        await run_in_threadpool(
+            s3.complete_multipart_upload,
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except BaseException:
+        if upload_id is not None:
+            logger.info(f"Aborting upload of {key}")
+            await run_in_threadpool(s3.abort_multipart_upload, Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
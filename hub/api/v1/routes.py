@@ -2,32 +2,43 @@ import importlib.metadata
 import json
 import logging
 import time
-from typing import Annotated, Iterable, List, Optional, Union
+from typing import Annotated, Iterable, Iterator, List, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
-from nearai.shared.cache import mem_cache_with_timeout
+from nearai.shared.cache import cached
 from nearai.shared.client_config import DEFAULT_TIMEOUT
 from nearai.shared.near.sign import derive_new_extended_private_key, get_public_key
 from nearai.shared.provider_models import PROVIDER_MODEL_SEP, get_provider_model
 from openai.types.beta.assistant_response_format_option import AssistantResponseFormatOption
 from pydantic import BaseModel, field_validator
+from starlette.background import BackgroundTask
 
 from hub.api.v1.auth import AuthToken, get_auth, validate_signature
-from hub.api.v1.completions import Message, Provider, get_llm_ai, handle_stream
+from hub.api.v1.completions import (
+    Message,
+    Provider,
+    close_stream,
+    get_async_llm_ai,
+    get_llm_ai,
+    handle_stream,
+)
 from hub.api.v1.images import get_images_ai
+from hub.api.v1.provider_clients import StreamSlot, stream_limiter
 from hub.api.v1.sign import get_hub_key, get_signed_completion, is_trusted_runner_api_key
 from hub.api.v1.sql import SqlClient
+from hub.api.v1.usage import usage_recorder
 
 v1_router = APIRouter()
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
-def get_db() -> SqlClient:
-    """Get a thread-local database connection."""
-    return SqlClient()
+def get_db() -> Iterator[SqlClient]:
+    """Get a pooled database connection, returned to the pool once the request is done."""
+    with SqlClient() as db:
+        yield db
 
 
 DatabaseSession = Annotated[SqlClient, Depends(get_db)]
@@ -131,14 +142,12 @@ def convert_request(
 
 
 @v1_router.post("/completions")
-def completions(
-    db: DatabaseSession, request: CompletionsRequest = Depends(convert_request), auth: AuthToken = Depends(get_auth)
-):
+async def completions(request: CompletionsRequest = Depends(convert_request), auth: AuthToken = Depends(get_auth)):
     logger.info(f"Received completions request: {request.model_dump()}")
 
     try:
         assert request.provider is not None
-        llm = get_llm_ai(request.provider)
+        llm = get_async_llm_ai(request.provider)
     except NotImplementedError:
         raise HTTPException(status_code=400, detail="Provider not supported") from None
 
@@ -147,36 +156,50 @@ def completions(
     model.pop("tools", None)
     print("Calling completions", model)
 
-    resp = llm.completions.create(**model)
-
     if request.stream:
+        slot = await acquire_stream_slot()
+        try:
+            resp = await llm.completions.create(**model)
+        except BaseException:
+            slot.release()
+            raise
 
         def add_usage_callback(response_text):
             logger.info("Stream done, adding usage to database")
-            db.add_user_usage(
+            usage_recorder.record(
                 auth.account_id, request.prompt, response_text, request.model, request.provider, "/completions"
             )
 
         run_id = thread_id = message_id = None
         return StreamingResponse(
-            handle_stream(thread_id, run_id, message_id, resp, add_usage_callback), media_type="text/event-stream"
+            handle_stream(thread_id, run_id, message_id, resp, add_usage_callback, slot),
+            media_type="text/event-stream",
+            background=BackgroundTask(close_stream, resp, slot),
         )
     else:
+        resp = await llm.completions.create(**model)
         c = json.dumps(resp.model_dump())
 
-        db.add_user_usage(auth.account_id, request.prompt, c, request.model, request.provider, "/completions")
+        usage_recorder.record(auth.account_id, request.prompt, c, request.model, request.provider, "/completions")
 
         return JSONResponse(content=json.loads(c))
 
 
+async def acquire_stream_slot() -> StreamSlot:
+    """Wait for a free upstream stream slot, 503 if the worker is saturated."""
+    slot = await stream_limiter.acquire()
+    if slot is None:
+        raise HTTPException(status_code=503, detail="Too many concurrent streams, try again later")
+    return slot
+
+
 @v1_router.post("/get_agent_public_key")
 def get_agent_public_key(agent_name: str = Query(...)):
     return get_public_key(derive_new_extended_private_key(get_hub_key(), agent_name))
 
 
 @v1_router.post("/chat/completions")
-def chat_completions(
-    db: DatabaseSession,
+async def chat_completions(
     req: Request,
     request: ChatCompletionsRequest = Depends(convert_request),
     auth: AuthToken = Depends(get_auth),
@@ -190,19 +213,26 @@ def chat_completions(
 
     try:
         assert request.provider is not None
-        llm = get_llm_ai(request.provider)
+        llm = get_async_llm_ai(request.provider)
     except NotImplementedError:
         raise HTTPException(status_code=400, detail="Provider not supported") from None
 
     print("/chat/completions", request.model_dump())
+    slot = await acquire_stream_slot() if request.stream else None
     try:
-        resp = llm.chat.completions.create(**request.model_dump(exclude={"provider"}), timeout=DEFAULT_TIMEOUT)
+        resp = await llm.chat.completions.create(**request.model_dump(exclude={"provider"}), timeout=DEFAULT_TIMEOUT)
     except Exception as e:
+        if slot is not None:
+            slot.release()
         error_message = str(e)
         if "Error code: 404" in error_message and "Model not found, inaccessible, and/or not deployed" in error_message:
             raise HTTPException(status_code=400, detail="Model not supported") from None
         else:
             raise HTTPException(status_code=400, detail=error_message) from None
+    except BaseException:
+        if slot is not None:
+            slot.release()
+        raise
 
     try:
         runner_data = json.loads(auth.runner_data or "{}")
@@ -236,7 +266,7 @@ def chat_completions(
 
         def add_usage_callback(response_text):
             logger.info("Stream done, adding usage to database")
-            db.add_user_usage(
+            usage_recorder.record(
                 auth.account_id,
                 json.dumps([x.model_dump() for x in request.messages]),
                 response_text,
@@ -246,13 +276,15 @@ def chat_completions(
             )
 
         return StreamingResponse(
-            handle_stream(thread_id, run_id, message_id, resp, add_usage_callback), media_type="text/event-stream"
+            handle_stream(thread_id, run_id, message_id, resp, add_usage_callback, slot),
+            media_type="text/event-stream",
+            background=BackgroundTask(close_stream, resp, slot),
         )
 
     else:
         c = json.dumps(resp.model_dump())
         try:
-            db.add_user_usage(
+            usage_recorder.record(
                 auth.account_id,
                 json.dumps([x.model_dump() for x in request.messages]),
                 c,
@@ -266,11 +298,12 @@ def chat_completions(
         return JSONResponse(content=json.loads(c))
 
 
-@mem_cache_with_timeout(300)
+@cached(ttl=300, stale_ttl=3600, max_entries=1, name="models")
 def get_models_inner():
     """Get all models from all providers.
 
-    This function is cached.
+    This function is cached for 5 minutes. After that, the previous list is served for up to an hour while a single
+    background refresh runs.
     """
     logger.info("Refreshing models cache")
     all_models = []
@@ -303,9 +336,7 @@ def get_models() -> JSONResponse:
 
 
 @v1_router.post("/embeddings")
-def embeddings(
-    db: DatabaseSession, request: EmbeddingsRequest = Depends(convert_request), auth: AuthToken = Depends(get_auth)
-):
+def embeddings(request: EmbeddingsRequest = Depends(convert_request), auth: AuthToken = Depends(get_auth)):
     logger.info(f"Received embeddings request: {request.model_dump()}")
 
     try:
@@ -317,7 +348,7 @@ def embeddings(
     resp = llm.embeddings.create(**request.model_dump(exclude={"provider"}))
 
     c = json.dumps(resp.model_dump())
-    db.add_user_usage(auth.account_id, str(request.input), c, request.model, request.provider, "/embeddings")
+    usage_recorder.record(auth.account_id, str(request.input), c, request.model, request.provider, "/embeddings")
 
     return JSONResponse(content=json.loads(c))
 
@@ -383,9 +414,7 @@ def version() -> str:
 
 
 @v1_router.post("/images/generations")
-def generate_images(
-    db: DatabaseSession, request: ImageGenerationRequest = Depends(convert_request), auth: AuthToken = Depends(get_auth)
-):
+def generate_images(request: ImageGenerationRequest = Depends(convert_request), auth: AuthToken = Depends(get_auth)):
     logger.info(f"Received image generation request: {request.model_dump()}")
 
     try:
@@ -405,7 +434,7 @@ def generate_images(
     logger.info(f"Image generation response: {c}")
     # TODO save image to s3 and save url in the DB
     image_url = "TODO"
-    db.add_user_usage(
+    usage_recorder.record(
         auth.account_id, request.prompt, image_url, request.model or "default", request.provider, "/images/generations"
     )
 
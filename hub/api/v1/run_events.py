@@ -0,0 +1,160 @@
+"""Push-based fan-out of run events (message deltas, run status changes) to streaming subscribers.
+
+Producers (`handle_stream`, `update_run`) still persist every event as a `Delta` row, and then publish it here so
+that `/threads/{thread_id}/stream/{run_id}` subscribers get it immediately. The `deltas` table remains the source of
+truth: subscribers replay it when they connect and poll it at a low rate to catch up on events published by other
+hub workers when the in-process backend is used.
+
+The backend is selected with `RUN_EVENTS_BACKEND`:
+    - `memory` (default): events are only delivered to subscribers in the same process.
+    - `redis`: events are published to a Redis-compatible server (`RUN_EVENTS_REDIS_URL`) and delivered to
+      subscribers on every hub worker. Requires the `redis` package, installed separately.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from os import getenv
+from typing import Any, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+from sqlmodel import Session
+
+from hub.api.v1.models import Delta
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RUN_EVENTS_BACKEND = getenv("RUN_EVENTS_BACKEND", "memory")
+RUN_EVENTS_REDIS_URL = getenv("RUN_EVENTS_REDIS_URL", "redis://localhost:6379/0")
+RUN_EVENTS_CHANNEL_PREFIX = "nearai:run_events:"
+# How often subscribers fall back to reading the `deltas` table.
+RUN_EVENTS_CATCHUP_INTERVAL = float(getenv("RUN_EVENTS_CATCHUP_INTERVAL", 1.0))
+
+
+def delta_to_event(delta: Delta) -> Dict[str, Any]:
+    """Serialize a committed delta into the payload that is published to subscribers."""
+    return {
+        "id": delta.id,
+        "object": delta.object,
+        "message_id": delta.message_id,
+        "content": delta.content,
+    }
+
+
+class RunEventSubscription:
+    """Queue of events for one run, bound to the event loop of the subscriber."""
+
+    def __init__(self, run_id: str):  # noqa: D107
+        self.run_id = run_id
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, event: Dict[str, Any]) -> None:
+        """Enqueue an event. Safe to call from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        except RuntimeError:
+            # Loop already closed, the subscriber is gone.
+            pass
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next event, returns None if `timeout` expires first."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RunEventBroker:
+    """In-process registry of subscriptions, fed either directly or by a Redis listener."""
+
+    def __init__(self, backend: str = "memory", redis_url: Optional[str] = None):  # noqa: D107
+        self._subscriptions: Dict[str, Set[RunEventSubscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._backend = backend
+        self._redis_url = redis_url
+        self._redis: Any = None
+        self._redis_listener: Any = None
+
+    def subscribe(self, run_id: str) -> RunEventSubscription:
+        """Subscribe the running event loop to events of `run_id`."""
+        if self._backend == "redis":
+            self._ensure_redis_listener()
+        subscription = RunEventSubscription(run_id)
+        with self._lock:
+            self._subscriptions[run_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: RunEventSubscription) -> None:  # noqa: D102
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.run_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.run_id]
+
+    def publish(self, run_id: str, event: Dict[str, Any]) -> None:
+        """Publish an event. Failures are logged, subscribers will pick the event up from the database."""
+        try:
+            if self._backend == "redis":
+                self._get_redis().publish(RUN_EVENTS_CHANNEL_PREFIX + run_id, json.dumps(event))
+            else:
+                self._dispatch(run_id, event)
+        except Exception as e:
+            logger.warning(f"Failed to publish run event for run_id {run_id}: {e}")
+
+    def subscriber_count(self, run_id: Optional[str] = None) -> int:  # noqa: D102
+        with self._lock:
+            if run_id is not None:
+                return len(self._subscriptions.get(run_id, ()))
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def _dispatch(self, run_id: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(run_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(self._redis_url)
+        return self._redis
+
+    def _ensure_redis_listener(self) -> None:
+        with self._lock:
+            if self._redis_listener is not None:
+                return
+            pubsub = self._get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(**{RUN_EVENTS_CHANNEL_PREFIX + "*": self._on_redis_message})
+            self._redis_listener = pubsub.run_in_thread(sleep_time=0.01, daemon=True)
+
+    def _on_redis_message(self, message: Dict[str, Any]) -> None:
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        try:
+            event = json.loads(message["data"])
+        except Exception as e:
+            logger.warning(f"Dropping malformed run event on {channel}: {e}")
+            return
+        self._dispatch(channel[len(RUN_EVENTS_CHANNEL_PREFIX) :], event)
+
+
+run_event_broker = RunEventBroker(RUN_EVENTS_BACKEND, RUN_EVENTS_REDIS_URL)
+
+
+def commit_and_publish(session: Session, run_id: str, deltas: List[Delta]) -> None:
+    """Persist `deltas` and publish them to the subscribers of `run_id` once committed."""
+    session.add_all(deltas)
+    session.flush()  # assigns ids without expiring the objects
+    events = [delta_to_event(delta) for delta in deltas]
+    session.commit()
+    for event in events:
+        run_event_broker.publish(run_id, event)
@@ -1,23 +1,44 @@
+import hashlib
 import json
 import logging
 import uuid
 from datetime import datetime
 from enum import Enum
 from os import getenv
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
+import numpy as np
 import pymysql
 import pymysql.cursors
 from dotenv import load_dotenv
+from nearai.shared.cache import LruTtlCache
 from nearai.shared.models import SimilaritySearch, SimilaritySearchFile
 from pydantic import BaseModel, RootModel
 
-from hub.api.v1.models import Completion, get_session
+from hub.api.v1.models import engine
+from hub.api.v1.usage import UsageRecord, write_usage
+from hub.api.v1.vector_index import parse_embedding, vector_indexes
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Results of similarity searches, keyed on (vector store, embeddings generation, search kind, query embedding digest,
+# limit). `vector_stores.embeddings_generation` is bumped in the transaction of every change to the embeddings, and read
+# on every search, so no hub replica serves results of embeddings that changed.
+similarity_search_cache = LruTtlCache(
+    max_entries=int(getenv("SIMILARITY_SEARCH_CACHE_SIZE", 2048)),
+    ttl=float(getenv("SIMILARITY_SEARCH_CACHE_TTL", 60)),
+    name="similarity_search",
+)
+
+
+def _similarity_search_cache_key(
+    vector_store_id: str, generation: int, kind: str, query_embedding_json: str, limit: int
+):
+    digest = hashlib.sha256(query_embedding_json.encode()).hexdigest()
+    return (vector_store_id, generation, kind, digest, limit)
+
 
 class NonceStatus(str, Enum):
     ACTIVE = "active"
@@ -76,14 +97,39 @@ class VectorStoreFile(BaseModel):
 
 
 class SqlClient:
+    """Raw SQL access to the hub database.
+
+    Connections are borrowed from the shared SQLAlchemy `engine` pool (the same one used by `get_session`) the first
+    time they are needed, and returned to the pool on `close()` or when the client is garbage collected. The pool
+    takes care of health checks (`pool_pre_ping`) and recycling stale connections.
+    """
+
     def __init__(self):  # noqa: D107
-        self.db = pymysql.connect(
-            host=getenv("DATABASE_HOST"),
-            user=getenv("DATABASE_USER"),
-            password=getenv("DATABASE_PASSWORD"),
-            database=getenv("DATABASE_NAME"),
-            autocommit=True,
-        )
+        self._db = None
+
+    @property
+    def db(self):
+        """DB-API connection checked out from the shared pool."""
+        if self._db is None:
+            self._db = engine.raw_connection()
+        return self._db
+
+    def close(self):
+        """Return the connection to the pool."""
+        if self._db is not None:
+            try:
+                self._db.close()
+            finally:
+                self._db = None
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, *args):  # noqa: D105
+        self.close()
+
+    def __del__(self):  # noqa: D105
+        self.close()
 
     def __fetch_all(self, query: str, args: object = None):
         """Fetches all matching rows from the database.
@@ -106,6 +152,8 @@ class SqlClient:
     def add_user_usage(self, account_id: str, query: str, response: str, model: str, provider: str, endpoint: str):  # noqa: D102
         """Store completion usage data with robust JSON handling.
 
+        Prefer `hub.api.v1.usage.usage_recorder.record`, which writes usage in batches off the request path.
+
         Args:
         ----
             account_id: User account identifier
@@ -116,51 +164,7 @@ class SqlClient:
             endpoint: API endpoint used
 
         """
-        # Default usage data
-        token_data = {
-            "completion_tokens": 0,
-            "prompt_tokens": 0,
-            "total_tokens": 0,
-            "completion_tokens_details": None,
-            "prompt_tokens_details": None,
-        }
-
-        try:
-            response_dict = json.loads(response)
-        except Exception as e:
-            logger.error(f"Error parsing response JSON: {e}")
-            response_dict = {"value": str(response)}
-
-        try:
-            query_dict = json.loads(query)
-        except Exception as e:
-            logger.error(f"Error parsing response JSON: {e}")
-            query_dict = {"value": query}
-
-        if isinstance(response_dict, dict) and "usage" in response_dict:
-            token_data.update(response_dict["usage"])
-        else:
-            logger.warning("No usage data found in response")
-
-        completion = Completion(
-            account_id=account_id,
-            query=query_dict,
-            response=response_dict,
-            model=model,
-            provider=provider,
-            endpoint=endpoint,
-            completion_tokens=token_data.get("completion_tokens", 0),
-            prompt_tokens=token_data.get("prompt_tokens", 0),
-            total_tokens=token_data.get("total_tokens", 0),
-            completion_tokens_details=token_data.get("completion_tokens_details"),
-            prompt_tokens_details=token_data.get("prompt_tokens_details"),
-        )
-
-        with get_session() as session:
-            session.add(completion)
-            session.commit()
-            # Refresh to get the auto-generated ID
-            session.refresh(completion)
+        write_usage([UsageRecord(account_id, query, response, model, provider, endpoint, datetime.now())])
 
     def get_user_usage(self, account_id: str):  # noqa: D102
         query = "SELECT * FROM completions WHERE account_id = %s"
@@ -377,6 +381,27 @@ class SqlClient:
         result = cursor.fetchone()
         return VectorStoreFile(**result) if result else None
 
+    def get_files_details_by_account(self, file_ids: List[str], account_id: str) -> List[VectorStoreFile]:
+        """Get file details for several files of an account.
+
+        Args:
+        ----
+            file_ids (List[str]): The IDs of the files.
+            account_id (str): The ID of the account.
+
+        Returns:
+        -------
+            List[VectorStoreFile]: The details of the files found, in no particular order.
+
+        """
+        if not file_ids:
+            return []
+        placeholders = ", ".join(["%s"] * len(file_ids))
+        query = f"SELECT * FROM vector_store_files WHERE id IN ({placeholders}) AND account_id = %s"
+        cursor = self.db.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(query, (*file_ids, account_id))
+        return [VectorStoreFile(**row) for row in cursor.fetchall()]
+
     def get_file_details_by_filename(self, vector_store_id: str, filename: str) -> Optional[List[VectorStoreFile]]:
         """Get file details for a specific filename and vector_store_id.
 
@@ -480,7 +505,43 @@ class SqlClient:
         """
         cursor = self.db.cursor()
         cursor.execute(query, (id, vector_store_id, file_id, chunk_index, chunk_text, json.dumps(embedding)))
+        generation = self._bump_embeddings_generation(cursor, vector_store_id)
         self.db.commit()
+        vector_indexes.add(vector_store_id, [id], [file_id], np.array([embedding]), generation)
+
+    def store_embeddings(self, vector_store_id: str, file_id: str, chunks: List[Tuple[int, str, List[float]]]):
+        """Store embeddings for several chunks of a file in a single bulk insert.
+
+        Args:
+        ----
+            vector_store_id (str): The ID of the vector store.
+            file_id (str): The ID of the file.
+            chunks (List[Tuple[int, str, List[float]]]): (chunk_index, chunk_text, embedding) for each chunk.
+
+        """
+        if not chunks:
+            return
+        query = """
+        INSERT INTO vector_store_embeddings
+        (id, vector_store_id, file_id, chunk_index, chunk_text, embedding)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        rows = [
+            (f"vfe_{uuid.uuid4().hex[:24]}", vector_store_id, file_id, chunk_index, chunk_text, json.dumps(embedding))
+            for chunk_index, chunk_text, embedding in chunks
+        ]
+        cursor = self.db.cursor()
+        # pymysql rewrites `executemany` on INSERT ... VALUES into multi-row inserts.
+        cursor.executemany(query, rows)
+        generation = self._bump_embeddings_generation(cursor, vector_store_id)
+        self.db.commit()
+        vector_indexes.add(
+            vector_store_id,
+            [row[0] for row in rows],
+            [file_id] * len(rows),
+            np.array([embedding for _, _, embedding in chunks]),
+            generation,
+        )
 
     def update_file_embedding_status(self, file_id: str, status: str):
         """Update the embedding status of a file.
@@ -565,10 +626,24 @@ class SqlClient:
         LIMIT %s
         """
         query_embedding_json = json.dumps(query_embedding)
-        results = [
-            SimilaritySearch(**res) for res in self.__fetch_all(query, (query_embedding_json, vector_store_id, limit))
-        ]
-        return results
+        generation = self.embeddings_generation(vector_store_id)
+        if generation is None:
+            # No such vector store (any longer).
+            return []
+        cache_key = _similarity_search_cache_key(vector_store_id, generation, "chunks", query_embedding_json, limit)
+        cached = similarity_search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        index = self._get_vector_index(vector_store_id, generation)
+        if index is not None:
+            results = self._similarity_search_with_index(index, query_embedding, limit)
+        else:
+            results = [
+                SimilaritySearch(**res)
+                for res in self.__fetch_all(query, (query_embedding_json, vector_store_id, limit))
+            ]
+        similarity_search_cache.set(cache_key, results)
+        return list(results)
 
     def similarity_search_full_files(
         self, vector_store_id: str, query_embedding: List[float], limit: int = 1
@@ -605,11 +680,112 @@ class SqlClient:
         INNER JOIN vector_store_files fd ON fd.id = f.file_id
         """
         query_embedding_json = json.dumps(query_embedding)
-        results = [
-            SimilaritySearchFile(**res)
-            for res in self.__fetch_all(query, (query_embedding_json, vector_store_id, limit, vector_store_id))
+        generation = self.embeddings_generation(vector_store_id)
+        if generation is None:
+            # No such vector store (any longer).
+            return []
+        cache_key = _similarity_search_cache_key(vector_store_id, generation, "full_files", query_embedding_json, limit)
+        cached = similarity_search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        index = self._get_vector_index(vector_store_id, generation)
+        if index is not None:
+            results = self._similarity_search_full_files_with_index(index, vector_store_id, query_embedding, limit)
+        else:
+            results = [
+                SimilaritySearchFile(**res)
+                for res in self.__fetch_all(query, (query_embedding_json, vector_store_id, limit, vector_store_id))
+            ]
+        similarity_search_cache.set(cache_key, results)
+        return list(results)
+
+    def _bump_embeddings_generation(self, cursor, vector_store_id: str) -> Optional[int]:
+        """Bump the embeddings generation of a vector store in the current transaction, returning the new one."""
+        query = "UPDATE vector_stores SET embeddings_generation = embeddings_generation + 1 WHERE id = %s"
+        cursor.execute(query, (vector_store_id,))
+        cursor.execute("SELECT embeddings_generation FROM vector_stores WHERE id = %s", (vector_store_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def embeddings_generation(self, vector_store_id: str) -> Optional[int]:
+        """Generation of the embeddings of a vector store, bumped whenever they change. None if there is no store."""
+        query = "SELECT embeddings_generation FROM vector_stores WHERE id = %s"
+        row = self.__fetch_one(query, (vector_store_id,))
+        return row["embeddings_generation"] if row else None
+
+    def count_embeddings(self, vector_store_id: str) -> int:
+        """Number of embeddings stored for a vector store."""
+        query = "SELECT COUNT(*) AS n FROM vector_store_embeddings WHERE vector_store_id = %s"
+        return self.__fetch_one(query, (vector_store_id,))["n"]
+
+    def load_embeddings(self, vector_store_id: str) -> Tuple[List[str], List[str], np.ndarray]:
+        """Load (ids, file_ids, embeddings) of every chunk of a vector store, streaming rows from the database."""
+        query = "SELECT id, file_id, embedding FROM vector_store_embeddings WHERE vector_store_id = %s"
+        ids: List[str] = []
+        file_ids: List[str] = []
+        embeddings: List[np.ndarray] = []
+        cursor = self.db.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query, (vector_store_id,))
+            for embedding_id, file_id, embedding in cursor:
+                ids.append(embedding_id)
+                file_ids.append(file_id)
+                embeddings.append(parse_embedding(embedding))
+        finally:
+            cursor.close()
+        return ids, file_ids, np.stack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+
+    def _get_vector_index(self, vector_store_id: str, generation: int):
+        """Approximate nearest neighbour index of a vector store, if enabled and in sync with `generation`."""
+        if not vector_indexes.enabled:
+            return None
+
+        def loader(vs_id: str):
+            with SqlClient() as client:
+                generation = client.embeddings_generation(vs_id)
+                ids, file_ids, vectors = client.load_embeddings(vs_id)
+                # The generation only describes the embeddings loaded if they did not change in the meantime.
+                if client.embeddings_generation(vs_id) != generation:
+                    return None, ids, file_ids, vectors
+                return generation, ids, file_ids, vectors
+
+        return vector_indexes.get_if_current(
+            vector_store_id, generation, lambda: self.count_embeddings(vector_store_id), loader
+        )
+
+    def _similarity_search_with_index(self, index, query_embedding: List[float], limit: int) -> List[SimilaritySearch]:
+        hits = index.search(query_embedding, limit)
+        if not hits:
+            return []
+        query = "SELECT id, chunk_text FROM vector_store_embeddings WHERE id IN %s"
+        chunk_texts = {row["id"]: row["chunk_text"] for row in self.__fetch_all(query, ([hit[0] for hit in hits],))}
+        return [
+            SimilaritySearch(file_id=file_id, chunk_text=chunk_texts[embedding_id], distance=distance)
+            for embedding_id, file_id, distance in hits
+            if embedding_id in chunk_texts
+        ]
+
+    def _similarity_search_full_files_with_index(
+        self, index, vector_store_id: str, query_embedding: List[float], limit: int
+    ) -> List[SimilaritySearchFile]:
+        ranked_files = index.search_files(query_embedding, limit)
+        if not ranked_files:
+            return []
+        query = """
+        SELECT CONCAT_WS(' ', GROUP_CONCAT(vse.chunk_text ORDER BY vse.chunk_index ASC)) as file_content,
+            vse.file_id, fd.filename
+        FROM vector_store_embeddings vse
+        INNER JOIN vector_store_files fd ON fd.id = vse.file_id
+        WHERE vse.vector_store_id = %s AND vse.file_id IN %s
+        GROUP BY vse.file_id, fd.filename
+        """
+        rows = self.__fetch_all(query, (vector_store_id, [file_id for file_id, _ in ranked_files]))
+        files = {row["file_id"]: row for row in rows}
+        return [
+            SimilaritySearchFile(distance=distance, **files[file_id])
+            for file_id, distance in ranked_files
+            if file_id in files
         ]
-        return results
 
     def delete_vector_store(self, vector_store_id: str, account_id: str) -> bool:
         """Delete a vector store and its embeddings from the database.
@@ -641,6 +817,7 @@ class SqlClient:
             cursor.execute(vector_store_query, (vector_store_id, account_id))
 
             self.db.commit()
+            vector_indexes.drop(vector_store_id)
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error deleting vector store and its embeddings: {str(e)}")
@@ -778,7 +955,9 @@ class SqlClient:
             WHERE vector_store_id = %s AND file_id = %s
             """
             cursor.execute(query, (vector_store_id, file_id))
+            generation = self._bump_embeddings_generation(cursor, vector_store_id)
             self.db.commit()
+            vector_indexes.remove_file(vector_store_id, file_id, generation)
             return True
         except Exception as e:
             logger.error(f"Error removing embeddings from vector store: {str(e)}")
@@ -842,9 +1021,9 @@ class SqlClient:
                 logger.warning(f"File {file_id} that belongs to account {account_id} not found")
                 return False
 
-            # Get all vector stores that contain this file
+            # Get all vector stores that contain this file, once each rather than once per chunk
             query = """
-            SELECT vector_store_id FROM vector_store_embeddings
+            SELECT DISTINCT vector_store_id FROM vector_store_embeddings
             WHERE file_id = %s
             """
 
@@ -862,6 +1041,7 @@ class SqlClient:
             WHERE file_id = %s
             """
             cursor.execute(query, (file_id,))
+            generations = [self._bump_embeddings_generation(cursor, vs[0]) for vs in vector_stores]
 
             # Finally delete the file record
             query = """
@@ -870,6 +1050,8 @@ class SqlClient:
             """
             cursor.execute(query, (file_id, account_id))
             self.db.commit()
+            for vs, generation in zip(vector_stores, generations):
+                vector_indexes.remove_file(vs[0], file_id, generation)
 
             # Check if any rows were affected
             return cursor.rowcount > 0
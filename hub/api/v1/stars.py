@@ -3,6 +3,7 @@ from sqlmodel import select
 
 from hub.api.v1.auth import AuthToken, get_auth
 from hub.api.v1.models import Stars, get_session
+from hub.api.v1.registry_summary import refresh_entry_summary
 
 v1_router = APIRouter(
     prefix="/stars",
@@ -22,6 +23,7 @@ async def add_star(auth: AuthToken = Depends(get_auth), namespace: str = Form(..
 
         session.add(Stars(account_id=auth.account_id, namespace=namespace, name=name))
         session.commit()
+        refresh_entry_summary(session, namespace, name)
 
 
 @v1_router.post("/remove_star")
@@ -36,3 +38,4 @@ async def remove_star(auth: AuthToken = Depends(get_auth), namespace: str = Form
 
         session.delete(result)
         session.commit()
+        refresh_entry_summary(session, namespace, name)
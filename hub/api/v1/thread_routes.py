@@ -5,7 +5,7 @@ import threading
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 from os import getenv
-from typing import Any, Dict, Iterable, List, Literal, Optional, Union
+from typing import Any, Dict, Iterable, List, Literal, Optional, Set, Union
 
 from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Path, Query
 from fastapi.responses import StreamingResponse
@@ -23,6 +23,7 @@ from openai.types.beta.threads.message_update_params import MessageUpdateParams
 from openai.types.beta.threads.run import Run as OpenAIRun
 from openai.types.beta.threads.run_create_params import AdditionalMessage, TruncationStrategy
 from pydantic import Field
+from sqlalchemy import union_all
 from sqlalchemy.orm.attributes import flag_modified
 from sqlmodel import asc, desc, select
 
@@ -39,10 +40,21 @@ from hub.api.v1.models import Message as MessageModel
 from hub.api.v1.models import Run as RunModel
 from hub.api.v1.models import Thread as ThreadModel
 from hub.api.v1.routes import DEFAULT_TIMEOUT, get_llm_ai
+from hub.api.v1.run_events import (
+    RUN_EVENTS_CATCHUP_INTERVAL,
+    commit_and_publish,
+    delta_to_event,
+    run_event_broker,
+)
 from hub.api.v1.sql import SqlClient
 from hub.tasks.scheduler import get_scheduler
 
 STREAMING_RUN_TIMEOUT_MINUTES = 10
+DELTAS_CATCHUP_BATCH_SIZE = 100
+TERMINAL_RUN_EVENTS = frozenset(
+    ["thread.run.completed", "thread.run.failed", "thread.run.cancelled", "thread.run.expired"]
+)
+"""Events after which a run produces no more events, ending its stream."""
 
 threads_router = APIRouter(
     tags=["Threads"],
@@ -287,7 +299,7 @@ def fork_thread(
 
         # Copy messages from the original thread to the forked thread
         messages = session.exec(
-            select(MessageModel).where(MessageModel.thread_id == thread_id).order_by(asc(MessageModel.created_at))
+            select(MessageModel).where(MessageModel.thread_id == thread_id).order_by(asc(MessageModel.seq))
         ).all()
 
         for message in messages:
@@ -422,7 +434,7 @@ def generate_thread_topic(thread_id: str):
             select(MessageModel)
             .where(MessageModel.thread_id == thread_id)
             .where(MessageModel.role != "assistant")
-            .order_by(desc(MessageModel.created_at))
+            .order_by(desc(MessageModel.seq))
             .limit(1)
         ).all()
 
@@ -460,6 +472,48 @@ class ListMessagesResponse(BaseModel):
     last_id: str
 
 
+def _message_seq(session, message_id: str) -> Optional[int]:
+    return session.exec(select(MessageModel.seq).where(MessageModel.id == message_id)).first()
+
+
+def list_messages_query(
+    thread_ids: List[str],
+    after_seq: Optional[int] = None,
+    before_seq: Optional[int] = None,
+    run_id: Optional[str] = None,
+    order: Literal["asc", "desc"] = "desc",
+    limit: int = 20,
+):
+    """Query a page of messages of `thread_ids`, keyed on `seq`.
+
+    Every condition and the order are served by the `(thread_id, seq)` and `(thread_id, run_id, seq)` indexes, so a
+    page costs the same wherever it is in the thread. Several threads (a thread and its subthreads) are merged from
+    one page per thread. `after_seq` and `before_seq` are the `seq` of the cursor messages; `after` lists newer
+    messages, and `before` lists the messages preceding the cursor in `order`.
+    """
+
+    def page(columns, thread_id: str):
+        statement = select(columns).where(MessageModel.thread_id == thread_id)
+        if run_id:
+            statement = statement.where(MessageModel.run_id == run_id)
+        if after_seq is not None:
+            statement = statement.where(MessageModel.seq > after_seq)  # type: ignore
+        if before_seq is not None:
+            if order == "asc":
+                statement = statement.where(MessageModel.seq < before_seq)  # type: ignore
+            else:
+                statement = statement.where(MessageModel.seq > before_seq)  # type: ignore
+        return statement.order_by(asc(MessageModel.seq) if order == "asc" else desc(MessageModel.seq)).limit(limit)
+
+    if len(thread_ids) == 1:
+        return page(MessageModel, thread_ids[0])
+
+    pages = [page(MessageModel.seq, thread_id).subquery() for thread_id in thread_ids]  # type: ignore
+    seqs = union_all(*[select(thread_page.c.seq) for thread_page in pages]).subquery()
+    statement = select(MessageModel).join(seqs, MessageModel.seq == seqs.c.seq)  # type: ignore
+    return statement.order_by(asc(MessageModel.seq) if order == "asc" else desc(MessageModel.seq)).limit(limit)
+
+
 @threads_router.get("/threads/{thread_id}/messages")
 def list_messages(
     thread_id: str,
@@ -484,42 +538,19 @@ def list_messages(
     with get_session() as session:
         _check_thread_permissions(auth, session, thread_id)
 
-        child_threads = (
-            session.exec(select(ThreadModel.id).where(ThreadModel.parent_id == thread_id)).all()
-            if include_subthreads
-            else []
-        )
-
-        statement = select(MessageModel).where(
-            MessageModel.thread_id.in_([thread_id] + list(child_threads))  # type: ignore
+        thread_ids = [thread_id]
+        if include_subthreads:
+            thread_ids += session.exec(select(ThreadModel.id).where(ThreadModel.parent_id == thread_id)).all()
+
+        statement = list_messages_query(
+            thread_ids,
+            after_seq=_message_seq(session, after) if after else None,
+            before_seq=_message_seq(session, before) if before else None,
+            run_id=run_id,
+            order=order,
+            limit=limit,
         )
 
-        # Apply filters
-        if after:
-            after_message = session.get(MessageModel, after)
-            if after_message:
-                statement = statement.where(MessageModel.created_at > after_message.created_at)
-
-        if run_id:
-            statement = statement.where(MessageModel.run_id == run_id)
-
-        # Apply order
-        if order == "asc":
-            statement = statement.order_by(asc(MessageModel.created_at))
-        else:
-            statement = statement.order_by(desc(MessageModel.created_at))
-
-        if before:
-            before_message = session.get(MessageModel, before)
-            if before_message:
-                if order == "asc":
-                    statement = statement.where(MessageModel.created_at < before_message.created_at)
-                else:
-                    statement = statement.where(MessageModel.created_at > before_message.created_at)
-
-        # Apply limit
-        statement = statement.limit(limit)
-
         # Print the SQL query
         logger.debug("SQL Query:", statement.compile(compile_kwargs={"literal_binds": True}))
 
@@ -865,67 +896,93 @@ def _run_agent(
 
 
 async def monitor_deltas(run_id: str, delete: bool):
-    with get_session() as session:
-        start_time = datetime.now(timezone.utc)
-        last_seen_id = 0  # Track by ID instead of storing all IDs in memory
+    """Forward the events of a run to its queue.
 
-        async def handle_delete():
-            if delete:
-                await asyncio.sleep(3)  # Let the other listeners get this event
-                session.query(Delta).filter(Delta.run_id == run_id).delete()
-                session.commit()
-
-        completion = None
-        while True:
-            try:
-                # Fetch events with ID greater than last_seen_id
-                query = (
-                    select(Delta)
-                    .where(Delta.run_id == run_id, Delta.id > last_seen_id)
-                    .order_by(asc(Delta.id))
-                    .limit(10)  # Process in small batches
-                )
-                events = session.exec(query).all()
-
-                # Set a maximum run time
-                if datetime.now(timezone.utc) - start_time >= timedelta(minutes=STREAMING_RUN_TIMEOUT_MINUTES):
-                    logger.error(f"Timeout reached for monitor_deltas on run_id {run_id}")
-                    run_model = session.get(RunModel, run_id)
-                    event = _streaming_run_event(
-                        "thread.run.expired", run_model, run_model.thread_id if run_model else ""
-                    )
-                    await run_queues[run_id].put(event)
-                    await handle_delete()
+    Events are pushed by `run_event_broker` as soon as they are committed. The `deltas` table is read on connect to
+    replay what was already produced, and then every `RUN_EVENTS_CATCHUP_INTERVAL` seconds to pick up events that
+    were not published to this worker.
+    """
+    subscription = run_event_broker.subscribe(run_id)
+    try:
+        with get_session() as session:
+            loop = asyncio.get_running_loop()
+            start_time = datetime.now(timezone.utc)
+            last_polled_id = 0  # Track by ID instead of storing all IDs in memory
+            delivered_ids: Set[int] = set()
+            next_poll = loop.time()
+
+            async def handle_delete():
+                if delete:
+                    await asyncio.sleep(3)  # Let the other listeners get this event
+                    session.query(Delta).filter(Delta.run_id == run_id).delete()
+                    session.commit()
+
+            completion = None
+
+            async def deliver(event: Dict[str, Any]):
+                nonlocal completion
+                if event["id"] in delivered_ids:
                     return
-
-                if not events:
-                    if completion:
-                        # send completion event last
-                        await run_queues[run_id].put(completion)
+                delivered_ids.add(event["id"])
+                payload = {"id": event["message_id"], "object": event["object"], "delta": event["content"]}
+                event_data = {
+                    "event": event["object"],
+                    "data": payload,
+                }
+
+                if event["object"] in TERMINAL_RUN_EVENTS:
+                    # Signal completion but continue processing events
+                    completion = event_data
+                else:
+                    # Send event
+                    await run_queues[run_id].put(event_data)
+
+            while True:
+                try:
+                    # Set a maximum run time
+                    if datetime.now(timezone.utc) - start_time >= timedelta(minutes=STREAMING_RUN_TIMEOUT_MINUTES):
+                        logger.error(f"Timeout reached for monitor_deltas on run_id {run_id}")
+                        run_model = session.get(RunModel, run_id)
+                        event = _streaming_run_event(
+                            "thread.run.expired", run_model, run_model.thread_id if run_model else ""
+                        )
+                        await run_queues[run_id].put(event)
                         await handle_delete()
                         return
-                    await asyncio.sleep(0.1)  # Longer sleep when no events
-                    continue
-
-                for event in events:
-                    last_seen_id = max(last_seen_id, event.id)
-                    payload = {"id": event.message_id, "object": event.object, "delta": event.content}
-                    event_data = {
-                        "event": event.object,
-                        "data": payload,
-                    }
-
-                    if hasattr(event, "object") and event.object == "thread.run.completed":
-                        # Signal completion but continue processing events
-                        completion = event_data
-                    else:
-                        # Send event
-                        await run_queues[run_id].put(event_data)
 
-                await asyncio.sleep(0.05)  # Poll more frequently
-            except Exception as e:
-                logger.error(f"Error in monitor_deltas for run_id {run_id}: {e}")
-                await asyncio.sleep(1)  # Wait before retrying
+                    if loop.time() >= next_poll:
+                        # Catch-up path: fetch events with ID greater than the last one read from the database
+                        query = (
+                            select(Delta)
+                            .where(Delta.run_id == run_id, Delta.id > last_polled_id)
+                            .order_by(asc(Delta.id))
+                            .limit(DELTAS_CATCHUP_BATCH_SIZE)
+                        )
+                        events = session.exec(query).all()
+                        for delta in events:
+                            last_polled_id = max(last_polled_id, delta.id)
+                            await deliver(delta_to_event(delta))
+
+                        if len(events) == DELTAS_CATCHUP_BATCH_SIZE:
+                            continue  # Still replaying a backlog
+                        if completion:
+                            # send completion event last
+                            await run_queues[run_id].put(completion)
+                            await handle_delete()
+                            return
+                        next_poll = loop.time() + RUN_EVENTS_CATCHUP_INTERVAL
+
+                    pushed = await subscription.get(timeout=max(0.0, next_poll - loop.time()))
+                    if pushed is not None:
+                        await deliver(pushed)
+                        if completion:
+                            # Make sure nothing committed before the completion is missing, then finish
+                            next_poll = loop.time()
+                except Exception as e:
+                    logger.error(f"Error in monitor_deltas for run_id {run_id}: {e}")
+                    await asyncio.sleep(1)  # Wait before retrying
+    finally:
+        run_event_broker.unsubscribe(subscription)
 
 
 async def stream_run_events(run_id: str, delete: bool):
@@ -936,12 +993,7 @@ async def stream_run_events(run_id: str, delete: bool):
         event = await queue.get()
         yield f"data: {json.dumps(event)}\n\n"
         await asyncio.sleep(0)
-        if (
-            event
-            and hasattr(event, "event")
-            and event.event
-            in ["thread.run.completed", "thread.run.failed", "thread.run.cancelled", "thread.run.expired"]
-        ):
+        if event and event.get("event") in TERMINAL_RUN_EVENTS:
             break
     del run_queues[run_id]
 
@@ -1024,8 +1076,7 @@ def update_run(
                 object=f"thread.run.{run.status}",
                 content=_streaming_run_event(f"thread.run.{run.status}", run_model, thread_id)["data"],
             )
-            session.add(delta)
-            session.commit()
+            commit_and_publish(session, run_id, [delta])
 
         return run_model.to_openai()
 
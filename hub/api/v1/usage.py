@@ -0,0 +1,225 @@
+"""Completion usage accounting off the request path.
+
+Endpoints call `usage_recorder.record(...)`, which only enqueues the raw request and response. A background thread
+parses them into `completions` rows and writes them with one bulk insert per batch.
+
+On shutdown the queue is drained for up to `USAGE_SHUTDOWN_TIMEOUT` seconds, so at most the records still queued
+after that (bounded by `USAGE_QUEUE_MAX_SIZE`) are lost. When the queue is full, records are dropped and counted in
+`usage_stats()`: `record` is called from request handlers running on the event loop, which must never wait for the
+database, least of all when it is overloaded.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from os import getenv
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from hub.api.v1.models import Completion, get_session
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+USAGE_QUEUE_MAX_SIZE = int(getenv("USAGE_QUEUE_MAX_SIZE", 10000))
+USAGE_BATCH_SIZE = int(getenv("USAGE_BATCH_SIZE", 500))
+USAGE_FLUSH_INTERVAL = float(getenv("USAGE_FLUSH_INTERVAL", 1.0))
+"""Seconds the flusher waits for a batch to fill up."""
+USAGE_MAX_ATTEMPTS = int(getenv("USAGE_MAX_ATTEMPTS", 3))
+"""Attempts to write a batch before its records are dropped."""
+USAGE_SHUTDOWN_TIMEOUT = float(getenv("USAGE_SHUTDOWN_TIMEOUT", 5.0))
+
+
+class UsageRecord(NamedTuple):
+    account_id: str
+    query: str
+    response: str
+    model: str
+    provider: str
+    endpoint: str
+    created_at: datetime
+
+
+def completion_row(record: UsageRecord) -> Dict[str, Any]:
+    """Values of the `completions` row of a usage record, with robust JSON handling."""
+    token_data = {
+        "completion_tokens": 0,
+        "prompt_tokens": 0,
+        "total_tokens": 0,
+        "completion_tokens_details": None,
+        "prompt_tokens_details": None,
+    }
+
+    try:
+        response_dict = json.loads(record.response)
+    except Exception as e:
+        logger.error(f"Error parsing response JSON: {e}")
+        response_dict = {"value": str(record.response)}
+
+    try:
+        query_dict = json.loads(record.query)
+    except Exception as e:
+        logger.error(f"Error parsing response JSON: {e}")
+        query_dict = {"value": record.query}
+
+    if isinstance(response_dict, dict) and "usage" in response_dict:
+        token_data.update(response_dict["usage"])
+    else:
+        logger.warning("No usage data found in response")
+
+    return {
+        "account_id": record.account_id,
+        "query": query_dict,
+        "response": response_dict,
+        "model": record.model,
+        "provider": record.provider,
+        "endpoint": record.endpoint,
+        "created_at": record.created_at,
+        "completion_tokens": token_data.get("completion_tokens") or 0,
+        "prompt_tokens": token_data.get("prompt_tokens") or 0,
+        "total_tokens": token_data.get("total_tokens") or 0,
+        "completion_tokens_details": token_data.get("completion_tokens_details"),
+        "prompt_tokens_details": token_data.get("prompt_tokens_details"),
+    }
+
+
+def write_usage(records: List[UsageRecord]) -> None:
+    """Insert the `completions` rows of `records` in a single statement."""
+    with get_session() as session:
+        session.execute(insert(Completion), [completion_row(record) for record in records])
+        session.commit()
+
+
+class UsageRecorder:
+    """Queue of usage records, written in batches by a background thread started on first use."""
+
+    def __init__(  # noqa: D107
+        self,
+        writer: Callable[[List[UsageRecord]], None] = write_usage,
+        max_size: int = USAGE_QUEUE_MAX_SIZE,
+        batch_size: int = USAGE_BATCH_SIZE,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        max_attempts: int = USAGE_MAX_ATTEMPTS,
+    ):
+        self._writer = writer
+        self._queue: "queue.Queue[UsageRecord]" = queue.Queue(maxsize=max_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.enqueued = 0
+        self.written = 0
+        self.written_inline = 0
+        self.dropped = 0
+        self.dropped_full = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+
+    def record(self, account_id: str, query: str, response: str, model: str, provider: str, endpoint: str) -> None:
+        """Record the usage of a completion, see `SqlClient.add_user_usage` for the arguments."""
+        record = UsageRecord(account_id, query, response, model, provider, endpoint, datetime.now())
+        if self._stopping.is_set():
+            # Shutting down, without a flusher: a single attempt.
+            self._write([record], inline=True)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped_full += 1
+            logger.warning(f"Usage queue is full, dropped usage of {account_id} ({self.dropped_full} so far)")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued record has been written (or dropped). Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if self._thread is None or (deadline is not None and time.monotonic() > deadline):
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = USAGE_SHUTDOWN_TIMEOUT) -> None:
+        """Drain the queue for up to `timeout` seconds and stop the flusher."""
+        if not self.flush(timeout):
+            logger.error(f"Lost {self._queue.qsize()} usage records on shutdown")
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._flush_interval + 1)
+
+    def stats(self) -> Dict[str, Any]:  # noqa: D102
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "written_inline": self.written_inline,
+            "dropped": self.dropped,
+            "dropped_full": self.dropped_full,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="usage-recorder", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                batch = [self._queue.get(timeout=self._flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[UsageRecord], inline: bool = False) -> None:
+        max_attempts = 1 if inline else self._max_attempts
+        for attempt in range(1, max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                self._writer(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} usage records (attempt {attempt}): {e}")
+                if attempt < max_attempts:
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+            self.last_batch_ms = 1000 * (time.perf_counter() - start)
+            self.batches += 1
+            if inline:
+                self.written_inline += len(batch)
+            else:
+                self.written += len(batch)
+            return
+        self.dropped += len(batch)
+
+
+usage_recorder = UsageRecorder()
+atexit.register(usage_recorder.stop)
+
+
+def usage_stats() -> Dict[str, Any]:
+    """Queue depth and write counters of the usage recorder."""
+    return usage_recorder.stats()
@@ -0,0 +1,451 @@
+"""In-process approximate nearest neighbour (IVF-Flat) index for vector store similarity search.
+
+`SqlClient.similarity_search` computes the distance to every chunk of a vector store in SQL. For large stores this
+module keeps the embeddings of a vector store in memory, partitioned around k-means centroids, so that a search
+only computes exact distances for the chunks of the `VECTOR_INDEX_NPROBE` closest partitions.
+
+Indexes are persisted per vector store under `VECTOR_INDEX_DIR` as append-only segments, so that adding embeddings
+never rewrites the whole index:
+
+    {VECTOR_INDEX_DIR}/{vector_store_id}/centroids.npy
+    {VECTOR_INDEX_DIR}/{vector_store_id}/segment-{seq}.npz   ids, file_ids and vectors added together
+    {VECTOR_INDEX_DIR}/{vector_store_id}/removed.json        file_id -> first segment seq not affected by removal
+    {VECTOR_INDEX_DIR}/{vector_store_id}/generation.json     `vector_stores.embeddings_generation` it reflects
+
+The database remains the source of truth: every change to the embeddings of a vector store bumps its
+`embeddings_generation`, and an index is only used when it reflects the current generation. Otherwise the SQL scan is
+used while the index is rebuilt in the background.
+
+Enable with `VECTOR_SEARCH_BACKEND=ivf`.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+from os import getenv
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from nearai.shared.cache import LruTtlCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+VECTOR_SEARCH_BACKEND = getenv("VECTOR_SEARCH_BACKEND", "sql")
+VECTOR_INDEX_DIR = getenv("VECTOR_INDEX_DIR", "/tmp/nearai_vector_indexes")
+VECTOR_INDEX_MIN_SIZE = int(getenv("VECTOR_INDEX_MIN_SIZE", 10_000))
+"""Vector stores with fewer embeddings are searched with SQL."""
+VECTOR_INDEX_NPROBE = int(getenv("VECTOR_INDEX_NPROBE", 16))
+"""Number of partitions scanned per query, higher is more accurate and slower."""
+VECTOR_INDEX_MAX_LOADED = int(getenv("VECTOR_INDEX_MAX_LOADED", 8))
+"""Maximum number of indexes kept in memory."""
+VECTOR_INDEX_MAX_SEGMENTS = 64
+"""Segments are compacted into one when there are more than this."""
+
+KMEANS_ITERATIONS = 10
+KMEANS_MAX_TRAINING_POINTS = 50_000
+_BATCH_ROWS = 65_536
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid for each vector."""
+    centroid_norms = (centroids**2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BATCH_ROWS):
+        batch = vectors[start : start + _BATCH_ROWS]
+        # |v - c|^2 = |v|^2 - 2 v.c + |c|^2, |v|^2 does not change the argmin.
+        distances = centroid_norms[None, :] - 2 * batch @ centroids.T
+        assignments[start : start + _BATCH_ROWS] = distances.argmin(axis=1)
+    return assignments
+
+
+def _kmeans(vectors: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_MAX_TRAINING_POINTS:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_MAX_TRAINING_POINTS, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _nearest_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=k)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+    return centroids
+
+
+class VectorStoreIndex:
+    """IVF-Flat index over the embeddings of one vector store."""
+
+    def __init__(self, path: str, dimensions: int):  # noqa: D107
+        self.path = path
+        self.dimensions = dimensions
+        self.ids = np.empty(0, dtype=object)
+        self.file_ids = np.empty(0, dtype=object)
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self.segments = np.empty(0, dtype=np.int32)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.removed: Dict[str, int] = {}
+        self.generation = -1
+        # Set once a rebuilt index replaced this one, whose files are then gone.
+        self.retired = False
+        self.next_segment = 0
+        self.segment_count = 0
+        # Added embeddings are buffered and concatenated on the next read, so that a burst of small additions does
+        # not copy the whole index each time.
+        self._pending: List[Tuple[int, np.ndarray, np.ndarray, np.ndarray]] = []
+        self._pending_count = 0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self.ids) + self._pending_count
+
+    # Mutations
+
+    def add(self, ids: Sequence[str], file_ids: Sequence[str], vectors: np.ndarray, persist: bool = True) -> None:
+        """Add embeddings, persisting them as a new segment."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        ids_array = np.array(ids, dtype=object)
+        file_ids_array = np.array(file_ids, dtype=object)
+        with self.lock:
+            segment = self.next_segment
+            self.next_segment += 1
+            if persist:
+                self._write_segment(segment, ids_array, file_ids_array, vectors)
+            self._append(segment, ids_array, file_ids_array, vectors)
+            if self.centroids is None and len(self) >= VECTOR_INDEX_MIN_SIZE:
+                self.train()
+            if self.segment_count > VECTOR_INDEX_MAX_SEGMENTS:
+                self.compact()
+
+    def remove_file(self, file_id: str) -> None:
+        """Remove every embedding of a file."""
+        with self.lock:
+            self._consolidate()
+            keep = self.file_ids != file_id
+            self._filter(keep)
+            self.removed[file_id] = self.next_segment
+            self._write_json("removed.json", self.removed)
+
+    def set_generation(self, generation: int) -> None:
+        """Record the `embeddings_generation` of the vector store this index now reflects."""
+        with self.lock:
+            self.generation = generation
+            self._write_json("generation.json", generation)
+
+    def train(self) -> None:
+        """Partition the embeddings around k-means centroids."""
+        with self.lock:
+            self._consolidate()
+            if len(self) == 0:
+                return
+            k = max(1, min(4096, int(np.sqrt(len(self)))))
+            self.centroids = _kmeans(self.vectors, k)
+            self.assignments = _nearest_centroids(self.vectors, self.centroids)
+            os.makedirs(self.path, exist_ok=True)
+            np.save(os.path.join(self.path, "centroids.npy"), self.centroids)
+
+    def compact(self) -> None:
+        """Rewrite all segments as a single one, dropping removed embeddings from disk."""
+        with self.lock:
+            self._consolidate()
+            segment = self.next_segment
+            self.next_segment += 1
+            self._write_segment(segment, self.ids, self.file_ids, self.vectors)
+            for name in os.listdir(self.path):
+                if name.startswith("segment-") and name != f"segment-{segment:08d}.npz":
+                    os.remove(os.path.join(self.path, name))
+            self.segments = np.full(len(self), segment, dtype=np.int32)
+            self.segment_count = 1
+            self.removed = {}
+            self._write_json("removed.json", self.removed)
+
+    # Queries
+
+    def search(self, query: Sequence[float], limit: int) -> List[Tuple[str, str, float]]:
+        """Approximate nearest neighbours of `query`, as (embedding id, file id, euclidean distance)."""
+        q = np.asarray(query, dtype=np.float32)
+        with self.lock:
+            self._consolidate()
+            if self.centroids is not None and len(self.centroids) > VECTOR_INDEX_NPROBE:
+                centroid_distances = ((self.centroids - q) ** 2).sum(axis=1)
+                probes = np.argpartition(centroid_distances, VECTOR_INDEX_NPROBE)[:VECTOR_INDEX_NPROBE]
+                candidates = np.flatnonzero(np.isin(self.assignments, probes))
+            else:
+                candidates = np.arange(len(self))
+            if len(candidates) == 0:
+                return []
+            distances = np.sqrt(((self.vectors[candidates] - q) ** 2).sum(axis=1))
+            limit = min(limit, len(candidates))
+            top = np.argpartition(distances, limit - 1)[:limit]
+            top = top[np.argsort(distances[top])]
+            return [(self.ids[candidates[i]], self.file_ids[candidates[i]], float(distances[i])) for i in top.tolist()]
+
+    def search_files(self, query: Sequence[float], limit: int) -> List[Tuple[str, float]]:
+        """Files ranked by the largest distance of their chunks to `query`, like `similarity_search_full_files`.
+
+        Ranking files needs every chunk, so this is an exact in-memory scan rather than an approximate one.
+        """
+        q = np.asarray(query, dtype=np.float32)
+        with self.lock:
+            self._consolidate()
+            if len(self) == 0:
+                return []
+            distances = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), _BATCH_ROWS):
+                batch = self.vectors[start : start + _BATCH_ROWS]
+                distances[start : start + _BATCH_ROWS] = np.sqrt(((batch - q) ** 2).sum(axis=1))
+            unique_files, inverse = np.unique(self.file_ids, return_inverse=True)
+            file_distances = np.full(len(unique_files), -np.inf, dtype=np.float32)
+            np.maximum.at(file_distances, inverse, distances)
+            order = np.argsort(file_distances)[:limit]
+            return [(unique_files[i], float(file_distances[i])) for i in order.tolist()]
+
+    # Persistence
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorStoreIndex"]:
+        """Load an index persisted under `path`, None if there is none."""
+        if not os.path.isdir(path):
+            return None
+        segment_files = sorted(name for name in os.listdir(path) if name.startswith("segment-"))
+        if not segment_files:
+            return None
+        index: Optional[VectorStoreIndex] = None
+        removed: Dict[str, int] = {}
+        removed_path = os.path.join(path, "removed.json")
+        if os.path.exists(removed_path):
+            with open(removed_path) as f:
+                removed = json.load(f)
+        for name in segment_files:
+            segment = int(name[len("segment-") : -len(".npz")])
+            with np.load(os.path.join(path, name), allow_pickle=True) as data:
+                if index is None:
+                    index = cls(path, data["vectors"].shape[1])
+                keep = np.array([removed.get(f, -1) <= segment for f in data["file_ids"]], dtype=bool)
+                index._append(segment, data["ids"][keep], data["file_ids"][keep], data["vectors"][keep])
+            index.next_segment = segment + 1
+        assert index is not None
+        index.segment_count = len(segment_files)
+        index.removed = removed
+        generation_path = os.path.join(path, "generation.json")
+        if os.path.exists(generation_path):
+            with open(generation_path) as f:
+                index.generation = json.load(f)
+        centroids_path = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            index.centroids = np.load(centroids_path)
+        index._consolidate()
+        return index
+
+    def _append(self, segment: int, ids: np.ndarray, file_ids: np.ndarray, vectors: np.ndarray) -> None:
+        self._pending.append((segment, ids, file_ids, vectors))
+        self._pending_count += len(ids)
+
+    def _consolidate(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_count = self._pending, [], 0
+        segments = [np.full(len(ids), segment, dtype=np.int32) for segment, ids, _, _ in pending]
+        vectors = [p[3] for p in pending]
+        self.ids = np.concatenate([self.ids] + [p[1] for p in pending])
+        self.file_ids = np.concatenate([self.file_ids] + [p[2] for p in pending])
+        self.segments = np.concatenate([self.segments] + segments)
+        if self.centroids is not None:
+            assignments = [_nearest_centroids(v, self.centroids) for v in vectors]
+            if len(self.assignments) != len(self.vectors):
+                # Centroids were just loaded, assign everything
+                assignments = [_nearest_centroids(self.vectors, self.centroids)] + assignments
+            else:
+                assignments = [self.assignments] + assignments
+            self.assignments = np.concatenate(assignments)
+        self.vectors = np.concatenate([self.vectors] + vectors)
+
+    def _filter(self, keep: np.ndarray) -> None:
+        self.ids = self.ids[keep]
+        self.file_ids = self.file_ids[keep]
+        self.vectors = self.vectors[keep]
+        self.segments = self.segments[keep]
+        if self.centroids is not None:
+            self.assignments = self.assignments[keep]
+
+    def _write_segment(self, segment: int, ids: np.ndarray, file_ids: np.ndarray, vectors: np.ndarray) -> None:
+        self.segment_count += 1
+        os.makedirs(self.path, exist_ok=True)
+        final_path = os.path.join(self.path, f"segment-{segment:08d}.npz")
+        tmp_path = final_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ids=ids, file_ids=file_ids, vectors=vectors)
+        os.replace(tmp_path, final_path)
+
+    def _write_json(self, name: str, value) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+
+EmbeddingLoader = Callable[[str], Tuple[Optional[int], List[str], List[str], np.ndarray]]
+"""Loads (embeddings_generation, ids, file_ids, vectors) of a vector store from the database.
+
+The generation is None if the embeddings changed while they were loaded.
+"""
+
+
+class VectorIndexRegistry:
+    """Indexes of every vector store, loaded lazily and kept in memory up to `VECTOR_INDEX_MAX_LOADED`."""
+
+    def __init__(self, root: str = VECTOR_INDEX_DIR, enabled: bool = VECTOR_SEARCH_BACKEND == "ivf"):  # noqa: D107
+        self.root = root
+        self.enabled = enabled
+        self._loaded = LruTtlCache(max_entries=VECTOR_INDEX_MAX_LOADED, name="vector_indexes")
+        # Generation at which a vector store was found too small to be indexed, so that it is only counted again
+        # once its embeddings change.
+        self._small = LruTtlCache(max_entries=4096, name="vector_indexes_small")
+        self._building: set = set()
+        # Guards loading indexes from disk against a rebuilt index being swapped in.
+        self._lock = threading.Lock()
+
+    def _path(self, vector_store_id: str) -> str:
+        return os.path.join(self.root, vector_store_id)
+
+    def get(self, vector_store_id: str) -> Optional[VectorStoreIndex]:
+        """Index of a vector store, loaded from disk if needed."""
+        if not self.enabled:
+            return None
+        index = self._loaded.get(vector_store_id)
+        if index is None:
+            with self._lock:
+                index = self._loaded.get(vector_store_id)
+                if index is None:
+                    index = VectorStoreIndex.load(self._path(vector_store_id))
+                    if index is not None:
+                        self._loaded.set(vector_store_id, index)
+        return index
+
+    def get_if_current(
+        self, vector_store_id: str, generation: int, count: Callable[[], int], loader: EmbeddingLoader
+    ) -> Optional[VectorStoreIndex]:
+        """Index of a vector store if it reflects `generation` of its embeddings.
+
+        Otherwise returns None and, for stores with at least `VECTOR_INDEX_MIN_SIZE` embeddings according to
+        `count`, (re)builds the index in the background using `loader`.
+        """
+        if not self.enabled:
+            return None
+        index = self.get(vector_store_id)
+        if index is not None and index.generation == generation:
+            return index
+        if self._small.get(vector_store_id) == generation:
+            return None
+        if count() < VECTOR_INDEX_MIN_SIZE:
+            self._small.set(vector_store_id, generation)
+            return None
+        self.rebuild_in_background(vector_store_id, loader)
+        return None
+
+    def add(
+        self,
+        vector_store_id: str,
+        ids: Sequence[str],
+        file_ids: Sequence[str],
+        vectors: np.ndarray,
+        generation: Optional[int],
+    ) -> None:
+        """Add embeddings to the index of a vector store, if it has one.
+
+        `generation` is the `embeddings_generation` of the vector store after the embeddings were stored. The index
+        is left stale (and rebuilt on the next search) unless it reflects the generation just before.
+        """
+        index = self.get(vector_store_id)
+        if index is None or generation is None:
+            return
+        with index.lock:
+            if not index.retired and index.generation == generation - 1:
+                index.add(ids, file_ids, vectors)
+                index.set_generation(generation)
+
+    def remove_file(self, vector_store_id: str, file_id: str, generation: Optional[int]) -> None:
+        """Remove the embeddings of a file from the index of a vector store, if it has one.
+
+        See `add` for `generation`.
+        """
+        index = self.get(vector_store_id)
+        if index is None or generation is None:
+            return
+        with index.lock:
+            if not index.retired and index.generation == generation - 1:
+                index.remove_file(file_id)
+                index.set_generation(generation)
+
+    def drop(self, vector_store_id: str) -> None:
+        """Delete the index of a vector store."""
+        with self._lock:
+            index = self._loaded.get(vector_store_id)
+            self._loaded.invalidate(vector_store_id)
+            self._small.invalidate(vector_store_id)
+            if index is not None:
+                with index.lock:
+                    index.retired = True
+            shutil.rmtree(self._path(vector_store_id), ignore_errors=True)
+
+    def rebuild_in_background(self, vector_store_id: str, loader: EmbeddingLoader) -> None:  # noqa: D102
+        with self._lock:
+            if vector_store_id in self._building:
+                return
+            self._building.add(vector_store_id)
+        threading.Thread(target=self._rebuild, args=(vector_store_id, loader), daemon=True).start()
+
+    def _rebuild(self, vector_store_id: str, loader: EmbeddingLoader) -> None:
+        try:
+            logger.info(f"Building vector index for vector store {vector_store_id}")
+            generation, ids, file_ids, vectors = loader(vector_store_id)
+            if generation is None:
+                logger.info(f"Embeddings of vector store {vector_store_id} changed while building its vector index")
+                return
+            path = self._path(vector_store_id)
+            tmp_path = path + ".building"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            index = VectorStoreIndex(tmp_path, vectors.shape[1])
+            index.add(ids, file_ids, vectors)  # trains the index, as it is larger than VECTOR_INDEX_MIN_SIZE
+            index.set_generation(generation)
+            # Swap the new index in place of the old one. Holding the lock of the old index waits for mutations in
+            # progress to finish writing to `path`, later ones see it retired and skip it. The new index misses them,
+            # and is rebuilt again as its generation is then behind.
+            with self._lock:
+                old = self._loaded.get(vector_store_id)
+                with old.lock if old is not None else contextlib.nullcontext():
+                    if old is not None:
+                        old.retired = True
+                    shutil.rmtree(path, ignore_errors=True)
+                    os.replace(tmp_path, path)
+                    index.path = path
+                    self._loaded.set(vector_store_id, index)
+            logger.info(f"Built vector index for vector store {vector_store_id} with {len(index)} embeddings")
+        except Exception as e:
+            logger.error(f"Failed to build vector index for vector store {vector_store_id}: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(vector_store_id)
+
+
+def parse_embedding(value) -> np.ndarray:
+    """Decode an embedding read from a `VECTOR` column, either packed float32 bytes or a JSON array."""
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return np.array(json.loads(value), dtype=np.float32)
+        except (UnicodeDecodeError, ValueError):
+            return np.frombuffer(value, dtype=np.float32)
+    if isinstance(value, str):
+        return np.array(json.loads(value), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+vector_indexes = VectorIndexRegistry()
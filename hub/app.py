@@ -20,13 +20,15 @@ logger = logging.getLogger(__name__)
 
 # next round of imports
 
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from nearai.shared.cache import cache_stats
 
 from hub.api.v1.agent_data import agent_data_router
 from hub.api.v1.agent_routes import run_agent_router
+from hub.api.v1.auth import AuthToken
 from hub.api.v1.benchmark import v1_router as benchmark_router
 from hub.api.v1.delegation import v1_router as delegation_router
 from hub.api.v1.evaluation import v1_router as evaluation_router
@@ -35,12 +37,16 @@ from hub.api.v1.files import files_router
 from hub.api.v1.hub_secrets import hub_secrets_router
 from hub.api.v1.jobs import v1_router as job_router
 from hub.api.v1.logs import logs_router
+from hub.api.v1.models import get_pool_stats
+from hub.api.v1.permissions import PermissionVariant, requires_permission
 from hub.api.v1.permissions import v1_router as permission_router
+from hub.api.v1.provider_clients import provider_stats
 from hub.api.v1.registry import v1_router as registry_router
 from hub.api.v1.routes import v1_router
 from hub.api.v1.scheduled_run import scheduled_run_router
 from hub.api.v1.stars import v1_router as stars_router
 from hub.api.v1.thread_routes import threads_router
+from hub.api.v1.usage import usage_stats
 from hub.api.v1.vector_stores import vector_stores_router
 
 # No lifespan function - FastAPI will use default behavior
@@ -81,6 +87,17 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/v1/stats")
+def stats(auth: AuthToken = Depends(requires_permission(PermissionVariant.VIEW_STATS))):
+    """Connection pool, cache, provider client and usage recorder statistics of this hub worker."""
+    return {
+        "db_pool": get_pool_stats(),
+        "caches": cache_stats(),
+        "providers": provider_stats(),
+        "usage": usage_stats(),
+    }
+
+
 @app.exception_handler(TokenValidationError)
 async def token_validation_exception_handler(request: Request, exc: TokenValidationError):
     exc_lines = exc.detail.split("\n")
@@ -0,0 +1,171 @@
+"""Linear-time text chunking on offsets into the original text.
+
+Chunks are returned as `Span`s (start and end offsets) so that callers decide whether and when to copy text. Each
+chunk is found by searching backwards from its size limit for the strongest separator (paragraph, line, sentence,
+word) in the second half of the window, and falls back to a hard cut. Every character is scanned a bounded number of
+times, so the cost is linear in the length of the text, whatever its structure.
+
+Sizes are measured either in true tokens, with a tokenizer that reports the offset of each token, or estimated from
+a number of characters per token.
+"""
+
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+TokenOffsets = Callable[[str], Sequence[int]]
+"""Function returning the offset in the text of the first character of each token, in increasing order."""
+
+
+class Span(NamedTuple):
+    """Chunk of a text, `text[start:end]`."""
+
+    start: int
+    end: int
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(name: str) -> Optional[TokenOffsets]:
+    """Load a Hugging Face tokenizer by name, returns None (and logs) if it is not available.
+
+    Args:
+    ----
+        name (str): Name or path of the tokenizer, e.g. "nomic-ai/nomic-embed-text-v1.5".
+
+    Returns:
+    -------
+        Optional[TokenOffsets]: Function returning the offsets of the tokens of a text.
+
+    """
+    try:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"Failed to load tokenizer {name}, chunk sizes will be estimated: {e}")
+        return None
+
+    def token_offsets(text: str) -> List[int]:
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [start for start, _ in encoding["offset_mapping"]]
+
+    return token_offsets
+
+
+class _CharMeasure:
+    def __init__(self, chars_per_token: int):  # noqa: D107
+        self.chars_per_token = max(chars_per_token, 1)
+
+    def forward(self, text: str, start: int, tokens: int) -> int:
+        return min(start + tokens * self.chars_per_token, len(text))
+
+    def backward(self, end: int, tokens: int) -> int:
+        return max(end - tokens * self.chars_per_token, 0)
+
+
+class _TokenMeasure:
+    def __init__(self, text: str, token_offsets: TokenOffsets):  # noqa: D107
+        self.offsets = token_offsets(text)
+
+    def forward(self, text: str, start: int, tokens: int) -> int:
+        index = bisect_left(self.offsets, start) + tokens
+        return self.offsets[index] if index < len(self.offsets) else len(text)
+
+    def backward(self, end: int, tokens: int) -> int:
+        index = bisect_left(self.offsets, end) - tokens
+        return self.offsets[index] if index > 0 else 0
+
+
+def _find_break(text: str, start: int, limit: int) -> int:
+    lower = start + (limit - start) // 2
+    for separator in SEPARATORS:
+        index = text.rfind(separator, lower, limit)
+        if index != -1:
+            return index + len(separator)
+    return limit
+
+
+def iter_spans(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int = 0,
+    token_offsets: Optional[TokenOffsets] = None,
+    chars_per_token: int = 1,
+) -> Iterator[Span]:
+    """Split text into chunks of at most `chunk_size` tokens, consecutive chunks sharing about `chunk_overlap`.
+
+    Chunks do not start or end with whitespace, and whitespace-only chunks are skipped.
+
+    Args:
+    ----
+        text (str): Input text to split.
+        chunk_size (int): Maximum size of each chunk, in tokens.
+        chunk_overlap (int): Overlap size between chunks, in tokens. Must be smaller than `chunk_size`.
+        token_offsets (TokenOffsets, optional): Tokenizer used to measure sizes, see `load_tokenizer`.
+        chars_per_token (int): Estimate used when no tokenizer is given. Defaults to 1, sizes are then characters.
+
+    Returns:
+    -------
+        Iterator[Span]: Spans of the chunks, in order.
+
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError("chunk_overlap must be non-negative and smaller than chunk_size")
+
+    measure = _TokenMeasure(text, token_offsets) if token_offsets else _CharMeasure(chars_per_token)
+    length = len(text)
+    start = _skip_whitespace(text, 0, length)
+    while start < length:
+        limit = measure.forward(text, start, chunk_size)
+        if limit <= start:
+            limit = start + 1
+        end = length if limit >= length else _find_break(text, start, limit)
+
+        stripped_end = end
+        while stripped_end > start and text[stripped_end - 1].isspace():
+            stripped_end -= 1
+        if stripped_end > start:
+            yield Span(start, stripped_end)
+        if end >= length:
+            return
+
+        next_start = end
+        if chunk_overlap:
+            next_start = measure.backward(end, chunk_overlap)
+            if next_start <= start:
+                next_start = end
+            elif next_start > 0 and not text[next_start - 1].isspace():
+                # Start the overlap on a word boundary when there is one.
+                boundary = _find_whitespace(text, next_start, end)
+                if boundary != -1:
+                    next_start = boundary
+        start = _skip_whitespace(text, next_start, length)
+
+
+def split_spans(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int = 0,
+    token_offsets: Optional[TokenOffsets] = None,
+    chars_per_token: int = 1,
+) -> List[Span]:
+    """List version of `iter_spans`."""
+    return list(iter_spans(text, chunk_size, chunk_overlap, token_offsets, chars_per_token))
+
+
+def _skip_whitespace(text: str, position: int, end: int) -> int:
+    while position < end and text[position].isspace():
+        position += 1
+    return position
+
+
+def _find_whitespace(text: str, start: int, end: int) -> int:
+    found = [index for index in (text.find(" ", start, end), text.find("\n", start, end)) if index != -1]
+    return min(found) if found else -1
@@ -1,17 +1,22 @@
 import asyncio
 import logging
 import os
-import uuid
-from typing import List, Optional
+import shutil
+import tempfile
+import weakref
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
 
 import openai
 from docx import Document
+from nearai.shared.cache import LruTtlCache
 from openpyxl import load_workbook
 from pptx import Presentation
 from pypdf import PdfReader
 
 from hub.api.v1.models import FILE_URI_PREFIX, S3_URI_PREFIX
 from hub.api.v1.sql import SqlClient, VectorStoreFile
+from hub.tasks.chunking import Span, iter_spans, load_tokenizer
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +25,40 @@ CHARS_PER_TOKEN = 4
 TOKEN_LIMIT = 800
 CHUNK_SIZE = TOKEN_LIMIT * CHARS_PER_TOKEN
 CHUNK_OVERLAP = CHUNK_SIZE // 4
+CHUNK_OVERLAP_TOKENS = TOKEN_LIMIT // 4
+CHUNKING_TOKENIZER = os.getenv("CHUNKING_TOKENIZER", "")
+"""Hugging Face tokenizer measuring chunks in true tokens, e.g. "nomic-ai/nomic-embed-text-v1.5".
+
+When empty (or if it fails to load), tokens are estimated with CHARS_PER_TOKEN.
+"""
 
 # File extensions
 OFFICE_EXTENSIONS = [".docx", ".pptx", ".xlsx"]
 
 # Embedding model
 EMBEDDING_MODEL = "nomic-ai/nomic-embed-text-v1.5"
+EMBEDDING_BASE_URL = "https://api.fireworks.ai/inference/v1"
+
+# Embedding requests
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+"""Number of chunks sent in a single multi-input embeddings request."""
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+"""Maximum number of embeddings requests in flight per event loop."""
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 5))
+"""Retries (with exponential backoff) on rate limits and transient errors."""
+
+# Streaming extraction
+EXTRACTION_BUFFER_CHUNKS = int(os.getenv("EXTRACTION_BUFFER_CHUNKS", 8))
+"""Extracted text is split once this many chunks worth of it is buffered, bounding memory for large files."""
+TEXT_READ_SIZE = 1024 * 1024
+S3_DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+
+# Query embeddings are deterministic for a given model, agents tend to repeat the same queries within a run.
+query_embedding_cache = LruTtlCache(
+    max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+    ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 3600)),
+    name="query_embeddings",
+)
 
 """
 Chunking strategy:
@@ -37,6 +70,9 @@ Chunking strategy:
 This strategy creates chunks based on the estimated token limit of the embedding model.
 The overlap ensures smooth transitions and context preservation between chunks.
 These values may need adjustment based on the specific requirements of the embedding model in use.
+
+A `chunking_strategy` (`max_chunk_size_tokens`, `chunk_overlap_tokens`) is measured in tokens, counted with
+CHUNKING_TOKENIZER when set. Chunking itself is done by `hub.tasks.chunking`.
 """
 
 
@@ -91,31 +127,56 @@ async def generate_embeddings_for_file(file_id: str, vector_store_id: str, chunk
         logger.error(f"File with id {file_id} not found")
         raise ValueError(f"File with id {file_id} not found")
 
-    content = await get_file_content(file_details)
-    chunks = create_chunks(content, chunking_strategy)
-    logger.debug(f"Created {len(chunks)} chunks for file: {file_id}")
-
-    embedding_tasks = [generate_embedding(chunk) for chunk in chunks]
-    embeddings = await asyncio.gather(*embedding_tasks)
+    chunk_size, chunk_overlap = get_chunk_sizes(chunking_strategy)
+    embedding_dimensions = 0
 
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-        embedding_id = f"vfe_{uuid.uuid4().hex[:24]}"
+    async def embed_and_store(batch_start: int, batch: List[str]):
+        nonlocal embedding_dimensions
+        embeddings = await generate_embeddings(batch)
+        embedding_dimensions = len(embeddings[0]) if embeddings else embedding_dimensions
+        rows: List[Tuple[int, str, List[float]]] = [
+            (batch_start + i, chunk, embedding) for i, (chunk, embedding) in enumerate(zip(batch, embeddings))
+        ]
         try:
-            sql_client.store_embedding(
-                id=embedding_id,
-                vector_store_id=vector_store_id,
-                file_id=file_id,
-                chunk_index=i,
-                chunk_text=chunk,
-                embedding=embedding,
-            )
+            sql_client.store_embeddings(vector_store_id, file_id, rows)
         except Exception as e:
-            logger.error(f"Failed to store embedding: {embedding_id} for file: {file_id}, error: {e}")
+            logger.error(f"Failed to store embeddings from chunk {batch_start} for file: {file_id}, error: {e}")
+
+    # Chunks are produced while the file is read and embedded as soon as a batch is full. At most
+    # 2 * EMBEDDING_CONCURRENCY batches are pending, so memory does not grow with the size of the file.
+    pending: Set[asyncio.Task] = set()
+
+    async def wait_pending(limit: int):
+        nonlocal pending
+        while len(pending) > limit:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+    num_chunks = 0
+    batch: List[str] = []
+    try:
+        for chunk in iter_chunks(iter_file_content(file_details), chunk_size, chunk_overlap):
+            batch.append(chunk)
+            if len(batch) == EMBEDDING_BATCH_SIZE:
+                pending.add(asyncio.create_task(embed_and_store(num_chunks, batch)))
+                num_chunks += len(batch)
+                batch = []
+                await asyncio.sleep(0)  # let the request start while extraction continues
+                await wait_pending(2 * EMBEDDING_CONCURRENCY - 1)
+        if batch:
+            pending.add(asyncio.create_task(embed_and_store(num_chunks, batch)))
+            num_chunks += len(batch)
+        await wait_pending(0)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    logger.debug(f"Created {num_chunks} chunks for file: {file_id}")
 
     sql_client.update_file_embedding_status(file_id, "completed")
 
-    if embeddings:
-        embedding_dimensions = len(embeddings[0])
+    if embedding_dimensions:
         sql_client.update_vector_store_embedding_info(vector_store_id, EMBEDDING_MODEL, embedding_dimensions)
 
     logger.info(f"Finished embedding generation for file: {file_id}")
@@ -134,20 +195,80 @@ def create_chunks(text: str, chunking_strategy=None) -> List[str]:
         List[str]: A list of text chunks.
 
     """
-    chunk_size = CHUNK_SIZE
-    chunk_overlap = CHUNK_OVERLAP
-    if chunking_strategy:
-        chunk_size = chunking_strategy.get("max_chunk_size_tokens", CHUNK_SIZE)
-        chunk_overlap = chunking_strategy.get("chunk_overlap_tokens", CHUNK_OVERLAP)
-
-    chunks = recursive_split(text, chunk_size, chunk_overlap)
+    chunk_size, chunk_overlap = get_chunk_sizes(chunking_strategy)
+    chunks = [text[start:end] for start, end in _iter_spans(text, chunk_size, chunk_overlap)]
     logger.debug(f"Created {len(chunks)} chunks, sizes: {[len(chunk) for chunk in chunks]}")
     return chunks
 
 
+def get_chunk_sizes(chunking_strategy=None) -> Tuple[int, int]:
+    """Chunk size and overlap in tokens, from a chunking strategy or TOKEN_LIMIT and CHUNK_OVERLAP_TOKENS.
+
+    Accepts both the OpenAI format (`{"type": "static", "static": {...}}`) and a flat dictionary.
+    """
+    if chunking_strategy and isinstance(chunking_strategy.get("static"), dict):
+        chunking_strategy = chunking_strategy["static"]
+    if not chunking_strategy:
+        return TOKEN_LIMIT, CHUNK_OVERLAP_TOKENS
+    chunk_size = chunking_strategy.get("max_chunk_size_tokens") or TOKEN_LIMIT
+    chunk_overlap = chunking_strategy.get("chunk_overlap_tokens")
+    if chunk_overlap is None:
+        chunk_overlap = chunk_size // 4
+    return chunk_size, min(chunk_overlap, chunk_size // 2)
+
+
+def _iter_spans(text: str, chunk_size: int, chunk_overlap: int) -> Iterator[Span]:
+    token_offsets = load_tokenizer(CHUNKING_TOKENIZER) if CHUNKING_TOKENIZER else None
+    return iter_spans(text, chunk_size, chunk_overlap, token_offsets=token_offsets, chars_per_token=CHARS_PER_TOKEN)
+
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """Split a stream of text pieces into chunks without materializing the whole text.
+
+    Pieces are concatenated in a buffer. Once it holds EXTRACTION_BUFFER_CHUNKS chunks worth of text, it is split
+    and all chunks but the last one are yielded; the text from the start of the last one is carried over and grows
+    with the next pieces. This produces the same chunks as splitting the whole text at once.
+
+    Args:
+    ----
+        pieces (Iterable[str]): Consecutive pieces of the text, e.g. from `iter_content`.
+        chunk_size (int): Maximum size of each chunk, in tokens.
+        chunk_overlap (int): Overlap size between chunks, in tokens.
+
+    Returns:
+    -------
+        Iterator[str]: Text chunks, in order.
+
+    """
+    window = chunk_size * CHARS_PER_TOKEN * EXTRACTION_BUFFER_CHUNKS
+    threshold = window
+    buffer: List[str] = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered < threshold:
+            continue
+        text = "".join(buffer)
+        spans = list(_iter_spans(text, chunk_size, chunk_overlap))
+        if len(spans) > 1:
+            for start, end in spans[:-1]:
+                yield text[start:end]
+            text = text[spans[-1].start :]
+        buffer = [text]
+        buffered = len(text)
+        # Chunks can be longer than estimated (true tokens), wait for a full window of new text.
+        threshold = buffered + window
+    text = "".join(buffer)
+    for start, end in _iter_spans(text, chunk_size, chunk_overlap):
+        yield text[start:end]
+
+
 def recursive_split(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
     """Recursively split text into chunks of specified size with overlap.
 
+    Superseded by `hub.tasks.chunking.iter_spans`, which runs in linear time.
+
     This function attempts to split the text using various separators, starting with
     paragraph breaks and moving to smaller separators if needed. It ensures that
     chunks do not exceed the specified size and maintains the required overlap.
@@ -201,6 +322,46 @@ def recursive_split(text: str, chunk_size: int, chunk_overlap: int) -> List[str]
     return [text[:chunk_size]]
 
 
+# Clients and concurrency limits are bound to an event loop, keep one set per loop.
+_embedding_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _get_embedding_client() -> Tuple[openai.AsyncOpenAI, asyncio.Semaphore]:
+    """Shared embeddings client (with its connection pool) and request semaphore for the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _embedding_clients:
+        client = openai.AsyncOpenAI(
+            base_url=EMBEDDING_BASE_URL,
+            api_key=os.getenv("FIREWORKS_API_KEY"),
+            max_retries=EMBEDDING_MAX_RETRIES,
+        )
+        _embedding_clients[loop] = (client, asyncio.Semaphore(EMBEDDING_CONCURRENCY))
+    return _embedding_clients[loop]
+
+
+async def generate_embeddings(texts: List[str], query: bool = False) -> List[List[float]]:
+    """Generate embeddings for several texts in a single request using the Nomic AI model.
+
+    Args:
+    ----
+        texts (List[str]): The texts to generate embeddings for.
+        query (bool, optional): If True, the texts are treated as search queries.
+            If False, they are treated as documents. Defaults to False.
+
+    Returns:
+    -------
+        List[List[float]]: The embedding vectors, in the same order as `texts`.
+
+    """
+    if not texts:
+        return []
+    client, semaphore = _get_embedding_client()
+    prefix = "search_query: " if query else "search_document: "
+    async with semaphore:
+        response = await client.embeddings.create(input=[prefix + text for text in texts], model=EMBEDDING_MODEL)
+    return [data.embedding for data in sorted(response.data, key=lambda data: data.index)]
+
+
 async def generate_embedding(text: str, query: bool = False):
     """Generate an embedding for the given text using the Nomic AI model.
 
@@ -215,42 +376,36 @@ async def generate_embedding(text: str, query: bool = False):
         list: The embedding vector for the input text.
 
     """
-    client = openai.AsyncOpenAI(
-        base_url="https://api.fireworks.ai/inference/v1", api_key=os.getenv("FIREWORKS_API_KEY")
-    )
-    prefix = "search_query: " if query else "search_document: "
-    response = await client.embeddings.create(input=prefix + text, model=EMBEDDING_MODEL)
-    return response.data[0].embedding
+    if not query:
+        return (await generate_embeddings([text]))[0]
 
+    key = (EMBEDDING_MODEL, " ".join(text.split()))
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = (await generate_embeddings([text], query=True))[0]
+        query_embedding_cache.set(key, embedding)
+    return embedding
 
-async def get_file_content(file_details: VectorStoreFile) -> str:
-    """Retrieve the content of a file based on its URI.
 
-    This function supports both local file system and S3 storage. For S3 files,
-    it downloads the file to a temporary location before extracting the content.
+@contextmanager
+def local_file_path(file_details: VectorStoreFile) -> Iterator[str]:
+    """Path to a local copy of the file, for the duration of the context.
+
+    Local files are used in place. S3 objects are streamed to a temporary file in parts, so the file is never
+    held in memory, and the temporary file is removed when the context exits.
 
     Args:
     ----
-        file_details (VectorStoreFile): Details of the file, including its URI and encoding.
-
-    Returns:
-    -------
-        str: The content of the file.
+        file_details (VectorStoreFile): Details of the file, including its URI.
 
     Raises:
     ------
         ValueError: If the file URI is not supported.
 
     """
-    logger.info(f"Getting content for file: {file_details.file_uri}")
-    encoding = file_details.encoding or "utf-8"
-
     if file_details.file_uri.startswith(FILE_URI_PREFIX):
-        file_path = file_details.file_uri[len(FILE_URI_PREFIX) :]
-        logger.debug(f"Extracting content from local file: {file_path}")
-        return extract_content(file_path, encoding)
+        yield file_details.file_uri[len(FILE_URI_PREFIX) :]
     elif file_details.file_uri.startswith(S3_URI_PREFIX):
-        logger.debug(f"Extracting content from S3 file: {file_details.file_uri}")
         import boto3
 
         s3_client = boto3.client("s3")
@@ -259,20 +414,65 @@ async def get_file_content(file_details: VectorStoreFile) -> str:
             logger.error(f"Invalid S3 URI format: {file_details.file_uri}")
             raise ValueError(f"Invalid S3 URI format: {file_details.file_uri}")
         bucket_name, key = parts
-        response = s3_client.get_object(Bucket=bucket_name, Key=key)
-        temp_file_path = f"/tmp/tempfile_{uuid.uuid4().hex}_{file_details.filename}"
-        with open(temp_file_path, "wb") as f:
-            f.write(response["Body"].read())
-        logger.debug(f"Downloaded S3 file to temporary path: {temp_file_path}")
-        content = extract_content(temp_file_path, encoding)
-        os.remove(temp_file_path)
-        logger.debug(f"Removed temporary file: {temp_file_path}")
-        return content
+        # Keep the original name as suffix, the extractor is selected by extension.
+        fd, temp_file_path = tempfile.mkstemp(prefix="tempfile_", suffix=f"_{os.path.basename(file_details.filename)}")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                response = s3_client.get_object(Bucket=bucket_name, Key=key)
+                shutil.copyfileobj(response["Body"], f, S3_DOWNLOAD_PART_SIZE)
+            logger.debug(f"Downloaded S3 file to temporary path: {temp_file_path}")
+            yield temp_file_path
+        finally:
+            os.remove(temp_file_path)
+            logger.debug(f"Removed temporary file: {temp_file_path}")
     else:
         logger.error(f"Unsupported file URI: {file_details.file_uri}")
         raise ValueError(f"Unsupported file URI: {file_details.file_uri}")
 
 
+def iter_file_content(file_details: VectorStoreFile) -> Iterator[str]:
+    """Stream the content of a file based on its URI, see `iter_content`.
+
+    Supports both local file system and S3 storage. Temporary files are removed once the iterator is exhausted
+    or closed.
+
+    Args:
+    ----
+        file_details (VectorStoreFile): Details of the file, including its URI and encoding.
+
+    Returns:
+    -------
+        Iterator[str]: Consecutive pieces of the content of the file.
+
+    """
+    logger.info(f"Getting content for file: {file_details.file_uri}")
+    with local_file_path(file_details) as file_path:
+        yield from iter_content(file_path, file_details.encoding or "utf-8")
+
+
+async def get_file_content(file_details: VectorStoreFile) -> str:
+    """Retrieve the content of a file based on its URI.
+
+    This function supports both local file system and S3 storage. For S3 files,
+    it downloads the file to a temporary location before extracting the content.
+    Prefer `iter_file_content` for large files.
+
+    Args:
+    ----
+        file_details (VectorStoreFile): Details of the file, including its URI and encoding.
+
+    Returns:
+    -------
+        str: The content of the file.
+
+    Raises:
+    ------
+        ValueError: If the file URI is not supported.
+
+    """
+    return "".join(iter_file_content(file_details))
+
+
 def extract_content(file_path: str, encoding: str = "utf-8") -> str:
     """Extract content from various file types.
 
@@ -289,74 +489,118 @@ def extract_content(file_path: str, encoding: str = "utf-8") -> str:
     -------
         str: The extracted content of the file.
 
+    """
+    return "".join(iter_content(file_path, encoding))
+
+
+def iter_content(file_path: str, encoding: str = "utf-8") -> Iterator[str]:
+    """Extract content from various file types, one page, paragraph, shape, row or text block at a time.
+
+    Concatenating the pieces gives the same text as `extract_content`.
+
+    Args:
+    ----
+        file_path (str): Path to the file.
+        encoding (str, optional): Encoding for text files. Defaults to "utf-8".
+
+    Returns:
+    -------
+        Iterator[str]: Consecutive pieces of the extracted content.
+
     """
     logger.debug(f"Extracting content from file: {file_path}")
     _, file_extension = os.path.splitext(file_path.lower())
 
     if file_extension == ".pdf":
         logger.debug("Detected PDF file, using PDF extraction method")
-        return extract_pdf_content(file_path)
+        pieces = iter_pdf_content(file_path)
     elif file_extension == ".docx":
         logger.debug("Detected DOCX file, using python-docx extraction method")
-        return extract_docx_content(file_path)
+        pieces = iter_docx_content(file_path)
     elif file_extension == ".pptx":
         logger.debug("Detected PPTX file, using python-pptx extraction method")
-        return extract_pptx_content(file_path)
+        pieces = iter_pptx_content(file_path)
     elif file_extension == ".xlsx":
         logger.debug("Detected XLSX file, using openpyxl extraction method")
-        return extract_xlsx_content(file_path)
+        pieces = iter_xlsx_content(file_path)
     else:
         logger.debug("Detected text file, using standard text extraction method")
-        return extract_text_file(file_path, encoding)
+        return iter_text_file(file_path, encoding)
+    return _join_lines(pieces)
+
+
+def _join_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Streaming equivalent of joining `lines` with newlines."""
+    for i, line in enumerate(lines):
+        yield ("\n" + line) if i else line
 
 
 def extract_text_file(file_path: str, encoding: str) -> str:
+    return "".join(iter_text_file(file_path, encoding))
+
+
+def iter_text_file(file_path: str, encoding: str) -> Iterator[str]:
     logger.debug(f"Extracting content from text file: {file_path}")
     try:
         with open(file_path, "r", encoding=encoding) as file:
-            content = file.read()
+            while block := file.read(TEXT_READ_SIZE):
+                yield block
         logger.debug(f"Successfully extracted content from text file: {file_path}")
-        return content
     except UnicodeDecodeError:
         logger.error(f"Unable to decode {file_path} with encoding {encoding}")
-        return f"Error: Unable to decode {file_path}"
+        yield f"Error: Unable to decode {file_path}"
 
 
 def extract_pdf_content(file_path: str) -> str:
+    return "\n".join(iter_pdf_content(file_path))
+
+
+def iter_pdf_content(file_path: str) -> Iterator[str]:
     logger.debug(f"Extracting content from PDF file: {file_path}")
     with open(file_path, "rb") as file:
         reader = PdfReader(file)
-        content = "\n".join(page.extract_text() for page in reader.pages)
+        for page in reader.pages:
+            yield page.extract_text()
     logger.debug(f"Successfully extracted content from PDF file: {file_path}")
-    return content
 
 
 def extract_docx_content(file_path: str) -> str:
+    return "\n".join(iter_docx_content(file_path))
+
+
+def iter_docx_content(file_path: str) -> Iterator[str]:
     logger.debug(f"Extracting content from DOCX file: {file_path}")
     doc = Document(file_path)
-    content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+    for paragraph in doc.paragraphs:
+        yield paragraph.text
     logger.debug(f"Successfully extracted content from DOCX file: {file_path}")
-    return content
 
 
 def extract_pptx_content(file_path: str) -> str:
+    return "\n".join(iter_pptx_content(file_path))
+
+
+def iter_pptx_content(file_path: str) -> Iterator[str]:
     logger.debug(f"Extracting content from PPTX file: {file_path}")
     prs = Presentation(file_path)
-    content = []
     for slide in prs.slides:
         for shape in slide.shapes:
             if hasattr(shape, "text"):
-                content.append(shape.text)
+                yield shape.text
     logger.debug(f"Successfully extracted content from PPTX file: {file_path}")
-    return "\n".join(content)
 
 
 def extract_xlsx_content(file_path: str) -> str:
+    return "\n".join(iter_xlsx_content(file_path))
+
+
+def iter_xlsx_content(file_path: str) -> Iterator[str]:
     logger.debug(f"Extracting content from XLSX file: {file_path}")
     wb = load_workbook(file_path, read_only=True)
-    content = []
-    for sheet in wb.worksheets:
-        for row in sheet.iter_rows(values_only=True):
-            content.append("\t".join(str(cell) for cell in row if cell is not None))
+    try:
+        for sheet in wb.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield "\t".join(str(cell) for cell in row if cell is not None)
+    finally:
+        wb.close()  # read-only workbooks keep the file open
     logger.debug(f"Successfully extracted content from XLSX file: {file_path}")
-    return "\n".join(content)
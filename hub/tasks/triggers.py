@@ -1,36 +1,103 @@
-from typing import List
+"""Agents subscribed to events, from an in-memory snapshot of the `registry_triggers` index.
 
-from hub.api.v1.registry import EntryInformation, list_entries_inner
+The index is maintained by `hub.api.v1.registry_summary` when agents are uploaded, updated or hidden, and its version
+is incremented on every change. Lookups read the snapshot; at most every `TRIGGER_INDEX_CHECK_INTERVAL` seconds the
+version is compared with the one of the snapshot, and the snapshot is reloaded only if it changed.
+"""
 
+import logging
+import threading
+import time
+from collections import defaultdict
+from os import getenv
+from typing import Dict, List, Optional, Tuple
 
-def _query_agent_triggers(trigger_clause) -> List[EntryInformation]:
-    res = list_entries_inner(
-        category="agent",
-        custom_where=trigger_clause,
-        show_hidden=False,
-        show_latest_version=True,
-    )
-    return res
+from dotenv import load_dotenv
+from sqlmodel import col, select
 
+from hub.api.v1.models import RegistryEntry, RegistryTrigger, get_session
+from hub.api.v1.registry_summary import TRIGGER_INDEX, get_index_version
 
-def agents_with_event_triggers() -> List[EntryInformation]:
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_INDEX_CHECK_INTERVAL = float(getenv("TRIGGER_INDEX_CHECK_INTERVAL", 5))
+"""Seconds between two checks of the version of the trigger index."""
+
+
+class TriggerIndex:
+    """Snapshot of the agent versions subscribed to each event type."""
+
+    def __init__(self, check_interval: float = TRIGGER_INDEX_CHECK_INTERVAL):  # noqa: D107
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self.reloads = 0
+        self._entries: Dict[str, Tuple[RegistryEntry, ...]] = {}
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def agents(self, event_type: str) -> List[RegistryEntry]:
+        """Latest visible versions of the agents subscribed to `event_type`, most recent first."""
+        self._check()
+        return list(self._entries.get(event_type, ()))
+
+    def event_types(self) -> List[str]:  # noqa: D102
+        self._check()
+        return list(self._entries)
+
+    def invalidate(self) -> None:
+        """Check the version of the index on the next lookup."""
+        self._checked_at = float("-inf")
+
+    def _check(self) -> None:
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            with get_session() as session:
+                version = get_index_version(session, TRIGGER_INDEX)
+                if version != self.version:
+                    self._entries = self._load(session)
+                    self.version = version
+                    self.reloads += 1
+                    logger.info(f"Loaded trigger index version {version}: {sorted(self._entries)}")
+            self._checked_at = time.monotonic()
+
+    def _load(self, session) -> Dict[str, Tuple[RegistryEntry, ...]]:
+        rows = session.exec(
+            select(RegistryTrigger.event_type, RegistryEntry)
+            .join(RegistryEntry, col(RegistryEntry.id) == RegistryTrigger.registry_id)
+            .order_by(col(RegistryEntry.id).desc())
+        ).all()
+        entries: Dict[str, List[RegistryEntry]] = defaultdict(list)
+        for event_type, entry in rows:
+            entries[event_type].append(entry)
+        return {event_type: tuple(agents) for event_type, agents in entries.items()}
+
+
+trigger_index = TriggerIndex()
+
+
+def _agents_with_triggers(event_types: List[str]) -> List[RegistryEntry]:
+    agents: Dict[int, RegistryEntry] = {}
+    for event_type in event_types:
+        for agent in trigger_index.agents(event_type):
+            agents.setdefault(agent.id, agent)
+    return sorted(agents.values(), key=lambda agent: agent.id, reverse=True)
+
+
+def agents_with_event_triggers() -> List[RegistryEntry]:
     """Returns latest version of agents that track events."""
-    trigger_clause = "details::triggers::events IS NOT NULL"
-    return _query_agent_triggers(trigger_clause)
+    return _agents_with_triggers([event_type for event_type in trigger_index.event_types() if event_type != "webhook"])
 
 
-def agents_with_webhook_triggers() -> List[EntryInformation]:
+def agents_with_webhook_triggers() -> List[RegistryEntry]:
     """Returns latest version of agents that are triggered by webhooks."""
-    trigger_clause = "details::triggers::webhook IS NOT NULL"
-    return _query_agent_triggers(trigger_clause)
+    return trigger_index.agents("webhook")
 
 
-def agents_with_x_accounts_to_track() -> List[EntryInformation]:
+def agents_with_x_accounts_to_track() -> List[RegistryEntry]:
     """Returns latest version of agents that track x_accounts."""
-    res = list_entries_inner(
-        category="agent",
-        custom_where="details::triggers::events::x_mentions IS NOT NULL",
-        show_hidden=False,
-        show_latest_version=True,
-    )
-    return res
+    return trigger_index.agents("x_mentions")
@@ -6,7 +6,7 @@ from typing import Dict, List
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from hub.api.v1.registry import EntryInformation
+from hub.api.v1.models import RegistryEntry
 from hub.tasks.near_events import run_agent
 from hub.tasks.triggers import agents_with_x_accounts_to_track
 from hub.tasks.twitter_client import get_latest_mentions
@@ -25,12 +25,12 @@ def get_user_last_tweet_filename(user_name=""):
     return TWEET_STATUS_FILE.replace(".txt", f"_{user_name}.txt")
 
 
-X_ACCOUNTS_BEING_TRACKED: Dict[str, List[EntryInformation]] = {}
+X_ACCOUNTS_BEING_TRACKED: Dict[str, List[RegistryEntry]] = {}
 x_accounts_lock = threading.Lock()  # synchronize access to X_ACCOUNTS_BEING_TRACKED in case scheduled tasks overlap
 
 
-def load_x_accounts_to_track() -> Dict[str, List[EntryInformation]]:
-    x_accounts_to_track: Dict[str, List[EntryInformation]] = {}
+def load_x_accounts_to_track() -> Dict[str, List[RegistryEntry]]:
+    x_accounts_to_track: Dict[str, List[RegistryEntry]] = {}
     registry_items_with_x_accounts_to_track = agents_with_x_accounts_to_track()
     for registry_item in registry_items_with_x_accounts_to_track:
         x_accounts_to_add = registry_item.details.get("triggers", {}).get("events", {}).get("x_mentions", [])
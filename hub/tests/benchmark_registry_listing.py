@@ -0,0 +1,59 @@
+"""Benchmark of registry listings aggregated on every call against listings from `registry_entry_summary`.
+
+Seeds 100k registry entries (25k entries with 4 versions each on average) in a SQLite database, with stars, forks and
+tags. Run from the repository root with `python -m hub.tests.benchmark_registry_listing [num_entries]`.
+"""
+
+import sys
+import time
+from typing import Any, Dict
+
+from sqlmodel import Session
+
+from hub.api.v1.registry import list_entries_query
+from hub.api.v1.registry_summary import rebuild_entry_summaries, refresh_entry_summary
+from hub.tests.test_registry_summary import create_sqlite_engine, seed_registry
+
+QUERIES: Dict[str, Dict[str, Any]] = {
+    "first page": {},
+    "page 20": {"offset": 20 * 32},
+    "category": {"category": "evaluation", "total": 10000},
+    "namespace": {"namespace": "user7.near"},
+    "tag": {"tags": "tag7"},
+    "starred by": {"starred_by": "fan1.near", "star_point_of_view": "fan1.near"},
+}
+
+
+def timed(function, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(num_entries: int = 100_000):
+    engine = create_sqlite_engine()
+    with Session(engine) as session:
+        start = time.perf_counter()
+        seed_registry(session, num_names=num_entries // 4, versions=4)
+        print(f"seeded {num_entries} entries in {time.perf_counter() - start:.1f}s")
+        rebuild_time = timed(lambda: rebuild_entry_summaries(session), repeat=1)
+        print(f"rebuild_entry_summaries {rebuild_time:.2f}s")
+        refresh_time = timed(lambda: refresh_entry_summary(session, "user7.near", "entry-7"), repeat=20)
+        print(f"refresh_entry_summary {1000 * refresh_time:.2f}ms")
+
+        for name, kwargs in QUERIES.items():
+            results = {}
+            for use_summary in (False, True):
+                query = list_entries_query(use_summary=use_summary, **kwargs)
+                results[use_summary] = timed(lambda: session.exec(query).all())  # type: ignore # noqa: B023
+            print(
+                f"{name:>12}: aggregated {1000 * results[False]:8.1f}ms, "
+                f"summary {1000 * results[True]:6.1f}ms, speedup {results[False] / results[True]:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
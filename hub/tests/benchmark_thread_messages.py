@@ -0,0 +1,78 @@
+"""Benchmark of thread message pages paginated on `created_at` against keyset pages on `(thread_id, seq)`.
+
+Seeds a thread with 100k messages and a subthread in a SQLite database, with the former `ix_messages_thread_id` index
+next to the new ones. Run from the repository root with `python -m hub.tests.benchmark_thread_messages [num_messages]`.
+"""
+
+import sys
+import time
+from typing import Dict, List, Literal, Optional
+
+from sqlalchemy import Index
+from sqlmodel import Session, asc, desc, select
+
+from hub.api.v1.models import Message, Thread
+from hub.api.v1.thread_routes import list_messages_query
+from hub.tests.test_thread_pagination import create_thread_engine, seed_thread
+
+
+def timed(function, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def created_at_page(
+    session: Session, thread_id: str, after: Optional[str], order: Literal["asc", "desc"], limit: int = 20
+):
+    """A page as listed before `seq`: child threads in a separate query, cursors compared on `created_at`."""
+    child_threads = session.exec(select(Thread.id).where(Thread.parent_id == thread_id)).all()
+    statement = select(Message).where(Message.thread_id.in_([thread_id] + list(child_threads)))  # type: ignore
+    if after:
+        after_message = session.get(Message, after)
+        if after_message:
+            statement = statement.where(Message.created_at > after_message.created_at)
+    statement = statement.order_by(asc(Message.created_at) if order == "asc" else desc(Message.created_at))
+    return session.exec(statement.limit(limit)).all()
+
+
+def seq_page(session: Session, thread_id: str, after: Optional[str], order: Literal["asc", "desc"], limit: int = 20):
+    """A page as listed by `list_messages`."""
+    thread_ids: List[str] = [thread_id]
+    thread_ids += session.exec(select(Thread.id).where(Thread.parent_id == thread_id)).all()
+    after_seq = session.exec(select(Message.seq).where(Message.id == after)).first() if after else None
+    return session.exec(list_messages_query(thread_ids, after_seq=after_seq, order=order, limit=limit)).all()
+
+
+def main(num_messages: int = 100_000):
+    engine = create_thread_engine()
+    Index("ix_messages_thread_id", Message.thread_id).create(engine)  # type: ignore
+    with Session(engine) as session:
+        start = time.perf_counter()
+        seed_thread(session, "thread_big", num_messages)
+        seed_thread(session, "thread_sub", 100, parent_id="thread_big")
+        seed_thread(session, "thread_other", num_messages // 10)
+        print(f"seeded {num_messages} messages in {time.perf_counter() - start:.1f}s")
+
+        pages: Dict[str, Dict[str, Optional[str]]] = {
+            "newest": {"thread_id": "thread_big", "after": None, "order": "desc"},
+            "oldest": {"thread_id": "thread_big", "after": None, "order": "asc"},
+            "after middle": {"thread_id": "thread_big", "after": f"msg_thread_big_{num_messages // 2}", "order": "asc"},
+            "after last": {"thread_id": "thread_big", "after": f"msg_thread_big_{num_messages - 20}", "order": "asc"},
+            "no children": {"thread_id": "thread_other", "after": None, "order": "desc"},
+        }
+        for name, kwargs in pages.items():
+            results = {}
+            for page in (created_at_page, seq_page):
+                results[page] = timed(lambda: page(session, **kwargs))  # type: ignore # noqa: B023
+            print(
+                f"{name:>12}: created_at {1000 * results[created_at_page]:8.1f}ms, "
+                f"seq {1000 * results[seq_page]:6.2f}ms, speedup {results[created_at_page] / results[seq_page]:7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,56 @@
+"""Micro-benchmark of `recursive_split` against `hub.tasks.chunking.split_spans` on 10 MB inputs.
+
+Run from the repository root with `python -m hub.tests.tasks.benchmark_chunking [size_mb]`.
+"""
+
+import random
+import sys
+import time
+
+from hub.tasks.chunking import split_spans
+from hub.tasks.embedding_generation import CHARS_PER_TOKEN, CHUNK_OVERLAP, CHUNK_SIZE, recursive_split
+
+
+def make_inputs(size: int):
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10))) for _ in range(5000)
+    ]
+    sentence = []
+    length = 0
+    while length < size:
+        sentence.append(rng.choice(words))
+        length += len(sentence[-1]) + 1
+    single_paragraph = ". ".join(" ".join(sentence[i : i + 15]) for i in range(0, len(sentence), 15))[:size]
+    paragraphs = single_paragraph.replace(". ", ".\n\n", size // 2000)
+    return {
+        "paragraphs": paragraphs,
+        "single paragraph": single_paragraph,
+        "no whitespace": single_paragraph.replace(" ", "").ljust(size, "x"),
+    }
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main(size_mb: float = 10):
+    size = int(size_mb * 1024 * 1024)
+    print(f"chunk_size={CHUNK_SIZE} chars, chunk_overlap={CHUNK_OVERLAP} chars, input={size_mb} MB")
+    for name, text in make_inputs(size).items():
+        old_time, old_chunks = timed(lambda: recursive_split(text, CHUNK_SIZE, CHUNK_OVERLAP))  # noqa: B023
+        new_time, spans = timed(
+            lambda: split_spans(  # noqa: B023
+                text, CHUNK_SIZE // CHARS_PER_TOKEN, CHUNK_OVERLAP // CHARS_PER_TOKEN, chars_per_token=CHARS_PER_TOKEN
+            )
+        )
+        print(
+            f"{name:>18}: recursive_split {old_time:7.2f}s ({len(old_chunks)} chunks), "
+            f"split_spans {new_time:7.2f}s ({len(spans)} chunks), speedup {old_time / new_time:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,50 @@
+import re
+import unittest
+
+from hub.tasks.chunking import iter_spans, split_spans
+
+
+def whitespace_tokens(text):
+    return [match.start() for match in re.finditer(r"\S+", text)]
+
+
+class TestChunking(unittest.TestCase):
+    def test_spans_cover_text_with_overlap(self):  # noqa: D102
+        text = " ".join(f"word{i}" for i in range(5000)) + ".\n\nNext paragraph."
+        spans = split_spans(text, chunk_size=200, chunk_overlap=50)
+        self.assertEqual(spans[0].start, 0)
+        self.assertEqual(spans[-1].end, len(text))
+        for previous, span in zip(spans, spans[1:]):
+            self.assertLessEqual(span.end - span.start, 200)
+            self.assertLess(previous.start, span.start)
+            self.assertLess(span.start, previous.end)  # overlapping
+            self.assertFalse(text[span.start].isspace() or text[span.end - 1].isspace())
+            self.assertTrue(text[span.start - 1].isspace())  # starts on a word boundary
+
+    def test_prefers_strongest_separator(self):  # noqa: D102
+        text = "a" * 60 + ". " + "b" * 20 + "\n\n" + "c" * 60
+        chunks = [text[start:end] for start, end in iter_spans(text, chunk_size=100)]
+        self.assertEqual(chunks, ["a" * 60 + ". " + "b" * 20, "c" * 60])
+
+    def test_hard_cut_without_separators(self):  # noqa: D102
+        text = "x" * 1000
+        spans = split_spans(text, chunk_size=300, chunk_overlap=100)
+        self.assertEqual([(s.start, s.end) for s in spans], [(0, 300), (200, 500), (400, 700), (600, 900), (800, 1000)])
+
+    def test_token_sizes(self):  # noqa: D102
+        text = " ".join("token" + "x" * (i % 9) for i in range(1000))
+        spans = split_spans(text, chunk_size=64, chunk_overlap=16, token_offsets=whitespace_tokens)
+        self.assertGreater(len(spans), 1)
+        for span in spans:
+            self.assertLessEqual(len(text[span.start : span.end].split()), 64)
+        self.assertGreaterEqual(len(text[spans[0].start : spans[0].end].split()), 32)
+
+    def test_invalid_sizes(self):  # noqa: D102
+        with self.assertRaises(ValueError):
+            split_spans("text", chunk_size=0)
+        with self.assertRaises(ValueError):
+            split_spans("text", chunk_size=10, chunk_overlap=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from hub.tasks import embedding_generation
+from hub.tasks.embedding_generation import CHARS_PER_TOKEN, create_chunks, extract_content, iter_chunks, iter_content
+
+
+class TestStreamingExtraction(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.text = "".join(f"Sentence number {i}. " + ("\n\n" if i % 7 == 0 else "") for i in range(20000))
+
+    def test_iter_content_text_file(self):  # noqa: D102
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write(self.text)
+        try:
+            pieces = list(iter_content(f.name))
+            self.assertGreater(len(pieces), 0)
+            self.assertEqual("".join(pieces), self.text)
+            self.assertEqual(extract_content(f.name), self.text)
+        finally:
+            os.remove(f.name)
+
+    def test_iter_chunks_is_bounded(self):  # noqa: D102
+        chunk_size, chunk_overlap = 100, 25
+        pieces = [self.text[i : i + 100] for i in range(0, len(self.text), 100)]
+        consumed = 0
+
+        def counting_pieces():
+            nonlocal consumed
+            for piece in pieces:
+                consumed += 1
+                yield piece
+
+        chunks = iter_chunks(counting_pieces(), chunk_size, chunk_overlap)
+        first = next(chunks)
+        # The first chunk is available after reading about one buffer, not the whole text.
+        window = chunk_size * CHARS_PER_TOKEN * embedding_generation.EXTRACTION_BUFFER_CHUNKS
+        self.assertLess(consumed * 100, 2 * window)
+        rest = list(chunks)
+        self.assertEqual(consumed, len(pieces))
+        self.assertTrue(all(0 < len(chunk) <= chunk_size * CHARS_PER_TOKEN for chunk in [first] + rest))
+        self.assertIn("Sentence number 19999.", rest[-1])
+        # Streaming does not change the chunks.
+        self.assertEqual([first] + rest, create_chunks(self.text, {"static": {"max_chunk_size_tokens": 100}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from sqlmodel import Session, select
+
+from hub.api.v1.models import RegistryEntry, RegistryTrigger, Stars
+from hub.api.v1.registry_summary import TRIGGER_INDEX, get_index_version, refresh_entry_summary
+from hub.tasks.triggers import TriggerIndex
+from hub.tests.test_registry_summary import create_sqlite_engine
+
+X_AGENT_DETAILS = {"triggers": {"events": {"x_mentions": ["@near_ai"]}}}
+
+
+class TestTriggerIndex(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.engine = create_sqlite_engine()
+        self.session = Session(self.engine)
+        self.sessions_opened = 0
+
+        @contextmanager
+        def get_session():
+            self.sessions_opened += 1
+            with Session(self.engine) as session:
+                yield session
+
+        patcher = patch("hub.tasks.triggers.get_session", get_session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.session.close)
+
+    def upload(self, name: str, details: dict, category: str = "agent", show_entry: bool = True) -> RegistryEntry:
+        entry = RegistryEntry(
+            namespace="dev.near",
+            name=name,
+            version=str(datetime.now().timestamp()),
+            time=datetime.now(timezone.utc),
+            category=category,
+            details=details,
+            show_entry=show_entry,
+        )
+        self.session.add(entry)
+        self.session.commit()
+        refresh_entry_summary(self.session, entry.namespace, entry.name)
+        return entry
+
+    def triggers(self):
+        return {(row.event_type, row.name, row.registry_id) for row in self.session.exec(select(RegistryTrigger))}
+
+    def test_maintained_on_upload_and_hide(self):  # noqa: D102
+        x_agent = self.upload("x-agent", X_AGENT_DETAILS)
+        hook_agent = self.upload("hook-agent", {"triggers": {"webhook": True}})
+        self.upload("model", X_AGENT_DETAILS, category="model")
+        self.upload("plain-agent", {"agent": {}})
+        self.assertEqual(
+            self.triggers(), {("x_mentions", "x-agent", x_agent.id), ("webhook", "hook-agent", hook_agent.id)}
+        )
+        version = get_index_version(self.session, TRIGGER_INDEX)
+
+        # Changes that do not affect triggers do not change the version.
+        self.session.add(Stars(account_id="fan.near", namespace="dev.near", name="x-agent"))
+        self.session.commit()
+        refresh_entry_summary(self.session, "dev.near", "x-agent")
+        self.assertEqual(get_index_version(self.session, TRIGGER_INDEX), version)
+
+        new_version = self.upload("x-agent", X_AGENT_DETAILS)
+        self.assertIn(("x_mentions", "x-agent", new_version.id), self.triggers())
+        self.upload("hook-agent", {"triggers": {"webhook": True}}, show_entry=False)
+        self.assertEqual(self.triggers(), {("x_mentions", "x-agent", new_version.id)})
+        self.assertEqual(get_index_version(self.session, TRIGGER_INDEX), version + 2)
+
+    def test_snapshot_reloads_on_version_change(self):  # noqa: D102
+        x_agent = self.upload("x-agent", X_AGENT_DETAILS)
+        index = TriggerIndex(check_interval=0)
+
+        self.assertEqual([agent.id for agent in index.agents("x_mentions")], [x_agent.id])
+        self.assertEqual(index.agents("webhook"), [])
+        self.assertEqual(index.reloads, 1)
+
+        hook_agent = self.upload("hook-agent", {"triggers": {"webhook": True, "events": {"x_mentions": ["a"]}}})
+        self.assertEqual([agent.id for agent in index.agents("x_mentions")], [hook_agent.id, x_agent.id])
+        self.assertEqual([agent.name for agent in index.agents("webhook")], ["hook-agent"])
+        self.assertEqual(index.reloads, 2)
+
+    def test_lookups_between_checks_are_in_memory(self):  # noqa: D102
+        self.upload("x-agent", X_AGENT_DETAILS)
+        index = TriggerIndex(check_interval=3600)
+        for _ in range(100):
+            self.assertEqual(len(index.agents("x_mentions")), 1)
+        self.assertEqual(self.sessions_opened, 1)
+
+        self.upload("x-agent-2", X_AGENT_DETAILS)
+        self.assertEqual(len(index.agents("x_mentions")), 1)
+        index.invalidate()
+        self.assertEqual(len(index.agents("x_mentions")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
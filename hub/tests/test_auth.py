@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import requests
+from nearai.shared.near.sign import SignatureVerificationResult, verify_access_key_owner
+from sqlmodel import Session
+
+from hub.api.v1 import auth, delegation
+from hub.api.v1.auth import AuthToken, get_delegation_expiry, verified_tokens, verify_auth_token
+from hub.api.v1.models import Delegation, IndexVersion
+from hub.tests.test_registry_summary import create_sqlite_engine
+
+
+class TestVerifiedTokenCache(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        verified_tokens.clear()
+        self.auth = AuthToken(
+            account_id="dev.near",
+            public_key="ed25519:2aPrik9S1qCnnfNo2doETrNa61ZaBwZYC8baschK5din",
+            signature="signature",
+            message="Test",
+            nonce="1722875604184",
+            recipient="test.near",
+            callback_url="https://near.ai",
+        )
+
+    @patch("hub.api.v1.auth.verify_signed_message", return_value=SignatureVerificationResult.TRUE)
+    def test_caches_valid_signature(self, verify):  # noqa: D102
+        self.assertTrue(verify_auth_token(self.auth))
+        self.assertTrue(verify_auth_token(self.auth))
+        self.assertEqual(verify.call_count, 1)
+
+        # Any change to the signed fields is a different token.
+        forged = self.auth.model_copy(update={"message": "Other"})
+        self.assertTrue(verify_auth_token(forged))
+        self.assertEqual(verify.call_count, 2)
+
+    @patch("hub.api.v1.auth.verify_signed_message", return_value=SignatureVerificationResult.FALSE)
+    def test_caches_invalid_signature(self, verify):  # noqa: D102
+        self.assertFalse(verify_auth_token(self.auth))
+        self.assertFalse(verify_auth_token(self.auth))
+        self.assertEqual(verify.call_count, 1)
+        self.assertGreaterEqual(verified_tokens.stats()["hits"], 1)
+
+    @patch(
+        "hub.api.v1.auth.verify_signed_message",
+        return_value=SignatureVerificationResult.VERIFY_ACCESS_KEY_OWNER_SERVICE_NOT_AVAILABLE,
+    )
+    def test_does_not_cache_unavailable_key_owner_service(self, verify):  # noqa: D102
+        self.assertFalse(verify_auth_token(self.auth))
+        self.assertFalse(verify_auth_token(self.auth))
+        self.assertEqual(verify.call_count, 2)
+
+
+class TestAccessKeyOwnerCache(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        verify_access_key_owner.cache.clear()  # type: ignore
+
+    @patch("nearai.shared.near.sign.requests.get")
+    def test_does_not_cache_unavailable_service(self, get):  # noqa: D102
+        get.side_effect = requests.exceptions.ConnectionError()
+        for _ in range(2):
+            result = verify_access_key_owner("ed25519:key", "dev.near")
+            self.assertEqual(result, SignatureVerificationResult.VERIFY_ACCESS_KEY_OWNER_SERVICE_NOT_AVAILABLE)
+        self.assertEqual(get.call_count, 2)
+
+        get.side_effect = None
+        get.return_value.json.return_value = {"account_ids": ["dev.near"]}
+        for _ in range(2):
+            self.assertEqual(verify_access_key_owner("ed25519:key", "dev.near"), SignatureVerificationResult.TRUE)
+        self.assertEqual(get.call_count, 3)
+
+
+class TestDelegationCache(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        engine = create_sqlite_engine(tables=[Delegation, IndexVersion])
+        for module in (auth, delegation):
+            session_patch = patch.object(module, "get_session", lambda: Session(engine))
+            session_patch.start()
+            self.addCleanup(session_patch.stop)
+        self.owner = AuthToken(
+            account_id="owner.near",
+            public_key="ed25519:2aPrik9S1qCnnfNo2doETrNa61ZaBwZYC8baschK5din",
+            signature="signature",
+            message="Test",
+            nonce="1722875604184",
+        )
+
+    def test_changes_take_effect_on_the_next_request(self):  # noqa: D102
+        self.assertEqual(get_delegation_expiry("owner.near", "delegate.near"), (False, None))
+
+        expires_at = datetime(2100, 1, 1, tzinfo=timezone.utc)
+        delegation.delegate("delegate.near", expires_at, self.owner)
+        found, _ = get_delegation_expiry("owner.near", "delegate.near")
+        self.assertTrue(found)
+        self.assertTrue(get_delegation_expiry("owner.near", "delegate.near")[0])
+        self.assertGreaterEqual(auth.delegations.stats()["hits"], 1)
+
+        # The version in the database is bumped, so every replica sees the revocation, not only this one.
+        with patch.object(auth, "delegations", auth.LruTtlCache()):
+            auth.delegations.set(("owner.near", "delegate.near", 2), (True, expires_at))
+            delegation.revoke_delegation("delegate.near", self.owner)
+            self.assertEqual(get_delegation_expiry("owner.near", "delegate.near"), (False, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
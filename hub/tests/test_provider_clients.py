@@ -0,0 +1,121 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+from openai.types.chat.chat_completion_chunk import ChatCompletionChunk, Choice, ChoiceDelta
+
+from hub.api.v1.completions import handle_stream
+from hub.api.v1.provider_clients import MeteredTransport, ProviderClientRegistry, ProviderMetrics, StreamLimiter
+
+
+API_KEYS = {"FIREWORKS_API_KEY": "test", "HYPERBOLIC_API_KEY": "test", "PROVIDER_LOCAL_API_KEY": "test"}
+
+
+@patch.dict("os.environ", API_KEYS)
+class TestProviderClientRegistry(unittest.TestCase):
+    def test_reuses_client_per_provider(self):  # noqa: D102
+        registry = ProviderClientRegistry()
+        try:
+            client = registry.get("fireworks")
+            self.assertIs(registry.get("fireworks"), client)
+            self.assertIsNot(registry.get("hyperbolic"), client)
+            with self.assertRaises(NotImplementedError):
+                registry.get("unknown")
+        finally:
+            registry.close()
+
+    def test_new_client_when_base_url_changes(self):  # noqa: D102
+        registry = ProviderClientRegistry()
+        try:
+            with patch.dict("os.environ", {"PROVIDER_LOCAL_BASE_URL": "http://localhost:1/v1"}):
+                first = registry.get("local")
+            with patch.dict("os.environ", {"PROVIDER_LOCAL_BASE_URL": "http://localhost:2/v1"}):
+                second = registry.get("local")
+            self.assertIsNot(first, second)
+            self.assertEqual(str(second.base_url), "http://localhost:2/v1/")
+        finally:
+            registry.close()
+
+    def test_metered_transport(self):  # noqa: D102
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/fail":
+                raise httpx.ConnectError("boom", request=request)
+            return httpx.Response(503 if request.url.path == "/busy" else 200)
+
+        metrics = ProviderMetrics()
+        with httpx.Client(transport=MeteredTransport(httpx.MockTransport(handler), metrics)) as client:
+            client.get("http://provider/ok")
+            client.get("http://provider/busy")
+            with self.assertRaises(httpx.ConnectError):
+                client.get("http://provider/fail")
+
+        stats = metrics.stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["errors"], 2)
+        self.assertGreaterEqual(stats["max_latency_ms"], stats["avg_latency_ms"])
+
+
+class FakeStream:
+    def __init__(self, chunks):  # noqa: D107
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):  # noqa: D105
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def close(self):  # noqa: D102
+        self.closed = True
+
+
+class TestStreaming(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_limiter(self):  # noqa: D102
+        limiter = StreamLimiter(max_streams=2, wait_timeout=0.01)
+        first = await limiter.acquire()
+        second = await limiter.acquire()
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(await limiter.acquire())
+        self.assertEqual(limiter.stats()["rejected"], 1)
+
+        assert first is not None
+        first.release()
+        first.release()  # idempotent
+        self.assertEqual(limiter.stats()["active"], 1)
+        self.assertIsNotNone(await limiter.acquire())
+        self.assertIsNone(await limiter.acquire())
+
+    async def test_handle_stream_closes_upstream_on_disconnect(self):  # noqa: D102
+        chunk = ChatCompletionChunk(
+            id="1",
+            choices=[Choice(index=0, delta=ChoiceDelta(content="hi"))],
+            created=0,
+            model="m",
+            object="chat.completion.chunk",
+        )
+        limiter = StreamLimiter(max_streams=1, wait_timeout=0.01)
+        usage = []
+
+        stream = FakeStream([chunk] * 3)
+        events = [e async for e in handle_stream(None, None, None, stream, usage.append, await limiter.acquire())]
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[-1], "data: [DONE]\n\n")
+        self.assertTrue(stream.closed)
+        self.assertEqual(len(usage), 1)
+
+        stream = FakeStream([chunk] * 3)
+        generator = handle_stream(None, None, None, stream, usage.append, await limiter.acquire())
+        await generator.__anext__()
+        await generator.aclose()  # what Starlette does when the client goes away
+        self.assertTrue(stream.closed)
+        self.assertEqual(len(usage), 1)
+        self.assertEqual(limiter.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 import os
 import shutil
 import tarfile
+import time
 import uuid
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
@@ -28,6 +30,27 @@ def test_fetch_health():
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+def test_fetch_stats_requires_permission():
+    token = AuthToken(
+        account_id="unittest.near",
+        public_key="unittest",
+        signature="unittest",
+        callback_url="unittest",
+        message="unittest",
+        nonce=str(int(time.time() * 1000)),
+    )
+    with patch.dict(app.dependency_overrides, {get_auth: lambda: token}), patch(
+        "hub.api.v1.permissions.get_session"
+    ) as get_session:
+        session = get_session.return_value.__enter__.return_value
+        session.exec.return_value.first.return_value = None
+        assert client.get("/v1/stats").status_code == 403
+
+        session.exec.return_value.first.return_value = MagicMock()
+        response = client.get("/v1/stats")
+        assert response.status_code == 200
+        assert set(response.json()) == {"db_pool", "caches", "providers", "usage"}
+
 def test_download_registry_directory_returns_first_file():
     response = client.get("/v1/registry/download_metadata/xela-agent")
     assert response.status_code == 200
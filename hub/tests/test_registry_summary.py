@@ -0,0 +1,162 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.ext.compiler import compiles
+from sqlmodel import Session, SQLModel, col, create_engine, select
+
+from hub.api.v1.models import Fork, IndexVersion, RegistryEntry, RegistryEntrySummary, RegistryTrigger, Stars, Tags
+from hub.api.v1.registry import list_entries_query
+from hub.api.v1.registry_summary import rebuild_entry_summaries, refresh_entry_summary
+
+CATEGORIES = ["agent", "agent", "agent", "model", "dataset", "evaluation"]
+TAGS = [f"tag{i}" for i in range(50)]
+
+
+@compiles(LONGTEXT, "sqlite")
+def _compile_longtext_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+
+def create_sqlite_engine(url: str = "sqlite://", tables: Optional[List[Any]] = None):
+    """Engine with the registry tables, or `tables`, for tests and benchmarks without the hub database."""
+    engine = create_engine(url)
+    if tables is None:
+        tables = [RegistryEntry, Tags, Stars, Fork, RegistryEntrySummary, RegistryTrigger, IndexVersion]
+    SQLModel.metadata.create_all(engine, tables=[table.__table__ for table in tables])  # type: ignore
+    return engine
+
+
+def seed_registry(session: Session, num_names: int, versions: int, seed: int = 0) -> None:
+    """Insert `num_names * versions` registry entries with stars, forks and tags."""
+    rng = random.Random(seed)
+    names = [(f"user{i % max(num_names // 10, 1)}.near", f"entry-{i}") for i in range(num_names)]
+    categories = {key: rng.choice(CATEGORIES) for key in names}
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    entries: List[Dict[str, Any]] = []
+    tags: List[Dict[str, Any]] = []
+    for registry_id in range(1, num_names * versions + 1):
+        # Versions of different entries are interleaved, as they are uploaded over time.
+        namespace, name = names[rng.randrange(num_names)] if registry_id > num_names else names[registry_id - 1]
+        entries.append(
+            {
+                "id": registry_id,
+                "namespace": namespace,
+                "name": name,
+                "version": str(registry_id),
+                "time": start + timedelta(minutes=registry_id),
+                "description": "",
+                "category": categories[(namespace, name)],
+                "details": {"agent": {"framework": "minimal"}},
+                "show_entry": rng.random() > 0.1,
+            }
+        )
+        tags.extend({"registry_id": registry_id, "tag": tag} for tag in set(rng.sample(TAGS, 2)))
+
+    stars = {(f"fan{rng.randrange(num_names)}.near", *rng.choice(names)) for _ in range(num_names * 2)}
+    forks = {}
+    for namespace, name in rng.sample(names, num_names // 20):
+        source = rng.choice(names)
+        if source != (namespace, name):
+            forks[(categories[(namespace, name)], namespace, name)] = source
+
+    session.execute(insert(RegistryEntry), entries)
+    session.execute(insert(Tags), tags)
+    session.execute(
+        insert(Stars), [{"account_id": account, "namespace": ns, "name": name} for account, ns, name in stars]
+    )
+    session.execute(
+        insert(Fork),
+        [
+            {"category": category, "to_namespace": ns, "to_name": name, "from_namespace": src[0], "from_name": src[1]}
+            for (category, ns, name), src in forks.items()
+        ],
+    )
+    session.commit()
+
+
+def summaries(session: Session):
+    rows = session.exec(select(RegistryEntrySummary).order_by(col(RegistryEntrySummary.latest_id))).all()
+    return [row.model_dump() for row in rows]
+
+
+class TestRegistrySummary(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.engine = create_sqlite_engine()
+        self.session = Session(self.engine)
+        seed_registry(self.session, num_names=300, versions=3)
+        rebuild_entry_summaries(self.session)
+
+    def tearDown(self):  # noqa: D102
+        self.session.close()
+
+    def list_rows(self, use_summary: bool, **kwargs):
+        query = list_entries_query(use_summary=use_summary, **kwargs)
+        rows = self.session.exec(query).all()  # type: ignore
+        # Missing counts are NULL when aggregated, as in `list_entries_inner`.
+        return [(*row[:8], row[8] or 0, bool(row[9]), row[10] or 0, *row[11:]) for row in rows]
+
+    def test_listing_matches_aggregation(self):  # noqa: D102
+        namespace = self.session.exec(select(RegistryEntry.namespace)).first()
+        starred_by = self.session.exec(select(Stars.account_id)).first()
+        fork = self.session.exec(select(Fork)).first()
+        assert fork is not None
+        cases = [
+            {},
+            {"total": 20, "offset": 40},
+            {"show_hidden": True, "total": 1000},
+            {"category": "agent", "total": 1000},
+            {"namespace": namespace},
+            {"tags": "tag1", "total": 1000},
+            {"tags": "tag1,tag2", "total": 1000},
+            {"tags": "tag3", "category": "agent", "total": 3, "offset": 2},
+            {"starred_by": starred_by, "star_point_of_view": starred_by},
+            {"fork_of_namespace": fork.from_namespace, "fork_of_name": fork.from_name},
+            {"custom_where": "registry.version != '7'", "total": 1000},
+        ]
+        for kwargs in cases:
+            with self.subTest(**kwargs):
+                self.assertEqual(self.list_rows(True, **kwargs), self.list_rows(False, **kwargs))
+
+    def test_refresh_matches_rebuild(self):  # noqa: D102
+        rebuilt = summaries(self.session)
+        self.session.exec(RegistryEntrySummary.__table__.delete())  # type: ignore
+        self.session.commit()
+        for namespace, name in {(row["namespace"], row["name"]) for row in rebuilt}:
+            refresh_entry_summary(self.session, namespace, name)
+        self.assertEqual(summaries(self.session), rebuilt)
+
+    def test_refresh_after_changes(self):  # noqa: D102
+        summary = self.session.exec(select(RegistryEntrySummary)).first()
+        assert summary is not None
+        namespace, name, num_stars = summary.namespace, summary.name, summary.num_stars
+
+        self.session.add(Stars(account_id="new-fan.near", namespace=namespace, name=name))
+        entry = RegistryEntry(
+            namespace=namespace,
+            name=name,
+            version="new",
+            time=datetime.now(timezone.utc),
+            category="model",
+            show_entry=False,
+        )
+        self.session.add(entry)
+        self.session.commit()
+        refresh_entry_summary(self.session, namespace, name)
+
+        summary = self.session.get(RegistryEntrySummary, (namespace, name))
+        assert summary is not None
+        self.assertEqual(summary.latest_id, entry.id)
+        self.assertEqual(summary.latest_category, "model")
+        self.assertFalse(summary.latest_show_entry)
+        self.assertEqual(summary.num_stars, num_stars + 1)
+        self.assertEqual(self.list_rows(True, show_hidden=True, total=1)[0][0], entry.id)
+        self.assertNotIn(entry.id, [row[0] for row in self.list_rows(True, total=1000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
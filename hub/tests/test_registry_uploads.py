@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+from sqlmodel import Session
+
+from hub.api.v1.entry_location import EntryLocation
+from hub.api.v1.models import RegistryBlob, RegistryEntry
+from hub.api.v1.registry import Filename, upload_manifest
+from hub.api.v1.registry_uploads import ManifestFile, record_blob, stream_to_s3
+from hub.tests.test_registry_summary import create_sqlite_engine
+
+
+async def chunks(content: bytes, chunk_size: int = 1000):
+    for start in range(0, len(content), chunk_size):
+        yield content[start : start + chunk_size]
+
+
+def upload(s3, content: bytes, sha256: str = "", size: int = -1):
+    sha256 = sha256 or hashlib.sha256(content).hexdigest()
+    size = len(content) if size < 0 else size
+    asyncio.run(stream_to_s3(s3, "bucket", "key", chunks(content), sha256, size))
+
+
+class TestStreamToS3(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.s3 = MagicMock()
+        self.s3.create_multipart_upload.return_value = {"UploadId": "upload"}
+        self.s3.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+        patcher = patch("hub.api.v1.registry_uploads.UPLOAD_PART_SIZE", 4000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_small_file_is_put(self):  # noqa: D102
+        upload(self.s3, b"a" * 3000)
+        self.s3.put_object.assert_called_once_with(Bucket="bucket", Key="key", Body=b"a" * 3000)
+        self.s3.create_multipart_upload.assert_not_called()
+
+    def test_large_file_is_uploaded_in_parts(self):  # noqa: D102
+        content = bytes(range(256)) * 40
+        upload(self.s3, content)
+        bodies = [call.kwargs["Body"] for call in self.s3.upload_part.call_args_list]
+        self.assertEqual([len(body) for body in bodies], [4000, 4000, 2240])
+        self.assertEqual(b"".join(bodies), content)
+        self.s3.complete_multipart_upload.assert_called_once_with(
+            Bucket="bucket",
+            Key="key",
+            UploadId="upload",
+            MultipartUpload={"Parts": [{"ETag": f"etag-{i}", "PartNumber": i} for i in (1, 2, 3)]},
+        )
+
+    def test_mismatching_content_is_not_stored(self):  # noqa: D102
+        with self.assertRaises(HTTPException):
+            upload(self.s3, b"a" * 10000, sha256=hashlib.sha256(b"b" * 10000).hexdigest())
+        self.s3.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="key", UploadId="upload")
+        self.s3.complete_multipart_upload.assert_not_called()
+
+        with self.assertRaises(HTTPException):
+            upload(self.s3, b"a" * 10000, size=5000)
+        self.s3.put_object.assert_not_called()
+
+
+class TestUploadManifest(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        engine = create_sqlite_engine(tables=[RegistryBlob, RegistryEntry])
+
+        @contextmanager
+        def get_session():
+            with Session(engine) as session:
+                yield session
+
+        self.s3 = MagicMock()
+        entry = RegistryEntry(namespace="dev.near", name="model", version="2")
+        for target, value in {
+            "get": MagicMock(return_value=entry),
+            "get_session": get_session,
+            "list_files_inner": MagicMock(return_value=[Filename(filename="README.md")]),
+            "s3": self.s3,
+            "S3_BUCKET": "bucket",
+        }.items():
+            patcher = patch(f"hub.api.v1.registry.{target}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("hub.api.v1.models.S3_PREFIX", "registry")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with get_session() as session:
+            time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+            private = {"private_source": True}
+            entries = [
+                RegistryEntry(namespace="dev.near", name="model", version="1", time=time, details=private),
+                RegistryEntry(namespace="other.near", name="model", version="1", time=time),
+                RegistryEntry(namespace="other.near", name="secret", version="1", time=time, details=private),
+            ]
+            session.add_all(entries)
+            session.commit()
+            for entry in entries:
+                session.refresh(entry)
+            record_blob(session, "a" * 64, 1000, "registry/dev.near/model/1/weights.bin", entries[0])
+            record_blob(session, "a" * 64, 1000, "registry/other.near/model/1/weights.bin", entries[1])
+            record_blob(session, "d" * 64, 10, "registry/other.near/model/1/data.bin", entries[1])
+            record_blob(session, "e" * 64, 10, "registry/other.near/secret/1/key.pem", entries[2])
+
+    def upload(self, files):  # noqa: D102
+        return upload_manifest(EntryLocation(namespace="dev.near", name="model", version="2"), files)
+
+    def test_stored_content_is_copied(self):  # noqa: D102
+        files = [
+            ManifestFile(path="weights.bin", size=1000, sha256="a" * 64),
+            ManifestFile(path="README.md", size=10, sha256="b" * 64),
+            ManifestFile(path="config.json", size=10, sha256="c" * 64),
+        ]
+        result = self.upload(files)
+        self.assertEqual(sorted(result.known_hashes), ["a" * 64, "b" * 64])
+        self.s3.copy.assert_called_once_with(
+            {"Bucket": "bucket", "Key": "registry/dev.near/model/1/weights.bin"},
+            "bucket",
+            "registry/dev.near/model/2/weights.bin",
+        )
+
+    def test_only_own_or_public_content_is_reused(self):  # noqa: D102
+        files = [
+            ManifestFile(path="data.bin", size=10, sha256="d" * 64),
+            ManifestFile(path="key.pem", size=10, sha256="e" * 64),
+        ]
+        result = self.upload(files)
+        self.assertEqual(result.known_hashes, ["d" * 64])
+        self.s3.copy.assert_called_once_with(
+            {"Bucket": "bucket", "Key": "registry/other.near/model/1/data.bin"},
+            "bucket",
+            "registry/dev.near/model/2/data.bin",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import base64
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from hub.api.v1 import files
+from hub.api.v1.files import RetrieveFilesRequest, retrieve_files
+from hub.api.v1.sql import VectorStoreFile
+
+
+def file_details(file_id: str, size: int) -> VectorStoreFile:
+    now = datetime.now(timezone.utc)
+    return VectorStoreFile(
+        id=file_id,
+        account_id="alice.near",
+        file_uri=f"file://{file_id}",
+        purpose="assistants",
+        filename=f"{file_id}.txt",
+        content_type="text/plain",
+        file_size=size,
+        encoding="utf-8",
+        created_at=now,
+        updated_at=now,
+        embedding_status=None,
+    )
+
+
+class TestRetrieveFiles(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.details = [file_details("a", 4), file_details("b", 4), file_details("c", 4)]
+        sql_client = MagicMock()
+        sql_client.get_files_details_by_account.return_value = self.details
+        self.reads = []
+
+        async def get_file_content(file_uri):
+            self.reads.append(file_uri)
+            return file_uri.encode()
+
+        for target, value in [("SqlClient", lambda: sql_client), ("get_file_content", get_file_content)]:
+            patcher = patch.object(files, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def retrieve(self, file_ids):  # noqa: D102
+        request = RetrieveFilesRequest(file_ids=file_ids, include_content=True)
+        response = asyncio.run(retrieve_files(request, auth=MagicMock(account_id="alice.near")))
+        return [
+            (retrieved.file.id, base64.b64decode(retrieved.content) if retrieved.content is not None else None)
+            for retrieved in response.data
+        ]
+
+    def test_contents_stop_at_the_byte_budget(self):  # noqa: D102
+        with patch.object(files, "MAX_RETRIEVE_BYTES", 8):
+            self.assertEqual(self.retrieve(["a", "b", "c"]), [("a", b"file://a"), ("b", b"file://b"), ("c", None)])
+        self.assertEqual(self.reads, ["file://a", "file://b"])
+
+    def test_first_content_is_always_included(self):  # noqa: D102
+        with patch.object(files, "MAX_RETRIEVE_BYTES", 1):
+            self.assertEqual(self.retrieve(["c", "a"]), [("c", b"file://c"), ("a", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
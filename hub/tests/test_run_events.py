@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from sqlmodel import Session
+
+from hub.api.v1 import thread_routes
+from hub.api.v1.models import Delta
+from hub.api.v1.thread_routes import TERMINAL_RUN_EVENTS, monitor_deltas
+from hub.tests.test_registry_summary import create_sqlite_engine
+
+
+class TestMonitorDeltas(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.engine = create_sqlite_engine(tables=[Delta])
+        session_patch = patch.object(thread_routes, "get_session", lambda: Session(self.engine))
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def monitor(self, run_id: str, objects: list) -> list:  # noqa: D102
+        with Session(self.engine) as session:
+            for i, object in enumerate(objects):
+                created_at = datetime(2024, 1, 1, 0, 0, i, tzinfo=timezone.utc)
+                session.add(Delta(object=object, run_id=run_id, message_id="msg", content={}, created_at=created_at))
+            session.commit()
+
+        async def run():
+            await asyncio.wait_for(monitor_deltas(run_id, delete=False), timeout=5)
+            queue = thread_routes.run_queues.pop(run_id)
+            return [queue.get_nowait()["event"] for _ in range(queue.qsize())]
+
+        return asyncio.run(run())
+
+    def test_every_terminal_event_ends_the_stream(self):  # noqa: D102
+        for terminal in sorted(TERMINAL_RUN_EVENTS):
+            with self.subTest(terminal=terminal):
+                events = self.monitor(f"run_{terminal}", ["thread.message.delta", terminal, "thread.message.delta"])
+                # The terminal event is sent last, after the events committed with it.
+                self.assertEqual(events, ["thread.message.delta", "thread.message.delta", terminal])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ import unittest
 # how to run:
 # python -m unittest discover -s hub/tests
 import nearai.shared.near.sign as near
+from nearai.shared.near.serializer import BinarySerializer
 
 
 class TestSignatureVerification(unittest.TestCase):
@@ -107,6 +108,21 @@ class TestSignatureVerification(unittest.TestCase):
             )
         )
 
+    def test_compiled_serializer_matches_binary_serializer(self):  # noqa: D102
+        for callback_url in (self.callback_url, None):
+            payload = near.Payload(self.message, self.nonce, self.recipient, callback_url)
+            self.assertEqual(
+                near.serialize_payload(payload), BinarySerializer(dict(near.PAYLOAD_SCHEMA)).serialize(payload)
+            )
+
+        completion = near.CompletionSignaturePayload(
+            "agent", "completion", "model", [{"role": "user", "content": "hi"}], 0.5, None
+        )
+        self.assertEqual(
+            near.serialize_completion_payload(completion),
+            BinarySerializer(dict(near.COMPLETION_PAYLOAD_SCHEMA)).serialize(completion),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from hub.api.v1.models import Message, Thread
+from hub.api.v1.thread_routes import list_messages_query
+from hub.tests.test_registry_summary import create_sqlite_engine
+
+_next_seq = 0
+
+
+def create_thread_engine(url: str = "sqlite://"):
+    """Engine with the thread tables, for tests and benchmarks without the hub database."""
+    return create_sqlite_engine(url, tables=[Thread, Message])
+
+
+def seed_thread(
+    session: Session,
+    thread_id: str,
+    num_messages: int,
+    parent_id: Optional[str] = None,
+    runs: int = 10,
+    batch_size: int = 10_000,
+) -> None:
+    """Insert a thread with `num_messages` messages, several of them created in the same second.
+
+    SQLite does not assign `seq` like MySQL's AUTO_INCREMENT does, so it is given here in insertion order.
+    """
+    global _next_seq
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    thread = {"id": thread_id, "object": "thread", "created_at": start, "owner_id": "user.near", "parent_id": parent_id}
+    session.exec(insert(Thread).values(**thread))  # type: ignore
+    messages: List[Dict[str, Any]] = []
+    for i in range(num_messages):
+        _next_seq += 1
+        messages.append(
+            {
+                "id": f"msg_{thread_id}_{i}",
+                "seq": _next_seq,
+                "object": "message",
+                "created_at": start + timedelta(seconds=i // 4),
+                "thread_id": thread_id,
+                "status": "completed",
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": [{"type": "text", "text": {"value": f"message {i}", "annotations": []}}],
+                "run_id": f"run_{i % runs}",
+            }
+        )
+        if len(messages) == batch_size:
+            session.exec(insert(Message), params=messages)  # type: ignore
+            messages = []
+    if messages:
+        session.exec(insert(Message), params=messages)  # type: ignore
+    session.commit()
+
+
+class TestListMessagesQuery(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.session = Session(create_thread_engine())
+        seed_thread(self.session, "thread_a", 50)
+
+    def tearDown(self):  # noqa: D102
+        self.session.close()
+
+    def pages(self, thread_ids: List[str], order: str, **kwargs) -> List[str]:  # noqa: D102
+        ids: List[str] = []
+        after_seq = None
+        while True:
+            page = self.session.exec(
+                list_messages_query(thread_ids, after_seq=after_seq, order=order, limit=7, **kwargs)  # type: ignore
+            ).all()
+            ids += [message.id for message in page]
+            if len(page) < 7:
+                return ids
+            after_seq = page[-1].seq
+
+    def test_pages_do_not_skip_messages_created_in_the_same_second(self):  # noqa: D102
+        self.assertEqual(self.pages(["thread_a"], "asc"), [f"msg_thread_a_{i}" for i in range(50)])
+
+    def test_order_and_before(self):  # noqa: D102
+        last = self.session.exec(list_messages_query(["thread_a"], limit=3)).all()
+        self.assertEqual([m.id for m in last], ["msg_thread_a_49", "msg_thread_a_48", "msg_thread_a_47"])
+
+        cursor = self.session.exec(select(Message).where(Message.id == "msg_thread_a_10")).one()
+        before = self.session.exec(list_messages_query(["thread_a"], before_seq=cursor.seq, order="asc")).all()
+        self.assertEqual([m.id for m in before], [f"msg_thread_a_{i}" for i in range(10)])
+
+    def test_subthreads_and_runs(self):  # noqa: D102
+        seed_thread(self.session, "thread_b", 5, parent_id="thread_a")
+        ids = self.pages(["thread_a", "thread_b"], "asc")
+        self.assertEqual(ids[-5:], [f"msg_thread_b_{i}" for i in range(5)])
+        self.assertEqual(len(ids), 55)
+
+        ids = self.pages(["thread_a"], "asc", run_id="run_3")
+        self.assertEqual(ids, [f"msg_thread_a_{i}" for i in range(3, 50, 10)])
+
+
+if __name__ == "__main__":
+    unittest.main()
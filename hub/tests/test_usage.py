@@ -0,0 +1,66 @@
+import json
+import threading
+import unittest
+from datetime import datetime
+
+from hub.api.v1.usage import UsageRecord, UsageRecorder, completion_row
+
+
+class TestUsageRecorder(unittest.TestCase):
+    def test_batches_records(self):  # noqa: D102
+        batches = []
+        recorder = UsageRecorder(writer=batches.append, batch_size=10, flush_interval=0.05)
+        for i in range(25):
+            recorder.record(f"account{i}", "prompt", "{}", "model", "provider", "/completions")
+        self.assertTrue(recorder.flush(timeout=5))
+        recorder.stop()
+
+        self.assertEqual(sum(len(batch) for batch in batches), 25)
+        self.assertTrue(all(len(batch) <= 10 for batch in batches))
+        self.assertEqual([r.account_id for batch in batches for r in batch], [f"account{i}" for i in range(25)])
+        stats = recorder.stats()
+        self.assertEqual(stats["written"], 25)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_drops_when_full(self):  # noqa: D102
+        taken = threading.Event()
+        release = threading.Event()
+        written = []
+
+        def blocking_writer(batch):
+            taken.set()
+            release.wait(5)
+            written.extend(batch)
+
+        recorder = UsageRecorder(writer=blocking_writer, max_size=2, batch_size=1, flush_interval=0.01)
+        recorder.record("first", "q", "{}", "m", "p", "/e")
+        self.assertTrue(taken.wait(5))  # the flusher is blocked on the first record
+        for _ in range(2):
+            recorder.record("queued", "q", "{}", "m", "p", "/e")
+        recorder.record("overflow", "q", "{}", "m", "p", "/e")  # must not wait for the flusher
+        release.set()
+        recorder.stop()
+        self.assertEqual([record.account_id for record in written], ["first", "queued", "queued"])
+        self.assertEqual(recorder.stats()["dropped_full"], 1)
+
+    def test_drops_after_failed_attempts(self):  # noqa: D102
+        def failing_writer(batch):
+            raise RuntimeError("db is down")
+
+        recorder = UsageRecorder(writer=failing_writer, max_attempts=1, flush_interval=0.01)
+        recorder.record("account", "q", "{}", "m", "p", "/e")
+        self.assertTrue(recorder.flush(timeout=5))
+        recorder.stop()
+        self.assertEqual(recorder.stats()["dropped"], 1)
+
+    def test_completion_row(self):  # noqa: D102
+        usage = {"prompt_tokens": 3, "completion_tokens": 5, "total_tokens": 8}
+        row = completion_row(
+            UsageRecord("account", "not json", json.dumps({"usage": usage}), "m", "p", "/e", datetime.now())
+        )
+        self.assertEqual(row["query"], {"value": "not json"})
+        self.assertEqual((row["prompt_tokens"], row["completion_tokens"], row["total_tokens"]), (3, 5, 8))
+
+
+if __name__ == "__main__":
+    unittest.main()
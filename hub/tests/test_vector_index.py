@@ -0,0 +1,370 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any, Dict, List
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pymysql.cursors
+
+from hub.api.v1 import vector_index
+from hub.api.v1.sql import SqlClient, similarity_search_cache
+from hub.api.v1.vector_index import VectorIndexRegistry, VectorStoreIndex
+
+
+def clustered_vectors(n: int, dimensions: int = 8, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions)) * 10
+    return (centers[np.arange(n) % clusters] + rng.normal(size=(n, dimensions))).astype(np.float32)
+
+
+def wait_until_built(registry: VectorIndexRegistry, timeout: float = 10) -> None:
+    deadline = time.time() + timeout
+    while registry._building and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class VectorIndexTestCase(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.patches = [
+            patch.object(vector_index, "VECTOR_INDEX_MIN_SIZE", 100),
+            patch.object(vector_index, "VECTOR_INDEX_NPROBE", 4),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):  # noqa: D102
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+
+class TestVectorStoreIndex(VectorIndexTestCase):
+    def test_add_search_remove_file(self):  # noqa: D102
+        index = VectorStoreIndex(os.path.join(self.root, "vs"), 2)
+        index.add(["a", "b"], ["file_1", "file_1"], np.array([[0, 0], [1, 0]]))
+        index.add(["c"], ["file_2"], np.array([[5, 5]]))
+        self.assertEqual(len(index), 3)
+        self.assertIsNone(index.centroids)
+
+        hits = index.search([0.9, 0], 2)
+        self.assertEqual([(hit[0], hit[1]) for hit in hits], [("b", "file_1"), ("a", "file_1")])
+        self.assertAlmostEqual(hits[0][2], 0.1, places=5)
+        self.assertEqual([f for f, _ in index.search_files([5, 4], 2)], ["file_2", "file_1"])
+
+        index.remove_file("file_1")
+        self.assertEqual([hit[0] for hit in index.search([0, 0], 10)], ["c"])
+
+    def test_persist_and_load(self):  # noqa: D102
+        path = os.path.join(self.root, "vs")
+        index = VectorStoreIndex(path, 2)
+        index.add(["a"], ["file_1"], np.array([[0, 0]]))
+        index.add(["b"], ["file_2"], np.array([[1, 1]]))
+        index.remove_file("file_1")
+        index.add(["c"], ["file_1"], np.array([[2, 2]]))  # added again after the removal
+        index.set_generation(4)
+
+        loaded = VectorStoreIndex.load(path)
+        assert loaded is not None
+        self.assertEqual(sorted(loaded.ids.tolist()), ["b", "c"])
+        self.assertEqual(loaded.generation, 4)
+        self.assertEqual(loaded.next_segment, index.next_segment)
+        self.assertIsNone(VectorStoreIndex.load(os.path.join(self.root, "missing")))
+
+    def test_training_and_compaction(self):  # noqa: D102
+        path = os.path.join(self.root, "vs")
+        vectors = clustered_vectors(400)
+        index = VectorStoreIndex(path, vectors.shape[1])
+        with patch.object(vector_index, "VECTOR_INDEX_MAX_SEGMENTS", 3):
+            for i in range(0, 400, 50):
+                index.add([f"e{j}" for j in range(i, i + 50)], [f"file_{i}"] * 50, vectors[i : i + 50])
+        self.assertIsNotNone(index.centroids)
+        segment_files = [name for name in os.listdir(path) if name.startswith("segment-")]
+        self.assertLessEqual(len(segment_files), 3)
+
+        # Every vector is found by probing the partitions closest to it.
+        for i in (0, 137, 399):
+            self.assertEqual(index.search(vectors[i], 1)[0][0], f"e{i}")
+
+        loaded = VectorStoreIndex.load(path)
+        assert loaded is not None
+        self.assertEqual(sorted(loaded.ids.tolist()), sorted(index.ids.tolist()))
+        self.assertEqual(loaded.search(vectors[137], 1)[0][0], "e137")
+
+
+class TestVectorIndexRegistry(VectorIndexTestCase):
+    def setUp(self):  # noqa: D102
+        super().setUp()
+        self.registry = VectorIndexRegistry(self.root, enabled=True)
+        self.vectors = clustered_vectors(200)
+        self.ids = [f"e{i}" for i in range(200)]
+        self.file_ids = [f"file_{i % 5}" for i in range(200)]
+
+    def loader(self, generation):  # noqa: D102
+        return MagicMock(return_value=(generation, self.ids, self.file_ids, self.vectors))
+
+    def build(self, generation: int = 1) -> VectorStoreIndex:  # noqa: D102
+        self.registry._rebuild("vs", self.loader(generation))
+        index = self.registry.get("vs")
+        assert index is not None
+        return index
+
+    def test_get_if_current_rebuilds_in_background(self):  # noqa: D102
+        count = MagicMock(return_value=200)
+        loader = self.loader(1)
+        self.assertIsNone(self.registry.get_if_current("vs", 1, count, loader))
+        wait_until_built(self.registry)
+        loader.assert_called_once_with("vs")
+
+        index = self.registry.get_if_current("vs", 1, count, loader)
+        assert index is not None
+        self.assertEqual(len(index), 200)
+        self.assertEqual(count.call_count, 1)
+
+        # Persisted, so it is loaded again by another process.
+        other = VectorIndexRegistry(self.root, enabled=True).get_if_current("vs", 1, count, loader)
+        assert other is not None
+        self.assertEqual(len(other), 200)
+
+    def test_small_stores_are_counted_once_per_generation(self):  # noqa: D102
+        count = MagicMock(return_value=10)
+        loader = self.loader(1)
+        for _ in range(3):
+            self.assertIsNone(self.registry.get_if_current("vs", 1, count, loader))
+        self.assertEqual(count.call_count, 1)
+        self.assertIsNone(self.registry.get_if_current("vs", 2, count, loader))
+        self.assertEqual(count.call_count, 2)
+        loader.assert_not_called()
+
+    def test_embeddings_changed_while_loading(self):  # noqa: D102
+        self.registry._rebuild("vs", self.loader(None))
+        self.assertIsNone(self.registry.get("vs"))
+
+    def test_mutations_follow_generations(self):  # noqa: D102
+        index = self.build(generation=1)
+        self.registry.add("vs", ["new"], ["file_new"], self.vectors[:1], 2)
+        self.assertEqual((len(index), index.generation), (201, 2))
+
+        # A mutation this process did not see leaves the index behind, so later ones are not applied.
+        self.registry.add("vs", ["lost"], ["file_lost"], self.vectors[:1], 4)
+        self.registry.remove_file("vs", "file_0", 5)
+        self.assertEqual((len(index), index.generation), (201, 2))
+        count = MagicMock(return_value=201)
+        loader = self.loader(5)
+        self.assertIsNone(self.registry.get_if_current("vs", 5, count, loader))
+        wait_until_built(self.registry)
+        loader.assert_called_once_with("vs")
+
+        self.registry.remove_file("vs", "file_0", 6)
+        index = self.registry.get_if_current("vs", 6, count, loader)
+        assert index is not None
+        self.assertEqual(len(index), 160)
+
+    def test_rebuild_waits_for_mutations_of_the_old_index(self):  # noqa: D102
+        old = self.build(generation=1)
+        path = old.path
+        with old.lock:
+            # A mutation in progress on the old index holds its lock while writing segments under `path`.
+            rebuild = threading.Thread(target=self.registry._rebuild, args=("vs", self.loader(2)))
+            rebuild.start()
+            time.sleep(0.2)
+            self.assertIs(self.registry.get("vs"), old)
+            self.assertFalse(old.retired)
+            old.add(["during"], ["file_during"], self.vectors[:1])
+        rebuild.join()
+
+        new = self.registry.get("vs")
+        assert new is not None
+        self.assertIsNot(new, old)
+        self.assertTrue(old.retired)
+        self.assertEqual((new.path, new.generation, len(new)), (path, 2, 200))
+
+        # Mutations that got hold of the old index skip it, leaving the new one and its files alone.
+        self.registry._loaded.set("vs", old)
+        self.registry.add("vs", ["late"], ["file_late"], self.vectors[:1], 2)
+        self.assertEqual(len(old), 201)
+        loaded = VectorStoreIndex.load(path)
+        assert loaded is not None
+        self.assertEqual((len(loaded), loaded.generation), (200, 2))
+
+    def test_drop(self):  # noqa: D102
+        index = self.build()
+        self.registry.drop("vs")
+        self.assertTrue(index.retired)
+        self.assertIsNone(self.registry.get("vs"))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "vs")))
+
+
+class TestSqlClientVectorIndex(VectorIndexTestCase):
+    def setUp(self):  # noqa: D102
+        super().setUp()
+        self.registry = VectorIndexRegistry(self.root, enabled=True)
+        self.generation = 7
+        vectors = clustered_vectors(150)
+        self.embeddings = ([f"e{i}" for i in range(150)], ["file_1"] * 150, vectors)
+        self.patches += [
+            patch("hub.api.v1.sql.vector_indexes", self.registry),
+            patch.object(SqlClient, "embeddings_generation", side_effect=lambda vs_id: self.generation),
+            patch.object(SqlClient, "count_embeddings", return_value=150),
+            patch.object(SqlClient, "load_embeddings", side_effect=lambda vs_id: self.embeddings),
+        ]
+        for p in self.patches[-4:]:
+            p.start()
+
+    def test_index_is_used_while_the_generation_is_current(self):  # noqa: D102
+        client = SqlClient()
+        self.assertIsNone(client._get_vector_index("vs", 7))
+        wait_until_built(self.registry)
+        index = client._get_vector_index("vs", 7)
+        assert index is not None
+        self.assertEqual(index.generation, 7)
+        self.assertEqual(SqlClient.count_embeddings.call_count, 1)  # type: ignore
+
+        self.generation = 8
+        self.assertIsNone(client._get_vector_index("vs", 8))
+        wait_until_built(self.registry)
+        index = client._get_vector_index("vs", 8)
+        assert index is not None
+        self.assertEqual(index.generation, 8)
+
+    def test_embeddings_changed_while_loading(self):  # noqa: D102
+        def load_embeddings(vs_id):
+            self.generation += 1
+            return self.embeddings
+
+        client = SqlClient()
+        with patch.object(SqlClient, "load_embeddings", side_effect=load_embeddings):
+            self.assertIsNone(client._get_vector_index("vs", 7))
+            wait_until_built(self.registry)
+        self.assertIsNone(self.registry.get("vs"))
+
+    def test_disabled(self):  # noqa: D102
+        self.registry.enabled = False
+        self.assertIsNone(SqlClient()._get_vector_index("vs", 7))
+        SqlClient.count_embeddings.assert_not_called()  # type: ignore
+        SqlClient.load_embeddings.assert_not_called()  # type: ignore
+
+
+class FakeDatabase:
+    """The `vector_stores` and `vector_store_embeddings` tables, as far as similarity searches use them."""
+
+    def __init__(self):  # noqa: D107
+        self.generations: Dict[str, int] = {}
+        self.embeddings: List[Dict[str, Any]] = []
+
+    def connect(self) -> "FakeConnection":  # noqa: D102
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, database: FakeDatabase):  # noqa: D107
+        self.database = database
+
+    def cursor(self, cursor_class=None) -> "FakeCursor":  # noqa: D102
+        return FakeCursor(self.database, dicts=cursor_class is pymysql.cursors.DictCursor)
+
+    def commit(self):  # noqa: D102
+        pass
+
+    def rollback(self):  # noqa: D102
+        pass
+
+    def close(self):  # noqa: D102
+        pass
+
+
+class FakeCursor:
+    def __init__(self, database: FakeDatabase, dicts: bool):  # noqa: D107
+        self.database = database
+        self.dicts = dicts
+        self.rows: List[Any] = []
+
+    def execute(self, query: str, args: Any = None) -> None:  # noqa: D102
+        query = " ".join(query.split())
+        db = self.database
+        if query.startswith("UPDATE vector_stores SET embeddings_generation"):
+            db.generations[args[0]] += 1
+        elif query.startswith("SELECT embeddings_generation FROM vector_stores"):
+            generation = db.generations.get(args[0])
+            row = {"embeddings_generation": generation} if self.dicts else (generation,)
+            self.rows = [] if generation is None else [row]
+        elif query.startswith("INSERT INTO vector_store_embeddings"):
+            _, vector_store_id, file_id, _, chunk_text, embedding = args
+            embedding = np.array(json.loads(embedding))
+            db.embeddings.append(
+                {
+                    "vector_store_id": vector_store_id,
+                    "file_id": file_id,
+                    "chunk_text": chunk_text,
+                    "embedding": embedding,
+                }
+            )
+        elif query.startswith("SELECT vse.file_id, vse.chunk_text, vse.embedding <-> %s AS distance"):
+            query_embedding, vector_store_id, limit = args
+            q = np.array(json.loads(query_embedding))
+            rows = [
+                {
+                    "file_id": e["file_id"],
+                    "chunk_text": e["chunk_text"],
+                    "distance": float(np.linalg.norm(e["embedding"] - q)),
+                }
+                for e in db.embeddings
+                if e["vector_store_id"] == vector_store_id
+            ]
+            self.rows = sorted(rows, key=lambda row: row["distance"])[:limit]
+        else:
+            raise NotImplementedError(query)
+
+    def executemany(self, query: str, rows: List[Any]) -> None:  # noqa: D102
+        for row in rows:
+            self.execute(query, row)
+
+    def fetchone(self):  # noqa: D102
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):  # noqa: D102
+        return self.rows
+
+
+class TestSimilaritySearchCache(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        similarity_search_cache.clear()
+        self.addCleanup(similarity_search_cache.clear)
+        self.database = FakeDatabase()
+        self.database.generations["vs"] = 0
+
+    def client(self) -> SqlClient:
+        """Client of one hub replica."""
+        client = SqlClient()
+        client._db = self.database.connect()
+        return client
+
+    def test_results_follow_the_embeddings_generation_of_the_database(self):  # noqa: D102
+        client = self.client()
+        client.store_embeddings("vs", "file_a", [(0, "far", [10.0, 10.0])])
+        self.assertEqual([r.chunk_text for r in client.similarity_search("vs", [0.0, 0.0])], ["far"])
+
+        # Cached: the result does not change while the generation does not.
+        self.database.embeddings[0]["chunk_text"] = "changed outside of the hub"
+        self.assertEqual([r.chunk_text for r in client.similarity_search("vs", [0.0, 0.0])], ["far"])
+
+        # Stored through another replica, which bumps the generation in the database only.
+        self.client().store_embeddings("vs", "file_b", [(0, "near", [1.0, 1.0])])
+        results = client.similarity_search("vs", [0.0, 0.0])
+        self.assertEqual([r.chunk_text for r in results], ["near", "changed outside of the hub"])
+
+    def test_deleted_vector_store(self):  # noqa: D102
+        client = self.client()
+        client.store_embeddings("vs", "file_a", [(0, "chunk", [1.0, 1.0])])
+        self.assertEqual(len(client.similarity_search("vs", [0.0, 0.0])), 1)
+        del self.database.generations["vs"]
+        self.assertEqual(client.similarity_search("vs", [0.0, 0.0]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
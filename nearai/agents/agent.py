@@ -11,15 +11,24 @@ import traceback
 import uuid
 from pathlib import Path
 from types import CodeType
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 from dotenv import load_dotenv
 
+from nearai.agents.workdir_pool import (
+    AGENT_FILENAME_PY,
+    AgentDirScan,
+    Workdir,
+    compile_agent_code,
+    file_bytes,
+    scan_agent_dir,
+    workdir_pool,
+)
 from nearai.shared.client_config import ClientConfig
 
-AGENT_FILENAME_PY = "agent.py"
 AGENT_FILENAME_TS = "agent.ts"
 THREADS_DIR = ".threads"
+TS_RUNNER_DIR = "/tmp/ts_runner"
 
 load_dotenv()
 
@@ -177,6 +186,17 @@ def get_local_agent_files(path: Path) -> List[Path]:
     return all_files
 
 
+_prepared_ts_runners: Set[str] = set()
+
+
+def prepare_ts_runner(source: str, destination: str) -> None:
+    """Copies the typescript runner once per process."""
+    if destination in _prepared_ts_runners and os.path.exists(destination):
+        return
+    shutil.copytree(source, destination, symlinks=True, dirs_exist_ok=True)
+    _prepared_ts_runners.add(destination)
+
+
 class Agent(object):
     def __init__(  # noqa: D107
         self,
@@ -208,7 +228,14 @@ class Agent(object):
         self.agent_files = agent_files
         self.original_cwd = os.getcwd()
 
-        self.temp_dir = self.write_agent_files_to_temp(agent_files, local_path)
+        # Files of registry agents are written to a working directory from the pool, reused across runs.
+        self.workdir: Optional[Workdir] = None
+        if isinstance(agent_files, List) and local_path is None and all(isinstance(f, dict) for f in agent_files):
+            self.workdir = workdir_pool.acquire(identifier, agent_files)
+            self.temp_dir = self.workdir.path
+        else:
+            self.temp_dir = self.write_agent_files_to_temp(agent_files, local_path)
+        self.pooled = self.workdir is not None
         self.ts_runner_dir = ""
         self.change_to_temp_dir = change_to_temp_dir
         self.agent_filename = ""
@@ -248,18 +275,8 @@ class Agent(object):
                     if not os.path.exists(os.path.dirname(file_path)):
                         os.makedirs(os.path.dirname(file_path))
 
-                    if isinstance(content, dict) or isinstance(content, list):
-                        try:
-                            content = json.dumps(content)
-                        except Exception as e:
-                            print(f"Error converting content to json: {e}")
-                        content = str(content)
-
-                    if isinstance(content, str):
-                        content = content.encode("utf-8")
-
                     with open(file_path, "wb") as f:
-                        with io.BytesIO(content) as byte_stream:
+                        with io.BytesIO(file_bytes(content)) as byte_stream:
                             shutil.copyfileobj(byte_stream, f)
                 except Exception as e:
                     print(f"Error writing file {file_path}: {e}")
@@ -367,9 +384,28 @@ class Agent(object):
         except Exception as e:
             # Return error message and full traceback as strings
             return str(e), traceback.format_exc()
+        finally:
+            # In a child process, buffered logs are lost unless written before it exits.
+            agent_namespace["env"].flush_logs()
 
-    def run_ts_agent(self, agent_filename, env_vars, json_params, log_stdout_callback=None, log_stderr_callback=None):
+    def run_ts_agent(
+        self,
+        agent_filename,
+        env_vars,
+        json_params,
+        log_stdout_callback=None,
+        log_stderr_callback=None,
+        flush_logs_callback=None,
+    ):
         """Launch typescript agent."""
+        try:
+            self._run_ts_agent(agent_filename, env_vars, json_params, log_stdout_callback, log_stderr_callback)
+        finally:
+            # Runs in a child process: buffered logs are lost unless written before it exits.
+            if flush_logs_callback:
+                flush_logs_callback()
+
+    def _run_ts_agent(self, agent_filename, env_vars, json_params, log_stdout_callback, log_stderr_callback):
         print(f"Running typescript agent {agent_filename} from {self.ts_runner_dir}")
 
         # Configure npm to use tmp directories
@@ -438,75 +474,39 @@ class Agent(object):
         # save env.env_vars
         env.env_vars = total_env_vars
 
-        agent_ts_files_to_transpile = []
-        agent_py_modules_import = []
-
-        if not self.agent_filename or True:
-            # if agent has "agent.py" file, we use python runner
-            if os.path.exists(os.path.join(self.temp_dir, AGENT_FILENAME_PY)):
-                self.agent_filename = os.path.join(self.temp_dir, AGENT_FILENAME_PY)
-                self.agent_language = "py"
-                with open(self.agent_filename, "r") as agent_file:
-                    self.code = compile(agent_file.read(), self.agent_filename, "exec")
-            # else, if agent has "agent.ts" file, we use typescript runner
-            elif os.path.exists(os.path.join(self.temp_dir, AGENT_FILENAME_TS)):
-                self.agent_filename = os.path.join(self.temp_dir, AGENT_FILENAME_TS)
-                self.agent_language = "ts"
-
-                # copy files from nearai/ts_runner_sdk to self.temp_dir
-                ts_runner_sdk_dir = "/tmp/ts_runner"
-                ts_runner_agent_dir = os.path.join(ts_runner_sdk_dir, "agents")
-
-                ts_runner_actual_path = "/var/task/ts_runner"
-
-                shutil.copytree(ts_runner_actual_path, ts_runner_sdk_dir, symlinks=True, dirs_exist_ok=True)
-
-                # make ts agents dir if not exists
-                if not os.path.exists(ts_runner_agent_dir):
-                    os.makedirs(ts_runner_agent_dir, exist_ok=True)
-
-                # copy agents files
-                shutil.copy(os.path.join(self.temp_dir, AGENT_FILENAME_TS), ts_runner_agent_dir)
+        # if agent has "agent.py" file, we use python runner
+        if os.path.exists(os.path.join(self.temp_dir, AGENT_FILENAME_PY)):
+            self.agent_filename = os.path.join(self.temp_dir, AGENT_FILENAME_PY)
+            self.agent_language = "py"
+            with open(self.agent_filename, "r") as agent_file:
+                self.code = compile_agent_code(agent_file.read(), self.agent_filename)
+        # else, if agent has "agent.ts" file, we use typescript runner
+        elif os.path.exists(os.path.join(self.temp_dir, AGENT_FILENAME_TS)):
+            self.agent_filename = os.path.join(self.temp_dir, AGENT_FILENAME_TS)
+            self.agent_language = "ts"
 
-                self.ts_runner_dir = ts_runner_sdk_dir
-            else:
-                raise ValueError(f"Agent run error: {AGENT_FILENAME_PY} or {AGENT_FILENAME_TS} does not exist")
-
-            # cache all agent files in file_cache
-            for root, dirs, files in os.walk(self.temp_dir):
-                is_main_dir = root == self.temp_dir
-
-                if is_main_dir:
-                    # add all folders in the root directory as potential modules to import
-                    agent_py_modules_import.extend(dirs)
-
-                for file in files:
-                    file_path = os.path.join(root, file)
+            # copy files from nearai/ts_runner_sdk to self.temp_dir
+            ts_runner_sdk_dir = TS_RUNNER_DIR
+            ts_runner_agent_dir = os.path.join(ts_runner_sdk_dir, "agents")
 
-                    # get file extension for agent_filename
-                    if file_path.endswith(".ts"):
-                        agent_ts_files_to_transpile.append(file_path)
+            prepare_ts_runner("/var/task/ts_runner", ts_runner_sdk_dir)
 
-                    if is_main_dir and file != AGENT_FILENAME_PY and file_path.endswith(".py"):
-                        # save py file without extension as potential module to import
-                        agent_py_modules_import.append(os.path.splitext(os.path.basename(file_path))[0])
+            # make ts agents dir if not exists
+            if not os.path.exists(ts_runner_agent_dir):
+                os.makedirs(ts_runner_agent_dir, exist_ok=True)
 
-                    relative_path = os.path.relpath(file_path, self.temp_dir)
-                    try:
-                        with open(file_path, "rb") as f:
-                            content = f.read()
-                            try:
-                                # Try to decode as text
-                                self.file_cache[relative_path] = content.decode("utf-8")
-                            except UnicodeDecodeError:
-                                # If decoding fails, store as binary
-                                self.file_cache[relative_path] = content
-
-                    except Exception as e:
-                        print(f"Error with cache creation {file_path}: {e}")
+            # copy agents files
+            shutil.copy(os.path.join(self.temp_dir, AGENT_FILENAME_TS), ts_runner_agent_dir)
 
+            self.ts_runner_dir = ts_runner_sdk_dir
         else:
-            print("Using cached agent code")
+            raise ValueError(f"Agent run error: {AGENT_FILENAME_PY} or {AGENT_FILENAME_TS} does not exist")
+
+        # Working directories from the pool were scanned when they were written, and are reset after every run.
+        scan: AgentDirScan = self.workdir.scan if self.workdir is not None else scan_agent_dir(self.temp_dir)
+        self.file_cache = scan.file_cache
+        agent_ts_files_to_transpile = scan.ts_files
+        agent_py_modules_import = scan.py_modules
 
         namespace = {
             "env": env,
@@ -549,6 +549,7 @@ class Agent(object):
                         agent_json_params,
                         log_stdout_callback,
                         log_stderr_callback,
+                        env.flush_logs,
                     ],
                 )
                 process.start()
@@ -557,7 +558,13 @@ class Agent(object):
                 if env.agent_runner_user:
                     process = multiprocessing.Process(
                         target=self.run_python_code,
-                        args=[namespace, env.agent_runner_user, log_stdout_callback, log_stderr_callback],
+                        args=[
+                            namespace,
+                            env.agent_runner_user,
+                            agent_py_modules_import,
+                            log_stdout_callback,
+                            log_stderr_callback,
+                        ],
                     )
                     process.start()
                     process.join()
@@ -577,6 +584,14 @@ class Agent(object):
 
         return error_message, traceback_message
 
+    def clear_temp_dir(self) -> None:
+        """Removes the working directory of the agent, or returns it to the pool for the next run of this version."""
+        if self.workdir is not None:
+            workdir_pool.release(self.workdir)
+            self.workdir = None
+        elif not self.pooled and os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
     @staticmethod
     def load_agents(agents: str, config: ClientConfig, local: bool = False):
         """Loads agents from the registry."""
@@ -4,7 +4,6 @@ import json
 import logging
 import os
 import re
-import shutil
 import time
 import uuid
 from datetime import datetime, timezone
@@ -20,7 +19,7 @@ from litellm.types.utils import (
     ModelResponse,
 )
 from litellm.utils import CustomStreamWrapper
-from openai import NOT_GIVEN, NotGiven, OpenAI
+from openai import NOT_GIVEN, APIStatusError, NotGiven, OpenAI
 from openai.types.beta.threads.message import Message
 from openai.types.beta.threads.message_create_params import Attachment
 from openai.types.beta.threads.run import Run
@@ -33,7 +32,10 @@ from py_near.constants import DEFAULT_ATTACHED_GAS
 import nearai.shared.near.sign as near
 from nearai.agents import tool_json_helper
 from nearai.agents.agent import Agent
-from nearai.agents.tool_registry import ToolRegistry
+from nearai.agents.log_writer import LogWriter, LogWriterHandler, is_log_segment, log_segment_filename
+from nearai.agents.thread_files import FileCache
+from nearai.agents.thread_messages import ThreadMessages
+from nearai.agents.tool_registry import ToolCallResult, ToolRegistry
 from nearai.shared.client_config import DEFAULT_PROVIDER_MODEL
 from nearai.shared.inference_client import InferenceClient
 from nearai.shared.models import (
@@ -83,17 +85,6 @@ class InferenceParameters:
         self.max_tokens = max_tokens
 
 
-class CustomLogHandler(logging.Handler):
-    def __init__(self, add_reply_func, namespace: str):  # noqa: D107
-        super().__init__()
-        self.add_reply_func = add_reply_func
-        self.namespace = namespace
-
-    def emit(self, record):  # noqa: D102
-        log_entry = self.format(record)
-        self.add_reply_func(message=log_entry, message_type=f"{self.namespace}:log")
-
-
 class Environment(object):
     def __init__(  # noqa: D107
         self,
@@ -148,6 +139,9 @@ class Environment(object):
             if key.lower() == "debug"
         )
         self._debug_mode: bool = not not_debug_mode
+        # Logs are written to disk and uploaded to the thread in batches, see `_flush_log`.
+        self._log_writer = LogWriter(self._flush_log)
+        self._log_segments: Dict[str, int] = {}
 
         # Expose the NEAR account_id of a user that signs this request to run an agent.
         self.signer_account_id: str = client._config.auth.account_id if client._config.auth else ""
@@ -609,7 +603,7 @@ class Environment(object):
 
             if self._debug_mode and not message_type:
                 self.add_chat_log("assistant", message)
-            return hub_client.beta.threads.messages.create(
+            created = hub_client.beta.threads.messages.create(
                 thread_id=thread_id,
                 role="assistant",
                 content=message,
@@ -620,6 +614,8 @@ class Environment(object):
                 attachments=attachments,
                 metadata={"message_type": message_type} if message_type else None,
             )
+            self._thread_messages(thread_id).add(created)
+            return created
 
         self.add_reply = add_reply
 
@@ -638,7 +634,7 @@ class Environment(object):
             if self._debug_mode:
                 self.add_chat_log(role, message)
 
-            return hub_client.beta.threads.messages.create(
+            created = hub_client.beta.threads.messages.create(
                 thread_id=self._thread_id,
                 role=role,  # type: ignore
                 content=message,
@@ -649,23 +645,68 @@ class Environment(object):
                 metadata=kwargs,
                 attachments=attachments,
             )
+            self._thread_messages(self._thread_id).add(created)
+            return created
 
         self._add_message = _add_message
 
+        thread_messages: Dict[str, ThreadMessages] = {}
+
+        def _thread_messages(thread_id: str) -> ThreadMessages:
+            """Messages of a thread, cached for this run."""
+            if thread_id not in thread_messages:
+
+                def fetch(after: Optional[str]) -> List[Message]:
+                    messages = hub_client.beta.threads.messages.list(
+                        thread_id=thread_id,
+                        after=after or NOT_GIVEN,  # type: ignore
+                        limit=LIST_MESSAGES_LIMIT,
+                        order="asc",
+                    )
+                    self.add_system_log(f"Retrieved {len(messages.data)} messages from NEAR AI Hub")
+                    return messages.data
+
+                thread_messages.setdefault(thread_id, ThreadMessages(fetch, page_size=LIST_MESSAGES_LIMIT))
+            return thread_messages[thread_id]
+
+        self._thread_messages = _thread_messages
+
         def _list_messages(
             limit: Union[int, NotGiven] = LIST_MESSAGES_LIMIT,
             order: Literal["asc", "desc"] = "asc",
             thread_id: Optional[str] = None,
         ) -> List[Message]:
-            """Returns messages from the environment."""
-            messages = hub_client.beta.threads.messages.list(
-                thread_id=thread_id or self._thread_id, limit=limit, order=order
-            )
-            self.add_system_log(f"Retrieved {len(messages.data)} messages from NEAR AI Hub")
-            return messages.data
+            """Returns messages from the environment.
+
+            The whole thread is fetched once per run, page by page, later calls only fetch the messages added since.
+            """
+            messages = self._thread_messages(thread_id or self._thread_id).list()
+            if order == "desc":
+                messages.reverse()
+            if isinstance(limit, int):
+                messages = messages[:limit]
+            return messages
 
         self._list_messages = _list_messages
 
+        def retrieve_files(file_ids: List[str], include_content: bool) -> List[Tuple[FileObject, Optional[bytes]]]:
+            try:
+                return client.retrieve_files(file_ids, include_content)
+            except APIStatusError as e:
+                if e.status_code not in (404, 405):
+                    raise
+            # The hub retrieves files one by one only.
+            return [
+                (
+                    hub_client.files.retrieve(file_id),
+                    hub_client.files.content(file_id).content if include_content else None,
+                )
+                for file_id in file_ids
+            ]
+
+        file_cache = FileCache(retrieve_files)
+        self._file_contents = file_cache.contents
+
         def list_files_from_thread(
             order: Literal["asc", "desc"] = "asc", thread_id: Optional[str] = None
         ) -> List[FileObject]:
@@ -675,14 +716,16 @@ class Environment(object):
             attachments = [a for m in messages if m.attachments for a in m.attachments]
             # Extract files from attachments
             file_ids = [a.file_id for a in attachments]
-            files = [hub_client.files.retrieve(f) for f in file_ids if f]
-            return files
+            return file_cache.files([f for f in file_ids if f])
 
         self.list_files_from_thread = list_files_from_thread
 
         def read_file_by_id(file_id: str, decode: Union[str, None] = "utf-8"):
             """Read a file from the thread."""
-            content = hub_client.files.content(file_id).content
+            contents = file_cache.contents([file_id])
+            if file_id not in contents:
+                raise FileNotFoundError(f"File {file_id} not found")
+            content = contents[file_id]
 
             if decode:
                 return content.decode(decode)
@@ -725,6 +768,7 @@ class Environment(object):
 
             # Upload to Hub
             file = hub_client.files.create(file=(filename, file_data, filetype), purpose="assistants")
+            file_cache.add(file, content if isinstance(content, bytes) else content.encode(encoding))  # type:ignore
             self.add_reply(
                 message=f"Output file: {filename}",
                 attachments=[{"file_id": file.id}],
@@ -775,9 +819,7 @@ class Environment(object):
 
         if self._debug_mode:
             # Try to load existing logs from thread if they don't exist locally
-            self._load_log_from_thread(SYSTEM_LOG_FILENAME)
-            self._load_log_from_thread(AGENT_LOG_FILENAME)
-            self._load_log_from_thread(CHAT_HISTORY_FILENAME)
+            self._load_logs_from_thread([SYSTEM_LOG_FILENAME, AGENT_LOG_FILENAME, CHAT_HISTORY_FILENAME])
         logger = logging.getLogger("system_logger")
         logger.handlers = []
         logger = logging.getLogger("agent_logger")
@@ -797,10 +839,10 @@ class Environment(object):
 
     def register_standard_tools(self) -> None:  # noqa: D102
         reg = self.get_tool_registry()
-        reg.register_tool(self.read_file)
+        reg.register_tool(self.read_file, parallel=True)
         reg.register_tool(self.write_file)
-        reg.register_tool(self.list_files)
-        reg.register_tool(self.query_vector_store)
+        reg.register_tool(self.list_files, parallel=True)
+        reg.register_tool(self.query_vector_store, parallel=True)
 
     def get_last_message(self, role: str = "user"):
         """Reads last message from the given role and returns it."""
@@ -832,7 +874,7 @@ class Environment(object):
         if not logger.handlers:
             # Configure the logger if it hasn't been set up yet
             logger.setLevel(logging.DEBUG)
-            file_handler = logging.FileHandler(os.path.join(self.get_primary_agent_temp_dir(), SYSTEM_LOG_FILENAME))
+            file_handler = LogWriterHandler(self._log_writer, SYSTEM_LOG_FILENAME)
             formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
             file_handler.setFormatter(formatter)
             logger.addHandler(file_handler)
@@ -844,18 +886,12 @@ class Environment(object):
 
             # Add Thread log handler
             if self._debug_mode:
-                custom_handler = CustomLogHandler(self.add_reply, "system")
+                custom_handler = LogWriterHandler(self._log_writer, "system:log")
                 custom_handler.setFormatter(formatter)
                 logger.addHandler(custom_handler)
 
         # Log the message
         logger.log(level, log)
-        # Force the handler to write to disk
-        for handler in logger.handlers:
-            handler.flush()
-
-        if self._debug_mode:
-            self._save_logs_to_thread(SYSTEM_LOG_FILENAME)
 
     def add_agent_log(self, log: str, level: int = logging.INFO) -> None:
         """Add agent log with timestamp and log level."""
@@ -865,25 +901,19 @@ class Environment(object):
         if not logger.handlers:
             # Configure the logger if it hasn't been set up yet
             logger.setLevel(logging.DEBUG)
-            file_handler = logging.FileHandler(os.path.join(self.get_primary_agent_temp_dir(), AGENT_LOG_FILENAME))
+            file_handler = LogWriterHandler(self._log_writer, AGENT_LOG_FILENAME)
             formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
             file_handler.setFormatter(formatter)
             logger.addHandler(file_handler)
 
             # Add Thread log handler
             if self._debug_mode:
-                custom_handler = CustomLogHandler(self.add_reply, "agent")
+                custom_handler = LogWriterHandler(self._log_writer, "agent:log")
                 custom_handler.setFormatter(formatter)
                 logger.addHandler(custom_handler)
 
         # Log the message
         logger.log(level, log)
-        # Force the handler to write to disk
-        for handler in logger.handlers:
-            handler.flush()
-
-        if self._debug_mode:
-            self._save_logs_to_thread(AGENT_LOG_FILENAME)
 
     def add_chat_log(self, role: str, content: str, level: int = logging.INFO) -> None:
         """Add chat history to log file when in debug mode."""
@@ -897,7 +927,7 @@ class Environment(object):
         if not logger.handlers:
             # Configure the logger if it hasn't been set up yet
             logger.setLevel(logging.DEBUG)
-            file_handler = logging.FileHandler(os.path.join(self.get_primary_agent_temp_dir(), CHAT_HISTORY_FILENAME))
+            file_handler = LogWriterHandler(self._log_writer, CHAT_HISTORY_FILENAME)
             formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
             file_handler.setFormatter(formatter)
             logger.addHandler(file_handler)
@@ -905,12 +935,23 @@ class Environment(object):
         # Log the message with role prefix
         message = f"{role.upper()}: {content}"
         logger.log(level, message)
-        # Force the handler to write to disk
-        for handler in logger.handlers:
-            handler.flush()
 
+    def flush_logs(self) -> None:
+        """Writes all buffered logs to disk and to the thread."""
+        self._log_writer.flush()
+
+    def _flush_log(self, log: str, content: str) -> None:
+        if log.endswith(":log"):
+            # Log lines shown in the thread.
+            self.add_reply(message=content.rstrip("\n"), message_type=log)
+            return
+
+        with open(os.path.join(self.get_primary_agent_temp_dir(), log), "a") as f:
+            f.write(content)
         if self._debug_mode:
-            self._save_logs_to_thread(CHAT_HISTORY_FILENAME)
+            index = self._log_segments.get(log, 0)
+            self._log_segments[log] = index + 1
+            self.write_file(log_segment_filename(log, index), content, write_to_disk=False, logging=False)
 
     def add_agent_start_system_log(self, agent_idx: int) -> None:
         """Adds agent start system log."""
@@ -986,54 +1027,71 @@ class Environment(object):
 
     def read_file(self, filename: str, decode: Union[str, None] = "utf-8") -> Optional[Union[bytes, str]]:
         """Reads a file from the environment or thread."""
-        file_content: Optional[Union[bytes, str]] = None
-        # First try to read from local filesystem
-        local_path = os.path.join(self.get_primary_agent_temp_dir(), filename)
-        if os.path.exists(local_path):
-            print(f"Reading file {filename} from local path: {local_path}")
-            try:
-                with open(local_path, "rb") as local_path_file:
-                    local_file_content = local_path_file.read()
-                    file_content = local_file_content
-                    if decode:
-                        file_content = file_content.decode(decode)
-            except Exception as e:
-                print(f"Error with read_file: {e}")
-
-        if not file_content:
-            # Next check files written out by the agent.
-            # Agent output files take precedence over files packaged with the agent
-            thread_files = self.list_files_from_thread(order="desc")
-
-            # Then try to read from thread, starting from the most recent
-            for f in thread_files:
-                if f.filename == filename:
-                    file_content = self.read_file_by_id(f.id, decode)
-                    break
-
+        return self.read_files([filename], decode)[filename]
+
+    def read_files(
+        self, filenames: List[str], decode: Union[str, None] = "utf-8"
+    ) -> Dict[str, Optional[Union[bytes, str]]]:
+        """Reads files from the environment or thread, fetching the ones from the thread in a single request."""
+        contents: Dict[str, Optional[Union[bytes, str]]] = {}
+        missing = []
+        for filename in filenames:
+            file_content: Optional[Union[bytes, str]] = None
+            # First try to read from local filesystem
+            local_path = os.path.join(self.get_primary_agent_temp_dir(), filename)
+            if os.path.exists(local_path):
+                print(f"Reading file {filename} from local path: {local_path}")
+                try:
+                    with open(local_path, "rb") as local_path_file:
+                        file_content = local_path_file.read()
+                        if decode:
+                            file_content = file_content.decode(decode)
+                except Exception as e:
+                    print(f"Error with read_file: {e}")
+            contents[filename] = file_content
             if not file_content:
-                # Next check agent file cache
-                # Agent output files & thread files take precedence over cached files
-                file_cache = self.get_primary_agent().file_cache
-                if file_cache:
-                    file_content = file_cache.get(filename, None)
-
-            # Write the file content from the thread or cache to the local filesystem
-            # This allows exec_command to operate on the file
-            if file_content:
-                if not os.path.exists(os.path.dirname(local_path)):
-                    os.makedirs(os.path.dirname(local_path))
-
-                with open(local_path, "wb") as local_file:
-                    if isinstance(file_content, bytes):
-                        local_file.write(file_content)
-                    else:
-                        local_file.write(file_content.encode("utf-8"))
+                missing.append(filename)
 
-        if not file_content:
-            self.add_system_log(f"Warn: File {filename} not found during read_file operation")
-
-        return file_content
+        if missing:
+            # Next check files written out by the agent, starting from the most recent.
+            # Agent output files take precedence over files packaged with the agent
+            thread_file_ids: Dict[str, str] = {}
+            for f in self.list_files_from_thread(order="desc"):
+                if f.filename in missing:
+                    thread_file_ids.setdefault(f.filename, f.id)
+            thread_contents = self._file_contents(list(thread_file_ids.values()))
+
+            for filename in missing:
+                file_content = thread_contents.get(thread_file_ids.get(filename, ""))
+                if file_content and decode:
+                    file_content = file_content.decode(decode)
+
+                if not file_content:
+                    # Next check agent file cache
+                    # Agent output files & thread files take precedence over cached files
+                    file_cache = self.get_primary_agent().file_cache
+                    if file_cache:
+                        file_content = file_cache.get(filename, None)
+
+                # Write the file content from the thread or cache to the local filesystem
+                # This allows exec_command to operate on the file
+                if file_content:
+                    local_path = os.path.join(self.get_primary_agent_temp_dir(), filename)
+                    if not os.path.exists(os.path.dirname(local_path)):
+                        os.makedirs(os.path.dirname(local_path))
+
+                    with open(local_path, "wb") as local_file:
+                        if isinstance(file_content, bytes):
+                            local_file.write(file_content)
+                        else:
+                            local_file.write(file_content.encode("utf-8"))
+                contents[filename] = file_content
+
+        for filename in filenames:
+            if not contents[filename]:
+                self.add_system_log(f"Warn: File {filename} not found during read_file operation")
+
+        return contents
 
     def get_inference_parameters(
         self,
@@ -1194,46 +1252,68 @@ class Environment(object):
         add_responses_to_messages,
         agent_role_name,
         tool_role_name,
-    ):
+    ) -> List[ToolCallResult]:
+        """Runs the tool calls of a response, adding their outputs as messages in the order of the calls.
+
+        Only consecutive calls of tools registered as `parallel` run concurrently, see `ToolRegistry.call_tools`.
+
+        Returns the results of the calls, with the time each one took.
+        """
         (message_without_tool_call, tool_calls) = self._parse_tool_call(response_message)
         if add_responses_to_messages and response_message.content:
-            self.add_message(agent_role_name, message_without_tool_call)
-        if tool_calls:
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                try:
-                    assert function_name, "Tool call must have a function name"
-                    function_signature = self.get_tool_registry().get_tool_definition(function_name)
-                    assert function_signature, f"Tool {function_name} not found"
-                    args = tool_call.function.arguments
-                    function_args = tool_json_helper.parse_json_args(function_signature, args)
-                    self.add_system_log(f"Calling tool {function_name} with args {function_args}")
-                    function_response = self._tools.call_tool(function_name, **function_args if function_args else {})
-
-                    if function_response:
-                        try:
-                            function_response_json = json.dumps(function_response) if function_response else ""
-                            if add_responses_to_messages:
-                                self.add_message(
-                                    tool_role_name,
-                                    function_response_json,
-                                    tool_call_id=tool_call.id,
-                                    name=function_name,
-                                )
-                        except Exception as e:
-                            # some tool responses may not be serializable
-                            error_message = f"Unable to add tool output as a message {function_name}: {e}"
-                            self.add_system_log(error_message, level=logging.INFO)
-                except Exception as e:
-                    error_message = f"Error calling tool {function_name}: {e}"
-                    self.add_system_log(error_message, level=logging.ERROR)
-                    if add_responses_to_messages:
-                        self.add_message(
-                            tool_role_name,
-                            error_message,
-                            tool_call_id=tool_call.id,
-                            name=function_name,
-                        )
+            self.add_message(agent_role_name, message_without_tool_call or "")
+        if not tool_calls:
+            return []
+
+        calls: List[Tuple[str, Dict[str, Any]]] = []
+        results: List[ToolCallResult] = []
+        for tool_call in tool_calls:
+            function_name = tool_call.function.name
+            try:
+                assert function_name, "Tool call must have a function name"
+                function_signature = self.get_tool_registry().get_tool_definition(function_name)
+                assert function_signature, f"Tool {function_name} not found"
+                args = tool_call.function.arguments
+                function_args = tool_json_helper.parse_json_args(function_signature, args)
+                self.add_system_log(f"Calling tool {function_name} with args {function_args}")
+                calls.append((function_name, function_args if function_args else {}))
+                results.append(ToolCallResult(function_name, calls[-1][1]))
+            except Exception as e:
+                results.append(ToolCallResult(function_name or "", {}, error=e))
+
+        called = iter(self._tools.call_tools(calls))
+        results = [next(called) if result.error is None else result for result in results]
+
+        for tool_call, result in zip(tool_calls, results):
+            function_name = tool_call.function.name
+            if result.error is None:
+                self.add_system_log(f"Tool {function_name} took {result.duration:.3f}s")
+                function_response = result.output
+                if function_response:
+                    try:
+                        function_response_json = json.dumps(function_response) if function_response else ""
+                        if add_responses_to_messages:
+                            self.add_message(
+                                tool_role_name,
+                                function_response_json,
+                                tool_call_id=tool_call.id,
+                                name=function_name,
+                            )
+                    except Exception as e:
+                        # some tool responses may not be serializable
+                        error_message = f"Unable to add tool output as a message {function_name}: {e}"
+                        self.add_system_log(error_message, level=logging.INFO)
+            else:
+                error_message = f"Error calling tool {function_name}: {result.error}"
+                self.add_system_log(error_message, level=logging.ERROR)
+                if add_responses_to_messages:
+                    self.add_message(
+                        tool_role_name,
+                        error_message,
+                        tool_call_id=tool_call.id,
+                        name=function_name,
+                    )
+        return results
 
     @staticmethod
     def _parse_tool_call(
@@ -1401,7 +1481,7 @@ class Environment(object):
 
     def get_primary_agent_temp_dir(self) -> Path:
         """Returns temp dir for primary agent."""
-        return self.get_primary_agent().temp_dir
+        return Path(self.get_primary_agent().temp_dir)
 
     def environment_run_info(self, base_id, run_type) -> dict:
         """Returns the environment run information."""
@@ -1437,11 +1517,12 @@ class Environment(object):
 
     def clear_temp_agent_files(self, verbose=True) -> None:
         """Remove temp agent files created to be used in `runpy`."""
+        self.flush_logs()
         for agent in self._agents:
             if os.path.exists(agent.temp_dir):
                 if verbose:
                     print("removed agent.temp_files", agent.temp_dir)
-                shutil.rmtree(agent.temp_dir)
+                agent.clear_temp_dir()
 
     def set_next_actor(self, who: str) -> None:
         """Set the next actor / action in the dialogue."""
@@ -1496,9 +1577,12 @@ class Environment(object):
 
         except Exception as e:
             self.add_system_log(f"Environment run failed: {e}", logging.ERROR)
+            self.flush_logs()
             self.mark_failed()
             raise e
 
+        self.flush_logs()
+
         if not self._pending_ext_agent:
             # If no external agent was called, mark the whole run as done.
             # Else this environment will stop for now but this run will be continued later.
@@ -1517,32 +1601,32 @@ class Environment(object):
 
         return hash_obj.hexdigest()
 
-    def _load_log_from_thread(self, filename: str) -> Optional[str]:
-        """Load log file from thread if it doesn't exist locally."""
-        local_path = os.path.join(self.get_primary_agent_temp_dir(), filename)
-        print(f"Logging {filename} at: {local_path}")
-        if not os.path.exists(local_path):
-            try:
-                content = self.read_file(filename, decode="utf-8")
-                if content and isinstance(content, str):  # Type guard to ensure it's a string
-                    with open(os.path.join(local_path), "w") as f:
-                        f.write(content)
-                    return content
-            except Exception:
-                pass
-        return None
+    def _load_logs_from_thread(self, filenames: List[str]) -> None:
+        """Load log files from thread if they don't exist locally.
 
-    def _save_logs_to_thread(self, log_file: str):
-        """Save log file to thread."""
-        if not self._debug_mode:
+        A log file is its last full upload, if any, followed by the segments uploaded after it.
+        """
+        missing = []
+        for filename in filenames:
+            local_path = os.path.join(self.get_primary_agent_temp_dir(), filename)
+            print(f"Logging {filename} at: {local_path}")
+            if not os.path.exists(local_path):
+                missing.append(filename)
+        if not missing:
             return
-        log_path = os.path.join(self.get_primary_agent_temp_dir(), log_file)
-        if os.path.exists(log_path):
-            try:
-                with open(log_path, "r") as f:
-                    content = f.read()
-                # Only upload if there's content
+
+        try:
+            thread_files = self.list_files_from_thread(order="asc")
+            for filename in missing:
+                parts: List[str] = []
+                for file in thread_files:
+                    if file.filename == filename:
+                        parts = [file.id]
+                    elif is_log_segment(file.filename, filename):
+                        parts.append(file.id)
+                content = "".join(self.read_file_by_id(file_id, decode="utf-8") for file_id in parts)
                 if content:
-                    self.write_file(log_file, content, write_to_disk=False, logging=False)
-            except Exception as e:
-                print(f"Failed to save {log_file} to thread: {e}")
+                    with open(os.path.join(self.get_primary_agent_temp_dir(), filename), "w") as f:
+                        f.write(content)
+        except Exception:
+            pass
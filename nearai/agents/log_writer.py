@@ -0,0 +1,126 @@
+"""Buffered writer of the logs of a run.
+
+Log lines are buffered in memory, per log, and handed to a flush callback by a background thread every
+`flush_interval` seconds, or as soon as `max_buffer_bytes` are buffered. Each flush of a log file is uploaded to the
+thread as a new segment holding only the lines written since the previous flush: a log file in a thread is the
+concatenation of its segments, in thread order.
+
+A forked process (agents run as `AGENT_RUNNER_USER`) starts with empty writers: the lines buffered before the fork
+belong to the parent, and the child has to `flush` its own lines before it exits, as its daemon threads die with it.
+"""
+
+import logging
+import os
+import re
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+AGENT_LOG_FLUSH_INTERVAL = float(os.getenv("AGENT_LOG_FLUSH_INTERVAL", 2))
+AGENT_LOG_FLUSH_BYTES = int(os.getenv("AGENT_LOG_FLUSH_BYTES", 64 * 1024))
+
+
+def log_segment_filename(filename: str, index: int) -> str:
+    """Name of the segment `index` of the log file `filename`, e.g. `system_log.part3.txt`."""
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}.part{index}{extension}"
+
+
+def is_log_segment(name: str, filename: str) -> bool:
+    """Whether `name` is the name of a segment of the log file `filename`."""
+    stem, extension = os.path.splitext(filename)
+    return re.fullmatch(rf"{re.escape(stem)}\.part\d+{re.escape(extension)}", name) is not None
+
+
+class LogWriter:
+    """Buffers log lines and hands them to `flush_log(log, content)` in batches, from a background thread."""
+
+    def __init__(  # noqa: D107
+        self,
+        flush_log: Callable[[str, str], None],
+        flush_interval: float = AGENT_LOG_FLUSH_INTERVAL,
+        max_buffer_bytes: int = AGENT_LOG_FLUSH_BYTES,
+    ):
+        self.flush_log = flush_log
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self._pending: Dict[str, List[str]] = {}
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        _writers.add(self)
+
+    def write(self, log: str, text: str) -> None:
+        """Appends `text` to the log `log`."""
+        with self._lock:
+            self._pending.setdefault(log, []).append(text)
+            self._pending_bytes += len(text)
+            full = self._pending_bytes >= self.max_buffer_bytes
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Hands all buffered lines to `flush_log`, one call per log."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_bytes = 0
+            for log, texts in pending.items():
+                try:
+                    self.flush_log(log, "".join(texts))
+                except Exception as e:
+                    logger.warning(f"Failed to write {log}: {e}")
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            with self._lock:
+                # Stop when idle, the next write starts a new thread.
+                if not self._pending:
+                    self._thread = None
+                    return
+
+    def _reset_after_fork(self) -> None:
+        # Threads do not survive a fork, and locks may have been held by one of them.
+        self._pending = {}
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+
+_writers: "weakref.WeakSet[LogWriter]" = weakref.WeakSet()
+
+
+def _reset_writers_after_fork() -> None:
+    for writer in list(_writers):
+        writer._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_writers_after_fork)
+
+
+class LogWriterHandler(logging.Handler):
+    """Logging handler writing formatted records to the log `log` of a `LogWriter`."""
+
+    def __init__(self, writer: LogWriter, log: str):  # noqa: D107
+        super().__init__()
+        self.writer = writer
+        self.log = log
+
+    def emit(self, record):  # noqa: D102
+        try:
+            self.writer.write(self.log, self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,57 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from openai.types.file_object import FileObject
+
+RETRIEVE_FILES_BATCH_SIZE = 100
+"""Files retrieved by a single request, the limit of the hub."""
+
+
+class FileCache:
+    """Files and file contents read by a run, by file id.
+
+    Files are immutable, so each one is fetched at most once: the ones missing from the cache are fetched together,
+    with `retrieve(file_ids, include_content)`, in batches of `RETRIEVE_FILES_BATCH_SIZE`. Contents left out of a
+    response are retrieved by the next request.
+    """
+
+    def __init__(self, retrieve: Callable[[List[str], bool], List[Tuple[FileObject, Optional[bytes]]]]):  # noqa: D107
+        self._retrieve = retrieve
+        self._files: Dict[str, FileObject] = {}
+        self._contents: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def add(self, file: FileObject, content: Optional[bytes] = None) -> None:
+        """Adds a file uploaded by the run."""
+        with self._lock:
+            self._files[file.id] = file
+            if content is not None:
+                self._contents[file.id] = content
+
+    def files(self, file_ids: List[str]) -> List[FileObject]:
+        """The files found among `file_ids`, in the same order."""
+        with self._lock:
+            missing = [file_id for file_id in dict.fromkeys(file_ids) if file_id not in self._files]
+        self._fetch(missing, include_content=False)
+        with self._lock:
+            return [self._files[file_id] for file_id in file_ids if file_id in self._files]
+
+    def contents(self, file_ids: List[str]) -> Dict[str, bytes]:
+        """Contents of the files found among `file_ids`, by file id."""
+        with self._lock:
+            missing = [file_id for file_id in dict.fromkeys(file_ids) if file_id not in self._contents]
+        self._fetch(missing, include_content=True)
+        with self._lock:
+            return {file_id: self._contents[file_id] for file_id in file_ids if file_id in self._contents}
+
+    def _fetch(self, file_ids: List[str], include_content: bool) -> None:
+        while file_ids:
+            batch = file_ids[:RETRIEVE_FILES_BATCH_SIZE]
+            retrieved = self._retrieve(batch, include_content)
+            for file, content in retrieved:
+                self.add(file, content)
+            file_ids = file_ids[len(batch) :]
+            # The hub leaves out contents past the size limit of a response, they are retrieved by the next request.
+            left_out = [file.id for file, content in retrieved if content is None]
+            if include_content and len(left_out) < len(retrieved):
+                file_ids = left_out + file_ids
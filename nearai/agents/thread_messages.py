@@ -0,0 +1,40 @@
+import threading
+from typing import Callable, List, Optional
+
+from openai.types.beta.threads.message import Message
+
+
+class ThreadMessages:
+    """Messages of a thread during a run, fetched once and then only the ones after the last fetched message.
+
+    Messages added by the run are listed right away, and take their place among the fetched messages once the hub
+    lists them.
+    """
+
+    def __init__(self, fetch: Callable[[Optional[str]], List[Message]], page_size: Optional[int] = None):  # noqa: D107
+        # `fetch(after)` returns the messages after the message `after`, or from the first message if None, oldest
+        # first. A page of `page_size` messages may be followed by more, which are fetched after its last message.
+        self._fetch = fetch
+        self._page_size = page_size
+        self._fetched: List[Message] = []
+        self._added: List[Message] = []
+        self._lock = threading.Lock()
+
+    def add(self, message: Message) -> None:
+        """Adds a message created by the run."""
+        with self._lock:
+            self._added.append(message)
+
+    def list(self) -> List[Message]:
+        """All messages of the thread, oldest first."""
+        with self._lock:
+            known_ids = {message.id for message in self._fetched}
+            while True:
+                page = self._fetch(self._fetched[-1].id if self._fetched else None)
+                new_messages = [message for message in page if message.id not in known_ids]
+                self._fetched.extend(new_messages)
+                known_ids.update(message.id for message in new_messages)
+                if not new_messages or self._page_size is None or len(page) < self._page_size:
+                    break
+            self._added = [message for message in self._added if message.id not in known_ids]
+            return self._fetched + self._added
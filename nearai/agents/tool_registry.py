@@ -1,8 +1,41 @@
+import asyncio
 import inspect
-from typing import Any, Callable, Dict, Literal, Optional, _GenericAlias, get_type_hints  # type: ignore
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import (  # type: ignore
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    _GenericAlias,
+    get_type_hints,
+)
 
 from nearai.agents.models.tool_definition import MCPTool
 
+TOOL_CALL_WORKERS = int(os.getenv("TOOL_CALL_WORKERS", 8))
+
+
+@dataclass
+class ToolCallResult:
+    """Outcome of a tool call made by `ToolRegistry.call_tools`."""
+
+    name: str
+    args: Dict[str, Any]
+    output: Any = None
+    error: Optional[Exception] = None
+    duration: float = 0.0
+    """Time the call took, in seconds."""
+
 
 class ToolRegistry:
     """A registry for tools that can be called by the agent.
@@ -32,13 +65,37 @@ class ToolRegistry:
 
     def __init__(self) -> None:  # noqa: D107
         self.tools: Dict[str, Callable] = {}
+        # Names of the tools that may run concurrently with each other, see `call_tools`.
+        self.parallel_tools: Set[str] = set()
+        # Definitions of the registered tools, each with the tool it was computed from.
+        self._definitions: Dict[str, Tuple[Callable, Dict]] = {}
+        self._definitions_json: Optional[Tuple[List[Callable], str]] = None
+
+    def register_tool(self, tool: Callable, parallel: bool = False) -> None:  # noqa: D102
+        """Register a tool.
 
-    def register_tool(self, tool: Callable) -> None:  # noqa: D102
-        """Register a tool."""
+        `parallel` tools do not change any state (files, thread, environment) and may run concurrently with each
+        other, see `call_tools`.
+        """
         self.tools[tool.__name__] = tool
+        self._set_parallel(tool.__name__, parallel)
+        self._cache_definition(tool)
+
+    def _set_parallel(self, name: str, parallel: bool) -> None:
+        if parallel:
+            self.parallel_tools.add(name)
+        else:
+            self.parallel_tools.discard(name)
 
-    def register_mcp_tool(self, mcp_tool: MCPTool, call_tool: Callable) -> None:  # noqa: D102
-        """Register a tool callable from its definition."""
+    def _cache_definition(self, tool: Callable) -> None:
+        try:
+            self._definitions[tool.__name__] = (tool, _tool_definition(tool))
+        except Exception:
+            # Raised again when the definition is requested.
+            self._definitions.pop(tool.__name__, None)
+
+    def register_mcp_tool(self, mcp_tool: MCPTool, call_tool: Callable, parallel: bool = False) -> None:  # noqa: D102
+        """Register a tool callable from its definition, see `register_tool` for `parallel`."""
 
         async def tool(**kwargs):
             try:
@@ -51,6 +108,8 @@ class ToolRegistry:
         tool.__setattr__("__schema__", mcp_tool.inputSchema)
 
         self.tools[mcp_tool.name] = tool
+        self._set_parallel(mcp_tool.name, parallel)
+        self._cache_definition(tool)
 
     def get_tool(self, name: str) -> Optional[Callable]:  # noqa: D102
         """Get a tool by name."""
@@ -67,74 +126,178 @@ class ToolRegistry:
             raise ValueError(f"Tool '{name}' not found.")
         return tool(**kwargs)
 
+    def call_tools(
+        self, calls: Sequence[Tuple[str, Dict[str, Any]]], max_workers: int = TOOL_CALL_WORKERS
+    ) -> List[ToolCallResult]:
+        """Call tools, each given by name and keyword arguments.
+
+        Calls run one after the other in the order of `calls`, except consecutive calls of tools registered as
+        `parallel`, which run concurrently: coroutine tools together on an event loop, other tools on a pool of at
+        most `max_workers` threads. With `max_workers` 1 other tools run one after the other, in the calling thread.
+
+        Returns
+        -------
+        The results of the calls, in the order of `calls`. A call that raised has its exception as `error`.
+
+        """
+        results = [ToolCallResult(name, args) for name, args in calls]
+        batch: List[Tuple[Callable, ToolCallResult]] = []
+        for result in results:
+            tool = self.get_tool(result.name)
+            if tool is None:
+                result.error = ValueError(f"Tool '{result.name}' not found.")
+            elif result.name in self.parallel_tools:
+                batch.append((tool, result))
+            else:
+                # Runs alone, after the calls before it and before the calls after it.
+                _call_tools_concurrently(batch, max_workers)
+                batch = []
+                _call_tools_concurrently([(tool, result)], max_workers)
+        _call_tools_concurrently(batch, max_workers)
+        return results
+
     def get_tool_definition(self, name: str) -> Optional[Dict]:  # noqa: D102
-        """Get the definition of a tool by name."""
+        """Get the definition of a tool by name.
+
+        Definitions are computed when tools are registered, the returned definition must not be modified.
+        """
         tool = self.get_tool(name)
         if tool is None:
             return None
+        cached = self._definitions.get(name)
+        if cached is None or cached[0] is not tool:
+            # Set in `tools` directly, or without a valid definition when registered.
+            self._definitions[name] = (tool, _tool_definition(tool))
+        return self._definitions[name][1]
 
-        assert tool.__doc__ is not None, f"Docstring missing for tool '{name}'."
-        docstring = tool.__doc__.strip().split("\n")
+    def get_all_tool_definitions(self) -> list[Dict]:  # noqa: D102
+        definitions = []
+        for tool_name, _tool in self.tools.items():
+            definition = self.get_tool_definition(tool_name)
+            if definition is not None:
+                definitions.append(definition)
+        return definitions
 
-        # The first line of the docstring is the function description
-        function_description = docstring[0].strip()
+    def get_all_tool_definitions_json(self) -> str:
+        """Get the definitions of all tools, serialized as a JSON array ready to be sent."""
+        tools = list(self.tools.values())
+        if self._definitions_json is None or self._definitions_json[0] != tools:
+            self._definitions_json = (tools, json.dumps(self.get_all_tool_definitions()))
+        return self._definitions_json[1]
 
-        # The rest of the lines contain parameter descriptions
-        param_descriptions = docstring[1:]
 
-        # Extract parameter names and types
-        signature = inspect.signature(tool)
-        type_hints = get_type_hints(tool)
+def _tool_definition(tool: Callable) -> Dict:
+    """Definition of a tool, from its signature and docstring, or its `__schema__` if set."""
+    assert tool.__doc__ is not None, f"Docstring missing for tool '{tool.__name__}'."
+    docstring = tool.__doc__.strip().split("\n")
 
-        parameters: Dict[str, Any] = {"type": "object", "properties": {}, "required": []}
+    # The first line of the docstring is the function description
+    function_description = docstring[0].strip()
 
-        if hasattr(tool, "__schema__"):
-            return {
-                "type": "function",
-                "function": {"name": tool.__name__, "description": function_description, "parameters": tool.__schema__},
-            }
+    # The rest of the lines contain parameter descriptions
+    param_descriptions = docstring[1:]
 
-        # Iterate through function parameters
-        for param in signature.parameters.values():
-            param_name = param.name
-            param_type = type_hints.get(param_name, str)  # Default to str if type hint is missing
-            param_description = ""
+    # Extract parameter names and types
+    signature = inspect.signature(tool)
+    type_hints = get_type_hints(tool)
 
-            # Find the parameter description in the docstring
-            for line in param_descriptions:
-                if line.strip().startswith(param_name):
-                    param_description = line.strip().split(":", 1)[1].strip()
-                    break
+    parameters: Dict[str, Any] = {"type": "object", "properties": {}, "required": []}
 
-            # Convert type hint to JSON Schema type
-            if isinstance(param_type, _GenericAlias) and param_type.__origin__ is Literal:
-                json_type = "string"
-            else:
-                json_type = param_type.__name__.lower()
+    if hasattr(tool, "__schema__"):
+        return {
+            "type": "function",
+            "function": {"name": tool.__name__, "description": function_description, "parameters": tool.__schema__},
+        }
 
-            if json_type == "union":
-                json_type = [t.__name__.lower() for t in param_type.__args__][0]
+    # Iterate through function parameters
+    for param in signature.parameters.values():
+        param_name = param.name
+        param_type = type_hints.get(param_name, str)  # Default to str if type hint is missing
+        param_description = ""
 
-            json_type = {"int": "integer", "float": "number", "str": "string", "bool": "boolean"}.get(
-                json_type, "string"
-            )
+        # Find the parameter description in the docstring
+        for line in param_descriptions:
+            if line.strip().startswith(param_name):
+                param_description = line.strip().split(":", 1)[1].strip()
+                break
 
-            # Add parameter to the definition
-            parameters["properties"][param_name] = {"description": param_description, "type": json_type}
+        # Convert type hint to JSON Schema type
+        if isinstance(param_type, _GenericAlias) and param_type.__origin__ is Literal:
+            json_type = "string"
+        else:
+            json_type = param_type.__name__.lower()
 
-            # Params without default values are required params
-            if param.default == inspect.Parameter.empty:
-                parameters["required"].append(param_name)
+        if json_type == "union":
+            json_type = [t.__name__.lower() for t in param_type.__args__][0]
 
-        return {
-            "type": "function",
-            "function": {"name": tool.__name__, "description": function_description, "parameters": parameters},
-        }
+        json_type = {"int": "integer", "float": "number", "str": "string", "bool": "boolean"}.get(json_type, "string")
 
-    def get_all_tool_definitions(self) -> list[Dict]:  # noqa: D102
-        definitions = []
-        for tool_name, _tool in self.tools.items():
-            definition = self.get_tool_definition(tool_name)
-            if definition is not None:
-                definitions.append(definition)
-        return definitions
+        # Add parameter to the definition
+        parameters["properties"][param_name] = {"description": param_description, "type": json_type}
+
+        # Params without default values are required params
+        if param.default == inspect.Parameter.empty:
+            parameters["required"].append(param_name)
+
+    return {
+        "type": "function",
+        "function": {"name": tool.__name__, "description": function_description, "parameters": parameters},
+    }
+
+
+def _call_tools_concurrently(calls: List[Tuple[Callable, ToolCallResult]], max_workers: int) -> None:
+    sync_calls: List[Tuple[Callable, ToolCallResult]] = []
+    async_calls: List[Tuple[Callable, ToolCallResult]] = []
+    for tool, result in calls:
+        if inspect.iscoroutinefunction(tool):
+            async_calls.append((tool, result))
+        else:
+            sync_calls.append((tool, result))
+
+    executor = None
+    if max_workers > 1 and len(sync_calls) + min(len(async_calls), 1) > 1:
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(sync_calls)), thread_name_prefix="tool")
+        futures = [executor.submit(_call_tool, tool, result) for tool, result in sync_calls]
+    else:
+        for tool, result in sync_calls:
+            _call_tool(tool, result)
+
+    if async_calls:
+        _run_coroutines([_call_async_tool(tool, result) for tool, result in async_calls])
+
+    if executor is not None:
+        wait(futures)
+        executor.shutdown()
+
+
+def _call_tool(tool: Callable, result: ToolCallResult) -> None:
+    start_time = time.perf_counter()
+    try:
+        result.output = tool(**result.args)
+    except Exception as e:
+        result.error = e
+    result.duration = time.perf_counter() - start_time
+
+
+async def _call_async_tool(tool: Callable, result: ToolCallResult) -> None:
+    start_time = time.perf_counter()
+    try:
+        result.output = await tool(**result.args)
+    except Exception as e:
+        result.error = e
+    result.duration = time.perf_counter() - start_time
+
+
+def _run_coroutines(coroutines: List[Any]) -> None:
+    async def gather():
+        await asyncio.gather(*coroutines)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(gather())
+        return
+    # Called from a running event loop, which cannot be blocked on: run the coroutines on a loop of their own.
+    thread = threading.Thread(target=asyncio.run, args=(gather(),))
+    thread.start()
+    thread.join()
@@ -0,0 +1,206 @@
+"""Working directories of registry agents, reused across runs of the same agent version.
+
+The files of an agent version are written to a working directory once. When a run ends the directory is reset to the
+agent files and kept for the next run of the same version: files created by the run are removed, and files it changed
+or deleted are written again. Changes are detected on the inode and status change time of files, which a run cannot
+set back the way it can set their modification time with `os.utime`. The directory is scanned once, when it is
+materialized, for the files and modules the runner needs, and the compiled code of the agent is cached by source.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import CodeType
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+AGENT_WORKDIR_POOL_SIZE = int(os.getenv("AGENT_WORKDIR_POOL_SIZE", 8))
+AGENT_CODE_CACHE_SIZE = int(os.getenv("AGENT_CODE_CACHE_SIZE", 64))
+
+AGENT_FILENAME_PY = "agent.py"
+
+
+def file_bytes(content: Any) -> bytes:
+    """Content of an agent file as written to disk."""
+    if isinstance(content, (dict, list)):
+        try:
+            content = json.dumps(content)
+        except Exception as e:
+            print(f"Error converting content to json: {e}")
+        content = str(content)
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return content
+
+
+@dataclass
+class AgentDirScan:
+    """Files of an agent directory, as needed to run the agent."""
+
+    file_cache: Dict[str, Union[str, bytes]] = field(default_factory=dict)
+    py_modules: List[str] = field(default_factory=list)
+    """Top-level folders and python files, which the agent may import as modules."""
+    ts_files: List[str] = field(default_factory=list)
+
+
+def scan_agent_dir(path: str) -> AgentDirScan:
+    """Reads all files of an agent directory."""
+    scan = AgentDirScan()
+    for root, dirs, files in os.walk(path):
+        is_main_dir = root == path
+
+        if is_main_dir:
+            # add all folders in the root directory as potential modules to import
+            scan.py_modules.extend(dirs)
+
+        for file in files:
+            file_path = os.path.join(root, file)
+
+            if file_path.endswith(".ts"):
+                scan.ts_files.append(file_path)
+
+            if is_main_dir and file != AGENT_FILENAME_PY and file_path.endswith(".py"):
+                # save py file without extension as potential module to import
+                scan.py_modules.append(os.path.splitext(os.path.basename(file_path))[0])
+
+            relative_path = os.path.relpath(file_path, path)
+            try:
+                with open(file_path, "rb") as f:
+                    content = f.read()
+                    try:
+                        # Try to decode as text
+                        scan.file_cache[relative_path] = content.decode("utf-8")
+                    except UnicodeDecodeError:
+                        # If decoding fails, store as binary
+                        scan.file_cache[relative_path] = content
+
+            except Exception as e:
+                print(f"Error with cache creation {file_path}: {e}")
+    return scan
+
+
+@functools.lru_cache(maxsize=AGENT_CODE_CACHE_SIZE)
+def compile_agent_code(source: str, filename: str) -> CodeType:
+    """Compiled agent code, cached by source and file name."""
+    return compile(source, filename, "exec")
+
+
+@dataclass
+class Workdir:
+    key: str
+    path: str
+    files: Dict[str, bytes]
+    scan: AgentDirScan
+    stats: Dict[str, Tuple[int, int, int]] = field(default_factory=dict)
+    """Inode, size and status change time of every file when it was last written."""
+
+
+class WorkdirPool:
+    """Idle working directories of agent versions, at most `size` of them, least recently used removed first."""
+
+    def __init__(self, size: int = AGENT_WORKDIR_POOL_SIZE, root: Optional[str] = None):  # noqa: D107
+        self.size = size
+        self.root = root or tempfile.gettempdir()
+        self.materialized = 0
+        self._idle: OrderedDict[str, Workdir] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, identifier: str, agent_files: List[Dict[str, Any]]) -> Workdir:
+        """Working directory with the given files of agent `identifier`, used by a single run until released."""
+        files = {file["filename"]: file_bytes(file["content"]) for file in agent_files}
+        key = f"{identifier}#{_fingerprint(files)}"
+        with self._lock:
+            for path, workdir in self._idle.items():
+                if workdir.key == key:
+                    del self._idle[path]
+                    return workdir
+
+        path = os.path.join(self.root, f"agent_{uuid.uuid4().hex}")
+        workdir = Workdir(key=key, path=path, files=files, scan=AgentDirScan())
+        _write(workdir, files)
+        workdir.scan = scan_agent_dir(path)
+        self.materialized += 1
+        return workdir
+
+    def release(self, workdir: Workdir) -> None:
+        """Resets the directory to the agent files and keeps it for the next run of the same agent version."""
+        try:
+            _reset(workdir)
+        except Exception as e:
+            print(f"Error resetting agent directory {workdir.path}: {e}")
+            shutil.rmtree(workdir.path, ignore_errors=True)
+            return
+
+        with self._lock:
+            self._idle[workdir.path] = workdir
+            evicted = []
+            while len(self._idle) > self.size:
+                evicted.append(self._idle.popitem(last=False)[1])
+        for old in evicted:
+            shutil.rmtree(old.path, ignore_errors=True)
+
+    def idle_paths(self) -> List[str]:  # noqa: D102
+        with self._lock:
+            return list(self._idle)
+
+
+def _fingerprint(files: Dict[str, bytes]) -> str:
+    digest = hashlib.sha256()
+    for filename in sorted(files):
+        digest.update(filename.encode())
+        digest.update(hashlib.sha256(files[filename]).digest())
+    return digest.hexdigest()
+
+
+def _write(workdir: Workdir, files: Dict[str, bytes]) -> None:
+    for filename, content in files.items():
+        file_path = os.path.join(workdir.path, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Written as a new file, so that neither links nor permissions left by a run are kept.
+        if os.path.lexists(file_path):
+            os.unlink(file_path)
+        with open(file_path, "wb") as f:
+            f.write(content)
+        stat = os.lstat(file_path)
+        workdir.stats[filename] = (stat.st_ino, stat.st_size, stat.st_ctime_ns)
+
+
+def _reset(workdir: Workdir) -> None:
+    needed_dirs = {workdir.path}
+    for filename in workdir.files:
+        parent = os.path.dirname(os.path.join(workdir.path, filename))
+        while parent not in needed_dirs:
+            needed_dirs.add(parent)
+            parent = os.path.dirname(parent)
+
+    changed = set(workdir.files)
+    for root, dirs, files in os.walk(workdir.path):
+        for name in list(dirs):
+            dir_path = os.path.join(root, name)
+            if os.path.islink(dir_path) or dir_path not in needed_dirs:
+                # Created by the run.
+                dirs.remove(name)
+                if os.path.islink(dir_path):
+                    os.unlink(dir_path)
+                else:
+                    shutil.rmtree(dir_path)
+        for name in files:
+            file_path = os.path.join(root, name)
+            filename = os.path.relpath(file_path, workdir.path)
+            if filename not in workdir.files or os.path.islink(file_path):
+                os.unlink(file_path)
+                continue
+            stat = os.lstat(file_path)
+            if workdir.stats.get(filename) == (stat.st_ino, stat.st_size, stat.st_ctime_ns):
+                changed.discard(filename)
+
+    _write(workdir, {filename: workdir.files[filename] for filename in changed})
+
+
+workdir_pool = WorkdirPool()
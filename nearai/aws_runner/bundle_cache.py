@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from shutil import copyfileobj
+from typing import IO, Optional
+
+AGENT_BUNDLE_CACHE_DIR = Path(os.getenv("AGENT_BUNDLE_CACHE_DIR", Path(tempfile.gettempdir()) / "agent_bundles"))
+AGENT_BUNDLE_CACHE_MAX_BYTES = int(os.getenv("AGENT_BUNDLE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+
+class BundleCache:
+    """Registry bundles on local disk, keyed by their hash, least recently used evicted first above `max_bytes`.
+
+    For each entry the hash of its last fetched bundle is remembered, to request the bundle only if it changed.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):  # noqa: D107
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, digest: str) -> Path:  # noqa: D102
+        return self.directory / f"{digest}.tar.gz"
+
+    def _ref_path(self, identifier: str) -> Path:
+        return self.directory / "refs" / hashlib.sha256(identifier.encode()).hexdigest()
+
+    def get(self, identifier: str) -> Optional[str]:
+        """Hash of the cached bundle of the entry `identifier`, if any."""
+        ref = self._ref_path(identifier)
+        if not ref.exists():
+            return None
+        digest = ref.read_text()
+        bundle = self.path(digest)
+        if not bundle.exists():
+            return None
+        # Mark as recently used.
+        os.utime(bundle)
+        return digest
+
+    def put(self, identifier: str, digest: str, content: IO[bytes]) -> Path:
+        """Stores the bundle `digest` of the entry `identifier`, read from `content`."""
+        path = self.path(digest)
+        self._ref_path(identifier).parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as f:
+            copyfileobj(content, f)
+        os.replace(f.name, path)
+        self._ref_path(identifier).write_text(digest)
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        """Removes least recently used bundles until the cache holds at most `max_bytes`, keeping the newest one."""
+        bundles = sorted(
+            ((path.stat(), path) for path in self.directory.glob("*.tar.gz")),
+            key=lambda bundle: bundle[0].st_mtime,
+            reverse=True,
+        )
+        total = 0
+        for i, (stat, path) in enumerate(bundles):
+            total += stat.st_size
+            if i > 0 and total > self.max_bytes:
+                path.unlink(missing_ok=True)
+
+
+bundle_cache = BundleCache(AGENT_BUNDLE_CACHE_DIR, AGENT_BUNDLE_CACHE_MAX_BYTES)
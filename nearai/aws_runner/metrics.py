@@ -0,0 +1,138 @@
+"""Metrics of the agent runner, aggregated in memory and sent in batches from a background thread.
+
+Datapoints of the same metric, unit and dimensions within the same minute are aggregated into statistic values, which
+is the resolution CloudWatch stores standard metrics at. The buffer is sent every `flush_interval` seconds, as soon as
+it holds `MAX_DATUMS_PER_REQUEST` aggregates, and on `flush()`, which the runner calls when an invocation ends.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_DATUMS_PER_REQUEST = 1000
+"""Limit of `put_metric_data` on the number of datums in a request."""
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+
+_MetricKey = Tuple[str, str, Tuple[Tuple[str, str], ...], int]
+
+
+class MetricsSink(ABC):
+    """Destination of the metrics of a `MetricsBuffer`."""
+
+    @abstractmethod
+    def send(self, data: List[Dict[str, Any]]) -> None:
+        """Sends at most `MAX_DATUMS_PER_REQUEST` datums, in the format of CloudWatch `put_metric_data`."""
+
+
+class CloudWatchSink(MetricsSink):
+    def __init__(self, client: Any, namespace: str = "NearAI"):  # noqa: D107
+        self.client = client
+        self.namespace = namespace
+
+    def send(self, data: List[Dict[str, Any]]) -> None:  # noqa: D102
+        self.client.put_metric_data(Namespace=self.namespace, MetricData=data)
+
+
+class FileSink(MetricsSink):
+    """Appends each datum as a line of JSON to the file `path`, or to stdout if `path` is "-"."""
+
+    def __init__(self, path: str):  # noqa: D107
+        self.path = path
+
+    def send(self, data: List[Dict[str, Any]]) -> None:  # noqa: D102
+        lines = "".join(json.dumps(datum, default=str) + "\n" for datum in data)
+        if self.path == "-":
+            # The runner replaces `sys.stdout` during an invocation.
+            stdout = sys.__stdout__ or sys.stdout
+            stdout.write(lines)
+            stdout.flush()
+        else:
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+
+class MetricsBuffer:
+    """Aggregates metric datapoints and sends them to `sink` in batches."""
+
+    def __init__(  # noqa: D107
+        self,
+        sink: MetricsSink,
+        flush_interval: float = METRICS_FLUSH_INTERVAL,
+        dimensions: Optional[Dict[str, str]] = None,
+    ):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.dimensions = dimensions or {}
+        # SampleCount, Sum, Minimum and Maximum of each metric.
+        self._stats: Dict[_MetricKey, List[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, value: float, unit: str, dimensions: Optional[Dict[str, str]] = None) -> None:
+        """Records a datapoint of metric `name`, sent with the next batch."""
+        value = float(value)
+        all_dimensions = {**self.dimensions, **(dimensions or {})}
+        minute = int(time.time()) // 60 * 60
+        key = (name, unit, tuple(sorted(all_dimensions.items())), minute)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                self._stats[key] = [1, value, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = min(stats[2], value)
+                stats[3] = max(stats[3], value)
+            full = len(self._stats) >= MAX_DATUMS_PER_REQUEST
+        self._start()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Sends all buffered metrics."""
+        with self._flush_lock:
+            with self._lock:
+                stats, self._stats = self._stats, {}
+            data = [_datum(key, values) for key, values in stats.items()]
+            for i in range(0, len(data), MAX_DATUMS_PER_REQUEST):
+                batch = data[i : i + MAX_DATUMS_PER_REQUEST]
+                try:
+                    self.sink.send(batch)
+                except Exception as e:
+                    logger.warning(f"Error sending {len(batch)} metrics: {e}")
+
+    def _start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def _datum(key: _MetricKey, stats: List[float]) -> Dict[str, Any]:
+    name, unit, dimensions, minute = key
+    sample_count, total, minimum, maximum = stats
+    return {
+        "MetricName": name,
+        "Dimensions": [{"Name": dimension, "Value": value} for dimension, value in dimensions],
+        "Timestamp": datetime.fromtimestamp(minute, tz=timezone.utc),
+        "StatisticValues": {"SampleCount": sample_count, "Sum": total, "Minimum": minimum, "Maximum": maximum},
+        "Unit": unit,
+    }
@@ -2,6 +2,7 @@ import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List
 
+from nearai.aws_runner.bundle_cache import bundle_cache
 from nearai.openapi_client import (
     BodyDownloadFileV1RegistryDownloadFilePost,
     BodyDownloadMetadataV1RegistryDownloadMetadataPost,
@@ -10,10 +11,14 @@ from nearai.openapi_client import (
 from nearai.openapi_client.api.registry_api import RegistryApi
 from nearai.openapi_client.api_client import ApiClient
 from nearai.openapi_client.configuration import Configuration
+from nearai.openapi_client.exceptions import ApiException, NotFoundException
 from nearai.shared.auth_data import AuthData
+from nearai.shared.registry_bundle import read_bundle
 
 ENVIRONMENT_FILENAME = "environment.tar.gz"
 
+_BUNDLE_HASH = re.compile(r"[0-9a-f]{64}")
+
 
 class PartialNearClient:
     """Wrap NEAR AI api registry methods, uses generated NEAR AI client."""
@@ -68,7 +73,46 @@ class PartialNearClient:
         return [file.filename for file in result]
 
     def get_files_from_registry(self, entry_location: dict):
-        """Fetches all files from NEAR AI registry."""
+        """Fetches all files from NEAR AI registry.
+
+        Files are fetched in a single bundle, which is cached on local disk and only transferred again if the entry
+        changed. Hubs without bundles are asked for every file.
+        """
+        try:
+            return self.get_bundle_from_registry(entry_location)
+        except NotFoundException:
+            return self.get_each_file_from_registry(entry_location)
+
+    def get_bundle_from_registry(self, entry_location: dict):
+        """Fetches all files from NEAR AI registry as a single bundle, see `nearai.shared.registry_bundle`."""
+        identifier = "{namespace}/{name}/{version}".format(**entry_location)
+        cached = bundle_cache.get(identifier)
+        method, url, headers, body, _ = self._client.param_serialize(
+            method="POST",
+            resource_path="/v1/registry/download_bundle",
+            header_params={"Content-Type": "application/json", **({"If-None-Match": f'"{cached}"'} if cached else {})},
+            body={"entry_location": entry_location},
+            auth_settings=["HTTPBearer"],
+        )
+        response = self._client.call_api(method, url, headers, body)
+
+        if response.status == 304 and cached is not None:
+            path = bundle_cache.path(cached)
+            response.read()
+        elif response.status == 200:
+            digest = (response.getheader("ETag") or "").strip('"')
+            if _BUNDLE_HASH.fullmatch(digest) is None:
+                raise ValueError(f"Invalid bundle hash for {identifier}: {digest}")
+            path = bundle_cache.put(identifier, digest, response.response)
+        else:
+            data = response.read()
+            raise ApiException.from_response(http_resp=response, body=data.decode(), data=None)
+
+        with open(path, "rb") as f:
+            return read_bundle(f)
+
+    def get_each_file_from_registry(self, entry_location: dict):
+        """Fetches all files from NEAR AI registry with one request per file."""
         api_instance = RegistryApi(self._client)
 
         files = self.list_files(entry_location)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import atexit
 import io
 import json
 import logging
@@ -6,14 +7,18 @@ import os
 import shutil
 import sys
 import time
+from collections import OrderedDict
 from pathlib import Path
-from subprocess import call
-from typing import Optional
+from typing import Dict, Optional
 
 import boto3
 from ddtrace import patch_all, tracer
-from nearai.agents.agent import Agent, get_local_agent_files
+from nearai.agents.agent import TS_RUNNER_DIR, Agent, get_local_agent_files
 from nearai.agents.environment import Environment
+from nearai.agents.log_writer import LogWriter, LogWriterHandler, log_segment_filename
+from nearai.agents.workdir_pool import workdir_pool
+from nearai.aws_runner.bundle_cache import bundle_cache
+from nearai.aws_runner.metrics import CloudWatchSink, FileSink, MetricsBuffer
 from nearai.aws_runner.partial_near_client import PartialNearClient
 from nearai.registry import get_registry_folder, resolve_local_path
 from nearai.shared.auth_data import AuthData
@@ -31,10 +36,56 @@ DEFAULT_API_URL = "https://api.near.ai"
 RUNNER_LOG_PATH = "/tmp/nearai-agent-runner/runner_log.txt"
 RUNNER_LOG_FILENAME = "runner_log.txt"
 
+METRICS_FILE = os.getenv("METRICS_FILE")
+"""Without CloudWatch, metrics are appended to this file as JSON lines, or written to stdout if it is "-"."""
+AGENT_CACHE_MAX_BYTES = int(os.getenv("AGENT_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+
+class AgentCache:
+    """Agents loaded from the registry, least recently used evicted first once their files exceed `max_bytes`."""
+
+    def __init__(self, max_bytes: int):  # noqa: D107
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._agents: OrderedDict[str, Agent] = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+
+    def __contains__(self, identifier: str) -> bool:  # noqa: D105
+        return identifier in self._agents
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._agents)
+
+    def __getitem__(self, identifier: str) -> Agent:  # noqa: D105
+        self._agents.move_to_end(identifier)
+        return self._agents[identifier]
+
+    def __setitem__(self, identifier: str, agent: Agent) -> None:  # noqa: D105
+        if identifier in self._agents:
+            self._remove(identifier)
+        size = _agent_files_size(agent)
+        self._agents[identifier] = agent
+        self._sizes[identifier] = size
+        self.total_bytes += size
+        while len(self._agents) > 1 and self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._agents)))
+
+    def _remove(self, identifier: str) -> None:
+        del self._agents[identifier]
+        self.total_bytes -= self._sizes.pop(identifier)
+
+
+def _agent_files_size(agent: Agent) -> int:
+    if not isinstance(agent.agent_files, list):
+        return 0
+    contents = [file["content"] for file in agent.agent_files if isinstance(file, dict)]
+    return sum(len(content) for content in contents if isinstance(content, (bytes, str)))
+
+
 # Local caches
 provider_models_cache = None
 provider_models_cache_time = None
-local_agent_cache: dict[str, Agent] = {}
+local_agent_cache = AgentCache(AGENT_CACHE_MAX_BYTES)
 
 
 def create_cloudwatch():
@@ -47,6 +98,19 @@ def create_cloudwatch():
     return None
 
 
+def create_metrics() -> Optional[MetricsBuffer]:
+    if cloudwatch:
+        return MetricsBuffer(
+            CloudWatchSink(cloudwatch), dimensions={"FunctionName": os.environ["AWS_LAMBDA_FUNCTION_NAME"]}
+        )
+    if METRICS_FILE:
+        function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+        return MetricsBuffer(
+            FileSink(METRICS_FILE), dimensions={"FunctionName": function_name} if function_name else {}
+        )
+    return None
+
+
 def load_protected_variables():
     variables = {}
 
@@ -70,11 +134,23 @@ def load_protected_variables():
 
 
 cloudwatch = create_cloudwatch()
+metrics = create_metrics()
+if metrics:
+    atexit.register(metrics.flush)
 protected_vars = load_protected_variables()
 
 
 @tracer.wrap(service="aws-runner", resource="lambda_handler")
 def handler(event, context):
+    try:
+        return _handle(event, context)
+    finally:
+        # The runtime may be frozen as soon as the handler returns, so metrics are not left to the flush thread.
+        if metrics:
+            metrics.flush()
+
+
+def _handle(event, context):
     start_time = time.perf_counter()
     required_params = ["agents", "auth"]
     agents = event.get("agents")
@@ -96,7 +172,9 @@ def handler(event, context):
     )
 
     if verification_result == SignatureVerificationResult.VERIFY_ACCESS_KEY_OWNER_SERVICE_NOT_AVAILABLE:
-        write_metric("AdminNotifications", "SignatureAccessKeyVerificationServiceFailed", "Count")
+        write_metric(
+            "AdminNotifications", 1, "Count", dimensions={"Notification": "SignatureAccessKeyVerificationServiceFailed"}
+        )
     elif not verification_result:
         return "Unauthorized: Invalid signature"
     else:
@@ -116,6 +194,27 @@ def handler(event, context):
     )
     hub_client = client_config.get_hub_client()
 
+    runner_log_segment = 0
+
+    def upload_runner_log(filename: str, content: str) -> None:
+        # NOTE: Do not call prints in this function.
+        nonlocal runner_log_segment
+        os.makedirs(os.path.dirname(RUNNER_LOG_PATH), exist_ok=True)
+        with open(RUNNER_LOG_PATH, "a") as f:
+            f.write(content)
+        segment = log_segment_filename(filename, runner_log_segment)
+        runner_log_segment += 1
+        file = hub_client.files.create(file=(segment, content, "text/plain"), purpose="assistants")
+        hub_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="assistant",
+            content=f"Output file: {segment}",
+            attachments=[{"file_id": file.id}],
+            metadata={"message_type": "system:output_file"},
+        )
+
+    runner_log = LogWriter(upload_runner_log)
+
     logger = logging.getLogger("runner_logger")
     logger.handlers = []
 
@@ -125,39 +224,13 @@ def handler(event, context):
         if not logger.handlers:
             # Configure the logger if it hasn't been set up yet
             logger.setLevel(logging.DEBUG)
-            log_dir = os.path.dirname(RUNNER_LOG_PATH)
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir, exist_ok=True)
-            file_handler = logging.FileHandler(RUNNER_LOG_PATH)
+            file_handler = LogWriterHandler(runner_log, RUNNER_LOG_FILENAME)
             formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
             file_handler.setFormatter(formatter)
             logger.addHandler(file_handler)
 
-        # Log the message
+        # Log the message, it is written to disk and uploaded to the thread in batches
         logger.log(level, log)
-        # Force the handler to write to disk
-        for handler in logger.handlers:
-            handler.flush()
-
-        log_path = RUNNER_LOG_PATH
-        if os.path.exists(log_path):
-            try:
-                with open(log_path, "r") as f:
-                    content = f.read()
-                # Only upload if there's content
-                if content:
-                    file = hub_client.files.create(
-                        file=(RUNNER_LOG_FILENAME, content, "text/plain"), purpose="assistants"
-                    )
-                    hub_client.beta.threads.messages.create(
-                        thread_id=thread_id,
-                        role="assistant",
-                        content=f"Output file: {RUNNER_LOG_FILENAME}",
-                        attachments=[{"file_id": file.id}],
-                        metadata={"message_type": "system:output_file"},
-                    )
-            except Exception:
-                pass
 
     # Create a custom writer that logs and writes to buffer
     class LoggingWriter:
@@ -192,41 +265,48 @@ def handler(event, context):
         stderr_buffer = io.StringIO()
         sys.stderr = LoggingWriter(stderr_buffer, logger, "STDERR")
 
-    new_thread_id = run_with_environment(
-        agents,
-        auth_object,
-        thread_id,
-        run_id,
-        params=params,
-    )
+    try:
+        new_thread_id = run_with_environment(
+            agents,
+            auth_object,
+            thread_id,
+            run_id,
+            params=params,
+        )
+    finally:
+        runner_log.flush()
     if not new_thread_id:
         return f"Run not recorded. Ran {agents} agent(s)."
     stop_time = time.perf_counter()
     write_metric("RunnerExecutionFinishedDuration", stop_time - start_time)
-    call("rm -rf /tmp/..?* /tmp/.[!.]* /tmp/*", shell=True)
+    clear_tmp()
     stop_time = time.perf_counter()
     write_metric("TotalRunnerDuration", stop_time - start_time)
     return new_thread_id
 
 
-def write_metric(metric_name, value, unit="Milliseconds", verbose=True):
-    if cloudwatch and value:  # running in lambda or locally passed credentials
+def clear_tmp() -> None:
+    """Removes everything the invocation left in /tmp, except the caches reused by the next invocations."""
+    keep = {str(bundle_cache.directory), TS_RUNNER_DIR, *workdir_pool.idle_paths()}
+    for name in os.listdir("/tmp"):
+        path = os.path.join("/tmp", name)
+        if path in keep:
+            continue
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def write_metric(metric_name, value, unit="Milliseconds", verbose=True, dimensions=None):
+    if metrics and value:  # running in lambda, locally passed credentials or METRICS_FILE
         try:
-            cloudwatch.put_metric_data(
-                Namespace="NearAI",
-                MetricData=[
-                    {
-                        "MetricName": metric_name,
-                        "Value": value,
-                        "Unit": unit,
-                        "Dimensions": [
-                            {"Name": "FunctionName", "Value": os.environ["AWS_LAMBDA_FUNCTION_NAME"]},
-                        ],
-                    }
-                ],
-            )
+            metrics.add(metric_name, value, unit, dimensions)
         except Exception as e:
-            print("Caught Error writing metric to CloudWatch: ", e)
+            print("Caught Error writing metric: ", e)
     elif verbose:
         print(f"[DEBUG] • Would have written metric {metric_name} with value {value} to cloudwatch")
 
@@ -326,13 +406,14 @@ def clear_temp_agent_files(agents, verbose=True):
     for agent in agents:
         if agent.temp_dir and os.path.exists(agent.temp_dir):
             if verbose:
-                debug_info = f"""[DEBUG] • Removed agent.temp_dir {agent.temp_dir}
+                action = "Reset" if agent.workdir is not None else "Removed"
+                debug_info = f"""[DEBUG] • {action} agent.temp_dir {agent.temp_dir}
 [DEBUG]
 [DEBUG]  =======================================
 
 """
                 print(debug_info)
-            shutil.rmtree(agent.temp_dir)
+            agent.clear_temp_dir()
 
 
 class EnvironmentRun:
@@ -353,6 +434,7 @@ class EnvironmentRun:
         self.verbose = verbose
 
     def __del__(self) -> None:  # noqa: D105
+        self.env.flush_logs()
         clear_temp_agent_files(self.agents, verbose=self.verbose)
 
     def run(self, new_message: str = "") -> Optional[str]:  # noqa: D102
@@ -444,7 +526,7 @@ def start_with_environment(
     # runners stay hot, it could be adjusted down or client model caching removed.
     if not provider_models_cache or (time.time() - (provider_models_cache_time or 0) > 3600):
         if provider_models_cache_time:
-            write_metric("InferenceClientCacheCleared", "1", "Count")
+            write_metric("InferenceClientCacheCleared", 1, "Count")
         provider_models_cache_time = time.time()
         provider_models_cache = inference_client.provider_models
     else:
@@ -0,0 +1,179 @@
+"""Content-addressed store of files downloaded from the registry.
+
+Every file is stored once under `~/.nearai/blobs`, keyed by the hash the hub reports for it, and linked into the
+folder of each entry version that contains it. Versions of an entry that share unchanged files never transfer them
+again, and an interrupted download resumes from the bytes already received.
+
+Downloads of the same blob are serialized across threads and, where `fcntl` is available, across processes sharing
+the store.
+
+Files are linked into entry folders with a reflink (copy-on-write clone) where the filesystem supports it, and with a
+hard link otherwise. Blobs are read-only, so hard linked files are read-only as well: replace them rather than editing
+them in place.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import stat
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+from nearai.config import DATA_FOLDER
+
+BLOBS_FOLDER = "blobs"
+
+FICLONE = 0x40049409
+"""`ioctl` request to clone a file on Linux (btrfs, xfs, ...)."""
+
+# S3 entity tags: the MD5 of the content, or the MD5 of the part MD5s followed by the number of parts.
+_DIGEST = re.compile(r"[0-9a-f]{32}(-\d+)?")
+_CHUNK_SIZE = 1024 * 1024
+
+
+def is_digest(digest: Optional[str]) -> bool:
+    """Whether `digest` identifies content and can be used as a key of the store."""
+    return digest is not None and _DIGEST.fullmatch(digest) is not None
+
+
+class DigestMismatchError(ValueError):
+    """The downloaded content does not hash to the digest reported for it.
+
+    Entity tags are not the MD5 of the content for objects encrypted with SSE-KMS or SSE-C, and on some S3-compatible
+    stores: such files can't be kept in the store.
+    """
+
+
+class BlobStore:
+    def __init__(self, root: Optional[Path] = None):  # noqa: D107
+        self.root = root or DATA_FOLDER / BLOBS_FOLDER
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self.digests_mismatched = False
+        """Set once a download did not match its digest, after which the digests of the hub are not trusted."""
+
+    def path(self, digest: str) -> Path:  # noqa: D102
+        return self.root / digest[:2] / digest
+
+    def partial_path(self, digest: str) -> Path:  # noqa: D102
+        return self.root / "partial" / digest
+
+    def fetch(self, digest: str, size: Optional[int], download: Callable[[int], Tuple[int, IO[bytes]]]) -> Path:
+        """Returns the path of the blob `digest`, downloading it if it is not in the store yet.
+
+        Args:
+        ----
+            digest: Hash of the content, as reported by the hub.
+            size: Size of the content in bytes, if known.
+            download: Called with the number of bytes already received. Returns the offset the stream starts at,
+                which is 0 if the source can't resume, and the stream of content.
+
+        Raises:
+        ------
+            ValueError: If the downloaded content does not match `size`.
+            DigestMismatchError: If the downloaded content does not match `digest`.
+
+        """
+        with self._locks_lock:
+            lock = self._locks.setdefault(digest, threading.Lock())
+        with lock, self._process_lock(digest):
+            return self._fetch(digest, size, download)
+
+    @contextmanager
+    def _process_lock(self, digest: str) -> Iterator[None]:
+        """Exclusive lock on the download of `digest`, held against other processes sharing the store."""
+        if fcntl is None:
+            yield
+            return
+        lock_path = self.root / "partial" / f"{digest}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        # The lock file is left in place: removing it would let a process lock a new file while another one holds
+        # the lock on the removed one.
+        with open(lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _fetch(self, digest: str, size: Optional[int], download: Callable[[int], Tuple[int, IO[bytes]]]) -> Path:
+        path = self.path(digest)
+        if path.exists():
+            return path
+
+        partial = self.partial_path(digest)
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        received = partial.stat().st_size if partial.exists() else 0
+        if size is not None and received > size:
+            received = 0
+
+        if size is None or received < size:
+            offset, stream = download(received)
+            with open(partial, "r+b" if offset > 0 else "wb") as f:
+                f.seek(offset)
+                f.truncate()
+                shutil.copyfileobj(stream, f, _CHUNK_SIZE)
+
+        received = partial.stat().st_size
+        if size is not None and received != size:
+            if received > size:
+                partial.unlink()
+            raise ValueError(f"Downloaded {received} bytes of blob {digest}, expected {size}")
+        if "-" not in digest and _md5(partial) != digest:
+            partial.unlink()
+            self.digests_mismatched = True
+            raise DigestMismatchError(f"Downloaded content does not match blob {digest}")
+
+        partial.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(partial, path)
+        return path
+
+    def link(self, digest: str, destination: Path) -> None:
+        """Places the blob `digest` at `destination`, replacing any file there."""
+        blob = self.path(digest)
+        if destination.exists():
+            if destination.samefile(blob):
+                return
+            destination.unlink()
+        destination.parent.mkdir(parents=True, exist_ok=True)
+
+        if _reflink(blob, destination):
+            return
+        try:
+            os.link(blob, destination)
+        except OSError:
+            # Different filesystems, or links are not supported.
+            shutil.copyfile(blob, destination)
+
+    def contains(self, digest: str) -> bool:  # noqa: D102
+        return self.path(digest).exists()
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    if fcntl is None:
+        return False
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    destination.unlink()
+    return False
+
+
+def _md5(path: Path) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            md5.update(chunk)
+    return md5.hexdigest()
@@ -94,6 +94,8 @@ class Config(BaseModel):
     confirm_commands: bool = True
     auth: Optional[AuthData] = None
     num_inference_retries: int = 1
+    registry_download_workers: int = 8
+    registry_upload_workers: int = 8
 
     def update_with(self, extra_config: Dict[str, Any], map_key: Callable[[str], str] = lambda x: x) -> "Config":
         """Update the config with the given dictionary."""
@@ -17,7 +17,7 @@ import pprint
 import re  # noqa: F401
 import json
 
-from pydantic import BaseModel, ConfigDict, StrictStr
+from pydantic import BaseModel, ConfigDict, StrictInt, StrictStr
 from typing import Any, ClassVar, Dict, List
 from typing import Optional, Set
 from typing_extensions import Self
@@ -27,7 +27,9 @@ class Filename(BaseModel):
     Filename
     """ # noqa: E501
     filename: StrictStr
-    __properties: ClassVar[List[str]] = ["filename"]
+    size: Optional[StrictInt] = None
+    etag: Optional[StrictStr] = None
+    __properties: ClassVar[List[str]] = ["filename", "size", "etag"]
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -68,6 +70,16 @@ class Filename(BaseModel):
             exclude=excluded_fields,
             exclude_none=True,
         )
+        # set to None if size (nullable) is None
+        # and model_fields_set contains the field
+        if self.size is None and "size" in self.model_fields_set:
+            _dict['size'] = None
+
+        # set to None if etag (nullable) is None
+        # and model_fields_set contains the field
+        if self.etag is None and "etag" in self.model_fields_set:
+            _dict['etag'] = None
+
         return _dict
 
     @classmethod
@@ -80,7 +92,9 @@ class Filename(BaseModel):
             return cls.model_validate(obj)
 
         _obj = cls.model_validate({
-            "filename": obj.get("filename")
+            "filename": obj.get("filename"),
+            "size": obj.get("size"),
+            "etag": obj.get("etag")
         })
         return _obj
 
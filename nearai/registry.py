@@ -1,7 +1,9 @@
+import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from shutil import copyfileobj
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import IO, Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 from packaging.version import InvalidVersion, Version
 from tqdm import tqdm
@@ -10,9 +12,10 @@ from tqdm import tqdm
 #       before creating RegistryApi object. This is because setup_api_client sets the default configuration for the
 #       API client that is used by Registry API.
 from nearai.agents.agent import get_local_agent_files
+from nearai.blob_store import BlobStore, DigestMismatchError, is_digest
 from nearai.config import CONFIG, DATA_FOLDER
 from nearai.lib import check_metadata_present, parse_location
-from nearai.openapi_client import EntryInformation, EntryLocation, EntryMetadata, EntryMetadataInput
+from nearai.openapi_client import EntryInformation, EntryLocation, EntryMetadata, EntryMetadataInput, Filename
 from nearai.openapi_client.api.registry_api import (
     BodyDownloadFileV1RegistryDownloadFilePost,
     BodyDownloadMetadataV1RegistryDownloadMetadataPost,
@@ -20,7 +23,8 @@ from nearai.openapi_client.api.registry_api import (
     BodyUploadMetadataV1RegistryUploadMetadataPost,
     RegistryApi,
 )
-from nearai.openapi_client.exceptions import BadRequestException, NotFoundException
+from nearai.openapi_client.exceptions import ApiException, BadRequestException, NotFoundException
+from nearai.openapi_client.rest import RESTResponse
 from nearai.shared.naming import NamespacedName, get_canonical_name
 
 REGISTRY_FOLDER = "registry"
@@ -104,6 +108,7 @@ class Registry:
         """Create Registry object to interact with the registry programmatically."""
         self.download_folder = DATA_FOLDER / "registry"
         self.api = RegistryApi()
+        self.blobs = BlobStore()
 
         if not self.download_folder.exists():
             self.download_folder.mkdir(parents=True, exist_ok=True)
@@ -146,19 +151,49 @@ class Registry:
 
     def download_file(self, entry_location: EntryLocation, path: Path, local_path: Path):
         """Download a file from the registry."""
+        _, result = self._open_file(entry_location, path)
+
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(local_path, "wb") as f:
+            copyfileobj(result, f)
+
+    def _open_file(self, entry_location: EntryLocation, path: Path, offset: int = 0) -> Tuple[int, IO[bytes]]:
+        """Opens a file of the registry for reading from byte `offset`, or from the start if the hub can't resume."""
         result = self.api.download_file_v1_registry_download_file_post_without_preload_content(
             BodyDownloadFileV1RegistryDownloadFilePost.from_dict(
                 dict(
                     entry_location=entry_location,
                     path=str(path),
                 )
-            )
+            ),
+            _headers={"Range": f"bytes={offset}-"} if offset > 0 else None,
         )
+        if result.status == 416:
+            return self._open_file(entry_location, path)
+        if result.status >= 400:
+            raise ApiException(http_resp=result)
+        return (offset if result.status == 206 else 0), result
 
-        local_path.parent.mkdir(parents=True, exist_ok=True)
+    def _fetch_file(self, entry_location: EntryLocation, file: Filename, local_path: Path) -> None:
+        """Places a file of the registry at `local_path`, transferring it only if it is not in the blob store.
 
-        with open(local_path, "wb") as f:
-            copyfileobj(result, f)
+        Files are downloaded directly, bypassing the store, when their entity tag is not known to be their digest.
+        """
+        if is_digest(file.etag) and not self.blobs.digests_mismatched:
+            assert file.etag is not None
+            try:
+                self.blobs.fetch(
+                    file.etag, file.size, lambda offset: self._open_file(entry_location, Path(file.filename), offset)
+                )
+                self.blobs.link(file.etag, local_path)
+                return
+            except DigestMismatchError:
+                pass
+
+        # Not written in place, `local_path` may be linked to the blob store by a former download.
+        local_path.unlink(missing_ok=True)
+        self.download_file(entry_location, Path(file.filename), local_path)
 
     def download(
         self,
@@ -167,13 +202,20 @@ class Registry:
         show_progress: bool = False,
         verbose: bool = True,
     ) -> Path:
-        """Download entry from the registry locally."""
+        """Download entry from the registry locally.
+
+        Files are fetched concurrently, by up to `CONFIG.registry_download_workers` workers, into the blob store
+        and linked into the entry folder. Files already in the store, e.g. unchanged files of other versions of the
+        entry, are not transferred again. `metadata.json` is written last, so that an interrupted download is
+        resumed on the next call.
+        """
         if isinstance(entry_location, str):
             entry_location = parse_location(entry_location)
 
         download_path = get_registry_folder() / entry_location.namespace / entry_location.name / entry_location.version
+        metadata_path = download_path / "metadata.json"
 
-        if download_path.exists():
+        if metadata_path.exists():
             if not force:
                 if verbose:
                     print(
@@ -181,23 +223,32 @@ class Registry:
                     )
                 return download_path
 
-        files = registry.list_files(entry_location)
+        files = self.list_files_info(entry_location)
 
         download_path.mkdir(parents=True, exist_ok=True)
 
-        metadata = registry.info(entry_location)
+        metadata = self.info(entry_location)
 
         if metadata is None:
             raise ValueError(f"Entry {entry_location} not found.")
 
-        metadata_path = download_path / "metadata.json"
+        workers = max(1, min(CONFIG.registry_download_workers, len(files)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._fetch_file, entry_location, file, download_path / file.filename): file
+                for file in files
+            }
+            with tqdm(total=len(files), disable=not show_progress) as pbar:
+                for future in as_completed(futures):
+                    future.result()
+                    pbar.set_description(futures[future].filename)
+                    pbar.update(1)
+
+        # The entry may contain a metadata.json linked to the blob store.
+        metadata_path.unlink(missing_ok=True)
         with open(metadata_path, "w") as f:
             f.write(metadata.model_dump_json(indent=2))
 
-        for file in (pbar := tqdm(files, disable=not show_progress)):
-            pbar.set_description(file)
-            registry.download_file(entry_location, file, download_path / file)
-
         return download_path
 
     def upload(
@@ -283,21 +334,101 @@ class Registry:
             files_to_upload.append((file, relative, size))
 
         pbar = tqdm(total=total_size, unit="B", unit_scale=True, disable=not show_progress)
-        for file, relative, size in files_to_upload:
-            registry.upload_file(entry_location, file, relative)
-            pbar.update(size)
+        self.upload_files(entry_location, files_to_upload, pbar.update)
+        pbar.close()
 
         return entry_location
 
+    def upload_files(
+        self,
+        entry_location: EntryLocation,
+        files: List[Tuple[Path, Path, int]],
+        on_uploaded: Optional[Callable[[int], Any]] = None,
+    ) -> None:
+        """Upload files to an entry, transferring only the content the hub does not store yet.
+
+        `files` are (local path, path in the entry, size) triples. The hub receives a manifest of the files with their
+        SHA-256 first, and the files it does not already have are streamed from disk, by up to
+        `CONFIG.registry_upload_workers` concurrent uploads. `on_uploaded` is called with the size of each file once
+        it is in the entry. Hubs without manifests receive every file through `upload_file`.
+        """
+        workers = max(1, min(CONFIG.registry_upload_workers, len(files)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            hashes = list(executor.map(lambda file: _sha256(file[0]), files))
+            manifest = [
+                {"path": str(path), "size": size, "sha256": sha256} for (_, path, size), sha256 in zip(files, hashes)
+            ]
+            try:
+                known_hashes: Optional[Set[str]] = set(self._upload_manifest(entry_location, manifest))
+            except NotFoundException:
+                known_hashes = None
+
+            def upload(local_path: Path, path: Path, size: int, sha256: str) -> None:
+                if known_hashes is None:
+                    self.upload_file(entry_location, local_path, path)
+                elif sha256 not in known_hashes:
+                    self._upload_blob(entry_location, local_path, path, size, sha256)
+                if on_uploaded is not None:
+                    on_uploaded(size)
+
+            futures = [executor.submit(upload, *file, sha256) for file, sha256 in zip(files, hashes)]
+            for future in as_completed(futures):
+                future.result()
+
+    def _upload_manifest(self, entry_location: EntryLocation, files: List[Dict[str, Any]]) -> List[str]:
+        """Sends the manifest of the files of an entry. Returns the hashes of the content the hub already has."""
+        api_client = self.api.api_client
+        method, url, headers, body, _ = api_client.param_serialize(
+            method="POST",
+            resource_path="/v1/registry/upload_manifest",
+            header_params={"Content-Type": "application/json", "Accept": "application/json"},
+            body={"entry_location": entry_location.to_dict(), "files": files},
+            auth_settings=["HTTPBearer"],
+        )
+        response = api_client.call_api(method, url, headers, body)
+        data = response.read()
+        if response.status >= 400:
+            raise ApiException.from_response(http_resp=response, body=data.decode(), data=None)
+        return json.loads(data)["known_hashes"]
+
+    def _upload_blob(self, entry_location: EntryLocation, local_path: Path, path: Path, size: int, sha256: str):
+        """Streams a file of the manifest from disk to the entry."""
+        api_client = self.api.api_client
+        method, url, headers, _, _ = api_client.param_serialize(
+            method="PUT",
+            resource_path="/v1/registry/upload_blob",
+            query_params=[
+                ("namespace", entry_location.namespace),
+                ("name", entry_location.name),
+                ("version", entry_location.version),
+                ("path", str(path)),
+                ("sha256", sha256),
+                ("size", size),
+            ],
+            header_params={"Content-Type": "application/octet-stream", "Content-Length": str(size)},
+            auth_settings=["HTTPBearer"],
+        )
+        with open(local_path, "rb") as f:
+            response = RESTResponse(api_client.rest_client.pool_manager.request(method, url, body=f, headers=headers))
+        data = response.read()
+        if response.status >= 400:
+            body = data.decode()
+            if response.status == 400 and "already exists" in body:
+                return
+            raise ApiException.from_response(http_resp=response, body=body, data=None)
+
     def list_files(self, entry_location: EntryLocation) -> List[str]:
         """List files in from an entry in the registry.
 
         Return the relative paths to all files with respect to the root of the entry.
         """
-        result = self.api.list_files_v1_registry_list_files_post(
+        return [file.filename for file in self.list_files_info(entry_location)]
+
+    def list_files_info(self, entry_location: EntryLocation) -> List[Filename]:
+        """List files from an entry in the registry, with their size and hash if the hub reports them."""
+        return self.api.list_files_v1_registry_list_files_post(
             BodyListFilesV1RegistryListFilesPost.from_dict(dict(entry_location=entry_location))
         )
-        return [file.filename for file in result]
 
     def list(
         self,
@@ -352,6 +483,14 @@ class Registry:
         return result
 
 
+def _sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
 def check_version_exists(namespace: str, name: str, version: str) -> Tuple[bool, Optional[str]]:
     """Check if a version already exists in the registry.
 
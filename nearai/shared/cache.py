@@ -1,25 +1,333 @@
+import asyncio
+import logging
+import threading
 import time
+import weakref
+from collections import OrderedDict
 from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
 
+logger = logging.getLogger(__name__)
 
-def mem_cache_with_timeout(timeout: int):
-    """Decorator to cache function results for a specified timeout period."""
+_NOT_FOUND = object()
+
+# Every named cache (LruTtlCache or SingleFlightCache), so that their metrics can be reported together.
+_caches: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
+
+class LruTtlCache:
+    """Thread-safe cache bounded by number of entries (LRU eviction) and, optionally, by age.
+
+    Args:
+    ----
+        max_entries: Maximum number of entries kept, the least recently used one is evicted first.
+        ttl: Seconds after which an entry is considered expired. `None` keeps entries until evicted.
+            Can be overridden per entry in `set`.
+        name: When given, the cache is registered and reported by `cache_stats()`.
+
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None, name: Optional[str] = None):  # noqa: D107
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        # key -> (value, monotonic expiry time or None)
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if name is not None:
+            _caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for `key`, or `default` if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or time.monotonic() < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value` for `key`, expiring after `ttl` seconds (defaults to the ttl of the cache)."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, None if ttl is None else time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:  # noqa: D102
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self) -> List[Hashable]:
+        """Snapshot of the keys currently stored, including expired ones not yet evicted."""
+        with self._lock:
+            return list(self._data)
+
+    def clear(self) -> None:  # noqa: D102
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, hit/miss/eviction counters and hit rate of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class _Flight:
+    """A computation in progress, that concurrent callers for the same key wait for."""
+
+    def __init__(self):  # noqa: D107
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    """Bounded TTL cache computing each missing key once, however many callers ask for it concurrently.
+
+    Args:
+    ----
+        max_entries: Maximum number of entries kept, the least recently used one is evicted first.
+        ttl: Seconds during which a value is fresh. `None` keeps values until evicted.
+        stale_ttl: Seconds after `ttl` during which the stale value is still returned while a single background
+            refresh runs (stale-while-revalidate). 0 disables it.
+        name: When given, the cache is registered and reported by `cache_stats()`.
+        should_cache: When given, computed values for which it returns False are returned but not stored.
+
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        stale_ttl: float = 0.0,
+        name: Optional[str] = None,
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.should_cache = should_cache
+        # key -> (value, monotonic time until which the value is fresh)
+        self._cache = LruTtlCache(max_entries=max_entries, ttl=None if ttl is None else ttl + stale_ttl)
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+        if name is not None:
+            _caches[name] = self
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Cached value of `key`, calling `compute()` (once for all concurrent callers) if it is missing."""
+        value, fresh = self._lookup(key)
+        if value is not _NOT_FOUND:
+            if not fresh:
+                self._refresh_in_background(key, compute)
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if is_leader:
+            return self._lead(key, flight, compute)
+        flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of `get_or_compute`, `compute()` returns an awaitable."""
+        value, fresh = self._lookup(key)
+        if value is not _NOT_FOUND:
+            if not fresh:
+                self._flight_task(key, compute, background=True)
+            return value
+        # Shielded, so that a cancelled caller does not cancel the computation other callers wait for.
+        return await asyncio.shield(self._flight_task(key, compute))
+
+    def invalidate(self, key: Hashable) -> None:  # noqa: D102
+        self._cache.invalidate(key)
+
+    def clear(self) -> None:  # noqa: D102
+        self._cache.clear()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._cache)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, hit/miss/eviction counters, and single-flight counters of the cache."""
+        stats = self._cache.stats()
+        stats.update(
+            {
+                "stale_hits": self.stale_hits,
+                "coalesced": self.coalesced,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+            }
+        )
+        return stats
+
+    def _lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return _NOT_FOUND, False
+        value, fresh_until = entry
+        if fresh_until is None or time.monotonic() < fresh_until:
+            return value, True
+        self.stale_hits += 1
+        return value, False
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if self.should_cache is not None and not self.should_cache(value):
+            return
+        fresh_until = None if self.ttl is None else time.monotonic() + self.ttl
+        self._cache.set(key, (value, fresh_until))
+
+    def _lead(self, key: Hashable, flight: _Flight, compute: Callable[[], Any]) -> Any:
+        try:
+            flight.value = compute()
+            self._store(key, flight.value)
+            return flight.value
+        except BaseException as e:
+            self.errors += 1
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _refresh_in_background(self, key: Hashable, compute: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+            self.refreshes += 1
+
+        def refresh():
+            try:
+                self._lead(key, flight, compute)
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.name or 'cache'} entry failed: {e}")
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _flight_task(self, key: Hashable, compute: Callable[[], Awaitable[Any]], background: bool = False):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._async_flights.get(key)
+            if task is not None and task.get_loop() is loop:
+                if not background:
+                    self.coalesced += 1
+                return task
+            if background:
+                self.refreshes += 1
+
+            async def lead():
+                try:
+                    value = await compute()
+                except BaseException:
+                    self.errors += 1
+                    raise
+                finally:
+                    with self._lock:
+                        if self._async_flights.get(key) is task:
+                            del self._async_flights[key]
+                self._store(key, value)
+                return value
+
+            task = self._async_flights[key] = loop.create_task(lead())
+        if background:
+            task.add_done_callback(self._log_background_error)
+        return task
+
+    def _log_background_error(self, task: "asyncio.Task[Any]") -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh of {self.name or 'cache'} entry failed: {task.exception()}")
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every named cache in this process."""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
+
+
+def _make_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    return (args, frozenset(kwargs.items())) if kwargs else args
+
+
+def cached(
+    ttl: Optional[float] = None,
+    max_entries: int = 1024,
+    stale_ttl: float = 0.0,
+    name: Optional[str] = None,
+    should_cache: Optional[Callable[[Any], bool]] = None,
+):
+    """Decorator caching the results of a function (sync or async) in a `SingleFlightCache`.
+
+    Arguments of the function must be hashable, they are the cache key. Exceptions are not cached, nor results for
+    which `should_cache` returns False. The cache is available as the `cache` attribute of the decorated function, and
+    reported by `cache_stats()` under `name` (defaults to the qualified name of the function).
+    """
 
     def decorator(func):
-        cache = {}
+        cache = SingleFlightCache(
+            max_entries=max_entries,
+            ttl=ttl,
+            stale_ttl=stale_ttl,
+            name=name or f"{func.__module__}.{func.__qualname__}",
+            should_cache=should_cache,
+        )
+
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await cache.aget_or_compute(_make_key(args, kwargs), lambda: func(*args, **kwargs))
+
+            async_wrapper.cache = cache  # type: ignore
+            return async_wrapper
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            now = time.time()
-            key = (args, frozenset(kwargs.items()))
-            if key in cache:
-                result, timestamp = cache[key]
-                if now - timestamp < timeout:
-                    return result
-            result = func(*args, **kwargs)
-            cache[key] = (result, now)
-            return result
+            return cache.get_or_compute(_make_key(args, kwargs), lambda: func(*args, **kwargs))
 
+        wrapper.cache = cache  # type: ignore
         return wrapper
 
     return decorator
+
+
+def mem_cache_with_timeout(timeout: int, max_entries: int = 1024):
+    """Decorator to cache function results for a specified timeout period.
+
+    Kept for compatibility, see `cached` for the options (size bound, single-flight, stale-while-revalidate).
+    """
+    return cached(ttl=timeout, max_entries=max_entries)
@@ -1,8 +1,9 @@
+import base64
 import io
 import json
 from datetime import datetime
 from functools import cached_property
-from typing import Any, Dict, Iterable, List, Literal, Optional, Union
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple, Union
 
 import litellm
 import openai
@@ -417,6 +418,23 @@ class InferenceClient(object):
             cast_to=str,
         )
 
+    def retrieve_files(
+        self, file_ids: List[str], include_content: bool = False
+    ) -> List[Tuple[FileObject, Optional[bytes]]]:
+        """Retrieve several files, with their contents if `include_content`. Files not found are left out."""
+        response = self.client.post(
+            path=f"{self._config.base_url}/files/retrieve",
+            body={"file_ids": file_ids, "include_content": include_content},
+            cast_to=Dict[str, Any],
+        )
+        return [
+            (
+                FileObject(**retrieved["file"]),
+                base64.b64decode(retrieved["content"]) if retrieved.get("content") is not None else None,
+            )
+            for retrieved in response["data"]
+        ]
+
     def generate_image(self, prompt: str):
         """Generate an image."""
         return self.client.images.generate(prompt=prompt)
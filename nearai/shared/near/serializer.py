@@ -1,3 +1,8 @@
+from typing import Any, Callable, Dict
+
+Encoder = Callable[[bytearray, Any], None]
+
+
 class BinarySerializer:
     def __init__(self, schema):  # noqa: D107
         self.array = bytearray()
@@ -158,3 +163,142 @@ class BinarySerializer:
         ret = self.deserialize_field(type_)
         assert self.offset == len(bytes_), "%s != %s" % (self.offset, len(bytes_))
         return ret
+
+
+def compile_serializer(schema: Dict[type, Any], type_: type) -> Callable[[Any], bytes]:
+    """Compile the schema of `type_` into a serializer function, once.
+
+    `BinarySerializer(schema).serialize(obj)` walks the schema for every call. The returned function produces the
+    same bytes from a tree of closures built ahead of time, which is several times faster on hot paths like
+    signature verification.
+    """
+    compiled: Dict[type, Encoder] = {}
+
+    def compile_struct(struct_type: type) -> Encoder:
+        if struct_type in compiled:
+            return compiled[struct_type]
+
+        def lazy(out: bytearray, value: Any) -> None:
+            compiled[struct_type](out, value)
+
+        compiled[struct_type] = lazy  # allows recursive schemas
+        struct_schema = schema[struct_type]
+        if struct_schema["kind"] == "struct":
+            fields = [(name, compile_field(field_type)) for name, field_type in struct_schema["fields"]]
+
+            def encode_struct(out: bytearray, value: Any) -> None:
+                assert type(value) == struct_type, "%s != type(%s)" % (struct_type, value)  # noqa: E721
+                for name, encode in fields:
+                    encode(out, getattr(value, name))
+
+            compiled[struct_type] = encode_struct
+        elif struct_schema["kind"] == "enum":
+            variants = [(name, compile_field(field_type)) for name, field_type in struct_schema["values"]]
+            tag_field = struct_schema["field"]
+
+            def encode_enum(out: bytearray, value: Any) -> None:
+                assert type(value) == struct_type, "%s != type(%s)" % (struct_type, value)  # noqa: E721
+                name = getattr(value, tag_field)
+                for idx, (variant, encode) in enumerate(variants):
+                    if variant == name:
+                        out.append(idx)
+                        encode(out, getattr(value, variant))
+                        return
+                raise AssertionError(name)
+
+            compiled[struct_type] = encode_enum
+        else:
+            raise AssertionError(struct_schema)
+        return compiled[struct_type]
+
+    def compile_field(field_type: Any) -> Encoder:  # noqa: C901
+        if type(field_type) == tuple:  # noqa: E721
+            encoders = [compile_field(t) for t in field_type]
+
+            def encode_tuple(out: bytearray, value: Any) -> None:
+                if encoders:
+                    assert len(value) == len(encoders)
+                    for v, encode in zip(value, encoders):
+                        encode(out, v)
+
+            return encode_tuple
+        elif type(field_type) == str:  # noqa: E721
+            if field_type == "bool":
+
+                def encode_bool(out: bytearray, value: Any) -> None:
+                    assert isinstance(value, bool), str(type(value))
+                    out.append(int(value))
+
+                return encode_bool
+            elif field_type[0] == "u":
+                n_bytes = int(field_type[1:]) // 8
+
+                def encode_num(out: bytearray, value: Any) -> None:
+                    assert value >= 0
+                    out += value.to_bytes(n_bytes, "little")
+
+                return encode_num
+            elif field_type == "string":
+
+                def encode_string(out: bytearray, value: Any) -> None:
+                    b = value.encode("utf8")
+                    out += len(b).to_bytes(4, "little")
+                    out += b
+
+                return encode_string
+            raise AssertionError(field_type)
+        elif type(field_type) == list:  # noqa: E721
+            assert len(field_type) == 1
+            if type(field_type[0]) == int:  # noqa: E721
+                size = field_type[0]
+
+                def encode_fixed_bytes(out: bytearray, value: Any) -> None:
+                    assert type(value) == bytes  # noqa: E721
+                    assert len(value) == size, "len(%r) = %s != %s" % (value, len(value), size)
+                    out += value
+
+                return encode_fixed_bytes
+            encode_item = compile_field(field_type[0])
+
+            def encode_list(out: bytearray, value: Any) -> None:
+                out += len(value).to_bytes(4, "little")
+                for item in value:
+                    encode_item(out, item)
+
+            return encode_list
+        elif type(field_type) == dict:  # noqa: E721
+            if "kind" not in field_type:
+                raise ValueError(f"Invalid field_type: {field_type}")
+            if field_type["kind"] == "option":
+                encode_some = compile_field(field_type["type"])
+
+                def encode_option(out: bytearray, value: Any) -> None:
+                    if value is None:
+                        out.append(0)
+                    else:
+                        out.append(1)
+                        encode_some(out, value)
+
+                return encode_option
+            elif field_type["kind"] == "struct":
+                fields = [(name, compile_field(details)) for name, details in field_type["fields"]]
+
+                def encode_dict_struct(out: bytearray, value: Any) -> None:
+                    assert isinstance(value, dict), f"Expected dict for struct, got {type(value)}"
+                    for name, encode in fields:
+                        encode(out, value[name])
+
+                return encode_dict_struct
+            raise ValueError(f"Unknown kind: {field_type['kind']}")
+        elif type(field_type) == type:  # noqa: E721
+            return compile_struct(field_type)
+        raise AssertionError(type(field_type))
+
+    encode_root = compile_struct(type_)
+
+    def serialize(obj: Any) -> bytes:
+        out = bytearray()
+        encode_root(out, obj)
+        return bytes(out)
+
+    return serialize
@@ -3,6 +3,7 @@ import hashlib
 import logging
 import time
 from enum import Enum
+from functools import lru_cache
 from typing import Any, List, Optional, Union
 
 import base58
@@ -10,8 +11,8 @@ import ed25519
 import nacl.signing
 import requests
 
-from nearai.shared.cache import mem_cache_with_timeout
-from nearai.shared.near.serializer import BinarySerializer
+from nearai.shared.cache import cached
+from nearai.shared.near.serializer import compile_serializer
 
 ED_PREFIX = "ed25519:"  # noqa: N806
 logger = logging.getLogger(__name__)
@@ -50,6 +51,8 @@ PAYLOAD_SCHEMA: list[list[Any]] = [
     ]
 ]
 
+serialize_payload = compile_serializer(dict(PAYLOAD_SCHEMA), Payload)
+
 
 def convert_nonce(value: Union[str, bytes, list[int]]):
     """Converts a given value to a 32-byte nonce."""
@@ -123,7 +126,13 @@ def verify_signed_message(
     return SignatureVerificationResult.FALSE
 
 
-@mem_cache_with_timeout(300)
+@cached(
+    ttl=300,
+    max_entries=16384,
+    name="access_key_owner",
+    # The service may be available again for the next request.
+    should_cache=lambda result: result != SignatureVerificationResult.VERIFY_ACCESS_KEY_OWNER_SERVICE_NOT_AVAILABLE,
+)
 def verify_access_key_owner(public_key, account_id) -> SignatureVerificationResult:
     """Verifies if a given public key belongs to a specified account ID using FastNEAR API."""
     try:
@@ -147,7 +156,7 @@ def verify_access_key_owner(public_key, account_id) -> SignatureVerificationResu
 
 def create_signature(private_key: str, payload: Payload) -> tuple[str, str]:
     """Creates a cryptographic signature for a given payload using a specified private key."""
-    borsh_payload = BinarySerializer(dict(PAYLOAD_SCHEMA)).serialize(payload)
+    borsh_payload = serialize_payload(payload)
 
     to_sign = hashlib.sha256(borsh_payload).digest()
 
@@ -173,13 +182,19 @@ def create_signature(private_key: str, payload: Payload) -> tuple[str, str]:
     return signature, full_public_key
 
 
+@lru_cache(maxsize=4096)
+def get_verify_key(public_key: str) -> nacl.signing.VerifyKey:
+    """Decoded ed25519 verify key of a "ed25519:<base58>" public key."""
+    return nacl.signing.VerifyKey(base58.b58decode(public_key[len(ED_PREFIX) :]))
+
+
 def validate_signature(public_key: str, signature: str, payload: Payload):
     """Validates a cryptographic signature for a given payload using a specified public key."""
-    borsh_payload = BinarySerializer(dict(PAYLOAD_SCHEMA)).serialize(payload)
+    borsh_payload = serialize_payload(payload)
     to_sign = hashlib.sha256(borsh_payload).digest()
     real_signature = base64.b64decode(signature)
 
-    verify_key: nacl.signing.VerifyKey = nacl.signing.VerifyKey(base58.b58decode(public_key[len(ED_PREFIX) :]))
+    verify_key = get_verify_key(public_key)
 
     try:
         verify_key.verify(to_sign, real_signature)
@@ -250,14 +265,16 @@ COMPLETION_PAYLOAD_SCHEMA: list[list[Any]] = [
     ]
 ]
 
+serialize_completion_payload = compile_serializer(dict(COMPLETION_PAYLOAD_SCHEMA), CompletionSignaturePayload)
+
 
 def validate_completion_signature(public_key: str, signature: str, payload: CompletionSignaturePayload):
     """Validates a cryptographic signature for a given payload using a specified public key."""
-    borsh_payload = BinarySerializer(dict(COMPLETION_PAYLOAD_SCHEMA)).serialize(payload)
+    borsh_payload = serialize_completion_payload(payload)
     to_sign = hashlib.sha256(borsh_payload).digest()
     real_signature = base64.b64decode(signature)
 
-    verify_key: nacl.signing.VerifyKey = nacl.signing.VerifyKey(base58.b58decode(public_key[len(ED_PREFIX) :]))
+    verify_key = get_verify_key(public_key)
 
     try:
         verify_key.verify(to_sign, real_signature)
@@ -286,7 +303,7 @@ def derive_new_extended_private_key(extended_private_key: str, addition: str) ->
 
 def create_inference_signature(private_key: str, payload: CompletionSignaturePayload) -> tuple[str, str]:
     """Creates a cryptographic signature for a given extended inference payload using a specified private key."""
-    borsh_payload = BinarySerializer(dict(COMPLETION_PAYLOAD_SCHEMA)).serialize(payload)
+    borsh_payload = serialize_completion_payload(payload)
 
     to_sign = hashlib.sha256(borsh_payload).digest()
 
@@ -0,0 +1,62 @@
+"""Bundles of all files of a registry entry, as a single gzip-compressed tar archive.
+
+The first member of a bundle is `manifest.json`, listing the files of the bundle with their size and entity tag,
+followed by the files in the order of the manifest. Members are read by position rather than by name, as an entry may
+have a file named `manifest.json` itself. A bundle is identified by the hash of its manifest, so it only changes when a
+file of the entry changes.
+"""
+
+import hashlib
+import io
+import json
+import tarfile
+from typing import IO, Any, Callable, Dict, List, Sequence
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def bundle_manifest(files: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Manifest of the given registry files, objects with `filename`, `size` and `etag`."""
+    return sorted(
+        ({"path": file.filename, "size": file.size, "etag": file.etag} for file in files), key=lambda f: f["path"]
+    )
+
+
+def bundle_hash(manifest: List[Dict[str, Any]]) -> str:
+    """Identifier of the bundle of the files of `manifest`."""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+
+
+def write_bundle(manifest: List[Dict[str, Any]], open_file: Callable[[str], IO[bytes]], fileobj: IO[bytes]) -> None:
+    """Writes a bundle of the files of `manifest` to `fileobj`, reading each file from `open_file(path)`."""
+    with tarfile.open(fileobj=fileobj, mode="w:gz") as tar:
+        data = json.dumps(manifest).encode()
+        _add(tar, MANIFEST_FILENAME, len(data), io.BytesIO(data))
+        for file in manifest:
+            _add(tar, file["path"], file["size"], open_file(file["path"]))
+
+
+def read_bundle(fileobj: IO[bytes]) -> List[Dict[str, Any]]:
+    """Files of a bundle, as dicts with `filename` and `content` bytes."""
+    files = []
+    with tarfile.open(fileobj=fileobj, mode="r:gz") as tar:
+        manifest = json.load(_extract_next(tar, MANIFEST_FILENAME))
+        for file in manifest:
+            files.append({"filename": file["path"], "content": _extract_next(tar, file["path"]).read()})
+    return files
+
+
+def _add(tar: tarfile.TarFile, path: str, size: int, content: IO[bytes]) -> None:
+    info = tarfile.TarInfo(path)
+    info.size = size
+    tar.addfile(info, content)
+
+
+def _extract_next(tar: tarfile.TarFile, path: str) -> IO[bytes]:
+    member = tar.next()
+    if member is None or member.name != path:
+        raise ValueError(f"Bundle has no file {path} at its position")
+    content = tar.extractfile(member)
+    if content is None:
+        raise ValueError(f"Bundle has no file {path}")
+    return content
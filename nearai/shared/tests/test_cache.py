@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from nearai.shared.cache import LruTtlCache, cache_stats, cached
+
+
+class TestLruTtlCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):  # noqa: D102
+        cache = LruTtlCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expires_entries(self):  # noqa: D102
+        cache = LruTtlCache(max_entries=2, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertEqual(cache.get("a", "missing"), "missing")
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):  # noqa: D102
+        cache = LruTtlCache(max_entries=2, name="test_stats")
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+
+        stats = cache_stats()["test_stats"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+
+class TestCached(unittest.TestCase):
+    def test_single_flight(self):  # noqa: D102
+        calls = []
+        started = threading.Event()
+
+        @cached(ttl=60)
+        def slow(x):
+            calls.append(x)
+            started.set()
+            time.sleep(0.1)
+            return x * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow(21))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [21])
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(slow.cache.stats()["coalesced"], 7)
+
+    def test_bounded(self):  # noqa: D102
+        @cached(ttl=60, max_entries=3)
+        def identity(x):
+            return x
+
+        for i in range(10):
+            identity(i)
+        self.assertEqual(len(identity.cache), 3)
+        self.assertEqual(identity.cache.stats()["evictions"], 7)
+
+    def test_errors_are_not_cached(self):  # noqa: D102
+        calls = []
+
+        @cached(ttl=60)
+        def failing():
+            calls.append(1)
+            raise ValueError("boom")
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                failing()
+        self.assertEqual(len(calls), 2)
+
+    def test_stale_while_revalidate(self):  # noqa: D102
+        version = [0]
+
+        @cached(ttl=0.05, stale_ttl=10, name="test_stale_while_revalidate")
+        def current():
+            version[0] += 1
+            return version[0]
+
+        self.assertEqual(current(), 1)
+        time.sleep(0.06)
+        self.assertEqual(current(), 1)  # stale value, refresh started in the background
+        for _ in range(100):
+            if current() == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(current(), 2)
+        stats = cache_stats()["test_stale_while_revalidate"]
+        self.assertEqual(stats["refreshes"], 1)
+        self.assertGreaterEqual(stats["stale_hits"], 1)
+
+    def test_async_single_flight(self):  # noqa: D102
+        calls = []
+
+        @cached(ttl=60)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return x + 1
+
+        async def main():
+            return await asyncio.gather(*[fetch(1) for _ in range(5)], fetch(2))
+
+        self.assertEqual(asyncio.run(main()), [2] * 5 + [3])
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual(fetch.cache.stats()["coalesced"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Benchmark of tool definitions computed on every request against definitions cached at registration.
+
+Registers 50 tools with a few typed and documented parameters each. Run from the repository root with
+`python -m nearai.tests.benchmark_tool_registry [num_tools]`.
+"""
+
+import sys
+import time
+from typing import Callable, Literal, Optional
+
+from nearai.agents.tool_registry import ToolRegistry, _tool_definition
+
+
+def make_tool(i: int) -> Callable:
+    def tool(query: str, limit: int = 10, mode: Literal["fast", "full"] = "fast", score: Optional[float] = None):
+        """Search the index.
+
+        query: The text to search for
+        limit: Maximum number of results
+        mode: Search mode
+        score: Minimum score of the results
+        """
+        return query
+
+    tool.__name__ = f"search_{i}"
+    return tool
+
+
+def timed(function, repeat: int = 200) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(num_tools: int = 50):
+    registry = ToolRegistry()
+    for i in range(num_tools):
+        registry.register_tool(make_tool(i))
+
+    uncached = timed(lambda: [_tool_definition(tool) for tool in registry.tools.values()])
+    cached = timed(registry.get_all_tool_definitions)
+    payload = timed(registry.get_all_tool_definitions_json)
+    print(f"{num_tools} tools: uncached {1000 * uncached:.3f}ms, cached {1000 * cached:.3f}ms, ", end="")
+    print(f"json payload {1000 * payload:.3f}ms, speedup {uncached / cached:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,88 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+
+from nearai.agents.log_writer import LogWriter, LogWriterHandler, is_log_segment, log_segment_filename
+
+
+class TestLogWriter(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.flushed = []
+        self.event = threading.Event()
+
+    def flush_log(self, log, content):  # noqa: D102
+        self.flushed.append((log, content))
+        self.event.set()
+
+    def test_lines_are_flushed_in_batches(self):  # noqa: D102
+        writer = LogWriter(self.flush_log, flush_interval=3600)
+        for i in range(3):
+            writer.write("system_log.txt", f"line {i}\n")
+        writer.write("system:log", "hello\n")
+        self.assertEqual(self.flushed, [])
+
+        writer.flush()
+        self.assertEqual(self.flushed, [("system_log.txt", "line 0\nline 1\nline 2\n"), ("system:log", "hello\n")])
+        writer.flush()
+        self.assertEqual(len(self.flushed), 2)
+
+    def test_flush_by_size_and_time(self):  # noqa: D102
+        writer = LogWriter(self.flush_log, flush_interval=3600, max_buffer_bytes=10)
+        writer.write("agent_log.txt", "x" * 10)
+        self.assertTrue(self.event.wait(10))
+        self.assertEqual(self.flushed, [("agent_log.txt", "x" * 10)])
+
+        self.event.clear()
+        writer = LogWriter(self.flush_log, flush_interval=0.01)
+        writer.write("agent_log.txt", "y")
+        self.assertTrue(self.event.wait(10))
+        self.assertEqual(self.flushed[-1], ("agent_log.txt", "y"))
+
+    def test_handler(self):  # noqa: D102
+        writer = LogWriter(self.flush_log, flush_interval=3600)
+        logger = logging.getLogger("test_log_writer")
+        logger.handlers = [LogWriterHandler(writer, "agent_log.txt")]
+        logger.setLevel(logging.INFO)
+        logger.info("first")
+        logger.info("second")
+        writer.flush()
+        self.assertEqual(self.flushed, [("agent_log.txt", "first\nsecond\n")])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_forked_child_flushes_its_own_lines(self):  # noqa: D102
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "flushed.txt")
+
+            def flush_to_file(log, content):
+                with open(path, "a") as f:
+                    f.write(f"{os.getpid()} {log} {content}")
+
+            writer = LogWriter(flush_to_file, flush_interval=3600)
+            writer.write("agent_log.txt", "parent\n")
+
+            def child():
+                writer.write("agent_log.txt", "child\n")
+                writer.flush()
+
+            process = multiprocessing.get_context("fork").Process(target=child)
+            process.start()
+            process.join(10)
+            self.assertEqual(process.exitcode, 0)
+            writer.flush()
+
+            with open(path) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines, [f"{process.pid} agent_log.txt child", f"{os.getpid()} agent_log.txt parent"])
+
+    def test_segment_filenames(self):  # noqa: D102
+        self.assertEqual(log_segment_filename("system_log.txt", 3), "system_log.part3.txt")
+        self.assertTrue(is_log_segment("system_log.part3.txt", "system_log.txt"))
+        self.assertFalse(is_log_segment("system_log.txt", "system_log.txt"))
+        self.assertFalse(is_log_segment("agent_log.part3.txt", "system_log.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from typing import Any, Dict, List
+
+from nearai.aws_runner.metrics import MAX_DATUMS_PER_REQUEST, FileSink, MetricsBuffer, MetricsSink
+
+
+class ListSink(MetricsSink):
+    def __init__(self):  # noqa: D107
+        self.batches: List[List[Dict[str, Any]]] = []
+        self.sent = threading.Event()
+
+    def send(self, data):  # noqa: D102
+        self.batches.append(data)
+        self.sent.set()
+
+
+class TestMetricsBuffer(unittest.TestCase):
+    def test_aggregates_datapoints(self):  # noqa: D102
+        sink = ListSink()
+        metrics = MetricsBuffer(sink, flush_interval=3600, dimensions={"FunctionName": "runner"})
+        for value in (3, 1, 2):
+            metrics.add("Duration", value, "Milliseconds")
+        metrics.add("Errors", 1, "Count", dimensions={"Reason": "timeout"})
+        self.assertEqual(sink.batches, [])
+
+        metrics.flush()
+        self.assertEqual(len(sink.batches), 1)
+        data = {datum["MetricName"]: datum for datum in sink.batches[0]}
+        self.assertEqual(
+            data["Duration"]["StatisticValues"], {"SampleCount": 3, "Sum": 6.0, "Minimum": 1.0, "Maximum": 3.0}
+        )
+        self.assertEqual(data["Duration"]["Dimensions"], [{"Name": "FunctionName", "Value": "runner"}])
+        self.assertEqual(
+            data["Errors"]["Dimensions"],
+            [{"Name": "FunctionName", "Value": "runner"}, {"Name": "Reason", "Value": "timeout"}],
+        )
+
+        metrics.flush()
+        self.assertEqual(len(sink.batches), 1)
+
+    def test_full_buffer_is_sent_in_background(self):  # noqa: D102
+        sink = ListSink()
+        metrics = MetricsBuffer(sink, flush_interval=3600)
+        for i in range(MAX_DATUMS_PER_REQUEST + 1):
+            metrics.add(f"Metric{i}", 1, "Count")
+        self.assertTrue(sink.sent.wait(10))
+        metrics.flush()
+        self.assertEqual(sum(len(batch) for batch in sink.batches), MAX_DATUMS_PER_REQUEST + 1)
+        self.assertTrue(all(len(batch) <= MAX_DATUMS_PER_REQUEST for batch in sink.batches))
+
+    def test_file_sink(self):  # noqa: D102
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.jsonl")
+            metrics = MetricsBuffer(FileSink(path), flush_interval=3600)
+            metrics.add("Duration", 5, "Milliseconds")
+            metrics.flush()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line["MetricName"] for line in lines], ["Duration"])
+        self.assertEqual(lines[0]["StatisticValues"]["Sum"], 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
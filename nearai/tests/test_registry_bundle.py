@@ -0,0 +1,74 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from nearai.aws_runner.bundle_cache import BundleCache
+from nearai.aws_runner.service import AgentCache
+from nearai.shared.registry_bundle import bundle_hash, bundle_manifest, read_bundle, write_bundle
+
+FILES = {"agent.py": b"print('hello')", "data/config.json": b'{"a": 1}', "empty.txt": b""}
+
+
+def make_bundle(files=FILES) -> bytes:
+    manifest = bundle_manifest(
+        [SimpleNamespace(filename=path, size=len(content), etag=str(hash(content))) for path, content in files.items()]
+    )
+    bundle = io.BytesIO()
+    write_bundle(manifest, lambda path: io.BytesIO(files[path]), bundle)
+    return bundle.getvalue()
+
+
+class TestRegistryBundle(unittest.TestCase):
+    def test_round_trip(self):  # noqa: D102
+        files = read_bundle(io.BytesIO(make_bundle()))
+        self.assertEqual({file["filename"]: file["content"] for file in files}, FILES)
+
+    def test_entry_with_its_own_manifest(self):  # noqa: D102
+        files = {"manifest.json": b'{"name": "web app"}', "index.html": b"<html></html>", "z.txt": b"z"}
+        read = read_bundle(io.BytesIO(make_bundle(files)))
+        self.assertEqual({file["filename"]: file["content"] for file in read}, files)
+
+    def test_hash_depends_on_content_only(self):  # noqa: D102
+        def digest(files):
+            return bundle_hash(bundle_manifest([SimpleNamespace(filename=p, size=1, etag=e) for p, e in files]))
+
+        self.assertEqual(digest([("a", "1"), ("b", "2")]), digest([("b", "2"), ("a", "1")]))
+        self.assertNotEqual(digest([("a", "1"), ("b", "2")]), digest([("a", "1"), ("b", "3")]))
+
+    def test_cache_evicts_least_recently_used(self):  # noqa: D102
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BundleCache(Path(directory), max_bytes=250)
+            for i, name in enumerate(["a", "b", "c"]):
+                cache.put(f"dev.near/{name}/1", name * 64, io.BytesIO(b"x" * 100))
+                os.utime(cache.path(name * 64), (i, i))
+            self.assertIsNone(cache.get("dev.near/a/1"))
+            self.assertEqual(cache.get("dev.near/b/1"), "b" * 64)
+            cache.put("dev.near/d/1", "d" * 64, io.BytesIO(b"x" * 100))
+            self.assertIsNone(cache.get("dev.near/c/1"))
+            self.assertEqual(cache.get("dev.near/b/1"), "b" * 64)
+            self.assertEqual(cache.get("dev.near/d/1"), "d" * 64)
+
+
+class TestAgentCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):  # noqa: D102
+        def agent(size):
+            return SimpleNamespace(agent_files=[{"filename": "agent.py", "content": b"x" * size}])
+
+        cache = AgentCache(max_bytes=250)
+        cache["a"] = agent(100)  # type: ignore
+        cache["b"] = agent(100)  # type: ignore
+        self.assertIsNotNone(cache["a"])
+        cache["c"] = agent(100)  # type: ignore
+        self.assertEqual(["a" in cache, "b" in cache, "c" in cache], [True, False, True])
+        self.assertEqual(cache.total_bytes, 200)
+
+        # An agent larger than the cache is still kept, alone.
+        cache["d"] = agent(1000)  # type: ignore
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import hashlib
+import io
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest.mock import MagicMock, patch
+
+from nearai.blob_store import BlobStore
+from nearai.openapi_client import EntryLocation, EntryMetadata, Filename
+from nearai.registry import Registry
+
+LARGE = b"weights" * 100_000
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, content: bytes, status: int = 200):  # noqa: D107
+        super().__init__(content)
+        self.status = status
+
+
+class FakeHub:
+    """Registry API serving entry versions from memory and recording the transfers."""
+
+    def __init__(self, versions: Dict[str, Dict[str, bytes]]):  # noqa: D107
+        self.versions = versions
+        self.transfers: List[Tuple[str, str, int]] = []
+        self.fail_after: Dict[str, int] = {}
+
+    def list_files_v1_registry_list_files_post(self, body):  # noqa: D102
+        files = self.versions[body.entry_location.version]
+        return [
+            Filename(filename=path, size=len(content), etag=hashlib.md5(content).hexdigest())
+            for path, content in files.items()
+        ]
+
+    def download_metadata_v1_registry_download_metadata_post(self, body):  # noqa: D102
+        return EntryMetadata(
+            name=body.entry_location.name,
+            version=body.entry_location.version,
+            category="agent",
+            description="",
+            tags=[],
+            details={},
+            show_entry=True,
+        )
+
+    def download_file_v1_registry_download_file_post_without_preload_content(self, body, _headers=None):  # noqa: D102
+        content = self.versions[body.entry_location.version][body.path]
+        offset = int(_headers["Range"][len("bytes=") : -1]) if _headers else 0
+        self.transfers.append((body.entry_location.version, body.path, offset))
+        if body.path in self.fail_after:
+            # Connection lost after some bytes.
+            return FakeResponse(content[: self.fail_after.pop(body.path)])
+        return FakeResponse(content[offset:], status=206 if offset else 200)
+
+
+class TestRegistryDownload(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        patcher = patch("nearai.registry.get_registry_folder", return_value=self.tmp / "registry")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.hub = FakeHub(
+            {
+                "0.0.1": {"agent.py": b"print('v1')", "model/weights.bin": LARGE},
+                "0.0.2": {"agent.py": b"print('v2')", "model/weights.bin": LARGE, "copy.bin": LARGE},
+            }
+        )
+        self.registry = Registry.__new__(Registry)
+        self.registry.api = MagicMock(wraps=self.hub)
+        self.registry.blobs = BlobStore(self.tmp / "blobs")
+
+    def download(self, version: str, **kwargs) -> Path:  # noqa: D102
+        return self.registry.download(
+            EntryLocation(namespace="dev.near", name="agent", version=version), verbose=False, **kwargs
+        )
+
+    def test_download_files(self):  # noqa: D102
+        path = self.download("0.0.1")
+        self.assertEqual((path / "agent.py").read_bytes(), b"print('v1')")
+        self.assertEqual((path / "model/weights.bin").read_bytes(), LARGE)
+        self.assertTrue((path / "metadata.json").exists())
+        self.assertEqual(len(self.hub.transfers), 2)
+
+    def test_unchanged_files_are_not_transferred_again(self):  # noqa: D102
+        self.download("0.0.1")
+        path = self.download("0.0.2")
+        self.assertEqual(self.hub.transfers[2:], [("0.0.2", "agent.py", 0)])
+        self.assertEqual((path / "copy.bin").read_bytes(), LARGE)
+        self.assertEqual((path / "model/weights.bin").read_bytes(), LARGE)
+
+        self.download("0.0.2", force=True)
+        self.assertEqual(len(self.hub.transfers), 3)
+
+    def test_resume_interrupted_download(self):  # noqa: D102
+        self.hub.fail_after["model/weights.bin"] = 1000
+        with self.assertRaises(ValueError):
+            self.download("0.0.1")
+        self.assertFalse((self.tmp / "registry/dev.near/agent/0.0.1/metadata.json").exists())
+
+        path = self.download("0.0.1")
+        self.assertIn(("0.0.1", "model/weights.bin", 1000), self.hub.transfers)
+        self.assertEqual((path / "model/weights.bin").read_bytes(), LARGE)
+
+    def test_etags_that_are_not_md5(self):  # noqa: D102
+        # Objects encrypted with SSE-KMS, for example, have entity tags unrelated to their content.
+        list_files = self.hub.list_files_v1_registry_list_files_post
+
+        def list_files_with_opaque_etags(body):
+            files = list_files(body)
+            for file in files:
+                file.etag = hashlib.md5(file.etag.encode()).hexdigest()
+            return files
+
+        self.registry.api.list_files_v1_registry_list_files_post.side_effect = list_files_with_opaque_etags
+        path = self.download("0.0.1")
+        self.assertEqual((path / "agent.py").read_bytes(), b"print('v1')")
+        self.assertEqual((path / "model/weights.bin").read_bytes(), LARGE)
+        self.assertTrue(self.registry.blobs.digests_mismatched)
+        self.assertFalse(list((self.tmp / "blobs").glob("??/*")))
+
+    def test_concurrent_downloads_share_the_partial_file(self):  # noqa: D102
+        # Another process downloading the same blob holds the lock on it.
+        other = BlobStore(self.tmp / "blobs")
+        digest = hashlib.md5(LARGE).hexdigest()
+        fetched: List[Path] = []
+        with other._process_lock(digest):
+            thread = threading.Thread(
+                target=lambda: fetched.append(
+                    self.registry.blobs.fetch(digest, len(LARGE), lambda _: (0, io.BytesIO(LARGE)))
+                )
+            )
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            other._fetch(digest, len(LARGE), lambda _: (0, io.BytesIO(LARGE)))
+        thread.join()
+        self.assertEqual(fetched[0].read_bytes(), LARGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from nearai.openapi_client import EntryLocation
+from nearai.openapi_client.exceptions import NotFoundException
+from nearai.registry import Registry
+
+ENTRY = EntryLocation(namespace="dev.near", name="model", version="2")
+
+
+class TestRegistryUploadFiles(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.files = []
+        for name, content in {"weights.bin": b"w" * 10000, "copy.bin": b"w" * 10000, "agent.py": b"print()"}.items():
+            path = Path(tmp.name) / name
+            path.write_bytes(content)
+            self.files.append((path, Path(name), len(content)))
+        self.registry = Registry.__new__(Registry)
+        self.registry.api = MagicMock()
+
+    def test_only_unknown_content_is_uploaded(self):  # noqa: D102
+        known = hashlib.sha256(b"w" * 10000).hexdigest()
+        uploaded = []
+        with (
+            patch.object(Registry, "_upload_manifest", return_value=[known]) as upload_manifest,
+            patch.object(Registry, "_upload_blob", side_effect=lambda *args: uploaded.append(args[2])),
+        ):
+            sizes = []
+            self.registry.upload_files(ENTRY, self.files, sizes.append)
+
+        manifest = upload_manifest.call_args.args[1]
+        self.assertEqual([file["sha256"] for file in manifest], [known, known, hashlib.sha256(b"print()").hexdigest()])
+        self.assertEqual(uploaded, [Path("agent.py")])
+        self.assertEqual(sorted(sizes), [7, 10000, 10000])
+
+    def test_hub_without_manifests(self):  # noqa: D102
+        with (
+            patch.object(Registry, "_upload_manifest", side_effect=NotFoundException(status=404)),
+            patch.object(Registry, "upload_file") as upload_file,
+        ):
+            self.registry.upload_files(ENTRY, self.files)
+        self.assertEqual(upload_file.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from openai.types.file_object import FileObject
+
+from nearai.agents.thread_files import FileCache
+
+
+def file_object(file_id: str) -> FileObject:
+    return FileObject(
+        id=file_id,
+        bytes=1,
+        created_at=0,
+        filename=f"{file_id}.txt",
+        object="file",
+        purpose="assistants",
+        status="uploaded",
+    )
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.requests = []
+        self.cache = FileCache(self.retrieve)
+
+    def retrieve(self, file_ids, include_content):  # noqa: D102
+        self.requests.append((file_ids, include_content))
+        return [
+            (file_object(file_id), file_id.encode() if include_content else None)
+            for file_id in file_ids
+            if file_id != "missing"
+        ]
+
+    def test_files_are_fetched_once_in_bulk(self):  # noqa: D102
+        files = self.cache.files(["a", "b", "missing", "a"])
+        self.assertEqual([f.id for f in files], ["a", "b", "a"])
+        self.assertEqual(self.cache.contents(["a", "b", "c"]), {"a": b"a", "b": b"b", "c": b"c"})
+        self.assertEqual(self.cache.contents(["b", "a"]), {"a": b"a", "b": b"b"})
+        self.assertEqual([f.id for f in self.cache.files(["c"])], ["c"])
+        self.assertEqual(self.requests, [(["a", "b", "missing"], False), (["a", "b", "c"], True)])
+
+    def test_added_files_are_not_fetched(self):  # noqa: D102
+        self.cache.add(file_object("new"), b"content")
+        self.assertEqual(self.cache.contents(["new"]), {"new": b"content"})
+        self.assertEqual(self.requests, [])
+
+    def test_batches(self):  # noqa: D102
+        self.cache.files([str(i) for i in range(250)])
+        self.assertEqual([len(file_ids) for file_ids, _ in self.requests], [100, 100, 50])
+
+    def test_contents_left_out_are_fetched_again(self):  # noqa: D102
+        retrieve = self.retrieve
+
+        def retrieve_two_contents(file_ids, include_content):
+            # Like the hub once a response reaches its size limit.
+            retrieved = retrieve(file_ids, include_content)
+            return retrieved[:2] + [(file, None) for file, _ in retrieved[2:]]
+
+        self.cache = FileCache(retrieve_two_contents)
+        self.assertEqual(
+            self.cache.contents(["a", "missing", "b", "c", "d", "e"]),
+            {"a": b"a", "b": b"b", "c": b"c", "d": b"d", "e": b"e"},
+        )
+        self.assertEqual(
+            self.requests,
+            [(["a", "missing", "b", "c", "d", "e"], True), (["c", "d", "e"], True), (["e"], True)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
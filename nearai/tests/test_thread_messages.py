@@ -0,0 +1,71 @@
+import unittest
+from types import SimpleNamespace
+
+from nearai.agents.thread_messages import ThreadMessages
+
+
+class FakeThread:
+    def __init__(self, page_size=None):  # noqa: D107
+        self.messages = []
+        self.fetches = []
+        self.page_size = page_size
+
+    def create(self, message_id):  # noqa: D102
+        message = SimpleNamespace(id=message_id)
+        self.messages.append(message)
+        return message
+
+    def fetch(self, after):  # noqa: D102
+        self.fetches.append(after)
+        ids = [message.id for message in self.messages]
+        messages = self.messages[ids.index(after) + 1 :] if after else list(self.messages)
+        return messages[: self.page_size]
+
+
+class TestThreadMessages(unittest.TestCase):
+    def test_fetches_only_new_messages(self):  # noqa: D102
+        thread = FakeThread()
+        for i in range(3):
+            thread.create(f"m{i}")
+        messages = ThreadMessages(thread.fetch)
+        self.assertEqual([m.id for m in messages.list()], ["m0", "m1", "m2"])
+
+        thread.create("m3")
+        self.assertEqual([m.id for m in messages.list()], ["m0", "m1", "m2", "m3"])
+        self.assertEqual(messages.list()[-1].id, "m3")
+        self.assertEqual(thread.fetches, [None, "m2", "m3"])
+
+    def test_added_messages_take_their_place(self):  # noqa: D102
+        thread = FakeThread()
+        thread.create("m0")
+        messages = ThreadMessages(thread.fetch)
+        messages.list()
+
+        # The reply of the run is listed right away, before the hub lists it.
+        reply = SimpleNamespace(id="reply")
+        messages.add(reply)
+        self.assertEqual([m.id for m in messages.list()], ["m0", "reply"])
+
+        # A user message created before the reply is listed before it.
+        thread.create("user")
+        thread.messages.append(reply)
+        self.assertEqual([m.id for m in messages.list()], ["m0", "user", "reply"])
+        self.assertEqual([m.id for m in messages.list()], ["m0", "user", "reply"])
+
+    def test_fetches_every_page(self):  # noqa: D102
+        thread = FakeThread(page_size=2)
+        for i in range(5):
+            thread.create(f"m{i}")
+        messages = ThreadMessages(thread.fetch, page_size=2)
+        # The newest messages are listed, not only the first page.
+        self.assertEqual([m.id for m in messages.list()], ["m0", "m1", "m2", "m3", "m4"])
+        self.assertEqual(thread.fetches, [None, "m1", "m3"])
+
+        thread.create("m5")
+        thread.create("m6")
+        self.assertEqual([m.id for m in messages.list()][-3:], ["m4", "m5", "m6"])
+        self.assertEqual(thread.fetches, [None, "m1", "m3", "m4", "m6"])
+
+
+if __name__ == "__main__":
+    unittest.main()
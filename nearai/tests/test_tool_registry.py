@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+import unittest
+from typing import List
+
+from nearai.agents.tool_registry import ToolRegistry
+
+
+def slow_echo(text: str):
+    """Echo after a while.
+
+    text: The text to echo
+    """
+    time.sleep(0.2)
+    return text
+
+
+async def async_echo(text: str):
+    """Echo after a while, asynchronously.
+
+    text: The text to echo
+    """
+    await asyncio.sleep(0.2)
+    return text.upper()
+
+
+def fail():
+    """Always fail."""
+    raise RuntimeError("boom")
+
+
+class TestCallTools(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        self.registry = ToolRegistry()
+        for tool in (slow_echo, async_echo):
+            self.registry.register_tool(tool, parallel=True)
+        self.registry.register_tool(fail)
+
+    def test_calls_run_concurrently_in_order(self):  # noqa: D102
+        calls = [("slow_echo", {"text": str(i)}) for i in range(4)]
+        calls += [("async_echo", {"text": "a"}), ("async_echo", {"text": "b"})]
+
+        start_time = time.perf_counter()
+        results = self.registry.call_tools(calls)
+        elapsed = time.perf_counter() - start_time
+
+        self.assertEqual([result.output for result in results], ["0", "1", "2", "3", "A", "B"])
+        self.assertLess(elapsed, 0.6)
+        self.assertTrue(all(result.duration >= 0.2 for result in results))
+
+    def test_calls_that_write_run_in_order(self):  # noqa: D102
+        written: List[str] = []
+
+        def write(text: str, delay: float):
+            """Write after a while.
+
+            text: The text to write
+            delay: Seconds to wait before writing
+            """
+            time.sleep(delay)
+            written.append(text)
+            return len(written)
+
+        def echo_written():
+            """What was written so far."""
+            time.sleep(0.1)
+            return list(written)
+
+        self.registry.register_tool(write)
+        self.registry.register_tool(echo_written, parallel=True)
+        calls = [
+            ("echo_written", {}),
+            ("echo_written", {}),
+            ("write", {"text": "a", "delay": 0.2}),
+            ("write", {"text": "b", "delay": 0.0}),
+            ("echo_written", {}),
+        ]
+        results = self.registry.call_tools(calls)
+        self.assertEqual(written, ["a", "b"])
+        self.assertEqual([result.output for result in results], [[], [], 1, 2, ["a", "b"]])
+
+    def test_errors_are_returned(self):  # noqa: D102
+        results = self.registry.call_tools([("fail", {}), ("missing", {}), ("slow_echo", {"text": "x"})])
+        self.assertIsInstance(results[0].error, RuntimeError)
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(results[2].output, "x")
+
+    def test_sequential(self):  # noqa: D102
+        start_time = time.perf_counter()
+        results = self.registry.call_tools([("slow_echo", {"text": "a"}), ("slow_echo", {"text": "b"})], max_workers=1)
+        self.assertGreaterEqual(time.perf_counter() - start_time, 0.4)
+        self.assertEqual([result.output for result in results], ["a", "b"])
+
+
+class TestToolDefinitions(unittest.TestCase):
+    def test_definitions_are_cached_and_invalidated(self):  # noqa: D102
+        registry = ToolRegistry()
+        registry.register_tool(slow_echo)
+        definition = registry.get_tool_definition("slow_echo")
+        assert definition is not None
+        self.assertEqual(definition["function"]["parameters"]["required"], ["text"])
+        self.assertIs(registry.get_tool_definition("slow_echo"), definition)
+
+        def slow_echo_v2(text: str, times: int = 1):
+            """Echo several times.
+
+            text: The text to echo
+            times: How many times
+            """
+            return text * times
+
+        slow_echo_v2.__name__ = "slow_echo"
+        registry.register_tool(slow_echo_v2)
+        definition = registry.get_tool_definition("slow_echo")
+        assert definition is not None
+        self.assertEqual(definition["function"]["description"], "Echo several times.")
+
+        payload = registry.get_all_tool_definitions_json()
+        self.assertEqual(json.loads(payload), registry.get_all_tool_definitions())
+        self.assertIs(registry.get_all_tool_definitions_json(), payload)
+        registry.register_tool(fail)
+        self.assertEqual(len(json.loads(registry.get_all_tool_definitions_json())), 2)
+
+    def test_tool_without_docstring_fails_on_request(self):  # noqa: D102
+        def undocumented():
+            pass
+
+        registry = ToolRegistry()
+        registry.register_tool(undocumented)
+        with self.assertRaises(AssertionError):
+            registry.get_tool_definition("undocumented")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from nearai.agents.workdir_pool import WorkdirPool, compile_agent_code
+
+FILES = [
+    {"filename": "agent.py", "content": "import utils\nenv.done = utils.VALUE"},
+    {"filename": "utils.py", "content": "VALUE = 1"},
+    {"filename": "prompts/system.txt", "content": "You are helpful."},
+    {"filename": "metadata.json", "content": {"name": "agent", "version": "1"}},
+]
+
+
+class TestWorkdirPool(unittest.TestCase):
+    def setUp(self):  # noqa: D102
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pool = WorkdirPool(size=2, root=tmp.name)
+
+    def test_reuse_after_reset(self):  # noqa: D102
+        workdir = self.pool.acquire("dev.near/agent/1", FILES)
+        path = Path(workdir.path)
+        self.assertEqual((path / "prompts/system.txt").read_text(), "You are helpful.")
+        self.assertEqual(sorted(workdir.scan.py_modules), ["prompts", "utils"])
+        self.assertEqual(workdir.scan.file_cache["utils.py"], "VALUE = 1")
+
+        # A run writes, changes and deletes files.
+        (path / "output.txt").write_text("result")
+        (path / ".threads/thread").mkdir(parents=True)
+        (path / "utils.py").write_text("VALUE = 2")
+        os.remove(path / "prompts/system.txt")
+        self.pool.release(workdir)
+
+        self.assertEqual(self.pool.acquire("dev.near/agent/1", FILES).path, str(path))
+        self.assertEqual(
+            sorted(str(p.relative_to(path)) for p in path.rglob("*") if p.is_file()),
+            sorted(f["filename"] for f in FILES),
+        )
+        self.assertEqual((path / "utils.py").read_text(), "VALUE = 1")
+        self.assertEqual((path / "prompts/system.txt").read_text(), "You are helpful.")
+        self.assertEqual(self.pool.materialized, 1)
+
+    def test_changes_with_restored_modification_time_are_reset(self):  # noqa: D102
+        workdir = self.pool.acquire("dev.near/agent/1", FILES)
+        path = Path(workdir.path)
+        utils = path / "utils.py"
+        stat = utils.stat()
+        # Same size, with the modification time set back to when the file was written.
+        utils.write_text("VALUE = 9")
+        os.utime(utils, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        (path / "agent.py").chmod(0o777)
+        self.pool.release(workdir)
+
+        self.assertEqual(self.pool.acquire("dev.near/agent/1", FILES).path, str(path))
+        self.assertEqual(utils.read_text(), "VALUE = 1")
+        self.assertEqual((path / "agent.py").stat().st_mode & 0o777, stat.st_mode & 0o777)
+
+    def test_directories_are_exclusive_and_bounded(self):  # noqa: D102
+        first = self.pool.acquire("dev.near/agent/1", FILES)
+        second = self.pool.acquire("dev.near/agent/1", FILES)
+        self.assertNotEqual(first.path, second.path)
+
+        changed = self.pool.acquire("dev.near/agent/1", FILES[:1] + [{"filename": "utils.py", "content": "VALUE = 3"}])
+        self.assertNotEqual(changed.key, first.key)
+
+        for workdir in (first, second, changed):
+            self.pool.release(workdir)
+        self.assertFalse(os.path.exists(first.path))
+        self.assertTrue(os.path.exists(second.path))
+        self.assertTrue(os.path.exists(changed.path))
+
+    def test_compiled_code_is_cached(self):  # noqa: D102
+        code = compile_agent_code("x = 1", "/tmp/agent.py")
+        self.assertIs(compile_agent_code("x = 1", "/tmp/agent.py"), code)
+        self.assertIsNot(compile_agent_code("x = 2", "/tmp/agent.py"), code)
+
+
+if __name__ == "__main__":
+    unittest.main()